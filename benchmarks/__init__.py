@@ -0,0 +1,5 @@
+"""
+성능 측정 스크립트 모음
+
+프로젝트 루트에서 모듈로 실행합니다. 예) python -m benchmarks.bench_quantized_index
+"""
@@ -0,0 +1,144 @@
+"""
+임베딩 지연 꼬리 벤치마크 (제한 시간, 헤지 요청, 회로 차단기)
+
+benchmarks.fake_embedding_server를 같은 프로세스의 스레드로 띄우고, 지연 꼬리를 넣은 상태에서
+- plain: OpenAIEmbeddings.embed_query를 그대로 호출
+- resilient: rag.resilient.ResilientEmbeddings로 감싼 호출
+을 --concurrency개 스레드로 --queries번씩 실행해 지연 분위수, 실패 수, 서버가 받은 요청 수(헤지 비용)를 비교합니다.
+--outage-seconds를 주면 이어서 서버가 모든 요청에 오류를 내는 구간을 만들고, 회로가 열려 요청을 보내지 않고
+바로 실패하는지, 복구 후 다시 닫히는지를 시간 순서로 기록합니다.
+
+사용법:
+    python -m benchmarks.bench_embedding --tail-rate 0.05 --tail-ms 3000
+    python -m benchmarks.bench_embedding --queries 500 --concurrency 16 --outage-seconds 5 --output bench/embedding.json
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.common import percentiles, run_info, write_json
+from benchmarks.fake_embedding_server import create_app
+from rag.resilient import CircuitBreaker, EmbeddingUnavailable, ResilientEmbeddings
+
+WORDS = ["수유", "이유식", "수면", "발달", "열", "기저귀", "분유", "예방접종", "목욕", "감기"]
+
+
+def start_server(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def remote_embedding(base_url: str):
+    from langchain_openai import OpenAIEmbeddings
+
+    # 재시도는 OpenAI 클라이언트가 아니라 헤지로 비교하도록 끔
+    return OpenAIEmbeddings(openai_api_key="unused", openai_api_base=base_url, check_embedding_ctx_length=False,
+                            max_retries=0, request_timeout=30)
+
+
+def timed_query(embedding, text: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        embedding.embed_query(text)
+        ok, error = True, None
+    except EmbeddingUnavailable as e:
+        ok, error = False, type(e).__name__
+    except Exception as e:
+        ok, error = False, type(e).__name__
+    return {"start": start, "seconds": time.perf_counter() - start, "ok": ok, "error": error}
+
+
+def run_queries(embedding, queries: List[str], concurrency: int) -> List[Dict[str, Any]]:
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(lambda q: timed_query(embedding, q), queries))
+
+
+def summarize(records: List[Dict[str, Any]], server_requests: int) -> Dict[str, Any]:
+    return {
+        "latency_ms": {**percentiles((r["seconds"] for r in records), 1000),
+                       "max": round(max(r["seconds"] for r in records) * 1000, 1)},
+        "failed": sum(not r["ok"] for r in records),
+        "server_requests": server_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 지연 꼬리 벤치마크")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=3000.0)
+    parser.add_argument("--timeout", type=float, default=2.0, help="ResilientEmbeddings 제한 시간(초)")
+    parser.add_argument("--outage-seconds", type=float, default=0.0, help="0보다 크면 장애 구간 시험")
+    parser.add_argument("--breaker-reset", type=float, default=1.0, help="장애 시험의 회로 재시험 간격(초)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.tail_rate, args.tail_ms)
+    server = start_server(app, args.port)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    queries = [f"{WORDS[i % len(WORDS)]} 질문 {i}" for i in range(args.queries)]
+
+    results: Dict[str, Any] = {}
+    modes = {
+        "plain": remote_embedding(base_url),
+        "resilient": ResilientEmbeddings(remote_embedding(base_url), timeout=args.timeout),
+    }
+    for mode, embedding in modes.items():
+        before = app.state.requests
+        records = run_queries(embedding, queries, args.concurrency)
+        results[mode] = summarize(records, app.state.requests - before)
+        latency = results[mode]["latency_ms"]
+        print(f"{mode:>9}: p50 {latency['p50']}ms, p95 {latency['p95']}ms, p99 {latency['p99']}ms, "
+              f"max {latency['max']}ms, 실패 {results[mode]['failed']}, 서버 요청 {results[mode]['server_requests']}")
+
+    if args.outage_seconds > 0:
+        breaker = CircuitBreaker(reset=args.breaker_reset)
+        embedding = ResilientEmbeddings(remote_embedding(base_url), timeout=args.timeout, breaker=breaker)
+        run_queries(embedding, queries[:50], args.concurrency)  # 헤지 지연 표본 채우기
+        timeline = []
+        start = time.perf_counter()
+        end = start + args.outage_seconds * 3
+        with httpx.Client() as client:
+            client.post(f"http://127.0.0.1:{args.port}/control", json={"error_rate": 1.0})
+            restored = False
+            while time.perf_counter() < end:
+                if not restored and time.perf_counter() - start > args.outage_seconds:
+                    client.post(f"http://127.0.0.1:{args.port}/control", json={"error_rate": 0.0})
+                    restored = True
+                record = timed_query(embedding, queries[len(timeline) % len(queries)])
+                timeline.append({"t": round(record["start"] - start, 3), "ms": round(record["seconds"] * 1000, 1),
+                                 "ok": record["ok"], "breaker": breaker.state})
+                time.sleep(0.05)
+        outage = [r for r in timeline if r["t"] <= args.outage_seconds]
+        recovered = next((r["t"] for r in timeline if r["t"] > args.outage_seconds and r["ok"]), None)
+        results["outage"] = {
+            "requests": len(outage),
+            "rejected_fast": sum(r["breaker"] != "closed" and not r["ok"] for r in outage),
+            "failure_latency_ms": percentiles((r["ms"] for r in outage if not r["ok"]), digits=1),
+            "recovered_after_seconds": None if recovered is None else round(recovered - args.outage_seconds, 3),
+            "timeline": timeline,
+        }
+        print(f"장애 구간: 요청 {len(outage)}개 중 회로가 열린 상태에서 실패 {results['outage']['rejected_fast']}개, "
+              f"실패 지연 p50 {results['outage']['failure_latency_ms']['p50']}ms, "
+              f"복구 후 첫 성공까지 {results['outage']['recovered_after_seconds']}초")
+
+    server.should_exit = True
+    if args.output:
+        write_json(args.output, {"run": run_info(), "config": vars(args), "results": results})
+
+
+if __name__ == "__main__":
+    main()
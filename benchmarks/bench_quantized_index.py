@@ -0,0 +1,155 @@
+"""
+양자화 인덱스 벤치마크
+
+현재 사용 중인 float32 Flat 인덱스(FAISS IndexFlatIP, 미설치 시 NumPy 전수 검색)와
+rag.quantized_store.QuantizedIndex의 설정별 문서당 메모리, 검색 지연 시간, recall@k를 비교합니다.
+
+사용법:
+    python -m benchmarks.bench_quantized_index --num-docs 20000 --k 3
+    python -m benchmarks.bench_quantized_index --vectors ./vector_db/faiss_classified_quantized/vectors.npy
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from rag.numpy_store import normalize
+from rag.quantized_store import QuantizedIndex
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# 비교할 양자화 설정 (차원 축소 방식, 축소 차원, 양자화 방식)
+CONFIGS = [
+    ("pca", 256, "int8"),
+    ("pca", 128, "int8"),
+    ("truncate", 512, "int8"),
+    ("pca", 512, "binary"),
+    ("pca", 256, "binary"),
+]
+
+
+def make_synthetic_vectors(num_docs: int, dim: int, rank: int = 256, seed: int = 0) -> np.ndarray:
+    """
+    실제 문장 임베딩처럼 일부 방향에 분산이 몰린 정규화 벡터를 생성합니다.
+    """
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim)).astype(np.float32)
+    spectrum = (1.0 / np.sqrt(np.arange(1, rank + 1))).astype(np.float32)  # 분산이 점차 감소
+    latent = rng.standard_normal((num_docs, rank)).astype(np.float32) * spectrum
+    noise = 0.05 * rng.standard_normal((num_docs, dim)).astype(np.float32)
+    return normalize(latent @ basis + noise).astype(np.float32)
+
+
+def make_queries(vectors: np.ndarray, num_queries: int, seed: int = 1) -> np.ndarray:
+    """문서 벡터에 잡음을 더해 질의 벡터를 만듭니다."""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), num_queries, replace=False)]
+    noise = 0.5 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return normalize(picked + noise).astype(np.float32)
+
+
+def flat_search(vectors: np.ndarray, queries: np.ndarray, k: int):
+    """float32 Flat 기준 검색: (질의별 상위 k 인덱스, 질의당 지연 시간 리스트)"""
+    latencies = []
+    results = []
+    if faiss is not None:
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        for q in queries:
+            start = time.perf_counter()
+            _, ids = index.search(q[None, :], k)
+            latencies.append(time.perf_counter() - start)
+            results.append(ids[0])
+    else:
+        for q in queries:
+            start = time.perf_counter()
+            scores = vectors @ q
+            top = np.argpartition(-scores, k - 1)[:k]
+            results.append(top[np.argsort(-scores[top])])
+            latencies.append(time.perf_counter() - start)
+    return np.array(results), latencies
+
+
+def recall_at_k(results, ground_truth, k: int) -> float:
+    hits = sum(len(set(r[:k]) & set(g[:k])) for r, g in zip(results, ground_truth))
+    return hits / (k * len(ground_truth))
+
+
+def summarize(name: str, bytes_per_doc: float, latencies, recall: float) -> dict:
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "name": name,
+        "bytes_per_doc": round(bytes_per_doc, 1),
+        "latency_ms_p50": round(float(np.percentile(lat_ms, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(lat_ms, 95)), 3),
+        "recall_at_k": round(recall, 4),
+    }
+
+
+def run(vectors: np.ndarray, num_queries: int, k: int, rescore_k: int) -> list:
+    queries = make_queries(vectors, num_queries)
+    ground_truth, flat_latencies = flat_search(vectors, queries, k)
+    rows = [summarize("float32_flat", vectors.shape[1] * 4, flat_latencies, 1.0)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for reduction, dim, quantization in CONFIGS:
+            if dim > vectors.shape[1]:
+                continue
+            folder = os.path.join(tmp, f"{reduction}_{dim}_{quantization}")
+            QuantizedIndex.build(vectors, dim, reduction, quantization).save(folder)
+            # 서비스와 동일하게 원본 벡터는 mmap으로 로드
+            index = QuantizedIndex.load(folder, dim, reduction, quantization)
+
+            for rk in (0, rescore_k):
+                latencies = []
+                results = []
+                for q in queries:
+                    start = time.perf_counter()
+                    ids, _ = index.search(q, k, rk)
+                    latencies.append(time.perf_counter() - start)
+                    results.append(ids)
+                name = f"{reduction}{dim}_{quantization}" + (f"+rescore{rk}" if rk else "")
+                bytes_per_doc = index.resident_nbytes / len(vectors)
+                rows.append(summarize(name, bytes_per_doc, latencies, recall_at_k(results, ground_truth, k)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="양자화 인덱스 메모리/지연 시간/recall 벤치마크")
+    parser.add_argument("--vectors", help="실제 임베딩 .npy 파일 (없으면 합성 벡터 사용)")
+    parser.add_argument("--num-docs", type=int, default=20000, help="합성 문서 수")
+    parser.add_argument("--dim", type=int, default=1536, help="합성 벡터 차원")
+    parser.add_argument("--num-queries", type=int, default=200, help="질의 수")
+    parser.add_argument("--k", type=int, default=3, help="recall@k의 k (RETRIEVAL_K)")
+    parser.add_argument("--rescore-k", type=int, default=200, help="재순위화 후보 수")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = normalize(np.load(args.vectors).astype(np.float32))
+    else:
+        vectors = make_synthetic_vectors(args.num_docs, args.dim)
+    print(f"문서 {len(vectors)}개, {vectors.shape[1]}차원, 질의 {args.num_queries}개, k={args.k}")
+
+    rows = run(vectors, args.num_queries, args.k, args.rescore_k)
+
+    print(f"{'인덱스':<32}{'문서당 바이트':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'recall@k':>10}")
+    for row in rows:
+        print(f"{row['name']:<32}{row['bytes_per_doc']:>14}{row['latency_ms_p50']:>10}"
+              f"{row['latency_ms_p95']:>10}{row['recall_at_k']:>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"num_docs": len(vectors), "dim": int(vectors.shape[1]), "k": args.k, "results": rows},
+                      f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+검색 → 프롬프트 → 생성 전체 경로 지연 시간 벤치마크
+
+질문 파일(JSONL)을 streamlit 앱과 같은 경로(rag.index.initialize_search_tools →
+rag.generation.retrieve_context → rag.generation.generate_stream)로 재생하고
+단계별 p50/p95/p99와 처리량을 JSON으로 저장합니다. 커밋마다 결과 파일을 비교할 수 있습니다.
+
+기본값은 오프라인 CPU 실행용입니다.
+- --embedding hash: 글자 n-gram 해싱 임베딩 (OpenAI API 호출 없음)
+- --model tiny: 코퍼스로 학습한 BPE 토크나이저 + 무작위 작은 GPT-NeoX
+
+사용법:
+    python -m benchmarks.bench_rag --data-dir streamlit/data --output bench/rag_tiny.json
+    python -m benchmarks.bench_rag --embedding openai --model real --vector-db-dir ./vector_db
+"""
+import argparse
+import itertools
+import logging
+import os
+import time
+
+import torch
+
+from benchmarks.common import percentiles, read_jsonl, run_info, write_json
+from rag.config import (
+    BABYLOVE_DATA_FILE, CLASSIFIED_DATA_FILE, DATA_DIR, EXPANDED_DATA_FILE, MODEL_PATH, RETRIEVAL_K, TOKENIZER_PATH,
+    VECTOR_INDEX_TYPE,
+)
+from rag.generation import build_prompt, generate_stream, load_model, retrieve_context
+from rag.index import get_embedding, initialize_search_tools
+from rag.loader import iter_documents_with_metadata
+from rag.telemetry import REGISTRY, span
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_TRAIN_DOCS = 3000  # tiny 모델 토크나이저 학습에 사용할 문서 수 (파일별)
+
+
+def corpus_texts(data_dir: str, limit: int):
+    """tiny 모델 토크나이저 학습용 텍스트 (데이터 파일별 앞부분)"""
+    for name in (CLASSIFIED_DATA_FILE, EXPANDED_DATA_FILE, BABYLOVE_DATA_FILE):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            for doc in itertools.islice(iter_documents_with_metadata(path), limit):
+                yield doc.page_content
+
+
+def add_pipeline_args(parser: argparse.ArgumentParser) -> None:
+    """build_pipeline/run_query가 사용하는 인자 (load_test 등 다른 벤치마크와 공유)"""
+    parser.add_argument("--queries", default=os.path.join(os.path.dirname(__file__), "queries.jsonl"),
+                        help="질문 JSONL 파일 ({\"question\": ...})")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="원본 데이터 폴더")
+    parser.add_argument("--vector-db-dir", default="./vector_db_bench",
+                        help="벤치마크용 벡터 DB 폴더 (임베딩이 다르므로 서비스 DB와 분리)")
+    parser.add_argument("--embedding", choices=["hash", "openai"], default="hash")
+    parser.add_argument("--embedding-dim", type=int, default=256, help="hash 임베딩 차원")
+    parser.add_argument("--model", choices=["tiny", "real"], default="tiny")
+    parser.add_argument("--tiny-hidden", type=int, default=128, help="tiny 모델 hidden size")
+    parser.add_argument("--tiny-layers", type=int, default=2, help="tiny 모델 레이어 수")
+    parser.add_argument("--index-type", choices=["flat", "quantized"], default=VECTOR_INDEX_TYPE)
+    parser.add_argument("--babylove-backend", choices=["chroma", "partitioned", "numpy"], default="numpy")
+    parser.add_argument("--k", type=int, default=RETRIEVAL_K)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--no-generate", action="store_true", help="검색 단계만 측정")
+
+
+def build_pipeline(args, questions):
+    """검색 도구와 모델을 준비하고 준비 시간을 반환합니다."""
+    setup = {}
+
+    start = time.perf_counter()
+    if args.embedding == "hash":
+        from rag.fakes import HashEmbeddings
+        embedding = HashEmbeddings(size=args.embedding_dim)
+    else:
+        embedding = get_embedding()
+    search_tools, _, _ = initialize_search_tools(
+        embedding=embedding,
+        data_dir=args.data_dir,
+        vector_db_dir=args.vector_db_dir,
+        index_type=args.index_type,
+        babylove_backend=args.babylove_backend,
+        cache_size=0,  # 같은 질문 반복 시에도 실제 검색 시간을 측정
+    )
+    for tool in search_tools:
+        tool.k = args.k
+    setup["index_seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"검색 도구 {len(search_tools)}개 준비 ({setup['index_seconds']}초)")
+
+    model = tokenizer = device = None
+    if not args.no_generate:
+        start = time.perf_counter()
+        if args.model == "tiny":
+            from rag.fakes import build_tiny_model
+            texts = list(corpus_texts(args.data_dir, TOKENIZER_TRAIN_DOCS)) + questions
+            model, tokenizer, device = build_tiny_model(texts, hidden_size=args.tiny_hidden, num_layers=args.tiny_layers)
+        else:
+            model, tokenizer, device = load_model(MODEL_PATH, TOKENIZER_PATH)
+        setup["model_seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"모델 준비 ({setup['model_seconds']}초)")
+
+    return search_tools, model, tokenizer, device, setup
+
+
+def run_query(question, search_tools, model, tokenizer, device, args) -> dict:
+    """질문 하나를 처리하고 단계별 시간(초)을 반환합니다."""
+    request_start = time.perf_counter()
+    row = {"question": question}
+    with span("rag.request", "rag_request_seconds"):
+        context, found = retrieve_context(question, search_tools, None, tokenizer)
+        row["retrieval"] = time.perf_counter() - request_start
+        row["found"] = found
+
+        if found and model is not None:
+            prompt_text = build_prompt(question, context)
+            _, stats = generate_stream(prompt_text, model, tokenizer, device, args.max_new_tokens,
+                                       args.temperature, request_start=request_start)
+            row.update({
+                "prompt_tokens": stats.prompt_tokens,
+                "generated_tokens": stats.generated_tokens,
+                "prefill": stats.prefill_seconds,
+                "ttft": stats.ttft_seconds,
+                "decode_tokens_per_second": stats.decode_tokens_per_second,
+                "generation": stats.total_seconds,
+            })
+    row["total"] = time.perf_counter() - request_start
+    return row
+
+
+def summarize(rows, wall_seconds: float) -> dict:
+    ms = 1000.0
+    return {
+        "requests": len(rows),
+        "throughput_rps": round(len(rows) / wall_seconds, 3) if wall_seconds > 0 else None,
+        "no_context": sum(1 for r in rows if not r["found"]),
+        "stages_ms": {
+            "retrieval": percentiles((r["retrieval"] for r in rows), ms),
+            "prefill": percentiles((r.get("prefill") for r in rows), ms),
+            "ttft": percentiles((r.get("ttft") for r in rows), ms),
+            "generation": percentiles((r.get("generation") for r in rows), ms),
+            "total": percentiles((r["total"] for r in rows), ms),
+        },
+        "decode_tokens_per_second": percentiles(r.get("decode_tokens_per_second") for r in rows),
+        "prompt_tokens": percentiles(r.get("prompt_tokens") for r in rows),
+        "generated_tokens": percentiles(r.get("generated_tokens") for r in rows),
+    }
+
+
+def print_summary(summary: dict) -> None:
+    print(f"요청 {summary['requests']}개, 처리량 {summary['throughput_rps']} req/s, 문맥 없음 {summary['no_context']}개")
+    print(f"{'단계':<14}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for stage, stats in summary["stages_ms"].items():
+        if stats["count"]:
+            print(f"{stage:<14}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}")
+    tps = summary["decode_tokens_per_second"]
+    if tps["count"]:
+        print(f"디코딩 속도(tok/s) p50={tps['p50']} p95={tps['p95']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 전체 경로 지연 시간 벤치마크")
+    add_pipeline_args(parser)
+    parser.add_argument("--repeat", type=int, default=1, help="질문 파일 반복 횟수")
+    parser.add_argument("--warmup", type=int, default=2, help="측정에서 제외할 앞쪽 요청 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    torch.manual_seed(args.seed)
+
+    questions = [record["question"] for record in read_jsonl(args.queries)]
+    search_tools, model, tokenizer, device, setup = build_pipeline(args, questions)
+    if not search_tools:
+        raise SystemExit("사용 가능한 검색 도구가 없습니다. --data-dir를 확인하세요.")
+
+    workload = questions * args.repeat
+    for question in workload[:args.warmup]:
+        run_query(question, search_tools, model, tokenizer, device, args)
+    REGISTRY.clear()  # 예열 구간 메트릭 제외
+
+    rows = []
+    wall_start = time.perf_counter()
+    for question in workload[args.warmup:]:
+        rows.append(run_query(question, search_tools, model, tokenizer, device, args))
+    wall_seconds = time.perf_counter() - wall_start
+
+    summary = summarize(rows, wall_seconds)
+    print_summary(summary)
+
+    if args.output:
+        write_json(args.output, {
+            "run": run_info(),
+            "config": vars(args),
+            "setup": setup,
+            "tools": [tool.name for tool in search_tools],
+            "summary": summary,
+            # 벡터 DB별 임베딩 시간/토큰, 도구별 검색 시간 (rag.telemetry)
+            "telemetry": REGISTRY.snapshot(),
+            "requests": rows,
+        })
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
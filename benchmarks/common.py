@@ -0,0 +1,101 @@
+"""
+벤치마크 공용 함수 (분위수 요약, 메모리 측정, 결과 JSON 저장)
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+def percentiles(values: Iterable[Optional[float]], scale: float = 1.0, digits: int = 3) -> Dict[str, Any]:
+    """None을 제외한 값들의 개수, 평균, p50/p95/p99 (scale을 곱해 단위 변환, 예: 초 → ms는 1000)"""
+    data = np.array([v for v in values if v is not None], dtype=np.float64) * scale
+    if len(data) == 0:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None}
+    return {
+        "count": int(len(data)),
+        "mean": round(float(data.mean()), digits),
+        "p50": round(float(np.percentile(data, 50)), digits),
+        "p95": round(float(np.percentile(data, 95)), digits),
+        "p99": round(float(np.percentile(data, 99)), digits),
+    }
+
+
+MB = 1024 * 1024
+
+
+def rss_mb() -> float:
+    """현재 RSS (MB)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / MB
+    except ImportError:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+
+
+def peak_rss_mb() -> float:
+    """프로세스 최대 RSS (MB, Linux의 ru_maxrss는 KB, macOS는 바이트)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Linux에서 최대 RSS(VmHWM)를 현재 값으로 되돌립니다. (단계별 최대값 측정용)
+    지원하지 않으면 False를 반환하며, 이때 stage_peak_rss_mb는 프로세스 전체 최대값을 돌려줍니다.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def stage_peak_rss_mb() -> float:
+    """reset_peak_rss 이후의 최대 RSS (MB)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def git_commit() -> Optional[str]:
+    """현재 커밋 해시 (커밋 간 결과 비교용)"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_info() -> Dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
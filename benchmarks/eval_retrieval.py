@@ -0,0 +1,114 @@
+"""
+검색 품질 오프라인 평가
+
+정답 문서 ID가 붙은 질문 파일로 검색 도구별 recall@k, MRR과 처리량(질문/초)을 측정합니다.
+SearchTool.search_batch로 질문을 배치 임베딩/배치 검색하므로 질문 수천 개도 인덱스 속도로 평가됩니다.
+
+질문 파일 (JSON Lines):
+    {"question": "5개월 아기 이유식은 언제 시작하나요?", "relevant_ids": ["92965818-...", "..."]}
+
+문서 ID는 원본 데이터의 id(classified_contents.json의 키, vector_db_final.json의 id)나
+index(expanded_info_contents.json의 순번)입니다.
+
+사용법:
+    python -m benchmarks.eval_retrieval --questions ./data/eval_questions.jsonl --k 3
+    python -m benchmarks.eval_retrieval --questions q.jsonl --route --serial 100 --output eval.json
+"""
+import argparse
+import json
+import time
+
+from rag.config import DATA_DIR, EMBED_BATCH_SIZE, RETRIEVAL_K, VECTOR_DB_DIR
+from rag.index import initialize_search_tools
+from rag.search import route_categories
+
+
+def read_eval_set(path: str):
+    questions, relevant = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            questions.append(record["question"])
+            relevant.append({str(doc_id) for doc_id in record.get("relevant_ids", [])})
+    return questions, relevant
+
+
+def score(results, relevant, k: int) -> dict:
+    """정답이 있는 질문만 대상으로 recall@k와 MRR@k를 계산합니다."""
+    recall_sum = 0.0
+    mrr_sum = 0.0
+    evaluated = 0
+    for result, gold in zip(results, relevant):
+        if not gold:
+            continue
+        evaluated += 1
+        ids = [hit.doc_id for hit in result.hits[:k]]
+        recall_sum += len(gold.intersection(ids)) / min(len(gold), k)
+        for rank, doc_id in enumerate(ids, start=1):
+            if doc_id in gold:
+                mrr_sum += 1.0 / rank
+                break
+    return {
+        "evaluated": evaluated,
+        "recall_at_k": round(recall_sum / evaluated, 4) if evaluated else None,
+        "mrr_at_k": round(mrr_sum / evaluated, 4) if evaluated else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 도구별 recall@k / 처리량 평가")
+    parser.add_argument("--questions", required=True, help="평가 질문 JSONL 파일")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="원본 데이터 폴더")
+    parser.add_argument("--vector-db-dir", default=VECTOR_DB_DIR, help="벡터 DB 폴더")
+    parser.add_argument("--k", type=int, default=RETRIEVAL_K, help="recall@k의 k")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="한 번에 임베딩할 질문 수")
+    parser.add_argument("--route", action="store_true", help="질문의 월령으로 카테고리를 지정해 검색 (서비스와 동일)")
+    parser.add_argument("--serial", type=int, default=0, help="비교용으로 search()를 하나씩 호출할 질문 수 (0이면 생략)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    questions, relevant = read_eval_set(args.questions)
+    categories = [route_categories(q) for q in questions] if args.route else None
+    print(f"질문 {len(questions)}개, k={args.k}, 카테고리 라우팅={'사용' if args.route else '미사용'}")
+
+    # 평가는 항상 캐시 없이 실제 검색을 수행
+    search_tools, _, _ = initialize_search_tools(data_dir=args.data_dir, vector_db_dir=args.vector_db_dir,
+                                                 cache_size=0)
+    if not search_tools:
+        raise SystemExit("사용 가능한 검색 도구가 없습니다.")
+
+    rows = []
+    for tool in search_tools:
+        tool.k = args.k
+        start = time.perf_counter()
+        results = tool.search_batch(questions, categories, batch_size=args.batch_size, use_cache=False)
+        elapsed = time.perf_counter() - start
+        row = {"tool": tool.name, **score(results, relevant, args.k),
+               "batch_qps": round(len(questions) / elapsed, 1) if elapsed > 0 else None}
+
+        if args.serial:
+            sample = questions[:args.serial]
+            start = time.perf_counter()
+            for i, q in enumerate(sample):
+                tool.search(q, categories[i] if categories else None)
+            elapsed = time.perf_counter() - start
+            row["serial_qps"] = round(len(sample) / elapsed, 1) if elapsed > 0 else None
+        rows.append(row)
+
+    print(f"{'도구':<20}{'평가 수':>8}{'recall@k':>10}{'MRR@k':>10}{'배치 qps':>12}{'단건 qps':>12}")
+    for row in rows:
+        print(f"{row['tool']:<20}{row['evaluated']:>8}{str(row['recall_at_k']):>10}{str(row['mrr_at_k']):>10}"
+              f"{str(row['batch_qps']):>12}{str(row.get('serial_qps', '-')):>12}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"num_questions": len(questions), "k": args.k, "route": args.route, "results": rows},
+                      f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+지연을 주입하는 가짜 OpenAI 임베딩 서버
+
+OpenAI 호환 POST /v1/embeddings를 rag.fakes.HashEmbeddings로 응답합니다. 요청마다
+- 평균 --latency-ms, 표준편차 --jitter-ms의 지연
+- --tail-rate 확률로 --tail-ms의 긴 지연 (지연 꼬리)
+- --error-rate 확률로 500 오류
+를 넣으므로 rag.resilient의 제한 시간, 헤지 요청, 회로 차단기를 API 키와 네트워크 없이 시험할 수 있습니다.
+실행 중에 POST /control로 설정을 바꿔 장애(error_rate=1 또는 tail_rate=1)와 복구를 흉내 냅니다.
+
+서버를 가리키려면 OPENAI_EMBEDDING_BASE_URL=http://127.0.0.1:8100/v1 로 rag를 실행합니다.
+
+사용법:
+    python -m benchmarks.fake_embedding_server --port 8100 --latency-ms 80 --tail-rate 0.05 --tail-ms 3000
+    curl -X POST localhost:8100/control -H 'content-type: application/json' -d '{"error_rate": 1}'
+"""
+import argparse
+import asyncio
+import random
+from typing import Any, Dict, List, Union
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from rag.fakes import HashEmbeddings
+
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str], List[int], List[List[int]]]
+    model: str = "fake"
+
+
+def create_app(latency_ms: float = 80.0, jitter_ms: float = 20.0, tail_rate: float = 0.0, tail_ms: float = 3000.0,
+               error_rate: float = 0.0, size: int = 256, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="가짜 임베딩 서버")
+    app.state.settings = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "tail_rate": tail_rate,
+                          "tail_ms": tail_ms, "error_rate": error_rate}
+    app.state.requests = 0
+    embedding = HashEmbeddings(size=size)
+    rng = random.Random(seed)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(body: EmbeddingRequest) -> Dict[str, Any]:
+        settings = app.state.settings
+        app.state.requests += 1
+        delay = max(rng.gauss(settings["latency_ms"], settings["jitter_ms"]), 0.0)
+        if rng.random() < settings["tail_rate"]:
+            delay = settings["tail_ms"]
+        await asyncio.sleep(delay / 1000)
+        if rng.random() < settings["error_rate"]:
+            raise HTTPException(status_code=500, detail="injected error")
+
+        texts = [body.input] if isinstance(body.input, str) or (body.input and isinstance(body.input[0], int)) \
+            else body.input
+        # 토큰 id로 온 입력은 id 문자열로 임베딩 (지연 시험용이라 벡터 의미는 상관없음)
+        texts = [t if isinstance(t, str) else " ".join(map(str, t)) for t in texts]
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": vector}
+                     for i, vector in enumerate(embedding.embed_documents(texts))],
+            "model": body.model,
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/control")
+    async def get_control() -> Dict[str, Any]:
+        return {**app.state.settings, "requests": app.state.requests}
+
+    @app.post("/control")
+    async def set_control(update: Dict[str, float]) -> Dict[str, Any]:
+        unknown = set(update) - set(app.state.settings)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"알 수 없는 설정: {', '.join(sorted(unknown))}")
+        app.state.settings.update(update)
+        return {**app.state.settings, "requests": app.state.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="지연을 주입하는 가짜 OpenAI 임베딩 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="평균 지연(ms)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="지연의 표준편차(ms)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="긴 지연을 넣을 요청 비율")
+    parser.add_argument("--tail-ms", type=float, default=3000.0, help="긴 지연(ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 오류를 낼 요청 비율")
+    parser.add_argument("--size", type=int, default=256, help="임베딩 차원")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, args.tail_rate, args.tail_ms, args.error_rate,
+                           args.size, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+동시 사용자 부하 테스트
+
+여러 부모가 동시에 질문하는 상황을 흉내 내어 검색 + 생성 경로에 부하를 겁니다.
+streamlit은 세션마다 별도 스레드에서 같은 모델로 generate를 호출하므로, 여기서도 한 프로세스 안의
+작업 스레드(--concurrency = 동시에 처리할 수 있는 요청 수)가 같은 모델을 공유합니다.
+오프라인 대체 구성 요소(hash 임베딩, tiny 모델)가 기본값입니다. (benchmarks.bench_rag 인자 공유)
+
+부하 모델:
+- open: 도착률 --rate(요청/초)의 포아송 도착. 작업 스레드가 모두 바쁘면 대기열에서 기다립니다.
+- closed: --users명이 질문 → 응답 → 생각 시간(평균 --think-time초, 지수 분포) → 질문을 반복합니다.
+
+요청마다 대기 시간(도착 → 처리 시작), 처리 시간, 전체 지연, TTFT, 토큰/초, 오류/타임아웃을 기록하고,
+--sweep으로 도착률을 바꿔가며 포화 곡선(제공 부하 대비 처리량, p95 지연)을 만듭니다.
+
+사용법:
+    python -m benchmarks.load_test --data-dir streamlit/data --mode open --rate 2 --duration 30
+    python -m benchmarks.load_test --data-dir streamlit/data --sweep 0.5,1,2,4,8 --plot bench/saturation.png
+    python -m benchmarks.load_test --data-dir streamlit/data --mode closed --users 8 --think-time 5
+"""
+import argparse
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from benchmarks.bench_rag import add_pipeline_args, build_pipeline, run_query
+from benchmarks.common import percentiles, read_jsonl, run_info, write_json
+
+logger = logging.getLogger(__name__)
+
+COLLAPSE_FACTOR = 3.0  # p95 지연이 가장 낮은 부하의 이 배수를 넘으면 붕괴로 판단
+THROUGHPUT_RATIO = 0.9  # 처리량이 제공 부하의 이 비율에 못 미치면 포화로 판단
+
+
+class LoadRunner:
+    """요청 하나를 처리하고 결과를 모으는 공용 부분"""
+
+    def __init__(self, pipeline, questions, args):
+        self.search_tools, self.model, self.tokenizer, self.device, _ = pipeline
+        self.questions = questions
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.results = []
+        self.results_lock = threading.Lock()
+
+    def next_question(self) -> str:
+        with self.rng_lock:
+            return self.rng.choice(self.questions)
+
+    def handle(self, question: str, arrival: float) -> None:
+        """arrival: 요청이 도착한 시각 (time.perf_counter)"""
+        start = time.perf_counter()
+        record = {"queue": start - arrival}
+        if self.args.timeout and record["queue"] > self.args.timeout:
+            # 대기열에서 이미 타임아웃된 요청은 처리하지 않음 (사용자가 떠난 것으로 간주)
+            record.update({"status": "timeout", "latency": record["queue"]})
+        else:
+            try:
+                row = run_query(question, self.search_tools, self.model, self.tokenizer, self.device, self.args)
+                latency = time.perf_counter() - arrival
+                status = "timeout" if self.args.timeout and latency > self.args.timeout else "ok"
+                record.update({
+                    "status": status,
+                    "service": row["total"],
+                    "latency": latency,
+                    "ttft": None if row.get("ttft") is None else record["queue"] + row["ttft"],
+                    "generated_tokens": row.get("generated_tokens", 0),
+                    "decode_tokens_per_second": row.get("decode_tokens_per_second"),
+                })
+            except Exception as e:
+                logger.error(f"요청 처리 오류: {str(e)}")
+                record.update({"status": "error", "latency": time.perf_counter() - arrival, "error": str(e)})
+        record["finish"] = time.perf_counter()
+        with self.results_lock:
+            self.results.append(record)
+
+
+def run_open(runner: LoadRunner, rate: float, duration: float, concurrency: int) -> float:
+    """포아송 도착으로 duration초 동안 요청을 보내고, 남은 요청이 끝날 때까지 기다립니다. 반환: 측정 시작 시각"""
+    rng = random.Random(runner.args.seed + 1)
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        next_arrival = begin
+        while True:
+            next_arrival += rng.expovariate(rate)
+            if next_arrival - begin > duration:
+                break
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(runner.handle, runner.next_question(), next_arrival)
+    return begin
+
+
+def run_closed(runner: LoadRunner, users: int, think_time: float, duration: float, concurrency: int) -> float:
+    """users명이 생각 시간을 두고 반복 질문합니다. 처리 슬롯은 concurrency개로 제한됩니다."""
+    slots = threading.Semaphore(concurrency)
+    begin = time.perf_counter()
+    stop_at = begin + duration
+
+    def user_loop(user_id: int):
+        rng = random.Random(runner.args.seed + 100 + user_id)
+        # 사용자들이 동시에 시작하지 않도록 첫 질문 시각을 분산
+        time.sleep(rng.uniform(0, think_time) if think_time > 0 else 0)
+        while time.perf_counter() < stop_at:
+            arrival = time.perf_counter()
+            with slots:
+                runner.handle(runner.next_question(), arrival)
+            if think_time > 0:
+                time.sleep(rng.expovariate(1.0 / think_time))
+
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return begin
+
+
+def summarize(results, begin: float, offered_rps=None) -> dict:
+    ms = 1000.0
+    ok = [r for r in results if r["status"] == "ok"]
+    end = max((r["finish"] for r in results), default=begin)
+    wall = end - begin
+    tokens = sum(r.get("generated_tokens") or 0 for r in ok)
+    return {
+        "offered_rps": offered_rps,
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": sum(1 for r in results if r["status"] == "error"),
+        "timeouts": sum(1 for r in results if r["status"] == "timeout"),
+        "throughput_rps": round(len(ok) / wall, 3) if wall > 0 else None,
+        "tokens_per_second": round(tokens / wall, 1) if wall > 0 else None,
+        "latency_ms": percentiles((r["latency"] for r in ok), ms),
+        "queue_ms": percentiles((r["queue"] for r in results), ms),
+        "service_ms": percentiles((r.get("service") for r in ok), ms),
+        "ttft_ms": percentiles((r.get("ttft") for r in ok), ms),
+        "decode_tokens_per_second": percentiles(r.get("decode_tokens_per_second") for r in ok),
+    }
+
+
+def find_knee(points) -> dict:
+    """p95 지연이 급증하거나 처리량이 제공 부하를 따라가지 못하기 시작하는 도착률"""
+    base = min((p["latency_ms"]["p95"] for p in points if p["latency_ms"]["p95"] is not None), default=None)
+    for p in points:
+        p95 = p["latency_ms"]["p95"]
+        if p95 is None or (base and p95 > COLLAPSE_FACTOR * base):
+            return {"rate": p["offered_rps"], "reason": f"p95 지연이 최저값의 {COLLAPSE_FACTOR}배 초과"}
+        if p["throughput_rps"] is not None and p["throughput_rps"] < THROUGHPUT_RATIO * p["offered_rps"]:
+            return {"rate": p["offered_rps"], "reason": f"처리량이 제공 부하의 {THROUGHPUT_RATIO:.0%} 미만"}
+    return {"rate": None, "reason": "측정 범위 안에서 포화되지 않음"}
+
+
+def plot_saturation(points, path: str) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    rates = [p["offered_rps"] for p in points]
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
+    for key in ("p50", "p95", "p99"):
+        ax1.plot(rates, [p["latency_ms"][key] for p in points], marker="o", label=key)
+    ax1.set_xlabel("offered load (req/s)")
+    ax1.set_ylabel("latency (ms)")
+    ax1.set_yscale("log")
+    ax1.legend()
+    ax2.plot(rates, [p["throughput_rps"] for p in points], marker="o", label="achieved")
+    ax2.plot(rates, rates, linestyle="--", color="gray", label="offered")
+    ax2.set_xlabel("offered load (req/s)")
+    ax2.set_ylabel("throughput (req/s)")
+    ax2.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"그래프 저장: {path}")
+
+
+def print_point(p: dict) -> None:
+    lat = p["latency_ms"]
+    print(f"{str(p['offered_rps']):>8}{str(p['throughput_rps']):>10}{str(lat['p50']):>11}{str(lat['p95']):>11}"
+          f"{str(lat['p99']):>11}{str(p['queue_ms']['p95']):>11}{str(p['tokens_per_second']):>9}"
+          f"{p['errors']:>6}{p['timeouts']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="동시 사용자 부하 테스트")
+    add_pipeline_args(parser)
+    parser.add_argument("--mode", choices=["open", "closed"], default="open")
+    parser.add_argument("--rate", type=float, default=1.0, help="open: 초당 도착 요청 수")
+    parser.add_argument("--sweep", help="open: 쉼표로 구분한 도착률 목록 (포화 곡선)")
+    parser.add_argument("--users", type=int, default=4, help="closed: 동시 사용자 수")
+    parser.add_argument("--think-time", type=float, default=3.0, help="closed: 평균 생각 시간(초)")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 처리하는 요청 수 (작업 스레드)")
+    parser.add_argument("--duration", type=float, default=20.0, help="부하 지점당 요청을 보내는 시간(초)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="요청 타임아웃(초, 0이면 없음)")
+    parser.add_argument("--torch-threads", type=int, default=0, help="torch 연산 스레드 수 (0이면 기본값)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plot", help="포화 곡선 그래프를 저장할 PNG 경로 (--sweep)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    torch.manual_seed(args.seed)
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+
+    questions = [record["question"] for record in read_jsonl(args.queries)]
+    pipeline = build_pipeline(args, questions)
+    if not pipeline[0]:
+        raise SystemExit("사용 가능한 검색 도구가 없습니다. --data-dir를 확인하세요.")
+
+    # 예열 (인덱스 mmap, 모델 첫 호출 비용 제외)
+    warm = LoadRunner(pipeline, questions, args)
+    warm.handle(questions[0], time.perf_counter())
+
+    print(f"{'도착률':>8}{'처리량':>10}{'p50(ms)':>11}{'p95(ms)':>11}{'p99(ms)':>11}{'대기p95':>11}"
+          f"{'tok/s':>9}{'오류':>6}{'초과':>6}")
+    points = []
+    if args.mode == "closed":
+        runner = LoadRunner(pipeline, questions, args)
+        begin = run_closed(runner, args.users, args.think_time, args.duration, args.concurrency)
+        points.append(summarize(runner.results, begin))
+        print_point(points[-1])
+    else:
+        rates = [float(r) for r in args.sweep.split(",")] if args.sweep else [args.rate]
+        for rate in rates:
+            runner = LoadRunner(pipeline, questions, args)
+            begin = run_open(runner, rate, args.duration, args.concurrency)
+            points.append(summarize(runner.results, begin, rate))
+            print_point(points[-1])
+
+    knee = find_knee(points) if len(points) > 1 else None
+    if knee:
+        print(f"포화 지점: {knee['rate']} req/s ({knee['reason']})")
+    if args.plot and len(points) > 1:
+        plot_saturation(points, args.plot)
+
+    if args.output:
+        write_json(args.output, {"run": run_info(), "config": vars(args), "points": points, "knee": knee})
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
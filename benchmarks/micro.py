@@ -0,0 +1,393 @@
+"""
+순수 파이썬 핫스팟 마이크로 벤치마크
+
+고정된 합성 입력(시드 고정)을 크기별로 만들어 다음 함수들의 초당 호출 수와 호출당 할당량을 측정하고,
+저장된 기준값(benchmarks/baselines/micro.json)과 비교해 회귀를 표시합니다.
+- rag.loader.load_documents_with_metadata (세 가지 입력 형식)
+- SearchTool.search 결과 포맷팅 (SearchTool._make_result)
+- StopOnTokens.__call__
+- 스트리밍 정지 태그 정리 루프 (rag.generation.collect_stream)
+- crawl-baby-love의 HTMLProcessor.extract_text_from_html / extract_structured_content
+- crawl-baby-love/output/2_excute.py의 extract_text_from_content
+- crawl-baby-love의 DataExporter.export_csv_files
+
+crawl 스크립트는 패키지가 아니므로 파일 경로로 불러옵니다.
+의존성(bs4, pandas, torch 등)이 없는 항목은 건너뜁니다.
+
+할당량은 tracemalloc으로 측정합니다.
+- alloc_kb: 호출 한 번 동안의 최대 메모리 (KB, 중간 할당 포함)
+- alloc_blocks: 호출이 끝난 뒤 반환값이 잡고 있는 메모리 블록 수
+
+사용법:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter loader --sizes small,medium
+    python -m benchmarks.micro --save-baseline   # 현재 결과를 기준값으로 저장
+"""
+import argparse
+import contextlib
+import gc
+import importlib.util
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import run_info, write_json
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CRAWL_DIR = os.path.join(BASE_DIR, "crawl", "crawl-baby-love")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "micro.json")
+
+SIZES = ("small", "medium", "large")
+MIN_TIME = 0.2  # 반복 측정 1회의 최소 시간(초)
+REPEAT = 5  # 반복 측정 횟수 (중앙값 사용)
+THRESHOLD = 0.25  # 기준값 대비 이 비율 이상 느려지거나 할당이 늘면 회귀
+
+WORDS = ["아기", "수유", "이유식", "수면", "발달", "예방접종", "열", "기저귀", "분유", "어린이집",
+         "모유", "목욕", "체온", "개월", "신생아", "놀이", "배변", "감기", "성장", "부모"]
+CATEGORIES = ["임신", "출산", "육아", "건강", "발달"]
+STOP_TAGS = ["### 질문:", "### 답변:", "### 시스템:", "### 문맥:"]
+
+
+def load_module(name: str, path: str):
+    """패키지가 아닌 스크립트를 파일 경로로 불러옵니다. (crawl 폴더 이름에 '-'가 있어 import 불가)"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + "."
+
+
+def paragraph(rng: random.Random, sentences: int = 4) -> str:
+    return " ".join(sentence(rng, rng.randint(6, 14)) for _ in range(sentences))
+
+
+# ---------------------------------------------------------------------------
+# 합성 입력
+# ---------------------------------------------------------------------------
+
+def make_loader_file(rng: random.Random, fmt: str, n: int, path: str) -> None:
+    """rag.loader가 인식하는 세 가지 형식의 JSON 파일"""
+    if fmt == "classified":
+        data = {str(i): {"post": paragraph(rng), "category": rng.choice(CATEGORIES),
+                         "confidence": round(rng.random(), 3)} for i in range(n)}
+    elif fmt == "expanded":
+        data = [{"post": paragraph(rng, 2), "comment": paragraph(rng)} for _ in range(n)]
+    else:
+        data = [{"id": f"doc-{i}", "text": paragraph(rng),
+                 "metadata": {"category_name": rng.choice(CATEGORIES), "page_title": sentence(rng, 3)}}
+                for i in range(n)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def make_html(rng: random.Random, sections: int) -> str:
+    """제목/단락/목록/표가 섞인 육아 정보 페이지 형태의 HTML"""
+    parts = ["<html><head><style>p {color: red}</style><script>var x = 1;</script></head><body>"]
+    for i in range(sections):
+        parts.append(f"<h{2 + i % 3}>{sentence(rng, 3)}</h{2 + i % 3}>")
+        parts.extend(f"<p>{paragraph(rng, 2)}</p>" for _ in range(2))
+        tag = "ul" if i % 2 else "ol"
+        parts.append(f"<{tag}>" + "".join(f"<li>{sentence(rng, 5)}</li>" for _ in range(4)) + f"</{tag}>")
+        if i % 3 == 0:
+            header = "".join(f"<th>{rng.choice(WORDS)}</th>" for _ in range(3))
+            rows = "".join("<tr>" + "".join(f"<td>{sentence(rng, 2)}</td>" for _ in range(3)) + "</tr>"
+                           for _ in range(4))
+            parts.append(f"<table><caption>{sentence(rng, 2)}</caption><thead><tr>{header}</tr></thead>"
+                         f"<tbody>{rows}</tbody></table>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def make_content(rng: random.Random, items: int, depth: int = 1) -> List[Dict[str, Any]]:
+    """2_excute.py 입력의 섹션 content 구조 (단락, 중첩 목록, 표, 강조 상자, 이미지)"""
+    content = []
+    for i in range(items):
+        kind = i % 5
+        if kind == 0:
+            content.append({"type": "paragraph", "text": paragraph(rng, 2)})
+        elif kind == 1:
+            list_items = []
+            for _ in range(3):
+                item = {"text": sentence(rng, 6), "sub_items": [{"text": sentence(rng, 4)} for _ in range(2)]}
+                if depth > 0:
+                    item["title"] = sentence(rng, 2)
+                    item["content"] = make_content(rng, 3, depth - 1)
+                list_items.append(item)
+            content.append({"type": "list", "items": list_items})
+        elif kind == 2:
+            rows = [[{"text": sentence(rng, 2)}, {"text": [rng.choice(WORDS) for _ in range(3)]}] for _ in range(4)]
+            content.append({"type": "table", "data": {"caption": sentence(rng, 2), "rows": rows}})
+        elif kind == 3:
+            content.append({"type": "highlight_box", "items": [{"text": sentence(rng, 8)} for _ in range(2)]})
+        else:
+            content.append({"type": "image", "alt": sentence(rng, 3)})
+    return content
+
+
+def make_processed_data(rng: random.Random, pages: int, processor) -> List[Dict[str, Any]]:
+    """processor.py 출력(processed_data.json) 형식"""
+    data = []
+    for page_num in range(pages):
+        tabs = []
+        for tab_num in range(3):
+            html = make_html(rng, 3)
+            tabs.append({
+                "tab_title": sentence(rng, 2),
+                "tab_menuno": 300 + tab_num,
+                "tab_url": f"https://example.com/?menuno={300 + tab_num}",
+                "content_text": processor.extract_text_from_html(html),
+                "content_structured": processor.extract_structured_content(html),
+            })
+        data.append({"menu_num": 287 + page_num, "page_title": sentence(rng, 2),
+                     "url": f"https://example.com/?menuno={287 + page_num}", "tabs": tabs})
+    return data
+
+
+# ---------------------------------------------------------------------------
+# 벤치마크 항목: setup(rng, size, workdir) -> 측정할 무인자 함수
+# ---------------------------------------------------------------------------
+
+def setup_loader(fmt: str):
+    counts = {"small": 100, "medium": 1000, "large": 10000}
+
+    def setup(rng, size, workdir):
+        from rag.loader import load_documents_with_metadata
+        path = os.path.join(workdir, f"{fmt}_{size}.json")
+        make_loader_file(rng, fmt, counts[size], path)
+        return lambda: load_documents_with_metadata(path)
+    return setup
+
+
+def setup_search_format(rng, size, workdir):
+    from langchain_core.documents import Document
+    from rag.search import SearchTool
+    k = {"small": 3, "medium": 10, "large": 50}[size]
+    docs_and_scores = [
+        (Document(page_content=paragraph(rng, 6),
+                  metadata={"id": f"doc-{i}", "category_name": rng.choice(CATEGORIES),
+                            "page_title": sentence(rng, 3), "post": paragraph(rng, 2)}),
+         rng.random())
+        for i in range(k)
+    ]
+    tool = SearchTool("benchmark", "", vector_db=None, db_type="벤치마크", k=k)
+    return lambda: tool._make_result("아기 수면", docs_and_scores)
+
+
+def setup_stop_on_tokens(rng, size, workdir):
+    import torch
+    from rag.generation import StopOnTokens
+    length = {"small": 128, "medium": 1024, "large": 4096}[size]
+    input_ids = torch.randint(10, 4000, (1, length))
+    stop_token_ids = [[rng.randint(10, 4000) for _ in range(rng.randint(3, 6))] for _ in STOP_TAGS]
+    criteria = StopOnTokens(None, stop_token_ids)
+    return lambda: criteria(input_ids, None)
+
+
+def setup_collect_stream(rng, size, workdir):
+    from rag.generation import collect_stream
+    n = {"small": 32, "medium": 256, "large": 1024}[size]
+    # 토큰 단위 조각 (1~3글자), 마지막에 정지 태그
+    chunks = [rng.choice(WORDS)[:rng.randint(1, 3)] + (" " if rng.random() < 0.3 else "") for _ in range(n)]
+    chunks.append("\n\n### 질문:")
+    # 화면 갱신 콜백은 조각마다 clean_response 결과를 받으므로 빈 콜백이라도 넘겨서 측정
+    return lambda: collect_stream(chunks, lambda text: None)
+
+
+def _processor(workdir):
+    module = load_module("crawl_processor", os.path.join(CRAWL_DIR, "processor.py"))
+    return module.HTMLProcessor(workdir)
+
+
+def setup_extract_text(rng, size, workdir):
+    processor = _processor(workdir)
+    html = make_html(rng, {"small": 3, "medium": 30, "large": 150}[size])
+    return lambda: processor.extract_text_from_html(html)
+
+
+def setup_extract_structured(rng, size, workdir):
+    processor = _processor(workdir)
+    html = make_html(rng, {"small": 3, "medium": 30, "large": 150}[size])
+    return lambda: processor.extract_structured_content(html)
+
+
+def setup_extract_content(rng, size, workdir):
+    module = load_module("crawl_excute", os.path.join(CRAWL_DIR, "output", "2_excute.py"))
+    content = make_content(rng, {"small": 10, "medium": 100, "large": 500}[size])
+    return lambda: module.extract_text_from_content(content)
+
+
+def setup_export_csv(rng, size, workdir):
+    module = load_module("crawl_exporter", os.path.join(CRAWL_DIR, "exporter.py"))
+    data = make_processed_data(rng, {"small": 2, "medium": 10, "large": 40}[size], _processor(workdir))
+    export_dir = os.path.join(workdir, f"export_{size}")
+    os.makedirs(export_dir, exist_ok=True)
+    input_file = os.path.join(export_dir, "processed_data.json")
+    with open(input_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    exporter = module.DataExporter(input_file)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):  # 파일마다 출력하는 print 억제
+            return exporter.export_csv_files()
+    return run
+
+
+CASES: Dict[str, Callable] = {
+    "loader.classified": setup_loader("classified"),
+    "loader.expanded": setup_loader("expanded"),
+    "loader.vector_db": setup_loader("vector_db"),
+    "search.format": setup_search_format,
+    "generation.stop_on_tokens": setup_stop_on_tokens,
+    "generation.collect_stream": setup_collect_stream,
+    "crawl.extract_text_from_html": setup_extract_text,
+    "crawl.extract_structured_content": setup_extract_structured,
+    "crawl.extract_text_from_content": setup_extract_content,
+    "crawl.export_csv_files": setup_export_csv,
+}
+
+
+# ---------------------------------------------------------------------------
+# 측정
+# ---------------------------------------------------------------------------
+
+def time_ops(func: Callable, min_time: float, repeat: int) -> float:
+    """min_time 이상 걸리도록 호출 횟수를 정한 뒤 repeat번 측정한 초당 호출 수의 중앙값"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4:
+            break
+        number *= 2
+    number = max(1, int(number * min_time / elapsed))
+
+    rates = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rates.append(number / (time.perf_counter() - start))
+    return statistics.median(rates)
+
+
+def measure_allocations(func: Callable) -> Dict[str, float]:
+    """
+    호출 한 번의 최대 추가 메모리(KB)와 반환값이 잡고 있는 블록 수
+    (tracemalloc은 이미 해제된 블록을 세지 않으므로 중간 할당은 최대 메모리로만 드러납니다)
+    """
+    func()  # 지연 초기화 제외
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    del result
+    return {"alloc_kb": round(peak / 1024, 1), "alloc_blocks": blocks}
+
+
+def run_case(name: str, size: str, args, workdir: str) -> Dict[str, Any]:
+    rng = random.Random(f"{args.seed}:{name}:{size}")
+    func = CASES[name](rng, size, workdir)
+    ops = time_ops(func, args.min_time, args.repeat)
+    result = {"case": name, "size": size, "ops_per_sec": round(ops, 2)}
+    result.update(measure_allocations(func))
+    return result
+
+
+def compare(result: Dict[str, Any], baseline: Dict, threshold: float) -> List[str]:
+    """
+    기준값 대비 속도 비율(speedup)을 result에 기록하고, 느려졌거나 할당이 늘어난 내용을 반환합니다.
+    baseline: {(항목, 크기): 기준 결과}
+    """
+    b = baseline.get((result["case"], result["size"]))
+    if b is None:
+        return []
+    regressions = []
+    label = f"{result['case']}[{result['size']}]"
+    result["baseline_ops_per_sec"] = b["ops_per_sec"]
+    result["speedup"] = round(result["ops_per_sec"] / b["ops_per_sec"], 3)
+    if result["speedup"] < 1 - threshold:
+        regressions.append(f"{label}: {result['ops_per_sec']} ops/s < 기준 {b['ops_per_sec']} ops/s")
+    if b["alloc_kb"] and result["alloc_kb"] > b["alloc_kb"] * (1 + threshold):
+        regressions.append(f"{label}: 할당 {result['alloc_kb']}KB > 기준 {b['alloc_kb']}KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="순수 파이썬 핫스팟 마이크로 벤치마크")
+    parser.add_argument("--filter", help="이 문자열이 이름에 포함된 항목만 실행")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"입력 크기 (쉼표 구분, {', '.join(SIZES)})")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="반복 측정 1회의 최소 시간(초)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="반복 측정 횟수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="비교할 기준값 JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="현재 결과를 --baseline 경로에 저장")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="회귀로 판단할 비율 (0.25 = 25%%)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        raise SystemExit(f"알 수 없는 크기: {', '.join(sorted(unknown))}")
+    names = [name for name in CASES if not args.filter or args.filter in name]
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+
+    workdir = tempfile.mkdtemp(prefix="micro_bench_")
+    results, skipped, regressions = [], [], []
+    print(f"{'항목':<36}{'크기':<8}{'ops/s':>12}{'할당(KB)':>10}{'블록':>9}{'기준 대비':>10}")
+    try:
+        for name in names:
+            for size in sizes:
+                try:
+                    result = run_case(name, size, args, workdir)
+                except ImportError as e:
+                    skipped.append({"case": name, "reason": str(e)})
+                    print(f"{name:<36}건너뜀 ({str(e)})")
+                    break
+                results.append(result)
+                regressions.extend(compare(result, baseline, args.threshold))
+                speedup = result.get("speedup")
+                print(f"{name:<36}{size:<8}{result['ops_per_sec']:>12}{result['alloc_kb']:>10}"
+                      f"{result['alloc_blocks']:>9}{'' if speedup is None else f'{speedup}x':>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for regression in regressions:
+        print(f"회귀 - {regression}")
+
+    report = {"run": run_info(), "config": vars(args), "results": results, "skipped": skipped,
+              "regressions": regressions}
+    if args.save_baseline:
+        write_json(args.baseline, {"run": report["run"], "results": results})
+        print(f"기준값 저장: {args.baseline}")
+    if args.output:
+        write_json(args.output, report)
+        print(f"결과 저장: {args.output}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+모델 로드 시간/메모리 비교: 허깅페이스 레포지토리 vs 로컬 스냅숏(rag.snapshot)
+
+rag.generation.load_model을 각 방식마다 새 프로세스(spawn)에서 --repeats번 실행하고 다음 값을 기록합니다.
+- 토크나이저/모델 로드 시간 (첫 실행은 허브 캐시 확인, 이후는 페이지 캐시가 데워진 상태)
+- 로드 중 최대 RSS와 로드 후 RSS (임포트 직후 기준값 대비 증가량)
+스냅숏 방식은 HF_HUB_OFFLINE=1로 실행해 네트워크 없이 열리는지도 함께 확인합니다.
+스냅숏이 없으면 먼저 만듭니다.
+
+--tiny는 5.8B 모델 대신 작은 무작위 모델을 float32 체크포인트로 저장해 원본 레포지토리 삼아 비교합니다 (파이프라인 확인용).
+
+사용법:
+    python -m benchmarks.model_load --output bench/model_load.json
+    python -m benchmarks.model_load --tiny --workdir /tmp/model_load
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import time
+
+from benchmarks.common import percentiles, read_jsonl, reset_peak_rss, rss_mb, run_info, stage_peak_rss_mb, write_json
+from rag.config import MODEL_DTYPE, MODEL_PATH, MODEL_SNAPSHOT_DIR, TOKENIZER_PATH
+
+SOURCES = ("hub", "snapshot")
+
+
+def measure_load(source: str, model_path: str, tokenizer_path: str, snapshot_dir: str) -> dict:
+    """새 프로세스 안에서 실행됩니다."""
+    if source == "snapshot":
+        os.environ["HF_HUB_OFFLINE"] = "1"
+    import torch  # noqa: F401
+    from rag.generation import load_model
+
+    gc.collect()
+    baseline = rss_mb()
+    reset_peak_rss()
+    start = time.perf_counter()
+    model, tokenizer, _ = load_model(model_path, tokenizer_path, snapshot_dir if source == "snapshot" else None)
+    load_seconds = time.perf_counter() - start
+    peak = stage_peak_rss_mb()
+    gc.collect()
+    steady = rss_mb()
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "peak_delta_mb": round(peak - baseline, 1),
+        "steady_delta_mb": round(steady - baseline, 1),
+        "dtype": str(model.dtype),
+        "fast_tokenizer": bool(tokenizer.is_fast),
+    }
+
+
+def build_tiny_source(workdir: str, data_dir: str, queries: str) -> str:
+    """작은 무작위 모델을 float32 체크포인트 + 토크나이저로 저장합니다. 반환: 저장 경로"""
+    from benchmarks.bench_rag import TOKENIZER_TRAIN_DOCS, corpus_texts
+    from rag.fakes import build_tiny_model
+
+    path = os.path.join(workdir, "tiny-source")
+    if not os.path.exists(os.path.join(path, "config.json")):
+        texts = list(corpus_texts(data_dir, TOKENIZER_TRAIN_DOCS)) + [r["question"] for r in read_jsonl(queries)]
+        model, tokenizer, _ = build_tiny_model(texts, hidden_size=512, num_layers=8)
+        model.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모델 로드 시간/메모리 비교 (허브 vs 로컬 스냅숏)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--tokenizer", default=TOKENIZER_PATH)
+    parser.add_argument("--snapshot-dir", default=MODEL_SNAPSHOT_DIR)
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tiny", action="store_true", help="작은 무작위 모델로 비교")
+    parser.add_argument("--workdir", default="/tmp/model_load", help="--tiny 모델과 스냅숏을 둘 디렉터리")
+    parser.add_argument("--data-dir", default="streamlit/data", help="--tiny 토크나이저 학습용 데이터")
+    parser.add_argument("--queries", default=os.path.join(os.path.dirname(__file__), "queries.jsonl"))
+    parser.add_argument("--output", default=None, help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    if args.tiny:
+        args.model = args.tokenizer = build_tiny_source(args.workdir, args.data_dir, args.queries)
+        args.snapshot_dir = os.path.join(args.workdir, "tiny-snapshot")
+
+    from rag.snapshot import find_snapshot, prepare_snapshot
+    if "snapshot" in args.sources and find_snapshot(args.model, args.tokenizer, args.snapshot_dir) is None:
+        print(f"스냅숏 생성: {args.snapshot_dir}")
+        prepare_snapshot(args.model, args.tokenizer, args.snapshot_dir)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for source in args.sources:
+            runs = [
+                pool.apply(measure_load, (source, args.model, args.tokenizer, args.snapshot_dir))
+                for _ in range(args.repeats)
+            ]
+            results[source] = {
+                "runs": runs,
+                "load_seconds": percentiles(r["load_seconds"] for r in runs),
+                "peak_delta_mb": max(r["peak_delta_mb"] for r in runs),
+                "steady_delta_mb": max(r["steady_delta_mb"] for r in runs),
+            }
+            print(f"{source:>8}: 로드 p50 {results[source]['load_seconds']['p50']}초 "
+                  f"(첫 실행 {runs[0]['load_seconds']}초), 최대 RSS +{results[source]['peak_delta_mb']}MB, "
+                  f"로드 후 +{results[source]['steady_delta_mb']}MB, {runs[0]['dtype']}, "
+                  f"fast 토크나이저 {runs[0]['fast_tokenizer']}")
+
+    if args.output:
+        write_json(args.output, {
+            "run": run_info(),
+            "model": args.model,
+            "tokenizer": args.tokenizer,
+            "snapshot_dir": args.snapshot_dir,
+            "dtype": MODEL_DTYPE,
+            "results": results,
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+모델/인덱스 로딩 메모리 프로파일러
+
+구성 요소(모델, 각 벡터 DB, 전체)를 각각 새 프로세스(spawn)에서 로드하여 서로 영향을 주지 않게 하고
+다음 값을 기록합니다.
+- 로드 시간
+- 최대 RSS (ru_maxrss)와 로드 후 안정 RSS (gc 후), 임포트 직후 기준값 대비 증가량
+- 로드로 늘어난 파이썬 힙 타입별 객체 수/크기 상위 목록 (pickle로 로드되는 Document 객체 비대화 확인용,
+  힙 순회가 RSS에 영향을 주지 않도록 별도 프로세스에서 한 번 더 로드하여 측정)
+- (--tracemalloc) 파이썬 할당 최대치
+
+--budget/--peak-budget를 넘는 구성 요소가 있으면 종료 코드 1로 실패합니다.
+인덱스가 없으면 먼저 한 번 생성한 뒤(--no-prepare로 생략) 로드만 측정합니다.
+
+사용법:
+    python -m benchmarks.profile_memory --data-dir streamlit/data
+    python -m benchmarks.profile_memory --embedding openai --model real --vector-db-dir ./vector_db \\
+        --budget model=13000 --budget chroma_baby_love=300 --output bench/memory.json
+"""
+import argparse
+import gc
+import multiprocessing
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.bench_rag import add_pipeline_args, build_pipeline
+from benchmarks.common import MB, peak_rss_mb, read_jsonl, rss_mb, run_info, write_json
+from rag.index import VECTOR_DB_NAMES
+
+COMPONENTS = ("model",) + VECTOR_DB_NAMES + ("all",)
+TOP_TYPES = 15  # 출력할 힙 타입 수
+
+
+def heap_by_type():
+    """
+    gc가 추적하는 객체와 그 객체가 직접 참조하는 str/bytes/숫자 등을 타입별로 집계합니다.
+    반환: (타입별 객체 수, 타입별 바이트)
+    """
+    counts = Counter()
+    sizes = Counter()
+    seen = set()
+    for obj in gc.get_objects():
+        for o in [obj] + gc.get_referents(obj):
+            if id(o) in seen:
+                continue
+            seen.add(id(o))
+            name = type(o).__name__
+            counts[name] += 1
+            try:
+                sizes[name] += sys.getsizeof(o)
+            except TypeError:
+                pass
+    return counts, sizes
+
+
+def heap_growth(before, after, top: int = TOP_TYPES):
+    """로드 전후 타입별 증가량 [(타입 이름, 객체 수 증가, 바이트 증가)] 크기 내림차순"""
+    counts = after[0].copy()
+    counts.subtract(before[0])
+    sizes = after[1].copy()
+    sizes.subtract(before[1])
+    return [(name, counts[name], size) for name, size in sizes.most_common(top) if size > 0]
+
+
+def load_component(name: str, args):
+    """구성 요소를 로드하고 로드된 객체를 반환합니다. (측정이 끝날 때까지 참조 유지)"""
+    questions = [record["question"] for record in read_jsonl(args.queries)]
+    if name == "all":
+        return build_pipeline(args, questions)
+
+    if name == "model":
+        if args.model == "tiny":
+            from benchmarks.bench_rag import corpus_texts, TOKENIZER_TRAIN_DOCS
+            from rag.fakes import build_tiny_model
+            texts = list(corpus_texts(args.data_dir, TOKENIZER_TRAIN_DOCS)) + questions
+            return build_tiny_model(texts, hidden_size=args.tiny_hidden, num_layers=args.tiny_layers)
+        from rag.config import MODEL_PATH, TOKENIZER_PATH
+        from rag.generation import load_model
+        return load_model(MODEL_PATH, TOKENIZER_PATH)
+
+    from rag.index import get_embedding, init_vector_db
+    if args.embedding == "hash":
+        from rag.fakes import HashEmbeddings
+        embedding = HashEmbeddings(size=args.embedding_dim)
+    else:
+        embedding = get_embedding()
+    db = init_vector_db(name, embedding, args.data_dir, args.vector_db_dir, args.index_type, args.babylove_backend)
+    if db is None:
+        raise RuntimeError(f"{name} 벡터 DB를 불러오지 못했습니다.")
+    return db
+
+
+def _import_baseline() -> None:
+    # 무거운 모듈 임포트는 기준값에 포함 (구성 요소 자체 비용만 보기 위해)
+    import torch  # noqa: F401
+    import rag.generation  # noqa: F401
+    import rag.index  # noqa: F401
+
+
+def profile_component(name: str, args) -> dict:
+    """새 프로세스 안에서 실행됩니다. (RSS, 로드 시간)"""
+    _import_baseline()
+    gc.collect()
+    baseline = rss_mb()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    loaded = load_component(name, args)
+    load_seconds = time.perf_counter() - start
+
+    traced_peak = None
+    if args.tracemalloc:
+        traced_peak = tracemalloc.get_traced_memory()[1] / MB
+        tracemalloc.stop()
+
+    gc.collect()
+    time.sleep(args.settle)
+    steady = rss_mb()
+    peak = peak_rss_mb()
+
+    result = {
+        "component": name,
+        "load_seconds": round(load_seconds, 3),
+        "baseline_rss_mb": round(baseline, 1),
+        "steady_rss_mb": round(steady, 1),
+        "peak_rss_mb": round(peak, 1),
+        "steady_delta_mb": round(steady - baseline, 1),
+        "peak_delta_mb": round(peak - baseline, 1),
+        "tracemalloc_peak_mb": None if traced_peak is None else round(traced_peak, 1),
+    }
+    try:
+        import torch
+        if torch.cuda.is_available():
+            result["cuda_max_allocated_mb"] = round(torch.cuda.max_memory_allocated() / MB, 1)
+    except ImportError:
+        pass
+    del loaded
+    return result
+
+
+def profile_heap(name: str, args) -> list:
+    """
+    새 프로세스 안에서 실행됩니다. 로드로 늘어난 파이썬 객체를 타입별로 집계합니다.
+    힙 순회 자체가 메모리를 쓰므로 RSS 측정과 다른 프로세스에서 실행합니다.
+    """
+    _import_baseline()
+    gc.collect()
+    before = heap_by_type()
+    loaded = load_component(name, args)
+    gc.collect()
+    growth = heap_growth(before, heap_by_type(), args.top_types)
+    del loaded
+    return [{"type": t, "count": c, "mb": round(b / MB, 2)} for t, c, b in growth]
+
+
+def run_isolated(func, name: str, args):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(func, (name, args))
+
+
+def parse_budgets(items):
+    budgets = {}
+    for item in items or []:
+        name, _, value = item.partition("=")
+        if name not in COMPONENTS or not value:
+            raise SystemExit(f"잘못된 예산 형식입니다: {item} (구성요소=MB, 구성요소: {', '.join(COMPONENTS)})")
+        budgets[name] = float(value)
+    return budgets
+
+
+def check_budgets(results, steady_budgets, peak_budgets):
+    failures = []
+    for r in results:
+        name = r["component"]
+        if name in steady_budgets and r["steady_delta_mb"] > steady_budgets[name]:
+            failures.append(f"{name}: 안정 RSS 증가 {r['steady_delta_mb']}MB > 예산 {steady_budgets[name]}MB")
+        if name in peak_budgets and r["peak_delta_mb"] > peak_budgets[name]:
+            failures.append(f"{name}: 최대 RSS 증가 {r['peak_delta_mb']}MB > 예산 {peak_budgets[name]}MB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모델/인덱스 로딩 메모리 프로파일러")
+    add_pipeline_args(parser)
+    parser.add_argument("--components", default=",".join(COMPONENTS),
+                        help=f"측정할 구성 요소 (쉼표 구분, {', '.join(COMPONENTS)})")
+    parser.add_argument("--budget", action="append", help="안정 RSS 증가 예산, 구성요소=MB (반복 가능)")
+    parser.add_argument("--peak-budget", action="append", help="최대 RSS 증가 예산, 구성요소=MB (반복 가능)")
+    parser.add_argument("--tracemalloc", action="store_true", help="파이썬 할당 최대치 측정 (로드가 느려짐)")
+    parser.add_argument("--top-types", type=int, default=TOP_TYPES, help="출력할 힙 타입 수")
+    parser.add_argument("--no-heap-types", action="store_true", help="힙 타입별 집계 생략 (구성 요소마다 한 번 더 로드함)")
+    parser.add_argument("--settle", type=float, default=1.0, help="안정 RSS 측정 전 대기 시간(초)")
+    parser.add_argument("--no-prepare", action="store_true", help="인덱스 사전 생성 생략 (생성 비용까지 측정)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    components = [c.strip() for c in args.components.split(",") if c.strip()]
+    unknown = set(components) - set(COMPONENTS)
+    if unknown:
+        raise SystemExit(f"알 수 없는 구성 요소: {', '.join(sorted(unknown))}")
+    steady_budgets = parse_budgets(args.budget)
+    peak_budgets = parse_budgets(args.peak_budget)
+
+    if not args.no_prepare and any(c in VECTOR_DB_NAMES or c == "all" for c in components):
+        print("인덱스 준비 중...")
+        args.no_generate = True
+        run_isolated(profile_component, "all", args)
+        args.no_generate = False
+
+    results = []
+    for name in components:
+        try:
+            result = run_isolated(profile_component, name, args)
+            if not args.no_heap_types:
+                result["heap_types"] = run_isolated(profile_heap, name, args)
+            results.append(result)
+        except Exception as e:
+            print(f"{name} 측정 실패: {str(e)}")
+
+    print(f"{'구성 요소':<20}{'로드(s)':>9}{'기준(MB)':>10}{'안정(MB)':>10}{'최대(MB)':>10}{'안정 증가':>10}{'최대 증가':>10}")
+    for r in results:
+        print(f"{r['component']:<20}{r['load_seconds']:>9}{r['baseline_rss_mb']:>10}{r['steady_rss_mb']:>10}"
+              f"{r['peak_rss_mb']:>10}{r['steady_delta_mb']:>10}{r['peak_delta_mb']:>10}")
+    for r in results:
+        if "heap_types" not in r:
+            continue
+        top = ", ".join(f"{h['type']} {h['count']}개/{h['mb']}MB" for h in r["heap_types"][:5])
+        print(f"  {r['component']} 힙 증가 상위: {top}")
+
+    failures = check_budgets(results, steady_budgets, peak_budgets)
+    for failure in failures:
+        print(f"예산 초과 - {failure}")
+
+    if args.output:
+        write_json(args.output, {
+            "run": run_info(),
+            "config": vars(args),
+            "budgets": {"steady_mb": steady_budgets, "peak_mb": peak_budgets},
+            "results": results,
+            "failures": failures,
+        })
+        print(f"결과 저장: {args.output}")
+
+    if failures or len(results) < len(components):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+코퍼스 규모별 수집/색인 확장성 벤치마크
+
+benchmarks.synth_corpus로 만든 합성 코퍼스(1만 ~ 100만 문서)에 대해 단계별 시간과 메모리를 측정합니다.
+- load: rag.loader.load_documents_with_metadata
+- embed: 빠른 가짜 임베딩(rag.fakes.RandomEmbeddings)으로 전체 문서 임베딩
+- build: 미리 계산한 벡터로 벡터 스토어 생성 (임베딩 비용 제외, 배치 크기는 INDEX_BATCH_SIZE)
+- save / reload: save_local / load_local
+- query: 단일 질의 검색 --queries회
+
+규모마다 새 프로세스(spawn)에서 실행하므로 메모리 값이 이전 규모의 영향을 받지 않습니다.
+단계별 최대 RSS는 Linux에서 /proc/self/clear_refs로 단계마다 초기화해 측정합니다.
+단계별 시간 ~ 문서 수의 로그-로그 기울기(1이면 선형)를 계산해 가장 먼저 초선형이 되는 단계를 표시하고,
+--plot으로 규모 대비 시간/메모리 그래프를 저장합니다.
+
+사용법:
+    python -m benchmarks.scaling --sizes 10000,30000,100000 --plot bench/scaling.png
+    python -m benchmarks.scaling --formats vector_db --backends numpy,faiss,quantized --sizes 10000,100000,1000000
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import shutil
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import percentiles, reset_peak_rss, rss_mb, run_info, stage_peak_rss_mb, write_json
+from benchmarks.synth_corpus import FORMATS, write_corpus
+from rag.config import INDEX_BATCH_SIZE, QUANTIZATION, QUANTIZED_REDUCTION, RESCORE_K
+
+BACKENDS = ("faiss", "numpy", "partitioned", "quantized", "chroma")
+STAGES = ("load", "embed", "build", "save", "reload", "query")
+SIZES = "10000,30000,100000,300000,1000000"
+SUPERLINEAR = 1.15  # 로그-로그 기울기가 이보다 크면 초선형으로 판단
+CATEGORY_FIELDS = {"classified": "category", "expanded": None, "vector_db": "category_name"}
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    미리 계산한 벡터를 요청 순서대로 돌려주는 임베딩 (build 단계에서 임베딩 비용을 빼기 위해 사용)
+    벡터 스토어는 문서 배치를 순서대로 embed_documents에 넘기므로 행 순서가 문서 순서와 같습니다.
+    """
+
+    def __init__(self, vectors: np.ndarray, query_embedding):
+        self.vectors = vectors
+        self.query_embedding = query_embedding
+        self.position = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        rows = self.vectors[self.position:self.position + len(texts)]
+        self.position += len(texts)
+        return rows.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.query_embedding.embed_query(text)
+
+
+def build_store(backend: str, batches, embedding, category_field, persist_dir: str, dim: int):
+    """
+    rag.index의 init_* 함수와 같은 방식으로 스토어를 만듭니다.
+    dim: 임베딩 차원 (quantized는 절반으로 축소)
+    """
+    if backend == "numpy":
+        from rag.numpy_store import NumpyVectorStore
+        return NumpyVectorStore.from_document_batches(batches, embedding)
+    if backend == "quantized":
+        from rag.quantized_store import QuantizedVectorStore
+        return QuantizedVectorStore.from_document_batches(
+            batches, embedding, dim=dim // 2, reduction=QUANTIZED_REDUCTION,
+            quantization=QUANTIZATION, rescore_k=RESCORE_K)
+    if backend == "partitioned":
+        from rag.partition import PartitionedVectorStore
+        return PartitionedVectorStore.from_document_batches(batches, embedding, category_field)
+
+    db = None
+    if backend == "faiss":
+        from langchain_community.vectorstores import FAISS
+        for docs in batches:
+            if db is None:
+                db = FAISS.from_documents(docs, embedding=embedding)
+            else:
+                db.add_documents(docs)
+        return db
+
+    from langchain_community.vectorstores import Chroma
+    for docs in batches:
+        if db is None:
+            db = Chroma.from_documents(documents=docs, embedding=embedding, persist_directory=persist_dir,
+                                       collection_name="scaling")
+        else:
+            db.add_documents(docs)
+    return db
+
+
+def save_store(backend: str, db, folder: str) -> None:
+    if backend != "chroma":  # Chroma는 생성하면서 persist_directory에 기록
+        db.save_local(folder)
+
+
+def load_store(backend: str, folder: str, embedding):
+    if backend == "faiss":
+        from langchain_community.vectorstores import FAISS
+        return FAISS.load_local(folder, embedding, allow_dangerous_deserialization=True)
+    if backend == "numpy":
+        from rag.numpy_store import NumpyVectorStore
+        return NumpyVectorStore.load_local(folder, embedding)
+    if backend == "quantized":
+        from rag.quantized_store import QuantizedVectorStore
+        return QuantizedVectorStore.load_local(folder, embedding)
+    if backend == "partitioned":
+        from rag.partition import PartitionedVectorStore
+        return PartitionedVectorStore.load_local(folder, embedding)
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=folder, embedding_function=embedding, collection_name="scaling")
+
+
+def batched(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def folder_mb(folder: str) -> float:
+    total = 0
+    for root, _, files in os.walk(folder):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / (1024 * 1024)
+
+
+def run_size(fmt: str, backend: str, size: int, args) -> Dict[str, Any]:
+    """새 프로세스 안에서 실행됩니다. 규모 하나의 단계별 측정값"""
+    from rag.fakes import RandomEmbeddings
+    from rag.loader import load_documents_with_metadata
+
+    corpus = os.path.join(args.work_dir, "corpus", f"{fmt}_{size}.json")
+    index_dir = os.path.join(args.work_dir, "index", f"{fmt}_{backend}_{size}")
+    embedding = RandomEmbeddings(size=args.embedding_dim)
+    stages: Dict[str, Dict[str, Any]] = {}
+    shutil.rmtree(index_dir, ignore_errors=True)  # Chroma는 기존 폴더에 이어서 쓰므로 항상 새로 생성
+
+    def measure(stage: str, func):
+        gc.collect()
+        reset_peak_rss()
+        before = rss_mb()
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        stages[stage] = {
+            "seconds": round(seconds, 4),
+            "rss_mb": round(rss_mb(), 1),
+            "rss_delta_mb": round(rss_mb() - before, 1),
+            "peak_rss_mb": round(stage_peak_rss_mb(), 1),
+        }
+        return result
+
+    docs = measure("load", lambda: load_documents_with_metadata(corpus))
+    texts = [doc.page_content for doc in docs]
+    vectors = measure("embed", lambda: np.concatenate(
+        [embedding.embed_array(batch) for batch in batched(texts, INDEX_BATCH_SIZE)]))
+    del texts
+
+    precomputed = PrecomputedEmbeddings(vectors, embedding)
+    batches = batched(docs, INDEX_BATCH_SIZE)
+    db = measure("build", lambda: build_store(backend, batches, precomputed, CATEGORY_FIELDS[fmt], index_dir,
+                                              args.embedding_dim))
+    measure("save", lambda: save_store(backend, db, index_dir))
+    index_mb = folder_mb(index_dir)
+    del db, precomputed, vectors, batches, docs
+
+    db = measure("reload", lambda: load_store(backend, index_dir, embedding))
+
+    rng = np.random.default_rng(args.seed)
+    queries = embedding.embed_array([f"질문 {i}" for i in rng.integers(0, size, args.queries)])
+    latencies = []
+
+    def run_queries():
+        for vector in queries.tolist():
+            start = time.perf_counter()
+            db.similarity_search_with_score_by_vector(vector, k=args.k)
+            latencies.append(time.perf_counter() - start)
+
+    measure("query", run_queries)
+    stages["query"]["latency_ms"] = percentiles(latencies, 1000.0)
+    return {"format": fmt, "backend": backend, "size": size, "corpus_mb": round(os.path.getsize(corpus) / 2 ** 20, 1),
+            "index_mb": round(index_mb, 1), "stages": stages}
+
+
+def run_isolated(fmt: str, backend: str, size: int, args) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(run_size, (fmt, backend, size, args))
+
+
+def scaling_exponents(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    """단계별 시간 ~ 문서 수의 로그-로그 최소제곱 기울기 (1 = 선형)"""
+    exponents = {}
+    sizes = np.log([r["size"] for r in rows])
+    for stage in STAGES:
+        seconds = [r["stages"][stage]["seconds"] for r in rows]
+        if len(rows) > 1 and min(seconds) > 0:
+            exponents[stage] = round(float(np.polyfit(sizes, np.log(seconds), 1)[0]), 3)
+    return exponents
+
+
+def first_superlinear(rows: List[Dict[str, Any]]):
+    """
+    가장 작은 규모에서부터 구간별 기울기를 보고 처음으로 SUPERLINEAR를 넘는 단계
+    반환: {"stage", "from_size", "to_size", "exponent"} 또는 None
+    """
+    for a, b in zip(rows, rows[1:]):
+        worst = None
+        for stage in STAGES:
+            t0, t1 = a["stages"][stage]["seconds"], b["stages"][stage]["seconds"]
+            if t0 <= 0 or t1 <= 0:
+                continue
+            slope = np.log(t1 / t0) / np.log(b["size"] / a["size"])
+            if slope > SUPERLINEAR and (worst is None or slope > worst["exponent"]):
+                worst = {"stage": stage, "from_size": a["size"], "to_size": b["size"], "exponent": round(float(slope), 3)}
+        if worst:
+            return worst
+    return None
+
+
+def plot_scaling(groups: Dict[str, List[Dict[str, Any]]], path: str) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(len(groups), 2, figsize=(11, 4 * len(groups)), squeeze=False)
+    for (label, rows), (ax_time, ax_mem) in zip(groups.items(), axes):
+        sizes = [r["size"] for r in rows]
+        for stage in STAGES:
+            ax_time.plot(sizes, [r["stages"][stage]["seconds"] for r in rows], marker="o", label=stage)
+            ax_mem.plot(sizes, [r["stages"][stage]["peak_rss_mb"] for r in rows], marker="o", label=stage)
+        # 선형 기준선 (가장 작은 규모의 전체 시간에서 출발)
+        total = sum(rows[0]["stages"][s]["seconds"] for s in STAGES)
+        ax_time.plot(sizes, [total * n / sizes[0] for n in sizes], linestyle="--", color="gray", label="linear")
+        ax_time.set_title(f"{label}: time")
+        ax_time.set_xlabel("documents")
+        ax_time.set_ylabel("seconds")
+        ax_time.set_xscale("log")
+        ax_time.set_yscale("log")
+        ax_time.legend(fontsize=8)
+        ax_mem.set_title(f"{label}: peak RSS")
+        ax_mem.set_xlabel("documents")
+        ax_mem.set_ylabel("MB")
+        ax_mem.set_xscale("log")
+        ax_mem.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"그래프 저장: {path}")
+
+
+def print_rows(label: str, rows: List[Dict[str, Any]], exponents: Dict[str, float]) -> None:
+    print(f"\n[{label}] 단계별 시간(s) / 최대 RSS(MB)")
+    print(f"{'문서 수':>10}" + "".join(f"{stage:>16}" for stage in STAGES) + f"{'인덱스(MB)':>12}")
+    for r in rows:
+        cells = "".join(f"{r['stages'][s]['seconds']:>9.3f}/{r['stages'][s]['peak_rss_mb']:<6.0f}" for s in STAGES)
+        print(f"{r['size']:>10}{cells}{r['index_mb']:>12}")
+    if exponents:
+        print(f"{'기울기':>10}" + "".join(f"{exponents.get(stage, ''):>16}" for stage in STAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="코퍼스 규모별 수집/색인 확장성 벤치마크")
+    parser.add_argument("--sizes", default=SIZES, help="문서 수 목록 (쉼표 구분)")
+    parser.add_argument("--formats", default=",".join(FORMATS), help=f"입력 형식 ({', '.join(FORMATS)})")
+    parser.add_argument("--backends", default="faiss", help=f"벡터 스토어 ({', '.join(BACKENDS)})")
+    parser.add_argument("--embedding-dim", type=int, default=256, help="가짜 임베딩 차원")
+    parser.add_argument("--queries", type=int, default=200, help="query 단계 검색 횟수")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default="./scaling_work", help="합성 코퍼스와 인덱스를 둘 폴더 (코퍼스는 재사용)")
+    parser.add_argument("--plot", help="규모 대비 시간/메모리 그래프를 저장할 PNG 경로")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = (set(formats) - set(FORMATS)) | (set(backends) - set(BACKENDS))
+    if unknown:
+        raise SystemExit(f"알 수 없는 형식/백엔드: {', '.join(sorted(unknown))}")
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    summary: Dict[str, Dict[str, Any]] = {}
+    for fmt in formats:
+        for size in sizes:
+            write_corpus(os.path.join(args.work_dir, "corpus", f"{fmt}_{size}.json"), fmt, size, args.seed)
+        for backend in backends:
+            if backend == "partitioned" and CATEGORY_FIELDS[fmt] is None:
+                print(f"{fmt}: 카테고리가 없어 partitioned 백엔드를 건너뜁니다.")
+                continue
+            label = f"{fmt}/{backend}"
+            rows = []
+            for size in sizes:
+                try:
+                    rows.append(run_isolated(fmt, backend, size, args))
+                except Exception as e:
+                    # 메모리 부족 등으로 실패하면 더 큰 규모는 시도하지 않음
+                    print(f"{label} {size}개 측정 실패: {str(e)}")
+                    break
+            if not rows:
+                continue
+            exponents = scaling_exponents(rows)
+            knee = first_superlinear(rows)
+            groups[label] = rows
+            summary[label] = {"exponents": exponents, "first_superlinear": knee}
+            print_rows(label, rows, exponents)
+            if knee:
+                print(f"처음 초선형이 되는 단계: {knee['stage']} ({knee['from_size']} → {knee['to_size']}개, "
+                      f"기울기 {knee['exponent']})")
+            else:
+                print("측정 범위 안에서 초선형 단계 없음")
+
+    if args.plot and groups:
+        plot_scaling(groups, args.plot)
+
+    if args.output:
+        write_json(args.output, {"run": run_info(), "config": vars(args), "summary": summary, "results": groups})
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
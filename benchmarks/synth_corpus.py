@@ -0,0 +1,141 @@
+"""
+합성 코퍼스 생성기
+
+rag.loader.load_documents_with_metadata가 읽는 세 가지 형식으로 실제 데이터와 비슷한 모양의 코퍼스를 만듭니다.
+- classified: {"id": {"post", "category", "confidence"}} (질문/정보 분류 결과, faiss_classified 입력)
+- expanded: [{"post", "comment"}] (게시글-댓글 쌍, faiss_expanded 입력)
+- vector_db: [{"id", "text", "metadata"}] (아이사랑 크롤링 섹션, chroma_baby_love 입력)
+
+본문 길이는 로그정규 분포, 단어는 육아 용어 + 합성 한글 단어를 지프 분포로 뽑아서
+토큰/길이 분포가 실제 카페 글과 비슷하도록 했습니다. 레코드를 하나씩 써 내려가므로 100만 개도 메모리를 거의 쓰지 않습니다.
+같은 시드, 같은 개수면 항상 같은 파일이 만들어집니다.
+
+사용법:
+    python -m benchmarks.synth_corpus --format vector_db --count 100000 --output /tmp/corpus/vector_db_100k.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+from typing import Any, Dict, Iterator, List, Tuple
+
+from rag.search import BABYLOVE_CATEGORIES
+
+FORMATS = ("classified", "expanded", "vector_db")
+
+TERMS = ["아기", "수유", "이유식", "수면", "발달", "예방접종", "열", "기저귀", "분유", "어린이집", "모유", "목욕",
+         "체온", "개월", "신생아", "놀이", "배변", "감기", "성장", "부모", "엄마", "아빠", "병원", "소아과",
+         "뒤집기", "걸음마", "낮잠", "밤중수유", "젖병", "유모차", "카시트", "아토피", "변비", "설사", "기침"]
+ENDINGS = ["요", "습니다", "네요", "나요", "까요", "어요", "했어요", "할까요", "인가요", "같아요"]
+SYLLABLES = [chr(0xAC00 + i * 28) for i in range(0, 399, 7)]  # 받침 없는 한글 음절 일부
+CLASSIFIED_CATEGORIES = [("정보", 0.55), ("질문", 0.3), ("비정보", 0.15)]
+
+VOCAB_SIZE = 20000  # 합성 단어 수 (지프 분포 꼬리)
+MEAN_WORDS = 60  # 본문 평균 단어 수
+SIGMA = 0.8  # 본문 길이 로그정규 분포의 표준편차
+
+
+class TextSampler:
+    """육아 용어를 머리로, 합성 한글 단어를 꼬리로 하는 지프 분포 단어 생성기"""
+
+    def __init__(self, rng: random.Random, vocab_size: int = VOCAB_SIZE):
+        self.rng = rng
+        synthetic = set()
+        while len(synthetic) < vocab_size:
+            synthetic.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+        self.vocab = TERMS + sorted(synthetic)
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(self.vocab))))
+
+    def words(self, count: int) -> List[str]:
+        return self.rng.choices(self.vocab, cum_weights=self.cum_weights, k=count)
+
+    def text(self, mean_words: int = MEAN_WORDS) -> str:
+        count = max(3, int(self.rng.lognormvariate(math.log(mean_words), SIGMA)))
+        words = self.words(count)
+        sentences = []
+        for start in range(0, count, 12):
+            sentences.append(" ".join(words[start:start + 12]) + self.rng.choice(ENDINGS) + ".")
+        return " ".join(sentences)
+
+    def title(self) -> str:
+        return " ".join(self.words(self.rng.randint(2, 5)))
+
+
+def iter_records(fmt: str, count: int, seed: int = 0) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """(키, 레코드)를 생성합니다. 키는 classified 형식에서만 사용합니다."""
+    if fmt not in FORMATS:
+        raise ValueError(f"지원하지 않는 형식입니다: {fmt}")
+    rng = random.Random(f"{seed}:{fmt}")
+    sampler = TextSampler(rng)
+    names = [name for name, _ in CLASSIFIED_CATEGORIES]
+    weights = [weight for _, weight in CLASSIFIED_CATEGORIES]
+
+    for i in range(count):
+        if fmt == "classified":
+            yield str(i), {
+                "post": sampler.text(),
+                "category": rng.choices(names, weights)[0],
+                "confidence": round(rng.betavariate(8, 2), 3),
+            }
+        elif fmt == "expanded":
+            yield i, {"post": sampler.text(MEAN_WORDS // 2), "comment": sampler.text()}
+        else:
+            category = rng.choice(BABYLOVE_CATEGORIES)
+            page_title = sampler.title()
+            section_title = sampler.title()
+            yield i, {
+                "id": f"synth-{i}",
+                "text": sampler.text(MEAN_WORDS * 2),
+                "metadata": {
+                    "category_id": BABYLOVE_CATEGORIES.index(category),
+                    "category_name": category,
+                    "page_title": page_title,
+                    "section_title": section_title,
+                    "source": f"{category}/{page_title}/{section_title}",
+                },
+            }
+
+
+def write_corpus(path: str, fmt: str, count: int, seed: int = 0) -> str:
+    """코퍼스 파일을 씁니다. 이미 같은 설정으로 만든 파일이 있으면 다시 만들지 않습니다."""
+    meta_path = path + ".meta.json"
+    meta = {"format": fmt, "count": count, "seed": seed}
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            if json.load(f) == meta:
+                return path
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("{" if fmt == "classified" else "[")
+        for i, (key, record) in enumerate(iter_records(fmt, count, seed)):
+            if i:
+                f.write(",\n")
+            if fmt == "classified":
+                f.write(f"{json.dumps(key)}: ")
+            f.write(json.dumps(record, ensure_ascii=False))
+        f.write("}" if fmt == "classified" else "]")
+    os.replace(tmp_path, path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="합성 코퍼스 생성기")
+    parser.add_argument("--format", choices=FORMATS, required=True)
+    parser.add_argument("--count", type=int, required=True, help="문서 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    write_corpus(args.output, args.format, args.count, args.seed)
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"{args.output}: {args.format} {args.count}개, {size_mb:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,229 +1,136 @@
-import torch
-import os
-import logging
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer, StoppingCriteria, StoppingCriteriaList
-from threading import Thread
-
-# 로깅 설정
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-# 모델 및 토크나이저 경로 설정
-MODEL_PATH = "Snowfall0601/finetuned-koalpaca-5.8B"  # 허깅페이스 레포지토리
-TOKENIZER_PATH = "beomi/KoAlpaca-Polyglot-5.8B"  # 토크나이저 경로
-
-# 커스텀 정지 기준 클래스 정의
-class StopOnTokens(StoppingCriteria):
-    def __init__(self, tokenizer, stop_token_ids):
-        self.tokenizer = tokenizer
-        self.stop_token_ids = stop_token_ids
-    
-    def __call__(self, input_ids, scores, **kwargs):
-        for stop_ids in self.stop_token_ids:
-            if input_ids[0][-len(stop_ids):].tolist() == stop_ids:
-                return True
-        return False
-
-def load_model(model_path, tokenizer_path):
-    """
-    모델과 토크나이저를 로드하는 함수
-    - 모델은 허깅페이스 레포지토리에서 로드
-    - 토크나이저는 지정된 경로에서 로드
-    """
-    logger.info(f"모델을 로드합니다: {model_path}")
-    logger.info(f"토크나이저를 로드합니다: {tokenizer_path}")
-    
-    # GPU 사용 가능 여부 확인
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    logger.info(f"사용 중인 장치: {device}")
-    
-    try:
-        # 다양한 옵션으로 토크나이저 로드 시도
-        try:
-            logger.info("첫 번째 방법으로 토크나이저 로드 시도")
-            tokenizer = AutoTokenizer.from_pretrained(
-                tokenizer_path,
-                use_fast=False,
-                trust_remote_code=True
-            )
-        except Exception as e:
-            logger.warning(f"첫 번째 방법 실패: {str(e)}")
-            logger.info("두 번째 방법으로 토크나이저 로드 시도")
-            try:
-                from transformers import PreTrainedTokenizerFast
-                tokenizer = PreTrainedTokenizerFast.from_pretrained(tokenizer_path)
-            except Exception as e2:
-                logger.warning(f"두 번째 방법 실패: {str(e2)}")
-                logger.info("마지막 방법으로 토크나이저 로드 시도")
-                tokenizer = AutoTokenizer.from_pretrained(
-                    tokenizer_path, 
-                    padding_side='left',
-                    truncation_side='left'
-                )
-        
-        logger.info("토크나이저 로드 완료")
-        
-        # 토크나이저에 필요한 토큰 설정
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
-            logger.info("패딩 토큰을 EOS 토큰으로 설정")
-        
-        # 모델 설정
-        model_loading_args = {
-            "torch_dtype": torch.float16,
-            "device_map": "cuda:0" if device == "cuda" else "auto",
-            "low_cpu_mem_usage": True,
-            "trust_remote_code": True
-        }
-        
-        # 허깅페이스에서 모델 로드 시도
-        try:
-            logger.info("기본 옵션으로 모델 로드 시도")
-            model = AutoModelForCausalLM.from_pretrained(model_path, **model_loading_args)
-        except Exception as e:
-            logger.warning(f"기본 옵션으로 모델 로드 실패: {str(e)}")
-            logger.info("추가 옵션으로 모델 로드 시도")
-            
-            # 오류 발생 시 추가 옵션 시도
-            model_loading_args["revision"] = "main"  # 메인 브랜치 사용
-            model = AutoModelForCausalLM.from_pretrained(model_path, **model_loading_args)
-        
-        logger.info("모델 로드 완료")
-        return model, tokenizer, device
-    
-    except Exception as e:
-        logger.error(f"모델 또는 토크나이저 로드 중 오류 발생: {str(e)}")
-        raise
-
-def generate_response(prompt, model, tokenizer, device, max_length=256, temperature=0.7):
-    """
-    사용자 입력에 대한 응답을 생성하는 함수
-    """
-    try:
-        # KoAlpaca 형식으로 프롬프트 변환
-        alpaca_prompt = f"### 질문: {prompt}\n\n### 답변:"
-        logger.info("KoAlpaca 형식으로 프롬프트 변환 완료")
-        
-        try:
-            # 입력 텍스트를 수동으로 토큰화하여 오류 방지
-            tokens = tokenizer.tokenize(alpaca_prompt)
-            token_ids = tokenizer.convert_tokens_to_ids(tokens)
-            input_ids = torch.tensor([token_ids]).to(device)
-            attention_mask = torch.ones_like(input_ids).to(device)
-            
-            logger.info("수동 토큰화 완료")
-        except Exception as e:
-            logger.error(f"토큰화 중 오류: {str(e)}")
-            # 백업 방법: 직접 인코딩
-            try:
-                input_ids = tokenizer.encode(alpaca_prompt, return_tensors="pt").to(device)
-                attention_mask = torch.ones_like(input_ids).to(device)
-                logger.info("백업 인코딩 방법 사용")
-            except Exception as e2:
-                logger.error(f"백업 인코딩 중 오류: {str(e2)}")
-                raise
-        
-        # 정지 토큰 설정
-        stop_words = ["### 질문:", "### 답변:"]
-        stop_token_ids = []
-        for word in stop_words:
-            try:
-                ids = tokenizer.encode(word, add_special_tokens=False)
-                stop_token_ids.append(ids)
-            except Exception as e:
-                logger.error(f"정지 토큰 인코딩 오류 (무시): {str(e)}")
-        
-        stopping_criteria = StoppingCriteriaList([StopOnTokens(tokenizer, stop_token_ids)])
-        
-        # 스트리머 초기화 (답변 부분만 가져오도록 설정)
-        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
-        
-        # 생성 매개변수 설정
-        generation_kwargs = {
-            "input_ids": input_ids,
-            "attention_mask": attention_mask,
-            "max_new_tokens": max_length,
-            "temperature": temperature,
-            "do_sample": True,
-            "top_p": 0.95,
-            "pad_token_id": tokenizer.pad_token_id,
-            "streamer": streamer
-        }
-        
-        # stopping_criteria가 설정되어 있으면 추가
-        if stop_token_ids:
-            generation_kwargs["stopping_criteria"] = stopping_criteria
-        
-        # 별도 스레드에서 텍스트 생성 시작
-        thread = Thread(target=model.generate, kwargs=generation_kwargs)
-        thread.start()
-        
-        # 응답 생성 (스트리밍)
-        generated_text = ""
-        print("\n모델 응답: ", end="", flush=True)
-        for text in streamer:
-            print(text, end="", flush=True)
-            generated_text += text
-            
-            # 응답에 "### 답변:" 또는 "### 질문:"이 포함되면 해당 부분까지만 사용
-            if "### 답변:" in text or "### 질문:" in text:
-                break
-                
-        print("\n")
-        
-        # 생성된 텍스트 정리
-        # "### 답변:" 이후의 추가 태그 제거
-        cleaned_text = generated_text
-        if "### 답변:" in cleaned_text:
-            cleaned_text = cleaned_text.split("### 답변:")[0]
-        if "### 질문:" in cleaned_text:
-            cleaned_text = cleaned_text.split("### 질문:")[0]
-            
-        return cleaned_text.strip()
-        
-    except Exception as e:
-        logger.error(f"응답 생성 중 오류 발생: {str(e)}")
-        return f"오류 발생: {str(e)}"
-
-def chat_with_model():
-    """
-    대화형 인터페이스를 제공하는 메인 함수
-    """
-    try:
-        # 모델 및 토크나이저 로드
-        model, tokenizer, device = load_model(MODEL_PATH, TOKENIZER_PATH)
-        
-        print(f"🤖 모델 '{MODEL_PATH}'이(가) 로드되었습니다.")
-        print(f"🔤 토크나이저는 '{TOKENIZER_PATH}'에서 로드되었습니다.")
-        print("대화를 시작합니다. 종료하려면 'exit', 'quit', 또는 'q'를 입력하세요.")
-        
-        conversation_history = ""  # 대화 기록 저장용
-        
-        while True:
-            user_input = input("\n사용자: ")
-            
-            # 종료 명령 확인
-            if user_input.lower() in ["exit", "quit", "q"]:
-                print("대화를 종료합니다. 감사합니다!")
-                break
-            
-            # 대화 기록 업데이트
-            if conversation_history:
-                conversation_history += f"\n사용자: {user_input}"
-            else:
-                conversation_history = f"사용자: {user_input}"
-            
-            # 사용자 입력 그대로 전달 (KoAlpaca 형식은 generate_response 내에서 변환)
-            response = generate_response(user_input, model, tokenizer, device, 500, 0.7)
-            
-            # 대화 기록 업데이트
-            conversation_history += f"\n모델: {response}"
-            
-    except KeyboardInterrupt:
-        print("\n사용자가 대화를 중단했습니다.")
-    except Exception as e:
-        logger.error(f"예상치 못한 오류 발생: {str(e)}")
-        print(f"오류 발생: {str(e)}")
-
-if __name__ == "__main__":
-    chat_with_model()
\ No newline at end of file
+import logging
+import os
+import sys
+import uuid
+
+from rag import daemon
+from rag.client import RagClient, RagServerError, ServerBusyError
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 모델은 추론 서버(rag/server.py)가 올려두고, CLI는 검색 없이 생성만 요청합니다.
+# RAG_SERVER_URL 환경 변수가 있으면 그 서버에, 없으면 유닉스 소켓의 로컬 데몬(rag/daemon.py)에 접속하고
+# 데몬이 없으면 띄웁니다. 데몬은 요청이 없으면 DAEMON_IDLE_TIMEOUT 후 종료됩니다.
+#
+# 사용법:
+#     python cli_chat.py                        # 대화형
+#     python cli_chat.py "아기가 밤에 자꾸 깨요"   # 질문 하나에 답하고 종료
+#     cat questions.txt | python cli_chat.py    # 한 줄에 질문 하나씩 답하고 종료
+
+def connect_server():
+    """추론 서버에 접속한 클라이언트"""
+    if os.getenv("RAG_SERVER_URL"):
+        return RagClient()
+    client = daemon.connect(on_start=lambda: print("⏳ 추론 데몬을 시작합니다...", file=sys.stderr))
+    daemon.wait_for_model(client, on_wait=lambda status: print(
+        "⏳ 모델을 불러오는 중입니다. 준비되면 바로 답변합니다...", file=sys.stderr))
+    return client
+
+def generate_response(prompt, client, max_length=256, temperature=0.7, session_id=None, prefix="\n모델 응답: "):
+    """
+    사용자 입력에 대한 응답을 생성하는 함수 (스트리밍 출력)
+    session_id: 있으면 추론 서버가 같은 세션의 이전 대화에 이어서 답함 (지난 턴의 KV 캐시 재사용)
+    prefix: 답변 앞에 출력할 문자열
+    """
+    try:
+        printed = 0
+        
+        def print_new_text(text):
+            # 누적 텍스트에서 새로 늘어난 부분만 출력
+            nonlocal printed
+            print(text[printed:], end="", flush=True)
+            printed = len(text)
+        
+        print(prefix, end="", flush=True)
+        # KoAlpaca 질문/답변 형식 (시스템 프롬프트 없음)으로 생성
+        response, _ = client.generate(
+            prompt,
+            system_prompt="",
+            max_new_tokens=max_length,
+            temperature=temperature,
+            on_text=print_new_text,
+            on_queue=lambda position: print(f"(대기 순번 {position}) ", end="", flush=True, file=sys.stderr),
+            session_id=session_id
+        )
+        print("\n")
+        
+        return response.strip()
+        
+    except ServerBusyError as e:
+        print()
+        logger.warning(f"서버 혼잡으로 응답 생성 실패: {str(e)}")
+        return "지금 질문하시는 분이 많아 답변을 만들 수 없어요. 잠시 후 다시 시도해 주세요."
+        
+    except RagServerError as e:
+        logger.error(f"응답 생성 중 오류 발생: {str(e)}")
+        return f"오류 발생: {str(e)}"
+
+def chat_with_model():
+    """
+    대화형 인터페이스를 제공하는 메인 함수
+    """
+    try:
+        # 추론 서버 연결 확인
+        client = connect_server()
+        status = client.health()
+        
+        print(f"🤖 추론 서버 {client.base_url}에 연결되었습니다.")
+        print(f"🤖 모델 '{status['model_path']}'")
+        print(f"🔤 토크나이저 '{status['tokenizer_path']}'")
+        if status["model"]["state"] != "ready":
+            print(f"⏳ 모델 상태: {status['model']['state']} (준비될 때까지 답변을 만들 수 없습니다)")
+        print("대화를 시작합니다. 종료하려면 'exit', 'quit', 또는 'q'를 입력하세요.")
+        print("새 대화를 시작하려면 'reset'을 입력하세요.")
+        
+        # 대화 기록은 추론 서버의 세션에 저장됨 (이전 턴은 다시 prefill하지 않음)
+        session_id = uuid.uuid4().hex
+        
+        while True:
+            user_input = input("\n사용자: ")
+            
+            # 종료 명령 확인
+            if user_input.lower() in ["exit", "quit", "q"]:
+                client.reset_session(session_id)
+                print("대화를 종료합니다. 감사합니다!")
+                break
+            
+            # 대화 기록 초기화
+            if user_input.lower() == "reset":
+                client.reset_session(session_id)
+                session_id = uuid.uuid4().hex
+                print("대화 기록을 지웠습니다. 새 대화를 시작합니다.")
+                continue
+            
+            # 사용자 입력 그대로 전달 (KoAlpaca 형식과 이전 대화는 추론 서버에서 붙임)
+            generate_response(user_input, client, 500, 0.7, session_id=session_id)
+            
+    except KeyboardInterrupt:
+        print("\n사용자가 대화를 중단했습니다.")
+    except Exception as e:
+        logger.error(f"예상치 못한 오류 발생: {str(e)}")
+        print(f"오류 발생: {str(e)}")
+
+def answer_questions(questions):
+    """
+    스크립트용: 질문마다 답변만 출력하고 종료 (각 질문은 독립적으로 답함)
+    """
+    try:
+        client = connect_server()
+    except RagServerError as e:
+        print(f"오류 발생: {str(e)}", file=sys.stderr)
+        return 1
+    for question in questions:
+        question = question.strip()
+        if question:
+            generate_response(question, client, 500, 0.7, prefix="")
+    return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(answer_questions([" ".join(sys.argv[1:])]))
+    elif not sys.stdin.isatty():
+        sys.exit(answer_questions(sys.stdin))
+    else:
+        chat_with_model()
\ No newline at end of file
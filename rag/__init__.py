@@ -0,0 +1,6 @@
+"""
+마파덜 RAG 공용 모듈
+
+streamlit 앱, CLI, 벤치마크 스크립트가 함께 사용하는 문서 로딩/검색 코드를 모아둔 패키지입니다.
+무거운 의존성(torch, langchain 등)은 각 하위 모듈에서 필요할 때만 임포트합니다.
+"""
@@ -0,0 +1,157 @@
+"""
+생성 요청 입장 제어 (동시 실행 제한 + FIFO 대기열)
+
+CPU 하나에서 model.generate를 여러 개 동시에 돌리면 모든 요청이 같이 느려지다가 한꺼번에 타임아웃됩니다.
+AdmissionController는 추론 서버(rag.server)의 생성 앞에서 다음을 보장합니다.
+- 동시에 생성하는 요청은 max_concurrent개까지
+- 나머지는 도착 순서(FIFO)대로 대기열에서 기다리고, 대기열이 max_queue개로 가득 차면 바로 AdmissionRejected("busy")
+- 대기열에서 queue_timeout초 넘게 기다린 요청은 AdmissionRejected("timeout")
+
+사용 순서 (모든 메서드는 서버의 이벤트 루프 스레드에서만 호출합니다):
+    ticket = controller.enqueue()          # 혼잡하면 AdmissionRejected
+    async for position in controller.wait_positions(ticket):
+        ...                                # 대기 순번(1부터)이 바뀔 때마다
+    controller.start(ticket)               # 생성 작업 시작
+    ...                                    # 작업이 끝나면 controller.finish(ticket)
+    controller.abandon(ticket)             # 시작 전에 포기한 경우 (연결 끊김, 검색 결과 없음 등)
+
+메트릭: rag_admission_queue_depth, rag_admission_active (게이지),
+        rag_admission_wait_seconds (입장까지 기다린 시간), rag_admission_rejected_total{reason}
+"""
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict
+
+from rag.telemetry import REGISTRY
+
+POSITION_POLL_SECONDS = 0.5  # 대기 순번 변화를 확인하는 간격(초)
+
+WAITING, ADMITTED, RUNNING, DONE = "waiting", "admitted", "running", "done"
+
+
+class AdmissionRejected(Exception):
+    """reason: "busy"(대기열이 가득 참) 또는 "timeout"(대기 시간 초과)"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class Ticket:
+    """요청 하나의 입장권"""
+    __slots__ = ("future", "enqueued_at", "state")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.state = WAITING
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent는 1 이상이어야 합니다.")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiting: Deque[Ticket] = deque()
+        self._update_gauges()
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiting)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "waiting": self.depth,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+    def enqueue(self) -> Ticket:
+        """빈자리가 있으면 바로 입장, 없으면 대기열 맨 뒤에 넣습니다. 대기열이 가득 차면 AdmissionRejected("busy")"""
+        ticket = Ticket(asyncio.get_running_loop().create_future())
+        if self.active < self.max_concurrent and not self._waiting:
+            self._admit(ticket)
+        elif len(self._waiting) >= self.max_queue:
+            REGISTRY.inc("rag_admission_rejected_total", reason="busy")
+            raise AdmissionRejected("busy", f"요청이 많아 처리할 수 없습니다 (생성 중 {self.active}개, 대기 {self.depth}개).")
+        else:
+            self._waiting.append(ticket)
+        self._update_gauges()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """대기 순번 (1부터, 입장했으면 0)"""
+        if ticket.state != WAITING:
+            return 0
+        return self._waiting.index(ticket) + 1
+
+    async def wait_positions(self, ticket: Ticket) -> AsyncIterator[int]:
+        """
+        입장할 때까지 대기 순번이 바뀔 때마다 순번을 내보냅니다 (바로 입장하면 아무것도 내보내지 않음).
+        queue_timeout이 지나면 대기열에서 빼고 AdmissionRejected("timeout")
+        """
+        deadline = ticket.enqueued_at + self.queue_timeout
+        last = None
+        while not ticket.future.done():
+            position = self.position(ticket)
+            if position != last:
+                yield position
+                last = position
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                self.abandon(ticket)
+                REGISTRY.inc("rag_admission_rejected_total", reason="timeout")
+                raise AdmissionRejected("timeout", f"대기 시간({self.queue_timeout:g}초)을 넘겼습니다.")
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), min(remaining, POSITION_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+
+    async def wait(self, ticket: Ticket) -> None:
+        async for _ in self.wait_positions(ticket):
+            pass
+
+    def start(self, ticket: Ticket) -> None:
+        """입장한 요청의 생성 작업을 넘긴 직후 호출합니다. 이후 자리는 finish에서만 반납됩니다."""
+        ticket.state = RUNNING
+
+    def finish(self, ticket: Ticket) -> None:
+        """생성 작업이 끝나면 자리를 반납합니다 (작업 스레드에서는 loop.call_soon_threadsafe로 호출)."""
+        if ticket.state in (ADMITTED, RUNNING):
+            ticket.state = DONE
+            self._release()
+
+    def abandon(self, ticket: Ticket) -> None:
+        """
+        작업을 시작하기 전에 요청을 포기합니다. 대기 중이면 대기열에서 빼고, 입장했으면 자리를 반납합니다.
+        이미 작업이 시작된 경우에는 아무것도 하지 않습니다 (작업 스레드가 끝날 때 finish).
+        """
+        if ticket.state == WAITING:
+            self._waiting.remove(ticket)
+            ticket.state = DONE
+            ticket.future.cancel()
+            self._update_gauges()
+        elif ticket.state == ADMITTED:
+            ticket.state = DONE
+            self._release()
+
+    def _admit(self, ticket: Ticket) -> None:
+        self.active += 1
+        ticket.state = ADMITTED
+        REGISTRY.observe("rag_admission_wait_seconds", time.perf_counter() - ticket.enqueued_at)
+        ticket.future.set_result(None)
+
+    def _release(self) -> None:
+        self.active -= 1
+        while self._waiting and self.active < self.max_concurrent:
+            self._admit(self._waiting.popleft())
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        REGISTRY.set_gauge("rag_admission_queue_depth", len(self._waiting))
+        REGISTRY.set_gauge("rag_admission_active", self.active)
@@ -0,0 +1,165 @@
+"""
+질문 파일 일괄 답변 (오프라인 평가, 답변 미리 만들기)
+
+질문 JSONL(한 줄에 {"question": ...}, 다른 필드는 결과에 그대로 복사)을 읽어
+1. --rag면 검색 도구로 문맥을 찾고 (질문을 EMBED_BATCH_SIZE개씩 묶어 임베딩해 검색 캐시를 채운 뒤 retrieve_context)
+2. 프롬프트 토큰 길이로 정렬해 길이가 비슷한 질문끼리 배치를 만들고 (왼쪽 패딩 낭비가 적음)
+3. 배치마다 rag.generation.generate_batch로 model.generate를 한 번만 실행합니다.
+한 시퀀스씩 생성하면 토큰 하나마다 행렬-벡터 곱이라 코어를 다 쓰지 못하지만, 배치로 묶으면
+가중치를 한 번 읽어 여러 질문의 토큰을 같이 계산합니다.
+
+배치 크기는 BATCH_GENERATION_SIZE개, 배치 크기 x (가장 긴 프롬프트 + max_new_tokens)가 BATCH_MAX_TOKENS를
+넘지 않도록 정합니다 (KV 캐시 메모리 상한).
+결과는 배치가 끝날 때마다 출력 JSONL에 추가합니다. 줄마다 입력 순번(index), 답변(answer), 관련 정보를 찾았는지
+(found), 측정값(timings: 검색 시간, 배치 번호/크기, 프롬프트/생성 토큰 수, prefill, 배치 시작부터 끝날 때까지 시간)이
+들어 있으며, 출력 순서는 배치 순서입니다.
+
+사용법:
+    python -m rag.batch questions.jsonl answers.jsonl --rag
+    python -m rag.batch questions.jsonl answers.jsonl --batch-size 16 --temperature 0
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from rag.config import (
+    BATCH_GENERATION_SIZE, BATCH_MAX_TOKENS, DEFAULT_MAX_NEW_TOKENS, DEFAULT_TEMPERATURE, EMBED_BATCH_SIZE,
+    MODEL_PATH, TOKENIZER_PATH,
+)
+from rag.generation import NO_RESULTS_ANSWER, SYSTEM_PROMPT, build_prompt, generate_batch, retrieve_context
+
+logger = logging.getLogger(__name__)
+
+
+def read_items(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def plan_batches(lengths: Sequence[int], max_new_tokens: int, batch_size: int = BATCH_GENERATION_SIZE,
+                 max_batch_tokens: int = BATCH_MAX_TOKENS) -> List[List[int]]:
+    """
+    프롬프트 토큰 길이 순으로 정렬한 뒤 앞에서부터 배치를 채웁니다.
+    반환: 배치마다 lengths의 인덱스 목록 (짧은 배치부터)
+    """
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # 정렬돼 있으므로 지금 질문이 배치에서 가장 긴 프롬프트
+        if batch and (len(batch) >= batch_size or (len(batch) + 1) * (lengths[i] + max_new_tokens) > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def answer_items(items: List[Dict[str, Any]], model, tokenizer, device, search_tools=None,
+                 max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS, temperature: float = DEFAULT_TEMPERATURE,
+                 batch_size: int = BATCH_GENERATION_SIZE, max_batch_tokens: int = BATCH_MAX_TOKENS,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 keep_context: bool = False) -> List[Dict[str, Any]]:
+    """
+    search_tools: 있으면 질문마다 검색한 문맥으로 답함 (없으면 검색 없이 KoAlpaca 질문/답변 형식)
+    keep_context: 검색한 문맥도 결과의 context 필드에 넣음
+    on_result: 결과 한 줄씩 받을 콜백 (배치가 끝날 때마다 호출)
+    반환: items와 같은 순서의 결과
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    prompts: Dict[int, str] = {}
+
+    def emit(i: int, result: Dict[str, Any]) -> None:
+        results[i] = result
+        if on_result is not None:
+            on_result(result)
+
+    if search_tools:
+        from rag.search import warm_search_cache
+        warm_search_cache(search_tools, [item["question"] for item in items], EMBED_BATCH_SIZE)
+
+    for i, item in enumerate(items):
+        result = {**item, "index": i}
+        if not search_tools:
+            prompts[i] = build_prompt(item["question"], system_prompt="")
+            results[i] = result
+            continue
+        start = time.perf_counter()
+        context, found = retrieve_context(item["question"], search_tools, item.get("categories"), tokenizer)
+        result.update(found=found, timings={"retrieval_seconds": round(time.perf_counter() - start, 4)})
+        if keep_context:
+            result["context"] = context
+        if found:
+            prompts[i] = build_prompt(item["question"], context, SYSTEM_PROMPT)
+            results[i] = result
+        else:
+            emit(i, {**result, "answer": NO_RESULTS_ANSWER})
+
+    indices = sorted(prompts)
+    lengths = [len(ids) for ids in tokenizer([prompts[i] for i in indices])["input_ids"]]
+    batches = plan_batches(lengths, max_new_tokens, batch_size, max_batch_tokens)
+    logger.info(f"질문 {len(items)}개 중 {len(indices)}개를 배치 {len(batches)}개로 생성합니다.")
+
+    for number, batch in enumerate(batches):
+        batch_indices = [indices[j] for j in batch]
+        outputs = generate_batch([prompts[i] for i in batch_indices], model, tokenizer, device,
+                                 max_new_tokens, temperature)
+        for i, (answer, stats) in zip(batch_indices, outputs):
+            result = results[i]
+            result.setdefault("found", True)
+            timings = result.setdefault("timings", {})
+            timings.update({
+                "batch": number,
+                "batch_size": len(batch),
+                "prompt_tokens": stats.prompt_tokens,
+                "generated_tokens": stats.generated_tokens,
+                "prefill_seconds": round(stats.prefill_seconds, 4) if stats.prefill_seconds is not None else None,
+                "generation_seconds": round(stats.total_seconds, 4),
+            })
+            emit(i, {**result, "answer": answer.strip()})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="질문 JSONL 일괄 답변 (배치 생성)")
+    parser.add_argument("input", help="질문 JSONL ({\"question\": ...})")
+    parser.add_argument("output", help="결과 JSONL (이어서 추가하지 않고 새로 씀)")
+    parser.add_argument("--rag", action="store_true", help="검색한 문맥으로 답변 (없으면 질문만으로)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_GENERATION_SIZE)
+    parser.add_argument("--max-batch-tokens", type=int, default=BATCH_MAX_TOKENS)
+    parser.add_argument("--max-new-tokens", type=int, default=DEFAULT_MAX_NEW_TOKENS)
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE, help="0이면 greedy")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from rag.generation import load_model
+
+    items = read_items(args.input)
+    search_tools = None
+    if args.rag:
+        from rag.index import initialize_search_tools
+        search_tools, _, _ = initialize_search_tools()
+    model, tokenizer, device = load_model(MODEL_PATH, TOKENIZER_PATH)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    with open(args.output, "w", encoding="utf-8") as f:
+        def write(result: Dict[str, Any]) -> None:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+
+        results = answer_items(items, model, tokenizer, device, search_tools, args.max_new_tokens, args.temperature,
+                               args.batch_size, args.max_batch_tokens, on_result=write)
+    elapsed = time.perf_counter() - start
+    generated = sum(r.get("timings", {}).get("generated_tokens", 0) for r in results)
+    print(f"질문 {len(results)}개 완료: {elapsed:.1f}초, 초당 {len(results) / elapsed:.2f}개, "
+          f"생성 토큰 초당 {generated / elapsed:.1f}개 -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
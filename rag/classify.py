@@ -0,0 +1,123 @@
+"""
+게시글 제로샷 분류 (정보/비정보 + 주제)
+
+preprocessor의 content_classifier.py와 같은 모델(CLASSIFIER_MODEL)로 게시글마다
+- category/confidence: "정보"/"비정보" (EXCLUDED_CATEGORIES, MIN_CATEGORY_CONFIDENCE로 인덱스에서 제외)
+- topic/topic_confidence: CLASSIFIED_TOPICS 중 하나 (신뢰도가 MIN_TOPIC_CONFIDENCE보다 낮으면 "기타")
+를 붙입니다. topic은 분류_게시글 인덱스를 나누는 기준(CLASSIFIED_PARTITION_FIELD)이고, 질문의 주제 키워드
+(rag.search.route_categories)나 사이드바 필터로 해당 파티션만 검색합니다.
+이미 만든 classified_contents.json에 주제를 추가할 때와, 증분 색인(rag.ingest)이 새 게시글을 추가하기 전에 씁니다.
+
+메트릭: rag_classify_seconds (배치당), rag_classify_posts_total{topic}
+
+사용법:
+    python -m rag.classify ./data/classified_contents.json          # 주제가 없는 글에만 topic 추가 (파일을 바꿔 씀)
+    python -m rag.classify ./data/classified_contents.json --force  # 모든 글을 다시 분류
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from rag.config import CLASSIFIER_BATCH_SIZE, CLASSIFIER_MODEL, MIN_TOPIC_CONFIDENCE
+from rag.partition import UNCATEGORIZED
+from rag.search import CLASSIFIED_TOPICS
+from rag.telemetry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CONTENT_LABELS = ["정보", "비정보"]  # content_classifier.py와 같은 라벨
+TOPIC_HYPOTHESIS = "이 글의 주제는 {}이다."
+
+
+class ContentClassifier:
+    """제로샷 분류 파이프라인 (첫 분류 때 모델을 불러옴)"""
+
+    def __init__(self, model_name: str = CLASSIFIER_MODEL, batch_size: int = CLASSIFIER_BATCH_SIZE,
+                 topics: Sequence[str] = CLASSIFIED_TOPICS, min_topic_confidence: float = MIN_TOPIC_CONFIDENCE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.topics = list(topics)
+        self.min_topic_confidence = min_topic_confidence
+        self._pipeline = None
+
+    def _classifier(self):
+        if self._pipeline is None:
+            from transformers import pipeline
+
+            logger.info(f"게시글 분류 모델을 불러옵니다: {self.model_name}")
+            self._pipeline = pipeline("zero-shot-classification", model=self.model_name)
+        return self._pipeline
+
+    def classify(self, texts: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        texts의 각 글에 대해 {"category", "confidence", "topic", "topic_confidence"}를 반환합니다.
+        빈 글은 분류하지 않고 "비정보"로 둡니다.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        classifier = self._classifier() if indices else None
+        for start in range(0, len(indices), self.batch_size):
+            chunk = indices[start:start + self.batch_size]
+            batch = [texts[i] for i in chunk]
+            started = time.perf_counter()
+            contents = classifier(batch, candidate_labels=CONTENT_LABELS)
+            topics = classifier(batch, candidate_labels=self.topics, hypothesis_template=TOPIC_HYPOTHESIS)
+            REGISTRY.observe("rag_classify_seconds", time.perf_counter() - started)
+            for i, content, topic in zip(chunk, contents, topics):
+                # 파이프라인은 라벨을 점수 내림차순으로 반환
+                name = topic["labels"][0] if topic["scores"][0] >= self.min_topic_confidence else UNCATEGORIZED
+                results[i] = {"category": content["labels"][0], "confidence": float(content["scores"][0]),
+                              "topic": name, "topic_confidence": float(topic["scores"][0])}
+                REGISTRY.inc("rag_classify_posts_total", topic=name)
+        return [r or {"category": "비정보", "confidence": 1.0, "topic": UNCATEGORIZED, "topic_confidence": 0.0}
+                for r in results]
+
+
+def classify_file(path: str, classifier: Optional[ContentClassifier] = None, force: bool = False) -> Counter:
+    """
+    classified_contents.json({키: {"post", "category", "confidence"}})의 글에 topic을 추가합니다.
+    category가 없는 글은 정보/비정보도 같이 분류합니다. 임시 파일에 쓰고 바꾸므로 중간에 멈춰도 원본은 남습니다.
+    반환: 주제별 글 수
+    """
+    classifier = classifier or ContentClassifier()
+    with open(path, "r", encoding="utf-8") as f:
+        posts: Dict[str, Dict[str, Any]] = json.load(f)
+
+    keys = [key for key, post in posts.items()
+            if isinstance(post, dict) and (force or "topic" not in post or "category" not in post)]
+    logger.info(f"{len(keys)}개 글을 분류합니다. (전체 {len(posts)}개)")
+    for key, labels in zip(keys, classifier.classify([str(posts[key].get("post", "")) for key in keys])):
+        post = posts[key]
+        if force or "category" not in post:
+            post["category"], post["confidence"] = labels["category"], labels["confidence"]
+        post["topic"], post["topic_confidence"] = labels["topic"], labels["topic_confidence"]
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(posts, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, path)
+    return Counter(post.get("topic", UNCATEGORIZED) for post in posts.values() if isinstance(post, dict))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="게시글 정보/비정보, 주제 제로샷 분류")
+    parser.add_argument("path", help="classified_contents.json 경로")
+    parser.add_argument("--force", action="store_true", help="이미 분류된 글도 다시 분류")
+    parser.add_argument("--model", default=CLASSIFIER_MODEL)
+    parser.add_argument("--batch-size", type=int, default=CLASSIFIER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    counts = classify_file(args.path, ContentClassifier(args.model, args.batch_size), force=args.force)
+    print("주제별 글 수:")
+    for topic, count in counts.most_common():
+        print(f"  {topic}: {count}개")
+    print("인덱스에 반영하려면 python -m rag.index_versions build로 새 버전을 만드세요.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+추론 서버(rag.server) 클라이언트
+
+streamlit 페이지와 CLI가 모델을 직접 올리지 않고 서버를 호출할 때 사용합니다.
+torch/transformers/langchain을 임포트하지 않으므로 UI 프로세스가 가볍게 유지됩니다.
+스트리밍 응답(SSE)은 on_text 콜백으로 누적 텍스트를 넘겨주므로 rag.generation.generate_stream과 같은 방식으로 화면을 갱신할 수 있습니다.
+생성 대기열에서 기다리는 동안에는 on_queue 콜백으로 대기 순번을 넘겨주고,
+서버가 혼잡해서 요청을 받지 못하면 ServerBusyError를 던집니다.
+base_url을 "unix:///경로/server.sock"로 주면 유닉스 도메인 소켓으로 접속합니다 (로컬 데몬, rag.daemon).
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from httpx_sse import connect_sse
+
+from rag.config import CLIENT_TIMEOUT, DEFAULT_MAX_NEW_TOKENS, DEFAULT_TEMPERATURE, SERVER_URL
+
+UNIX_SCHEME = "unix://"
+
+
+class RagServerError(RuntimeError):
+    """서버에 연결할 수 없거나 서버가 오류를 반환한 경우"""
+
+
+class ServerBusyError(RagServerError):
+    """생성 대기열이 가득 찼거나 대기 시간을 넘긴 경우, 모델을 아직 불러오는 중인 경우 (잠시 후 다시 시도)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    if response.status_code == 200:
+        return
+    if response.status_code == 503:
+        retry_after = response.headers.get("Retry-After")
+        try:
+            detail = response.json().get("detail")
+        except ValueError:
+            detail = response.text
+        raise ServerBusyError(detail, float(retry_after) if retry_after else None)
+    raise RagServerError(f"추론 서버 오류 ({response.status_code}): {response.text}")
+
+
+@dataclass
+class ChatReply:
+    text: str
+    context: str = ""
+    found: bool = True
+    stats: Optional[Dict[str, Any]] = None
+    retrieval_only: bool = False  # 모델 로드 중이라 검색된 문서만으로 답한 경우
+    faq: Optional[Dict[str, Any]] = None  # 미리 만든 FAQ 답변이면 {"question": 찾은 질문, "score": 유사도}
+
+
+class RagClient:
+    def __init__(self, base_url: str = SERVER_URL, timeout: float = CLIENT_TIMEOUT):
+        self.base_url = base_url
+        transport = None
+        if base_url.startswith(UNIX_SCHEME):
+            transport = httpx.HTTPTransport(uds=base_url[len(UNIX_SCHEME):])
+            base_url = "http://localhost"
+        self._client = httpx.Client(base_url=base_url, transport=transport,
+                                    timeout=httpx.Timeout(timeout, connect=5.0))
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        try:
+            response = self._client.request(method, path, json=payload)
+        except httpx.HTTPError as e:
+            raise RagServerError(f"추론 서버({self.base_url})에 연결할 수 없습니다: {str(e)}") from e
+        _raise_for_status(response)
+        return response.json()
+
+    def _stream(self, path: str, payload: Dict[str, Any], on_text: Optional[Callable[[str], None]],
+                on_queue: Optional[Callable[[int], None]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        SSE 응답을 끝까지 읽습니다.
+        반환: (done 이벤트 데이터, context 이벤트 데이터)
+        """
+        context: Dict[str, Any] = {}
+        text = ""
+        try:
+            with connect_sse(self._client, "POST", path, json=payload) as source:
+                if source.response.status_code != 200:
+                    source.response.read()
+                    _raise_for_status(source.response)
+                for sse in source.iter_sse():
+                    data = json.loads(sse.data)
+                    if sse.event == "context":
+                        context = data
+                    elif sse.event == "queue":
+                        if on_queue is not None:
+                            on_queue(data["position"])
+                    elif sse.event == "token":
+                        text += data["text"]
+                        if on_text is not None:
+                            on_text(text)
+                    elif sse.event == "done":
+                        return data, context
+                    elif sse.event == "error":
+                        if data.get("reason"):
+                            raise ServerBusyError(data.get("detail"))
+                        raise RagServerError(f"생성 중 서버 오류: {data.get('detail')}")
+        except httpx.HTTPError as e:
+            raise RagServerError(f"추론 서버({self.base_url})에 연결할 수 없습니다: {str(e)}") from e
+        raise RagServerError("추론 서버 응답이 완료되지 않고 끊겼습니다.")
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def search(self, query: str, categories: Optional[List[str]] = None) -> Tuple[str, bool]:
+        """검색만 수행합니다. 반환: (문맥 문자열, 관련 정보를 찾았는지 여부)"""
+        data = self._request("POST", "/search", {"query": query, "categories": categories})
+        return data["context"], data["found"]
+
+    def generate(self, question: str, context: str = "", system_prompt: Optional[str] = None,
+                 max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS, temperature: float = DEFAULT_TEMPERATURE,
+                 on_text: Optional[Callable[[str], None]] = None,
+                 on_queue: Optional[Callable[[int], None]] = None,
+                 session_id: Optional[str] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        검색 없이 생성합니다. system_prompt가 None이면 서버 기본값, 빈 문자열이면 시스템 부분 없이 생성합니다.
+        on_text가 있으면 스트리밍으로 받아 누적 텍스트를, on_queue에는 대기 순번을 넘겨줍니다.
+        session_id를 주면 서버가 같은 세션의 이전 대화에 이어서 답합니다.
+        반환: (최종 텍스트, 생성 측정값)
+        """
+        payload = {
+            "question": question,
+            "context": context,
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "stream": on_text is not None,
+            "session_id": session_id,
+        }
+        if system_prompt is not None:
+            payload["system_prompt"] = system_prompt
+        if on_text is None:
+            data = self._request("POST", "/generate", payload)
+        else:
+            data, _ = self._stream("/generate", payload, on_text, on_queue)
+        return data["text"], data.get("stats")
+
+    def chat(self, question: str, categories: Optional[List[str]] = None,
+             max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS, temperature: float = DEFAULT_TEMPERATURE,
+             on_text: Optional[Callable[[str], None]] = None,
+             on_queue: Optional[Callable[[int], None]] = None,
+             session_id: Optional[str] = None) -> ChatReply:
+        """검색 + 생성 (RAG). on_text가 있으면 스트리밍으로 받고, 대기 순번은 on_queue로 넘겨줍니다."""
+        payload = {
+            "question": question,
+            "categories": categories,
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "stream": on_text is not None,
+            "session_id": session_id,
+        }
+        if on_text is None:
+            data = context = self._request("POST", "/chat", payload)
+        else:
+            data, context = self._stream("/chat", payload, on_text, on_queue)
+        return ChatReply(text=data["text"], context=context.get("context", ""), found=context.get("found", True),
+                         stats=data.get("stats"), retrieval_only=data.get("retrieval_only", False),
+                         faq=data.get("faq"))
+
+    def reset_session(self, session_id: str) -> bool:
+        """서버의 세션 대화 기록과 KV 캐시를 지웁니다. 반환: 세션이 있었는지 여부"""
+        return self._request("DELETE", f"/sessions/{session_id}")["removed"]
@@ -0,0 +1,153 @@
+"""
+검색(RAG) 설정값
+
+streamlit 앱과 CLI, 벤치마크가 같은 경로와 인덱스 설정을 사용하도록 한곳에 모아둡니다.
+"""
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+# 환경 변수 로드
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+RETRIEVAL_K = 3  # 각 벡터 DB에서 검색할 문서 수
+INDEX_BATCH_SIZE = 500  # 벡터 DB 생성 시 한 번에 임베딩할 문서 수
+EMBED_BATCH_SIZE = 256  # 배치 검색 시 한 번에 임베딩할 질의 수
+# 동시에 들어온 질의 임베딩을 묶어 보내는 마이크로 배치 (rag.microbatch, WINDOW_MS가 0이면 사용 안 함)
+EMBED_MICROBATCH_WINDOW_MS = 5.0  # 첫 요청 후 같은 배치로 모으는 시간(밀리초)
+EMBED_MICROBATCH_MAX_SIZE = 64  # 이 개수가 차면 기다리지 않고 보냄
+EMBED_MICROBATCH_CONCURRENCY = 4  # 동시에 보내는 배치 수
+# 원격 임베딩 지연/장애 대응 (rag.resilient)
+OPENAI_EMBEDDING_BASE_URL = os.getenv("OPENAI_EMBEDDING_BASE_URL")  # OpenAI 호환 임베딩 서버 주소 (테스트용 가짜 서버 등)
+EMBEDDING_REQUEST_TIMEOUT = 10.0  # HTTP 요청 한 번의 제한 시간(초, 제한 시간이 지난 요청이 작업 스레드를 오래 잡지 않도록)
+EMBEDDING_TIMEOUT = 2.0  # 질의 임베딩 한 번의 제한 시간(초, 헤지 요청 포함)
+EMBEDDING_HEDGE_PERCENTILE = 95  # 최근 응답 시간의 이 백분위가 지나도 응답이 없으면 같은 요청을 한 번 더 보냄
+EMBEDDING_HEDGE_DELAY = 0.5  # 응답 시간 표본이 모이기 전의 헤지 지연(초, 0이면 헤지 안 함)
+EMBEDDING_HEDGE_MIN_DELAY = 0.05  # 헤지 지연의 하한(초)
+EMBEDDING_MAX_WORKERS = 32  # 임베딩 요청을 실행하는 작업 스레드 수
+EMBEDDING_BREAKER_FAILURES = 5  # 연속 실패가 이만큼이면 회로를 열고 대체 인덱스로 검색
+EMBEDDING_BREAKER_RESET = 30.0  # 회로를 연 뒤 원격을 다시 시험하기까지(초)
+# 대체 인덱스용 로컬 임베딩 (sentence-transformers 모델 이름, 비어 있으면 대체 인덱스를 만들지 않음)
+FALLBACK_EMBEDDING_MODEL = os.getenv("RAG_FALLBACK_EMBEDDING_MODEL", "")  # 예: "jhgan/ko-sroberta-multitask"
+SEARCH_CACHE_SIZE = 1000  # 검색 결과 캐시 크기 (0이면 캐시 사용 안 함)
+
+# 데이터 경로 설정 (하드코딩)
+DATA_DIR = "./data"  # 데이터 파일 경로
+VECTOR_DB_DIR = "./vector_db"  # 벡터 DB 저장 경로
+FALLBACK_VECTOR_DB_DIR = "./vector_db_local"  # 로컬 임베딩으로 만든 대체 벡터 DB 저장 경로
+# 버전별 벡터 DB (VECTOR_DB_DIR/versions/<버전>, 서비스할 버전 이름은 VECTOR_DB_DIR/CURRENT에 기록)
+# CURRENT가 없으면 VECTOR_DB_DIR 자체를 사용 (기존 구조)
+INDEX_VERSIONS_DIR = "versions"
+INDEX_CURRENT_FILE = "CURRENT"
+INDEX_WATCH_INTERVAL = 10.0  # 추론 서버가 CURRENT 변경을 확인하는 간격(초, 0이면 확인 안 함)
+INDEX_KEEP_VERSIONS = 3  # prune 시 남길 최근 버전 수 (현재 버전 포함)
+
+# 크롤링 게시글 증분 색인 (rag/ingest.py): 크롤러 출력 폴더를 감시해 새 게시글을 새 버전으로 publish
+INGEST_WATCH_DIRS = [
+    "./crawl/cafe-crawl-all-data/output",
+    "./crawl/cafe-crawl-index-categroy-mapping/output",
+]
+INGEST_FILE_PATTERN = "articles_*_*.json"  # 크롤러가 게시글 묶음을 저장하는 파일 (articles_summary.json 제외)
+INGEST_OFFSETS_FILE = "ingest_offsets.json"  # 버전 폴더 안에 저장하는 "색인한 파일" 기록
+INGEST_BATCH_SIZE = 100  # 한 번에 임베딩할 게시글 수
+INGEST_PUBLISH_INTERVAL = 60.0  # 새 버전을 publish하는 최소 간격(초)
+INGEST_SETTLE_SECONDS = 5.0  # 파일이 이 시간 동안 바뀌지 않아야 읽음 (크롤러가 쓰는 중인 파일 제외)
+INGEST_POLL_INTERVAL = 30.0  # 파일 이벤트가 없어도 폴더를 다시 확인하는 간격(초)
+
+# 원본 데이터 파일 이름 (DATA_DIR 기준)
+CLASSIFIED_DATA_FILE = "classified_contents.json"
+EXPANDED_DATA_FILE = "expanded_info_contents.json"
+BABYLOVE_DATA_FILE = "vector_db_final.json"
+
+# 벡터 DB 저장 폴더 이름 (VECTOR_DB_DIR 기준)
+FAISS_CLASSIFIED_NAME = "faiss_classified"
+FAISS_CLASSIFIED_PARTITIONED_NAME = "faiss_classified_partitioned"
+FAISS_EXPANDED_NAME = "faiss_expanded"
+CHROMA_BABYLOVE_NAME = "chroma_babylove"
+FAISS_BABYLOVE_PARTITIONED_NAME = "faiss_babylove_partitioned"
+NUMPY_BABYLOVE_NAME = "numpy_babylove"
+
+# FAISS 인덱스 종류 ("flat": 기존 float32 FAISS, "quantized": 차원 축소 + 양자화 인덱스)
+VECTOR_INDEX_TYPE = "flat"
+QUANTIZED_REDUCTION = "pca"  # "pca" 또는 "truncate"(앞쪽 차원 절단)
+QUANTIZED_DIM = 256  # 축소 후 차원 수
+QUANTIZATION = "int8"  # "int8" 또는 "binary"
+RESCORE_K = 200  # 원본 벡터로 재순위화할 후보 수
+
+# 베이비러브 벡터 DB 종류
+# "chroma": 메타데이터 필터, "partitioned": 카테고리별 FAISS 파티션, "numpy": NumPy 행렬 전수 검색
+BABYLOVE_BACKEND = "chroma"
+NUMPY_DTYPE = "float32"  # "float16"으로 저장하면 메모리 절반 (계산 시 float32 변환)
+
+# 인덱스 생성 시 제외할 문서 (content_classifier.py의 분류 결과 기준)
+EXCLUDED_CATEGORIES = ["비정보"]  # 제외할 카테고리
+# 분류 신뢰도가 이보다 낮은 문서 제외 ("정보"/"비정보" 두 라벨 제로샷이라 0.5 근처는 판단이 어려운 글)
+MIN_CATEGORY_CONFIDENCE = 0.6
+
+# 게시글 분류 (rag/classify.py, content_classifier.py와 같은 제로샷 모델)
+CLASSIFIER_MODEL = "joeddav/xlm-roberta-large-xnli"
+CLASSIFIER_BATCH_SIZE = 16
+MIN_TOPIC_CONFIDENCE = 0.3  # 주제 신뢰도가 이보다 낮으면 "기타" 파티션
+# 분류 게시글 인덱스를 나눌 메타데이터 키 (flat 인덱스에만 적용, ""이면 파티션 없는 FAISS)
+CLASSIFIED_PARTITION_FIELD = "topic"
+
+# 서비스 모델
+MODEL_PATH = "Snowfall0601/finetuned-koalpaca-5.8B"  # 파인튜닝 모델 (허깅페이스 레포지토리)
+TOKENIZER_PATH = "beomi/KoAlpaca-Polyglot-5.8B"  # 토크나이저 경로
+MODEL_DTYPE = "float16"  # 서빙 dtype (반정밀도로 메모리 사용량 감소)
+# 로컬 스냅숏 (python -m rag.snapshot으로 생성, 있으면 허브 대신 오프라인으로 로드)
+MODEL_SNAPSHOT_DIR = os.getenv("RAG_MODEL_SNAPSHOT_DIR", "./models/finetuned-koalpaca-5.8B")
+SNAPSHOT_MAX_SHARD_SIZE = "2GB"  # 스냅숏 safetensors 샤드 최대 크기
+DEFAULT_MAX_NEW_TOKENS = 256  # 생성할 최대 토큰 수 기본값
+MAX_NEW_TOKENS_LIMIT = 1024  # 요청에서 지정할 수 있는 최대 토큰 수 상한
+DEFAULT_TEMPERATURE = 0.7
+
+# 일괄 생성 (rag/batch.py)
+BATCH_GENERATION_SIZE = 8  # 한 번의 generate로 생성할 최대 질문 수
+BATCH_MAX_TOKENS = 16384  # 배치 크기 x (가장 긴 프롬프트 + 생성 토큰 수) 상한 (KV 캐시 메모리)
+
+# 추론 서버 설정 (rag/server.py, rag/client.py)
+SERVER_HOST = os.getenv("RAG_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("RAG_SERVER_PORT", "8000"))
+SERVER_URL = os.getenv("RAG_SERVER_URL", f"http://{SERVER_HOST}:{SERVER_PORT}")  # 클라이언트가 접속할 주소
+# 로컬 데몬 (rag/daemon.py): cli_chat.py가 필요할 때 띄우는 유닉스 소켓 추론 서버
+DAEMON_SOCKET_PATH = os.getenv("RAG_DAEMON_SOCKET", os.path.join(
+    os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"mapadeol-rag-{os.getuid()}", "server.sock"))
+DAEMON_IDLE_TIMEOUT = 1800.0  # 요청이 없으면 데몬을 종료할 시간(초)
+DAEMON_START_TIMEOUT = 300.0  # 데몬을 띄우고 인덱스 로드를 기다리는 최대 시간(초)
+DAEMON_LOG_PATH = "./logs/rag-daemon.log"
+GENERATION_WORKERS = 1  # 모델로 동시에 생성하는 요청 수 (나머지는 입장 대기열에서 대기)
+CLIENT_TIMEOUT = 300.0  # 클라이언트 요청 타임아웃(초, 스트리밍은 토큰 사이 간격 기준)
+
+# 멀티턴 세션 (rag/sessions.py)
+SESSION_MAX_PROMPT_TOKENS = 1536  # 대화 기록을 포함한 프롬프트 최대 토큰 수 (넘으면 오래된 턴부터 버림)
+SESSION_MAX_COUNT = 64  # 서버가 유지하는 최대 세션 수 (LRU로 내보냄)
+SESSION_CACHE_MAX_MB = 2048  # 세션 KV 캐시 합계 상한(MB)
+
+# 사전 fork 서빙 (rag/prefork.py)
+SERVER_PROCESSES = "1"  # 작업 프로세스 수 ("auto"면 남은 메모리와 코어 수로 결정, 1이면 fork 없이 한 프로세스)
+WORKER_ACTIVATION_OVERHEAD_MB = 512  # 생성 한 건당 KV 캐시 외 중간 텐서/파이썬 여유분 추정치(MB)
+WORKER_HEARTBEAT_INTERVAL = 1.0  # 작업 프로세스 하트비트 간격(초)
+WORKER_HEARTBEAT_TIMEOUT = 30.0  # 이 시간 동안 하트비트가 없으면 작업 프로세스를 다시 시작(초)
+
+# 생성 입장 제어 (rag/admission.py)
+ADMISSION_MAX_QUEUE = 8  # 생성 대기열 최대 길이, 가득 차면 바로 503(혼잡) 응답
+ADMISSION_QUEUE_TIMEOUT = 60.0  # 대기열에서 기다릴 수 있는 최대 시간(초)
+ADMISSION_RETRY_AFTER = 10  # 혼잡 응답의 Retry-After 헤더(초)
+MODEL_LOADING_RETRY_AFTER = 30  # 모델 로드 중 /generate 응답의 Retry-After 헤더(초)
+
+# 검색 캐시 사전 적재용 질문 파일 (JSONL, {"question": ...}), 없으면 건너뜀
+WARMUP_QUERIES_PATH = os.path.join(DATA_DIR, "warmup_queries.jsonl")
+
+# 자주 묻는 질문 답변 저장소 (rag/faq.py, python -m rag.faq로 생성, 서버 시작 시 로드)
+FAQ_STORE_DIR = "./faq_store"
+FAQ_MATCH_THRESHOLD = 0.95  # 질문 임베딩 코사인 유사도가 이 값 이상이면 저장된 답변으로 바로 응답
+FAQ_CLUSTER_COUNT = 200  # 질문 게시판에서 뽑을 대표 질문(군집) 수
+FAQ_BOARDS_DIR = "./preprocessor/2 메뉴 데이터 병합/question"  # 크롤링한 질문 게시판 JSON 폴더
+
+# 계측 설정 (rag/telemetry.py)
+TELEMETRY_EXPORTER = "none"  # 트레이스 내보내기: "console", "file", "none" (기본은 끔)
+TELEMETRY_TRACE_PATH = os.path.join(tempfile.gettempdir(), "rag-chatbot", "traces.jsonl")  # "file"일 때 스팬을 추가할 파일 (저장소 밖)
+METRICS_PORT = 9464  # Prometheus /metrics 포트 (0이면 사용 안 함)
@@ -0,0 +1,155 @@
+"""
+로컬 추론 데몬 (cli_chat.py용)
+
+cli_chat.py를 실행할 때마다 5.8B 모델과 토크나이저를 다시 올리지 않도록, 추론 서버(rag.server)를
+유닉스 도메인 소켓(DAEMON_SOCKET_PATH)에서 도는 데몬으로 한 번만 띄워두고 CLI는 rag.client로 접속만 합니다.
+- connect(): 소켓에서 데몬이 응답하면 바로 접속하고, 없으면 데몬을 새 세션(터미널과 분리)으로 띄운 뒤
+  검색 도구가 준비될 때까지 기다립니다. 여러 CLI가 동시에 실행돼도 잠금 파일로 데몬은 하나만 띄웁니다.
+- 데몬은 DAEMON_IDLE_TIMEOUT초 동안 요청이 없으면 스스로 종료합니다 (rag.server --idle-timeout).
+- 모델은 데몬 안에서 백그라운드로 로드되므로, 첫 실행에서는 wait_for_model()로 준비될 때까지 기다립니다.
+두 번째 실행부터는 소켓 접속 + /health 한 번이면 되므로 바로 질문할 수 있습니다.
+소켓 디렉터리는 사용자 전용(0700)으로 만들어 다른 사용자가 접속하지 못하게 합니다.
+데몬은 어느 디렉터리에서 cli_chat.py를 실행했든 저장소 루트(REPO_ROOT)에서 실행되므로 rag를 불러오고
+./data, ./vector_db 같은 설정 경로도 저장소 기준으로 찾습니다. 데몬 출력은 DAEMON_LOG_PATH(상대 경로면 저장소 기준)에 쌓입니다.
+
+사용법:
+    python -m rag.daemon status
+    python -m rag.daemon start
+    python -m rag.daemon stop
+"""
+import argparse
+import fcntl
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+from rag.client import UNIX_SCHEME, RagClient, RagServerError
+from rag.config import DAEMON_IDLE_TIMEOUT, DAEMON_LOG_PATH, DAEMON_SOCKET_PATH, DAEMON_START_TIMEOUT
+
+POLL_SECONDS = 0.2  # 데몬/모델 준비 상태를 확인하는 간격(초)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # rag 패키지가 있는 디렉터리
+
+
+def daemon_url(socket_path: str = DAEMON_SOCKET_PATH) -> str:
+    return UNIX_SCHEME + os.path.abspath(socket_path)
+
+
+def _ping(client: RagClient) -> Optional[Dict[str, Any]]:
+    """데몬이 응답하면 /health 결과, 아니면 None"""
+    if not os.path.exists(client.base_url[len(UNIX_SCHEME):]):
+        return None
+    try:
+        return client.health()
+    except RagServerError:
+        return None
+
+
+def _spawn(socket_path: str, idle_timeout: float, log_path: str) -> subprocess.Popen:
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, "ab") as log:
+        # start_new_session: CLI에서 Ctrl+C를 눌러도 데몬은 종료되지 않음
+        # cwd: 저장소 밖에서 실행해도 rag를 불러오고 설정의 상대 경로를 저장소 기준으로 찾도록
+        return subprocess.Popen(
+            [sys.executable, "-m", "rag.server", "--uds", os.path.abspath(socket_path),
+             "--idle-timeout", str(idle_timeout)],
+            cwd=REPO_ROOT, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+
+
+def connect(socket_path: str = DAEMON_SOCKET_PATH, idle_timeout: float = DAEMON_IDLE_TIMEOUT,
+            start_timeout: float = DAEMON_START_TIMEOUT, log_path: str = DAEMON_LOG_PATH,
+            on_start: Optional[Callable[[], None]] = None) -> RagClient:
+    """
+    데몬에 접속한 RagClient를 반환합니다. 데몬이 없으면 띄우고 /health가 응답할 때까지 기다립니다.
+    on_start: 데몬을 새로 띄울 때 한 번 호출 (안내 메시지 출력용)
+    """
+    client = RagClient(daemon_url(socket_path))
+    if _ping(client) is not None:
+        return client
+    log_path = os.path.normpath(os.path.join(REPO_ROOT, log_path))  # 데몬과 같이 저장소 기준 (절대 경로면 그대로)
+
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    with open(os.path.join(socket_dir, "daemon.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # 잠금을 기다리는 사이 다른 CLI가 이미 띄웠을 수 있음
+        if _ping(client) is not None:
+            return client
+        if on_start is not None:
+            on_start()
+        process = _spawn(socket_path, idle_timeout, log_path)
+        deadline = time.monotonic() + start_timeout
+        while _ping(client) is None:
+            if process.poll() is not None:
+                raise RagServerError(f"추론 데몬이 시작하지 못했습니다 (종료 코드 {process.returncode}). "
+                                     f"로그를 확인하세요: {log_path}")
+            if time.monotonic() > deadline:
+                raise RagServerError(f"추론 데몬이 {start_timeout:g}초 안에 준비되지 않았습니다. 로그: {log_path}")
+            time.sleep(POLL_SECONDS)
+    return client
+
+
+def wait_for_model(client: RagClient, timeout: Optional[float] = None,
+                   on_wait: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    모델 상태가 ready가 될 때까지 기다립니다. 반환: 마지막 /health 결과
+    on_wait: 아직 로드 중일 때 처음 한 번 호출
+    모델 로드에 실패했거나 timeout초를 넘기면 RagServerError
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    waited = False
+    while True:
+        status = client.health()
+        state = status["model"]["state"]
+        if state == "ready":
+            return status
+        if state == "failed":
+            raise RagServerError(f"모델 로드에 실패했습니다: {status['model']['error']}")
+        if not waited and on_wait is not None:
+            on_wait(status)
+        waited = True
+        if deadline is not None and time.monotonic() > deadline:
+            raise RagServerError(f"모델이 {timeout:g}초 안에 준비되지 않았습니다.")
+        time.sleep(POLL_SECONDS * 5)
+
+
+def stop(socket_path: str = DAEMON_SOCKET_PATH) -> bool:
+    """실행 중인 데몬에 SIGTERM을 보냅니다. 반환: 데몬이 있었는지 여부"""
+    client = RagClient(daemon_url(socket_path))
+    try:
+        status = _ping(client)
+    finally:
+        client.close()
+    if status is None:
+        return False
+    os.kill(status["pid"], signal.SIGTERM)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 추론 데몬 관리")
+    parser.add_argument("command", choices=["status", "start", "stop"])
+    parser.add_argument("--socket", default=DAEMON_SOCKET_PATH)
+    parser.add_argument("--idle-timeout", type=float, default=DAEMON_IDLE_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.command == "stop":
+        print("데몬을 종료했습니다." if stop(args.socket) else "실행 중인 데몬이 없습니다.")
+        return
+    client = RagClient(daemon_url(args.socket))
+    if args.command == "start":
+        client = connect(args.socket, args.idle_timeout, on_start=lambda: print("데몬을 시작합니다..."))
+    status = _ping(client)
+    if status is None:
+        print(f"실행 중인 데몬이 없습니다 ({args.socket}).")
+        return
+    print(json.dumps({key: status[key] for key in ("pid", "model", "admission", "sessions")},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+오프라인 벤치마크용 대체 구성 요소
+
+OpenAI API와 5.8B 모델 없이 CPU에서 전체 파이프라인을 돌려보기 위한 것으로, 서비스에서는 사용하지 않습니다.
+- HashEmbeddings: 글자 n-gram을 해시해 만든 결정적 임베딩 (같은 단어를 공유하면 유사도가 높음)
+- RandomEmbeddings: 텍스트 해시로 고른 무작위 벡터 (의미는 없고 빠름, 대규모 코퍼스 측정용)
+- build_tiny_model: 코퍼스로 즉석 학습한 BPE 토크나이저 + 무작위 초기화한 작은 GPT-NeoX
+  (KoAlpaca-Polyglot과 같은 구조라 generate 경로가 동일합니다)
+"""
+import hashlib
+import zlib
+from typing import Iterable, List
+
+import numpy as np
+import torch
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import GPTNeoXConfig, GPTNeoXForCausalLM, PreTrainedTokenizerFast
+
+from rag.generation import STOP_WORDS
+
+SPECIAL_TOKENS = ["<|endoftext|>", "<|pad|>"]
+
+
+class HashEmbeddings(Embeddings):
+    """글자 1~3-gram 해싱 임베딩 (결정적, 네트워크 없음)"""
+
+    def __init__(self, size: int = 256, ngram_range=(1, 3)):
+        self.size = size
+        self.ngram_range = ngram_range
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in text.split():
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(max(len(word) - n + 1, 0)):
+                    digest = hashlib.blake2b(word[i:i + n].encode("utf-8"), digest_size=8).digest()
+                    h = int.from_bytes(digest, "little")
+                    vector[h % self.size] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class RandomEmbeddings(Embeddings):
+    """
+    텍스트의 crc32로 무작위 벡터 표에서 두 행을 골라 더한 결정적 임베딩
+    (문서 수십만 개도 몇 초 안에 임베딩되므로 색인 규모 측정에서 임베딩 비용을 빼고 볼 때 사용)
+    """
+
+    def __init__(self, size: int = 256, table_size: int = 65536, seed: int = 0):
+        self.size = size
+        rng = np.random.default_rng(seed)
+        self.table = rng.standard_normal((table_size, size), dtype=np.float32)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(text.encode("utf-8")) for text in texts), dtype=np.uint64, count=len(texts))
+        n = len(self.table)
+        vectors = self.table[hashes % n] + self.table[(hashes // n) % n]
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def train_tokenizer(texts: Iterable[str], vocab_size: int = 4000) -> PreTrainedTokenizerFast:
+    """바이트 수준 BPE 토크나이저를 텍스트로 학습합니다. (프롬프트 태그는 단일 토큰 시퀀스가 되도록 포함)"""
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=vocab_size,
+        special_tokens=SPECIAL_TOKENS,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    tokenizer.train_from_iterator(list(texts) + STOP_WORDS * 10, trainer=trainer)
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        eos_token=SPECIAL_TOKENS[0],
+        pad_token=SPECIAL_TOKENS[1],
+    )
+
+
+def build_tiny_model(texts: Iterable[str], hidden_size: int = 128, num_layers: int = 2,
+                     num_heads: int = 4, vocab_size: int = 4000, max_positions: int = 4096, seed: int = 0):
+    """
+    무작위 가중치의 작은 GPT-NeoX와 토크나이저를 만듭니다.
+    반환: (model, tokenizer, device) - rag.generation.load_model과 같은 형식
+    """
+    tokenizer = train_tokenizer(texts, vocab_size)
+    torch.manual_seed(seed)
+    config = GPTNeoXConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=num_heads,
+        intermediate_size=hidden_size * 4,
+        max_position_embeddings=max_positions,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    model = GPTNeoXForCausalLM(config).eval()
+    return model, tokenizer, "cpu"
@@ -0,0 +1,305 @@
+"""
+자주 묻는 질문(FAQ) 답변 미리 만들기와 답변 저장소
+
+로그에 자주 나오는 질문은 요청마다 생성하지 않고 미리 만든 답변으로 바로 응답합니다.
+1. 오프라인 (python -m rag.faq):
+   - 질문 목록(JSONL, {"question": ...})을 받거나, 크롤링한 질문 게시판 글(FAQ_BOARDS_DIR)을 임베딩해
+     k-means로 묶고 큰 군집부터 중심에 가장 가까운 글을 대표 질문으로 고릅니다.
+   - rag.batch.answer_items로 검색 + 배치 생성을 하고, 관련 정보를 찾은 질문만 저장소에 넣습니다.
+   - 저장소 디렉터리: answers.jsonl(질문, 답변, 문맥, 군집 크기), embeddings.npy(정규화한 질문 임베딩),
+     manifest.json(버전: 모델/토크나이저/dtype, 검색 인덱스 버전, 임베딩 모델)
+2. 서버 시작 (rag.server.load_pipeline): load_answer_store가 저장소를 읽습니다. manifest의 버전이 지금
+   서비스 중인 모델, 인덱스, 임베딩과 다르면 답변이 낡은 것이므로 사용하지 않습니다.
+   인덱스 버전은 rag.index.base_index_version (증분 색인으로 게시글만 추가된 버전은 바탕이 된 빌드와 같게 봄)
+3. 요청 (/chat): AnswerStore.match가 질문과 가장 가까운 FAQ 질문의 코사인 유사도가 FAQ_MATCH_THRESHOLD
+   이상이면 저장된 답변을 돌려줍니다 (검색, 생성 대기열, 모델을 거치지 않음).
+
+메트릭: rag_faq_requests_total{result="hit"|"miss"|"unavailable"}, rag_faq_score (가장 가까운 FAQ 질문의 유사도),
+        rag_faq_disabled_total (인덱스 교체로 저장소를 쓰지 않게 된 횟수, rag.server)
+
+사용법:
+    python -m rag.faq --questions faq_questions.jsonl
+    python -m rag.faq --boards "./preprocessor/2 메뉴 데이터 병합/question" --count 200
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag.config import (
+    BATCH_GENERATION_SIZE, BATCH_MAX_TOKENS, DEFAULT_MAX_NEW_TOKENS, EMBED_BATCH_SIZE, FAQ_BOARDS_DIR,
+    FAQ_CLUSTER_COUNT, FAQ_MATCH_THRESHOLD, FAQ_STORE_DIR, MODEL_DTYPE, MODEL_PATH, TOKENIZER_PATH, VECTOR_DB_DIR,
+)
+from rag.numpy_store import normalize
+from rag.resilient import EmbeddingUnavailable
+from rag.telemetry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+FAQ_MANIFEST = "manifest.json"
+FAQ_ANSWERS = "answers.jsonl"
+FAQ_EMBEDDINGS = "embeddings.npy"
+BOARD_TEXT_CHARS = 300  # 게시판 글에서 질문으로 쓸 앞부분 길이 (제목 + 본문)
+
+
+def embedding_name(embedding) -> str:
+    """임베딩 종류와 모델 이름 (다른 임베딩으로 만든 벡터끼리는 비교할 수 없음)"""
+    while isinstance(getattr(embedding, "embedding", None), Embeddings):
+        embedding = embedding.embedding  # MicroBatchingEmbeddings, InstrumentedEmbeddings 래퍼는 벗겨서 봄
+    model = getattr(embedding, "model", None) or getattr(embedding, "size", None)
+    return f"{type(embedding).__name__}:{model}" if model else type(embedding).__name__
+
+
+def store_version(embedding, index_version: str, model_path: str = MODEL_PATH,
+                  tokenizer_path: str = TOKENIZER_PATH, dtype: str = MODEL_DTYPE) -> Dict[str, str]:
+    """답변을 만든 구성 (이 중 하나라도 바뀌면 저장된 답변을 쓰지 않음)"""
+    return {
+        "model_path": model_path,
+        "tokenizer_path": tokenizer_path,
+        "dtype": dtype,
+        "index_version": index_version,
+        "embedding": embedding_name(embedding),
+    }
+
+
+def normalize_question(text: str) -> str:
+    """정확히 같은 질문 비교용 (공백과 끝의 문장 부호 무시)"""
+    return re.sub(r"\s+", " ", text).strip().rstrip("?.!~ ").lower()
+
+
+def embed_texts(embedding, texts: Sequence[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """batch_size개씩 embed_documents로 임베딩한 정규화 float32 행렬"""
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embedding.embed_documents(list(texts[start:start + batch_size])))
+    return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def read_board_questions(path: str) -> List[str]:
+    """
+    크롤링한 질문 게시판 JSON([{"title", "content", ...}, ...])의 글을 질문 텍스트로 읽습니다.
+    path: JSON 파일 또는 JSON 파일이 있는 폴더
+    """
+    paths = sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+    questions = []
+    for file_path in paths:
+        with open(file_path, "r", encoding="utf-8") as f:
+            posts = json.load(f)
+        for post in posts:
+            text = re.sub(r"\s+", " ", f"{post.get('title', '')} {post.get('content', '')}").strip()
+            if len(text) >= 10:
+                questions.append(text[:BOARD_TEXT_CHARS])
+    logger.info(f"질문 게시판 글 {len(questions)}개 ({len(paths)}개 파일)")
+    return questions
+
+
+def representative_questions(texts: Sequence[str], embedding, count: int = FAQ_CLUSTER_COUNT,
+                             seed: int = 0) -> List[Tuple[str, int]]:
+    """
+    텍스트를 임베딩해 k-means(코사인)로 count개 군집으로 묶고, 군집마다 중심에 가장 가까운 텍스트를 고릅니다.
+    반환: (대표 텍스트, 군집 크기) 목록, 큰 군집부터
+    """
+    import faiss
+
+    vectors = embed_texts(embedding, texts)
+    count = min(count, len(texts))
+    kmeans = faiss.Kmeans(vectors.shape[1], count, niter=20, spherical=True, seed=seed, verbose=False)
+    kmeans.train(vectors)
+    _, assignment = kmeans.index.search(vectors, 1)
+    assignment = assignment[:, 0]
+
+    representatives = []
+    for cluster in range(count):
+        members = np.flatnonzero(assignment == cluster)
+        if len(members) == 0:
+            continue
+        best = members[np.argmax(vectors[members] @ kmeans.centroids[cluster])]
+        representatives.append((texts[best], len(members)))
+    representatives.sort(key=lambda item: -item[1])
+    return representatives
+
+
+@dataclass
+class FaqHit:
+    question: str  # 저장소에서 찾은 질문
+    answer: str
+    context: str
+    score: float  # 코사인 유사도 (정확히 같은 질문이면 1.0)
+
+
+class AnswerStore:
+    """미리 만든 답변과 질문 임베딩 (코사인 유사도 전수 검색)"""
+
+    def __init__(self, entries: List[Dict[str, Any]], vectors: np.ndarray, manifest: Dict[str, Any],
+                 embedding, threshold: float = FAQ_MATCH_THRESHOLD):
+        self.entries = entries
+        self.vectors = vectors
+        self.manifest = manifest
+        self.embedding = embedding
+        self.threshold = threshold
+        self._exact = {normalize_question(entry["question"]): i for i, entry in enumerate(entries)}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self), "threshold": self.threshold, "created": self.manifest.get("created")}
+
+    def match(self, question: str) -> Optional[FaqHit]:
+        """가장 가까운 FAQ 질문의 유사도가 threshold 이상이면 FaqHit, 아니면 None"""
+        i = self._exact.get(normalize_question(question))
+        if i is not None:
+            score = 1.0
+        else:
+            try:
+                vector = normalize(np.asarray(self.embedding.embed_query(question), dtype=np.float32))
+            except EmbeddingUnavailable:
+                # 임베딩 서버가 응답하지 않으면 FAQ 없이 검색(대체 인덱스) + 생성으로 넘어감
+                REGISTRY.inc("rag_faq_requests_total", result="unavailable")
+                return None
+            scores = self.vectors @ vector
+            i = int(np.argmax(scores))
+            score = float(scores[i])
+        REGISTRY.observe("rag_faq_score", score)
+        if score < self.threshold:
+            REGISTRY.inc("rag_faq_requests_total", result="miss")
+            return None
+        REGISTRY.inc("rag_faq_requests_total", result="hit")
+        entry = self.entries[i]
+        return FaqHit(entry["question"], entry["answer"], entry.get("context", ""), score)
+
+
+def load_answer_store(store_dir: str = FAQ_STORE_DIR, embedding=None, index_version: Optional[str] = None,
+                      threshold: float = FAQ_MATCH_THRESHOLD) -> Optional[AnswerStore]:
+    """
+    저장소를 읽습니다. 없거나, 지금 구성(모델, 인덱스, 임베딩)과 버전이 다르면 None
+    embedding: 질문 임베딩에 쓸 임베딩 (없으면 OpenAI 임베딩)
+    index_version: 서비스 중인 검색 인덱스 버전 (없으면 VECTOR_DB_DIR의 base_index_version)
+    """
+    manifest_path = os.path.join(store_dir, FAQ_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    from rag.index import base_index_version, get_embedding
+
+    embedding = embedding or get_embedding()
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    expected = store_version(embedding, index_version or base_index_version(VECTOR_DB_DIR))
+    if manifest.get("version") != expected:
+        logger.warning(f"FAQ 답변 저장소 {store_dir}의 버전이 지금 구성과 달라 사용하지 않습니다: "
+                       f"{manifest.get('version')} != {expected}")
+        return None
+    with open(os.path.join(store_dir, FAQ_ANSWERS), "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    vectors = np.load(os.path.join(store_dir, FAQ_EMBEDDINGS))
+    logger.info(f"FAQ 답변 저장소 로드: {len(entries)}개 ({manifest.get('created')})")
+    return AnswerStore(entries, vectors, manifest, embedding, threshold)
+
+
+def build_answer_store(questions: Sequence[str], search_tools, model, tokenizer, device, embedding,
+                       index_version: str, output_dir: str = FAQ_STORE_DIR,
+                       cluster_sizes: Optional[Sequence[int]] = None,
+                       max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS, temperature: float = 0.0,
+                       batch_size: int = BATCH_GENERATION_SIZE,
+                       max_batch_tokens: int = BATCH_MAX_TOKENS) -> Dict[str, Any]:
+    """
+    질문마다 검색 + 배치 생성으로 답변을 만들어 저장소를 씁니다. 임시 디렉터리에 모두 쓴 뒤 바꿔치기하므로
+    실행 중인 서버가 읽는 도중 반쯤 쓴 저장소를 보지 않습니다.
+    temperature: 기본 0(greedy, 같은 구성이면 같은 답변)
+    반환: manifest.json 내용
+    """
+    from rag.batch import answer_items
+
+    start = time.perf_counter()
+    items = [{"question": question} for question in questions]
+    if cluster_sizes is not None:
+        for item, size in zip(items, cluster_sizes):
+            item["cluster_size"] = size
+    results = answer_items(items, model, tokenizer, device, search_tools, max_new_tokens, temperature,
+                           batch_size, max_batch_tokens, keep_context=True)
+    entries = [
+        {
+            "question": r["question"],
+            "answer": r["answer"],
+            "context": r.get("context", ""),
+            "cluster_size": r.get("cluster_size"),
+        }
+        for r in results if r.get("found") and r["answer"]
+    ]
+    if not entries:
+        raise ValueError("관련 정보를 찾은 질문이 없어 저장소를 만들지 않았습니다.")
+    vectors = embed_texts(embedding, [entry["question"] for entry in entries])
+
+    manifest = {
+        "version": store_version(embedding, index_version),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "entries": len(entries),
+        "skipped": len(results) - len(entries),
+        "build_seconds": round(time.perf_counter() - start, 1),
+    }
+    tmp_dir = output_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with open(os.path.join(tmp_dir, FAQ_ANSWERS), "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    np.save(os.path.join(tmp_dir, FAQ_EMBEDDINGS), vectors)
+    # 매니페스트는 마지막에 써서, 매니페스트가 있으면 저장소가 완성된 것으로 봄
+    with open(os.path.join(tmp_dir, FAQ_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    old_dir = output_dir.rstrip("/") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"FAQ 답변 저장소 저장: {output_dir} ({len(entries)}개, 관련 정보 없음 {manifest['skipped']}개 제외)")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="자주 묻는 질문 답변 미리 만들기")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--questions", help="질문 JSONL ({\"question\": ...}), 자주 묻는 순서대로")
+    source.add_argument("--boards", default=FAQ_BOARDS_DIR, help="질문 게시판 JSON 파일 또는 폴더 (군집 대표 질문 사용)")
+    parser.add_argument("--count", type=int, default=FAQ_CLUSTER_COUNT, help="저장할 최대 질문 수 (게시판은 군집 수)")
+    parser.add_argument("--output", default=FAQ_STORE_DIR)
+    parser.add_argument("--max-new-tokens", type=int, default=DEFAULT_MAX_NEW_TOKENS)
+    parser.add_argument("--temperature", type=float, default=0.0, help="0이면 greedy")
+    parser.add_argument("--batch-size", type=int, default=BATCH_GENERATION_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from rag.batch import read_items
+    from rag.generation import load_model
+    from rag.index import base_index_version, get_embedding, initialize_search_tools
+
+    embedding = get_embedding()
+    cluster_sizes = None
+    if args.questions:
+        questions = [item["question"] for item in read_items(args.questions)][:args.count]
+    else:
+        representatives = representative_questions(read_board_questions(args.boards), embedding, args.count)
+        questions = [text for text, _ in representatives]
+        cluster_sizes = [size for _, size in representatives]
+
+    search_tools, _, _ = initialize_search_tools()
+    model, tokenizer, device = load_model(MODEL_PATH, TOKENIZER_PATH)
+    manifest = build_answer_store(questions, search_tools, model, tokenizer, device, embedding,
+                                  base_index_version(VECTOR_DB_DIR), args.output, cluster_sizes, args.max_new_tokens,
+                                  args.temperature, args.batch_size)
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
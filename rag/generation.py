@@ -0,0 +1,385 @@
+"""
+KoAlpaca 프롬프트 구성과 스트리밍 생성
+
+streamlit 앱과 벤치마크가 같은 검색 → 프롬프트 → 생성 경로를 사용하도록 streamlit에 의존하지 않는
+부분을 모았습니다. 화면 출력은 호출하는 쪽에서 on_text 콜백으로 처리합니다.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from threading import Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import torch
+from transformers import (
+    AutoModelForCausalLM, AutoTokenizer, LogitsProcessorList, StoppingCriteria, StoppingCriteriaList,
+    TextIteratorStreamer,
+)
+
+from rag.config import MODEL_DTYPE, MODEL_SNAPSHOT_DIR
+from rag.search import select_and_use_tools
+from rag.snapshot import find_snapshot
+from rag.telemetry import REGISTRY, GenerationTimer, span
+
+logger = logging.getLogger(__name__)
+
+# 시스템 프롬프트
+SYSTEM_PROMPT = """
+너는 초보 부모를 위한 육아 전문가 챗봇이야.
+아래 제공되는 문서 내용을 참고하여 질문에 대해
+친절하고 이해하기 쉽게 답변해줘.
+"""
+
+# 정지 태그 (모델이 다음 턴을 스스로 만들기 시작하면 중단)
+STOP_WORDS = ["### 질문:", "### 답변:", "### 시스템:", "### 문맥:"]
+
+NO_RESULTS_MARKER = "어떤 데이터베이스에서도 관련 정보를 찾을 수 없습니다"
+NO_RESULTS_ANSWER = "죄송합니다. 현재 데이터베이스에서 해당 질문에 대한 관련 정보를 찾을 수 없습니다. 다른 주제나 더 일반적인 육아 관련 질문으로 문의해 주시면 도움드리겠습니다."
+MODEL_LOADING_NOTICE = "답변 모델을 불러오는 중이라 우선 검색된 관련 자료를 보여드립니다. 모델이 준비되면 자료를 바탕으로 직접 답변해 드려요."
+
+
+# 커스텀 정지 기준 클래스 정의
+class StopOnTokens(StoppingCriteria):
+    def __init__(self, tokenizer, stop_token_ids):
+        self.tokenizer = tokenizer
+        self.stop_token_ids = stop_token_ids
+
+    def __call__(self, input_ids, scores, **kwargs):
+        for stop_ids in self.stop_token_ids:
+            if input_ids[0][-len(stop_ids):].tolist() == stop_ids:
+                return True
+        return False
+
+
+class StopSignal(StoppingCriteria):
+    """스트리밍 쪽에서 생성을 멈추게 할 때 사용 (다음 토큰 생성 전에 중단)"""
+
+    def __init__(self):
+        self.stopped = False
+
+    def set(self) -> None:
+        self.stopped = True
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.stopped
+
+
+class BatchStopOnTokens(StoppingCriteria):
+    """
+    배치 생성용 정지 기준. 행마다 생성한 부분 끝에 정지 태그(토큰 id 또는 디코딩한 텍스트)나 EOS가 나오면
+    그 행만 끝난 것으로 표시합니다. 끝난 행은 generate가 패딩 토큰으로 채우고, 모든 행이 끝나면 멈춥니다.
+    행별로 끝난 시점의 생성 토큰 수(generated)와 시각(finished_at)을 기록합니다.
+    """
+    TAIL_TOKENS = 8  # 정지 태그를 찾을 생성 토큰 끝부분 길이
+
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int):
+        self.tokenizer = tokenizer
+        self.stop_token_ids = [tokenizer.encode(word, add_special_tokens=False) for word in STOP_WORDS]
+        self.prompt_length = prompt_length
+        self.generated: List[Optional[int]] = [None] * batch_size
+        self.finished_at: List[Optional[float]] = [None] * batch_size
+
+    def _stopped(self, tail: List[int]) -> bool:
+        if tail and tail[-1] == self.tokenizer.eos_token_id:
+            return True
+        if any(tail[-len(stop_ids):] == stop_ids for stop_ids in self.stop_token_ids):
+            return True
+        # 토큰 경계가 태그와 맞지 않는 경우 (앞 토큰에 붙어서 생성된 태그)
+        text = self.tokenizer.decode(tail, skip_special_tokens=True)
+        return any(tag in text for tag in STOP_WORDS)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        now = time.perf_counter()
+        length = input_ids.shape[1]
+        start = max(self.prompt_length, length - self.TAIL_TOKENS)
+        for row in range(input_ids.shape[0]):
+            if self.generated[row] is None and self._stopped(input_ids[row, start:].tolist()):
+                self.generated[row] = length - self.prompt_length
+                self.finished_at[row] = now
+        return torch.tensor([n is not None for n in self.generated], dtype=torch.bool, device=input_ids.device)
+
+
+@dataclass
+class GenerationStats:
+    """생성 한 번의 측정값 (초 단위, 측정되지 않은 값은 None)"""
+    prompt_tokens: int = 0
+    cached_tokens: int = 0  # 세션 KV 캐시로 prefill을 건너뛴 프롬프트 앞부분 토큰 수
+    generated_tokens: int = 0
+    prefill_seconds: Optional[float] = None
+    ttft_seconds: Optional[float] = None  # request_start부터 첫 텍스트 조각까지 (검색 시간 포함 가능)
+    decode_tokens_per_second: Optional[float] = None
+    total_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def load_model(model_path: str, tokenizer_path: str, snapshot_dir: Optional[str] = MODEL_SNAPSHOT_DIR):
+    """
+    모델과 토크나이저를 로드하는 함수
+    같은 레포지토리로 만든 로컬 스냅숏(rag.snapshot)이 snapshot_dir에 있으면 허브에 접속하지 않고
+    스냅숏의 safetensors(메모리 매핑)와 tokenizer.json을 엽니다. snapshot_dir=None이면 항상 허브에서 로드합니다.
+    반환: (model, tokenizer, device)
+    """
+    snapshot = find_snapshot(model_path, tokenizer_path, snapshot_dir)
+    local_files_only = snapshot is not None
+    if snapshot:
+        logger.info(f"로컬 스냅숏에서 모델과 토크나이저를 로드합니다: {snapshot}")
+        model_path = tokenizer_path = snapshot
+    else:
+        logger.info(f"허깅페이스 레포지토리에서 모델을 로드합니다: {model_path}")
+        logger.info(f"토크나이저를 로드합니다: {tokenizer_path}")
+
+    # GPU 사용 가능 여부 확인
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    logger.info(f"사용 중인 장치: {device}")
+
+    try:
+        # 토크나이저 로드
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_path, local_files_only=local_files_only)
+        logger.info("토크나이저 로드 완료")
+
+        # 토크나이저에 패딩 토큰 설정 (없는 경우)
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+            logger.info("패딩 토큰을 EOS 토큰으로 설정")
+
+        # 파인튜닝된 모델 로드 (허깅페이스 레포지토리 또는 로컬 스냅숏)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_path,
+            torch_dtype=getattr(torch, MODEL_DTYPE),  # 서빙 dtype (기본 FP16)으로 로드하여 메모리 사용량 감소
+            device_map="auto",  # 자동으로 GPU에 할당
+            low_cpu_mem_usage=True,
+            local_files_only=local_files_only,
+            use_safetensors=True if local_files_only else None,
+        )
+
+        logger.info("파인튜닝된 모델 로드 완료")
+        return model, tokenizer, device
+
+    except Exception as e:
+        logger.error(f"모델 또는 토크나이저 로드 중 오류 발생: {str(e)}")
+        raise
+
+
+def build_prompt(question: str, context: str = "", system_prompt: str = SYSTEM_PROMPT) -> str:
+    """KoAlpaca 형식으로 프롬프트 변환 (system_prompt가 비어 있으면 시스템 부분 생략)"""
+    alpaca_prompt = f"### 시스템: {system_prompt}\n\n" if system_prompt else ""
+    if context:
+        alpaca_prompt += f"### 문맥: {context}\n\n"
+    alpaca_prompt += f"### 질문: {question}\n\n### 답변:"
+    return alpaca_prompt
+
+
+def clean_response(text: str) -> str:
+    """정지 태그 이후의 텍스트를 잘라냅니다."""
+    for tag in STOP_WORDS:
+        if tag in text:
+            text = text.split(tag)[0]
+    return text
+
+
+def collect_stream(chunks: Iterable[str], on_text: Optional[Callable[[str], None]] = None,
+                   on_first_chunk: Optional[Callable[[], None]] = None) -> Tuple[str, bool]:
+    """
+    스트리머의 텍스트 조각을 누적하고 정지 태그가 나오면 중단합니다.
+    반환: (누적 텍스트, 정지 태그로 중단했는지 여부)
+    """
+    generated_text = ""
+    for text in chunks:
+        if on_first_chunk is not None and not generated_text:
+            on_first_chunk()
+            on_first_chunk = None
+        generated_text += text
+
+        if on_text is not None:
+            on_text(clean_response(generated_text))
+
+        # 태그가 발견되면 생성 중단
+        if any(tag in text for tag in STOP_WORDS):
+            return generated_text, True
+    return generated_text, False
+
+
+def retrieve_context(question: str, search_tools, categories: Optional[List[str]] = None,
+                     tokenizer=None) -> Tuple[str, bool]:
+    """
+    검색 도구로 문맥을 찾습니다.
+    반환: (문맥 문자열, 관련 정보를 찾았는지 여부)
+    """
+    if not search_tools:
+        return "", True
+    context = select_and_use_tools(question, search_tools, categories)
+    if tokenizer is not None:
+        REGISTRY.observe("rag_context_tokens", len(tokenizer.encode(context, add_special_tokens=False)))
+    found = bool(context) and NO_RESULTS_MARKER not in context
+    return context, found
+
+
+def retrieval_only_answer(context: str) -> str:
+    """모델 없이 검색된 상위 문서만으로 만든 답변 (모델 로드 중)"""
+    return f"{MODEL_LOADING_NOTICE}\n\n{context}"
+
+
+def generate_batch(prompts: Sequence[str], model, tokenizer, device, max_new_tokens: int, temperature: float,
+                   top_p: float = 0.95) -> List[Tuple[str, GenerationStats]]:
+    """
+    여러 프롬프트를 왼쪽 패딩으로 맞춰 model.generate 한 번으로 생성합니다 (오프라인 일괄 처리용, rag.batch).
+    행마다 정지 태그가 나오면 그 행만 끝나고, 가장 늦게 끝나는 행까지 생성합니다.
+    temperature가 0이면 greedy 디코딩
+    반환: prompts와 같은 순서의 (정리된 텍스트, 측정값)
+      - prefill_seconds, ttft_seconds: 배치 전체의 prefill 시간 (모든 행이 같음)
+      - total_seconds: 배치 시작부터 그 행이 끝날 때까지
+    """
+    start = time.perf_counter()
+    # 디코더 전용 모델은 프롬프트 끝이 맞아야 다음 토큰을 바로 이어서 생성하므로 왼쪽 패딩
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+    try:
+        encoded_input = tokenizer(list(prompts), return_tensors="pt", padding=True)
+    finally:
+        tokenizer.padding_side = padding_side
+    input_ids = encoded_input["input_ids"].to(device)
+    attention_mask = encoded_input["attention_mask"].to(device)
+    prompt_length = int(input_ids.shape[1])
+
+    batch_stop = BatchStopOnTokens(tokenizer, prompt_length, len(prompts))
+    generation_timer = GenerationTimer()
+    generation_kwargs = {
+        "input_ids": input_ids,
+        "attention_mask": attention_mask,
+        "max_new_tokens": max_new_tokens,
+        "do_sample": temperature > 0,
+        "pad_token_id": tokenizer.pad_token_id,
+        "stopping_criteria": StoppingCriteriaList([batch_stop]),
+        "logits_processor": LogitsProcessorList([generation_timer]),
+    }
+    if temperature > 0:
+        generation_kwargs.update(temperature=temperature, top_p=top_p)
+
+    with span("rag.generate_batch", "rag_generate_batch_seconds") as generate_span:
+        generate_span.set_attribute("rag.batch_size", len(prompts))
+        sequences = model.generate(**generation_kwargs)
+        generation_timer.record(generate_span)
+    end = time.perf_counter()
+
+    results = []
+    for row, prompt_tokens in enumerate(attention_mask.sum(dim=1).tolist()):
+        generated = batch_stop.generated[row]
+        if generated is None:
+            generated = int(sequences.shape[1]) - prompt_length
+        finished = batch_stop.finished_at[row] or end
+        text = tokenizer.decode(sequences[row, prompt_length:prompt_length + generated], skip_special_tokens=True)
+        stats = GenerationStats(
+            prompt_tokens=int(prompt_tokens),
+            generated_tokens=generated,
+            prefill_seconds=generation_timer.prefill_seconds,
+            ttft_seconds=generation_timer.prefill_seconds,
+            total_seconds=finished - start,
+        )
+        if generation_timer.prefill_end is not None and generated > 1 and finished > generation_timer.prefill_end:
+            stats.decode_tokens_per_second = (generated - 1) / (finished - generation_timer.prefill_end)
+        REGISTRY.observe("rag_prompt_tokens", stats.prompt_tokens)
+        results.append((clean_response(text), stats))
+    return results
+
+
+def generate_stream(prompt_text: str, model, tokenizer, device, max_new_tokens: int, temperature: float,
+                    top_p: float = 0.95, on_text: Optional[Callable[[str], None]] = None,
+                    request_start: Optional[float] = None,
+                    stop_signal: Optional[StopSignal] = None,
+                    past_key_values=None,
+                    prompt_ids: Optional[List[int]] = None,
+                    on_sequences: Optional[Callable[[torch.Tensor], None]] = None) -> Tuple[str, GenerationStats]:
+    """
+    별도 스레드에서 model.generate를 실행하고 스트리머로 텍스트를 받습니다.
+    on_text: 정지 태그를 정리한 누적 텍스트를 받을 콜백 (화면 갱신용)
+    request_start: 첫 토큰까지의 시간(TTFT) 기준 시각 (time.perf_counter 값, 없으면 생성 시작 시각)
+    stop_signal: 호출하는 쪽에서 생성을 취소할 때 set()할 신호 (클라이언트 연결 종료 등)
+    past_key_values: 프롬프트 앞부분이 이미 들어 있는 KV 캐시 (rag.sessions, 생성 후 이어진 상태로 갱신됨)
+    prompt_ids: 이미 토큰화한 프롬프트 (있으면 prompt_text 대신 사용)
+    on_sequences: 생성이 끝나면 프롬프트 + 생성 토큰 id 텐서를 받을 콜백
+    반환: (정리된 최종 텍스트, 측정값)
+    """
+    stats = GenerationStats()
+    start = time.perf_counter()
+    request_start = start if request_start is None else request_start
+
+    # 입력 인코딩 (attention_mask 명시적 포함)
+    if prompt_ids is not None:
+        input_ids = torch.tensor([prompt_ids], device=device)
+        attention_mask = torch.ones_like(input_ids)
+    else:
+        encoded_input = tokenizer(prompt_text, return_tensors="pt", padding=True)
+        input_ids = encoded_input["input_ids"].to(device)
+        attention_mask = encoded_input["attention_mask"].to(device)
+    stats.prompt_tokens = int(input_ids.shape[1])
+    REGISTRY.observe("rag_prompt_tokens", stats.prompt_tokens)
+    if past_key_values is not None:
+        stats.cached_tokens = past_key_values.get_seq_length()
+
+    # 정지 토큰 설정
+    stop_token_ids = [tokenizer.encode(word, add_special_tokens=False) for word in STOP_WORDS]
+    stop_signal = stop_signal or StopSignal()
+    stopping_criteria = StoppingCriteriaList([StopOnTokens(tokenizer, stop_token_ids), stop_signal])
+
+    # 스트리머 초기화
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+    # prefill 종료 시점과 디코딩 속도 측정
+    generation_timer = GenerationTimer()
+
+    # 생성 매개변수 설정
+    generation_kwargs = {
+        "input_ids": input_ids,
+        "attention_mask": attention_mask,
+        "max_new_tokens": max_new_tokens,
+        "temperature": temperature,
+        "do_sample": True,
+        "top_p": top_p,
+        "pad_token_id": tokenizer.pad_token_id,
+        "streamer": streamer,
+        "stopping_criteria": stopping_criteria,
+        "logits_processor": LogitsProcessorList([generation_timer])
+    }
+    if past_key_values is not None:
+        # 캐시에 있는 앞부분은 건너뛰고 나머지 토큰만 prefill
+        generation_kwargs["past_key_values"] = past_key_values
+
+    errors: List[BaseException] = []
+
+    def run_generate():
+        try:
+            sequences = model.generate(**generation_kwargs)
+            if on_sequences is not None:
+                on_sequences(sequences)
+        except BaseException as e:
+            # 스트리머를 끝내지 않으면 collect_stream이 영원히 기다림 (예외는 join 후 호출한 스레드에서 다시 발생)
+            errors.append(e)
+            streamer.end()
+
+    with span("rag.generate", "rag_generate_seconds") as generate_span:
+        # 별도 스레드에서 텍스트 생성 시작
+        thread = Thread(target=run_generate)
+        thread.start()
+
+        def on_first_chunk():
+            stats.ttft_seconds = time.perf_counter() - request_start
+            REGISTRY.observe("rag_ttft_seconds", stats.ttft_seconds)
+            generate_span.set_attribute("rag.ttft_seconds", stats.ttft_seconds)
+
+        generated_text, stopped = collect_stream(streamer, on_text, on_first_chunk)
+        if stopped:
+            # 토큰 단위로 태그가 맞지 않은 경우에도 다음 토큰 전에 멈춤
+            stop_signal.set()
+
+        thread.join()
+        if errors:
+            raise errors[0]
+        generation_timer.record(generate_span)
+
+    stats.generated_tokens = generation_timer.tokens
+    stats.prefill_seconds = generation_timer.prefill_seconds
+    stats.decode_tokens_per_second = generation_timer.decode_tokens_per_second
+    stats.total_seconds = time.perf_counter() - start
+    return clean_response(generated_text), stats
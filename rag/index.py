@@ -0,0 +1,456 @@
+"""
+벡터 DB 생성/로드와 검색 도구 초기화
+
+streamlit 앱뿐 아니라 오프라인 평가, 벤치마크에서도 같은 인덱스를 쓸 수 있도록 streamlit에
+의존하지 않습니다. (앱에서는 st.cache_resource로 감싸서 사용)
+각 init_* 함수는 실패 시 오류를 로그로 남기고 None을 반환합니다.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+from langchain_community.vectorstores import FAISS, Chroma
+from langchain_openai import OpenAIEmbeddings
+
+from rag.config import (
+    BABYLOVE_BACKEND, BABYLOVE_DATA_FILE, CHROMA_BABYLOVE_NAME, CLASSIFIED_DATA_FILE, CLASSIFIED_PARTITION_FIELD,
+    DATA_DIR,
+    EMBEDDING_REQUEST_TIMEOUT, EXCLUDED_CATEGORIES, EXPANDED_DATA_FILE, FAISS_BABYLOVE_PARTITIONED_NAME,
+    FAISS_CLASSIFIED_NAME, FAISS_CLASSIFIED_PARTITIONED_NAME, FAISS_EXPANDED_NAME, FALLBACK_EMBEDDING_MODEL, FALLBACK_VECTOR_DB_DIR, INDEX_BATCH_SIZE,
+    INDEX_CURRENT_FILE, INDEX_VERSIONS_DIR, INGEST_OFFSETS_FILE,
+    MIN_CATEGORY_CONFIDENCE, NUMPY_BABYLOVE_NAME, NUMPY_DTYPE, OPENAI_API_KEY, OPENAI_EMBEDDING_BASE_URL, QUANTIZATION, QUANTIZED_DIM, QUANTIZED_REDUCTION, RESCORE_K, RETRIEVAL_K,
+    SEARCH_CACHE_SIZE, VECTOR_DB_DIR, VECTOR_INDEX_TYPE,
+)
+from rag.loader import iter_document_batches
+from rag.microbatch import MicroBatchingEmbeddings
+from rag.numpy_store import NumpyVectorStore
+from rag.partition import UNCATEGORIZED, PartitionedVectorStore, filter_document_batches, keep_informative
+from rag.quantized_store import QuantizedVectorStore
+from rag.resilient import ResilientEmbeddings
+from rag.search import BABYLOVE_CATEGORIES, CLASSIFIED_TOPICS, SearchTool
+from rag.telemetry import instrument_embedding
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding():
+    """
+    기본 임베딩 (OpenAI). 프로세스 안에서 하나를 같이 씁니다.
+    - 동시에 들어온 질의 임베딩은 rag.microbatch로 묶어서 보냄
+    - 질의 임베딩에 제한 시간, 헤지 요청, 회로 차단기 적용 (rag.resilient, 헤지 요청은 묶지 않고 원격으로 바로 보냄)
+    OPENAI_EMBEDDING_BASE_URL이 있으면 그 주소의 OpenAI 호환 서버를 씁니다 (토큰 id 대신 텍스트를 보냄).
+    """
+    if OPENAI_EMBEDDING_BASE_URL:
+        remote = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY or "unused", openai_api_base=OPENAI_EMBEDDING_BASE_URL,
+                                  check_embedding_ctx_length=False, request_timeout=EMBEDDING_REQUEST_TIMEOUT,
+                                  max_retries=0)
+    else:
+        remote = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, request_timeout=EMBEDDING_REQUEST_TIMEOUT,
+                                  max_retries=0)
+    # 재시도는 ResilientEmbeddings의 헤지 요청이 맡음
+    return ResilientEmbeddings(MicroBatchingEmbeddings(remote), hedge_embedding=remote)
+
+
+def get_fallback_embedding(model_name: str = FALLBACK_EMBEDDING_MODEL):
+    """원격 임베딩 장애 시 대체 인덱스에 쓰는 로컬 임베딩 (sentence-transformers)"""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"normalize_embeddings": True})
+
+
+# JSON → Document 배치 로드 함수 (스트리밍)
+def load_document_batches(path: str):
+    """
+    원본 JSON 파일을 스트리밍으로 읽어 INDEX_BATCH_SIZE 단위의 Document 리스트를 생성합니다.
+    EXCLUDED_CATEGORIES, MIN_CATEGORY_CONFIDENCE 조건에 맞지 않는 문서는 제외합니다.
+    JSON 구조를 인식할 수 없으면 UnknownFormatError가 발생합니다.
+    """
+    keep = keep_informative(EXCLUDED_CATEGORIES, MIN_CATEGORY_CONFIDENCE)
+    yield from filter_document_batches(iter_document_batches(path, INDEX_BATCH_SIZE), keep)
+
+# FAISS 벡터 DB 초기화
+def init_faiss(path: str, save_path: str, embedding=None):
+    """
+    FAISS 벡터 DB를 초기화하고 저장/로드합니다.
+    path: 원본 JSON 파일 경로
+    save_path: FAISS DB를 저장할 경로
+    """
+    try:
+        # 이미 저장된 FAISS DB가 있는지 확인
+        if os.path.exists(save_path):
+            logger.info(f"저장된 FAISS DB를 로드합니다: {save_path}")
+            embedding = instrument_embedding(embedding or get_embedding(), os.path.basename(save_path))
+            return FAISS.load_local(save_path, embedding, allow_dangerous_deserialization=True)
+        
+        # 없으면 새로 생성
+        logger.info(f"새 FAISS DB를 생성합니다: {path}")
+        embedding = instrument_embedding(embedding or get_embedding(), os.path.basename(save_path))
+        
+        # FAISS DB 생성 (배치 단위로 임베딩하여 추가)
+        db = None
+        for docs in load_document_batches(path):
+            if db is None:
+                db = FAISS.from_documents(docs, embedding=embedding)
+            else:
+                db.add_documents(docs)
+        
+        if db is None:
+            raise ValueError(f"{path}에 색인할 문서가 없습니다.")
+        
+        # 저장 디렉토리가 없으면 생성
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        
+        # FAISS DB 저장
+        db.save_local(save_path)
+        logger.info(f"FAISS DB를 저장했습니다: {save_path}")
+        
+        return db
+    except Exception as e:
+        logger.error(f"FAISS 벡터 DB 초기화 오류: {str(e)}")
+        return None
+
+# 양자화 벡터 DB 초기화
+def init_quantized(path: str, save_path: str, embedding=None):
+    """
+    차원 축소 + 양자화 벡터 DB를 초기화하고 저장/로드합니다.
+    원본 float32 벡터는 디스크에 두고 mmap으로 열어 재순위화에만 사용합니다.
+    path: 원본 JSON 파일 경로
+    save_path: 인덱스를 저장할 경로
+    """
+    try:
+        embedding = instrument_embedding(embedding or get_embedding(), os.path.basename(save_path))
+        
+        if not os.path.exists(save_path):
+            logger.info(f"새 양자화 벡터 DB를 생성합니다: {path}")
+            db = QuantizedVectorStore.from_document_batches(
+                load_document_batches(path),
+                embedding,
+                dim=QUANTIZED_DIM,
+                reduction=QUANTIZED_REDUCTION,
+                quantization=QUANTIZATION,
+                rescore_k=RESCORE_K
+            )
+            db.save_local(save_path)
+            logger.info(f"양자화 벡터 DB를 저장했습니다: {save_path}")
+        
+        # 저장 후 다시 로드하여 원본 벡터를 메모리 대신 mmap으로 사용
+        logger.info(f"저장된 양자화 벡터 DB를 로드합니다: {save_path}")
+        return QuantizedVectorStore.load_local(save_path, embedding, rescore_k=RESCORE_K)
+    except Exception as e:
+        logger.error(f"양자화 벡터 DB 초기화 오류: {str(e)}")
+        return None
+
+# 카테고리 파티션 벡터 DB 초기화
+def init_partitioned(path: str, save_path: str, category_field: str, embedding=None):
+    """
+    카테고리별 FAISS 하위 인덱스로 나눈 벡터 DB를 초기화하고 저장/로드합니다.
+    path: 원본 JSON 파일 경로
+    save_path: 파티션 인덱스를 저장할 경로
+    category_field: 파티션 기준 메타데이터 키
+    """
+    try:
+        embedding = instrument_embedding(embedding or get_embedding(), os.path.basename(save_path))
+        
+        if os.path.exists(save_path):
+            logger.info(f"저장된 파티션 벡터 DB를 로드합니다: {save_path}")
+            return PartitionedVectorStore.load_local(save_path, embedding)
+        
+        logger.info(f"새 파티션 벡터 DB를 생성합니다: {path}")
+        db = PartitionedVectorStore.from_document_batches(load_document_batches(path), embedding, category_field)
+        db.save_local(save_path)
+        logger.info(f"파티션 벡터 DB를 저장했습니다: {save_path} ({len(db.partition_names)}개 파티션)")
+        
+        return db
+    except Exception as e:
+        logger.error(f"파티션 벡터 DB 초기화 오류: {str(e)}")
+        return None
+
+# NumPy 벡터 DB 초기화
+def init_numpy(path: str, save_path: str, embedding=None):
+    """
+    NumPy 행렬 기반 벡터 DB를 초기화하고 저장/로드합니다. (작은 코퍼스용, Chroma 대체)
+    path: 원본 JSON 파일 경로
+    save_path: 임베딩 행렬(.npy)과 문서를 저장할 경로
+    """
+    try:
+        embedding = instrument_embedding(embedding or get_embedding(), os.path.basename(save_path))
+        
+        if os.path.exists(save_path):
+            logger.info(f"저장된 NumPy 벡터 DB를 로드합니다: {save_path}")
+            return NumpyVectorStore.load_local(save_path, embedding)
+        
+        logger.info(f"새 NumPy 벡터 DB를 생성합니다: {path}")
+        db = NumpyVectorStore.from_document_batches(load_document_batches(path), embedding, dtype=NUMPY_DTYPE)
+        db.save_local(save_path)
+        logger.info(f"NumPy 벡터 DB를 저장했습니다: {save_path}")
+        
+        return db
+    except Exception as e:
+        logger.error(f"NumPy 벡터 DB 초기화 오류: {str(e)}")
+        return None
+
+# Chroma 벡터 DB 초기화
+def init_chroma(path: str, persist_dir: str, collection_name: str, embedding=None):
+    """
+    Chroma 벡터 DB를 초기화하고 저장/로드합니다.
+    path: 원본 JSON 파일 경로
+    persist_dir: Chroma DB를 저장할 디렉토리
+    collection_name: 컬렉션 이름
+    embedding: 사용할 임베딩 (없으면 OpenAI 임베딩)
+    """
+    try:
+        embedding = instrument_embedding(embedding or get_embedding(), os.path.basename(persist_dir))
+        
+        # 이미 저장된 DB가 있으면 로드만 하고, 없으면 생성
+        if os.path.isdir(persist_dir) and os.listdir(persist_dir):
+            logger.info(f"저장된 Chroma DB를 로드합니다: {persist_dir}")
+            return Chroma(
+                persist_directory=persist_dir,
+                embedding_function=embedding,
+                collection_name=collection_name
+            )
+        else:
+            logger.info(f"새 Chroma DB를 생성합니다: {path}")
+            # 저장 디렉토리가 없으면 생성
+            os.makedirs(persist_dir, exist_ok=True)
+            
+            # 배치 단위로 임베딩하여 추가
+            db = None
+            for docs in load_document_batches(path):
+                if db is None:
+                    db = Chroma.from_documents(
+                        documents=docs,
+                        embedding=embedding,
+                        persist_directory=persist_dir,
+                        collection_name=collection_name
+                    )
+                else:
+                    db.add_documents(docs)
+            
+            if db is None:
+                raise ValueError(f"{path}에 색인할 문서가 없습니다.")
+            
+            # 명시적으로 저장 (실제로는 생성 시 자동 저장되지만 확실히 하기 위해)
+            db.persist()
+            logger.info(f"Chroma DB를 저장했습니다: {persist_dir}")
+            
+            return db
+    except Exception as e:
+        logger.error(f"Chroma 벡터 DB 초기화 오류: {str(e)}")
+        return None
+
+# 벡터 DB 이름 (initialize_search_tools가 반환하는 딕셔너리 키)
+VECTOR_DB_NAMES = ("faiss_classified", "faiss_expanded", "chroma_baby_love")
+
+
+def current_version(vector_db_dir: str = VECTOR_DB_DIR) -> Optional[str]:
+    """CURRENT 파일에 기록된 서비스 버전 이름 (버전 구조가 아니면 None)"""
+    try:
+        with open(os.path.join(vector_db_dir, INDEX_CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(vector_db_dir: str, version: str) -> str:
+    return os.path.join(vector_db_dir, INDEX_VERSIONS_DIR, version)
+
+
+def resolve_vector_db_dir(vector_db_dir: str = VECTOR_DB_DIR) -> str:
+    """서비스할 벡터 DB 폴더 (CURRENT가 가리키는 버전 폴더, 없으면 vector_db_dir 그대로)"""
+    version = current_version(vector_db_dir)
+    return version_dir(vector_db_dir, version) if version else vector_db_dir
+
+
+def publish_version(vector_db_dir: str, version: str) -> None:
+    """
+    CURRENT를 version으로 바꿉니다. 임시 파일을 쓰고 os.replace로 바꾸므로 읽는 쪽은 항상
+    이전 버전 또는 새 버전 이름 하나만 봅니다. 버전 폴더는 완전히 만들어진 뒤에 publish 해야 합니다.
+    """
+    path = version_dir(vector_db_dir, version)
+    if not os.path.isdir(path) or not os.listdir(path):
+        raise FileNotFoundError(f"버전 폴더가 없거나 비어 있습니다: {path}")
+    tmp = os.path.join(vector_db_dir, f".{INDEX_CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(vector_db_dir, INDEX_CURRENT_FILE))
+
+
+def index_version(vector_db_dir: str = VECTOR_DB_DIR) -> str:
+    """
+    저장된 벡터 DB의 버전 문자열 (파일 경로와 크기의 해시, 인덱스를 다시 만들면 바뀜)
+    버전 구조이면 CURRENT가 가리키는 버전 폴더의 내용으로 계산합니다.
+    Chroma는 열기만 해도 SQLite 파일 수정 시각이 바뀔 수 있어 수정 시각은 넣지 않습니다.
+    """
+    vector_db_dir = resolve_vector_db_dir(vector_db_dir)
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(vector_db_dir):
+        # 기존 구조 폴더 안에 새로 만든 버전들은 제외
+        dirs[:] = sorted(d for d in dirs if not (root == vector_db_dir and d == INDEX_VERSIONS_DIR))
+        for name in sorted(files):
+            if name.endswith(("-wal", "-shm", "-journal")) or name.startswith(f".{INDEX_CURRENT_FILE}."):
+                continue
+            path = os.path.join(root, name)
+            digest.update(f"{os.path.relpath(path, vector_db_dir)}:{os.path.getsize(path)}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def base_index_version(vector_db_dir: str = VECTOR_DB_DIR) -> str:
+    """
+    증분 색인(rag.ingest)으로 게시글만 추가한 버전이면 바탕이 된 전체 빌드의 index_version, 아니면 index_version
+    FAQ 답변 저장소는 이 값으로 버전을 맞추므로 게시글이 추가될 때마다 버려지지 않고, 인덱스를 새로 만들면 바뀝니다.
+    """
+    path = resolve_vector_db_dir(vector_db_dir)
+    try:
+        with open(os.path.join(path, INGEST_OFFSETS_FILE), "r", encoding="utf-8") as f:
+            base = json.load(f).get("base_index_version")
+    except FileNotFoundError:
+        base = None
+    return base or index_version(path)
+
+
+def vector_db_path(name: str, vector_db_dir: str = VECTOR_DB_DIR, index_type: str = VECTOR_INDEX_TYPE,
+                   babylove_backend: str = BABYLOVE_BACKEND,
+                   classified_partition_field: str = CLASSIFIED_PARTITION_FIELD) -> str:
+    """벡터 DB 하나가 저장되는 폴더 (VECTOR_DB_NAMES 중 하나, 설정에 따라 폴더 이름이 다름)"""
+    if name in ("faiss_classified", "faiss_expanded"):
+        folder = FAISS_CLASSIFIED_NAME if name == "faiss_classified" else FAISS_EXPANDED_NAME
+        save_path = os.path.join(vector_db_dir, folder)
+        if index_type == "quantized":
+            return f"{save_path}_quantized"
+        if name == "faiss_classified" and classified_partition_field:
+            return os.path.join(vector_db_dir, FAISS_CLASSIFIED_PARTITIONED_NAME)
+        return save_path
+    if name == "chroma_baby_love":
+        folder = {"partitioned": FAISS_BABYLOVE_PARTITIONED_NAME, "numpy": NUMPY_BABYLOVE_NAME}.get(
+            babylove_backend, CHROMA_BABYLOVE_NAME)
+        return os.path.join(vector_db_dir, folder)
+    raise ValueError(f"알 수 없는 벡터 DB 이름입니다: {name}")
+
+
+def init_vector_db(name: str, embedding=None, data_dir: str = DATA_DIR, vector_db_dir: str = VECTOR_DB_DIR,
+                   index_type: str = VECTOR_INDEX_TYPE, babylove_backend: str = BABYLOVE_BACKEND,
+                   classified_partition_field: str = CLASSIFIED_PARTITION_FIELD):
+    """
+    이름으로 벡터 DB 하나를 초기화합니다. (VECTOR_DB_NAMES 중 하나)
+    index_type은 faiss_*에, babylove_backend는 chroma_baby_love에 적용됩니다.
+    classified_partition_field가 있으면 flat faiss_classified를 그 메타데이터(주제)별 파티션으로 나눕니다.
+    """
+    save_path = vector_db_path(name, vector_db_dir, index_type, babylove_backend, classified_partition_field)
+    if name in ("faiss_classified", "faiss_expanded"):
+        data_file = CLASSIFIED_DATA_FILE if name == "faiss_classified" else EXPANDED_DATA_FILE
+        path = os.path.join(data_dir, data_file)
+        # 설정에 따라 FAISS, 양자화 또는 파티션 인덱스
+        if index_type == "quantized":
+            return init_quantized(path, save_path, embedding)
+        if name == "faiss_classified" and classified_partition_field:
+            return init_partitioned(path, save_path, classified_partition_field, embedding)
+        return init_faiss(path, save_path, embedding)
+
+    babylove_path = os.path.join(data_dir, BABYLOVE_DATA_FILE)
+    if babylove_backend == "partitioned":
+        return init_partitioned(babylove_path, save_path, "category_name", embedding)
+    if babylove_backend == "numpy":
+        return init_numpy(babylove_path, save_path, embedding)
+    return init_chroma(babylove_path, save_path, "baby_love_contents", embedding)
+
+# 벡터 DB와 검색 도구 초기화
+def initialize_search_tools(embedding=None, data_dir: str = DATA_DIR, vector_db_dir: str = VECTOR_DB_DIR,
+                            index_type: str = VECTOR_INDEX_TYPE, babylove_backend: str = BABYLOVE_BACKEND,
+                            cache_size: int = SEARCH_CACHE_SIZE, fallback_embedding=None,
+                            fallback_vector_db_dir: str = FALLBACK_VECTOR_DB_DIR):
+    """
+    세 가지 벡터 DB를 초기화하고 검색 도구를 만듭니다.
+    embedding: 사용할 임베딩 (없으면 OpenAI 임베딩, 평가/벤치마크에서 교체 가능)
+    vector_db_dir: 버전 구조(CURRENT 파일)이면 CURRENT가 가리키는 버전을 씀
+    fallback_embedding: 원격 임베딩이 응답하지 않을 때 검색할 대체 벡터 DB의 임베딩
+        (없으면 FALLBACK_EMBEDDING_MODEL이 설정된 경우에만 로컬 임베딩으로 fallback_vector_db_dir에 만듦)
+    반환: (검색 도구 리스트, 벡터 DB 딕셔너리, None)
+    """
+    # 세 벡터 DB가 임베딩 하나를 같이 써야 질의 임베딩이 한 배치로 모임
+    embedding = embedding or get_embedding()
+    vector_db_dir = resolve_vector_db_dir(vector_db_dir)
+    try:
+        faiss_classified, faiss_expanded, chroma_baby_love = (
+            init_vector_db(name, embedding, data_dir, vector_db_dir, index_type, babylove_backend)
+            for name in VECTOR_DB_NAMES
+        )
+        fallback_dbs = {}
+        if fallback_embedding is None and FALLBACK_EMBEDDING_MODEL:
+            fallback_embedding = get_fallback_embedding()
+        if fallback_embedding is not None:
+            fallback_dbs = {
+                name: init_vector_db(name, fallback_embedding, data_dir, fallback_vector_db_dir, index_type,
+                                     babylove_backend)
+                for name in VECTOR_DB_NAMES
+            }
+        
+        # 분류 게시글이 주제별 파티션이면 주제로 검색 범위를 좁힐 수 있음
+        classified_topics = []
+        if isinstance(faiss_classified, PartitionedVectorStore):
+            classified_topics = CLASSIFIED_TOPICS + [UNCATEGORIZED]
+
+        # 개별 검색 도구 생성
+        search_tools = []
+        
+        if faiss_classified:
+            search_tools.append(
+                SearchTool(
+                    name="분류_게시글_검색",
+                    description="육아 관련 분류된 게시글에서 정보를 검색합니다.",
+                    vector_db=faiss_classified,
+                    fallback_db=fallback_dbs.get("faiss_classified"),
+                    db_type="분류_게시글",
+                    k=RETRIEVAL_K,
+                    category_field=CLASSIFIED_PARTITION_FIELD or None,
+                    categories=classified_topics,
+                    cache_size=cache_size
+                )
+            )
+        
+        if faiss_expanded:
+            search_tools.append(
+                SearchTool(
+                    name="확장_정보_검색",
+                    description="육아 관련 상세 정보와 추가 설명이 포함된 확장 정보를 검색합니다.",
+                    vector_db=faiss_expanded,
+                    fallback_db=fallback_dbs.get("faiss_expanded"),
+                    db_type="확장_정보",
+                    k=RETRIEVAL_K,
+                    cache_size=cache_size
+                )
+            )
+        
+        if chroma_baby_love:
+            search_tools.append(
+                SearchTool(
+                    name="베이비러브_정보_검색",
+                    description="베이비러브 콘텐츠에서 정보를 검색합니다.",
+                    vector_db=chroma_baby_love,
+                    fallback_db=fallback_dbs.get("chroma_baby_love"),
+                    db_type="베이비러브",
+                    k=RETRIEVAL_K,
+                    category_field="category_name",
+                    categories=BABYLOVE_CATEGORIES,
+                    cache_size=cache_size
+                )
+            )
+        
+        # 벡터 DB 사전 생성 (원래 코드와의 호환성을 위해)
+        vector_dbs = {
+            "faiss_classified": faiss_classified,
+            "faiss_expanded": faiss_expanded,
+            "chroma_baby_love": chroma_baby_love
+        }
+        
+        return search_tools, vector_dbs, None
+    
+    except Exception as e:
+        logger.error(f"검색 도구 초기화 오류: {str(e)}")
+        return [], {}, None
@@ -0,0 +1,268 @@
+"""
+벡터 DB 버전 관리와 무중단 교체
+
+인덱스를 다시 만들 때마다 VECTOR_DB_DIR/versions/<버전>에 새 폴더로 만들고, 다 만든 뒤 CURRENT 파일을
+그 버전 이름으로 바꿉니다 (rag.index.publish_version, os.replace로 원자적).
+추론 서버는 IndexWatcher가 INDEX_WATCH_INTERVAL초마다 CURRENT를 확인하고, 바뀌면 백그라운드 스레드에서
+새 버전의 검색 도구를 만들고 검색 캐시를 미리 채운 뒤 IndexManager.swap으로 교체합니다.
+- 요청은 IndexManager.lease()로 그 시점의 세대(IndexGeneration)를 빌려 검색하므로, 한 요청 안에서는
+  항상 같은 버전의 도구들을 씁니다. 교체는 다음 요청부터 적용됩니다.
+- 교체된 이전 세대는 빌려 간 검색이 모두 끝나면 검색 캐시를 비우고 참조를 놓습니다 (메모리 해제).
+- 새 버전을 불러오지 못하거나, 이전 버전에 있던 벡터 DB가 빠져 있으면 교체하지 않고 이전 버전으로 계속 서비스합니다.
+모델은 다시 올리지 않고 세션도 유지됩니다. 사전 fork 모드에서는 작업 프로세스마다 따로 새 버전을 불러옵니다.
+
+메트릭: rag_index_swaps_total, rag_index_reload_failures_total, rag_index_load_seconds,
+        rag_index_retired_leases (교체됐지만 아직 검색 중인 이전 세대의 요청 수, 게이지)
+
+사용법:
+    python -m rag.index_versions status
+    python -m rag.index_versions build                 # DATA_DIR로 새 버전을 만들고 CURRENT를 바꿈
+    python -m rag.index_versions build --no-publish
+    python -m rag.index_versions publish 20250301-120000   # 되돌리기
+    python -m rag.index_versions prune --keep 3
+"""
+import argparse
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from rag.config import (
+    DATA_DIR, EMBED_BATCH_SIZE, INDEX_KEEP_VERSIONS, INDEX_VERSIONS_DIR, INDEX_WATCH_INTERVAL, VECTOR_DB_DIR,
+    WARMUP_QUERIES_PATH,
+)
+from rag.index import current_version, index_version, publish_version, version_dir
+from rag.telemetry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexGeneration:
+    """한 버전의 벡터 DB로 만든 검색 도구 묶음"""
+    version: Optional[str]  # 기존 구조(CURRENT 없음)면 None
+    path: str
+    search_tools: List[Any]
+    vector_dbs: Dict[str, Any] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.time)
+    leases: int = 0
+    retired: bool = False
+
+
+def load_generation(vector_db_dir: str = VECTOR_DB_DIR, version: Optional[str] = None, data_dir: str = DATA_DIR,
+                    warmup_path: Optional[str] = WARMUP_QUERIES_PATH, require: Sequence[str] = ()) -> IndexGeneration:
+    """
+    version의 검색 도구를 만들고 자주 묻는 질문으로 검색 캐시를 채웁니다.
+    version이 없으면 CURRENT가 가리키는 버전 (기존 구조면 vector_db_dir 자체)
+    require: 버전 폴더에 이미 있어야 하는 벡터 DB 이름 (없으면 FileNotFoundError, 서비스 중에 원본으로
+             인덱스를 새로 만들지 않도록)
+    """
+    from rag.index import initialize_search_tools, vector_db_path
+    from rag.search import read_questions, warm_search_cache
+
+    start = time.perf_counter()
+    version = version or current_version(vector_db_dir)
+    path = version_dir(vector_db_dir, version) if version else vector_db_dir
+    missing = [name for name in require if not os.path.exists(vector_db_path(name, path))]
+    if missing:
+        raise FileNotFoundError(f"{path}에 벡터 DB가 없습니다: {', '.join(missing)}")
+    search_tools, vector_dbs, _ = initialize_search_tools(data_dir=data_dir, vector_db_dir=path)
+    if warmup_path and os.path.exists(warmup_path):
+        warm_search_cache(search_tools, read_questions(warmup_path), EMBED_BATCH_SIZE)
+    REGISTRY.observe("rag_index_load_seconds", time.perf_counter() - start)
+    return IndexGeneration(version, path, search_tools, vector_dbs)
+
+
+class IndexManager:
+    """서비스 중인 IndexGeneration과 그 교체"""
+
+    def __init__(self, generation: IndexGeneration,
+                 on_swap: Optional[Callable[[IndexGeneration], None]] = None):
+        self._current = generation
+        self._retired: List[IndexGeneration] = []
+        self._lock = threading.Lock()
+        self.on_swap = on_swap  # 교체 직후 호출 (Pipeline 필드, FAQ 저장소 갱신)
+
+    @property
+    def current(self) -> IndexGeneration:
+        return self._current
+
+    @contextmanager
+    def lease(self) -> Iterator[IndexGeneration]:
+        """요청 하나 동안 쓸 세대. 빌린 동안에는 교체되더라도 해제되지 않습니다."""
+        with self._lock:
+            generation = self._current
+            generation.leases += 1
+        try:
+            yield generation
+        finally:
+            with self._lock:
+                generation.leases -= 1
+                release = generation.retired and generation.leases == 0
+                if release:
+                    self._retired.remove(generation)
+                self._update_gauge()
+            if release:
+                self._release(generation)
+
+    def swap(self, generation: IndexGeneration) -> None:
+        with self._lock:
+            old, self._current = self._current, generation
+            old.retired = True
+            release = old.leases == 0
+            if not release:
+                self._retired.append(old)
+            self._update_gauge()
+        REGISTRY.inc("rag_index_swaps_total")
+        logger.info(f"검색 인덱스를 {old.version or old.path} -> {generation.version or generation.path}로 교체했습니다.")
+        if self.on_swap is not None:
+            self.on_swap(generation)
+        if release:
+            self._release(old)
+        else:
+            logger.info(f"이전 인덱스는 진행 중인 검색 {old.leases}건이 끝나면 해제합니다.")
+
+    def stats(self) -> Dict[str, Any]:
+        generation = self._current
+        with self._lock:
+            retired = sum(g.leases for g in self._retired)
+        return {"version": generation.version, "path": generation.path,
+                "loaded_at": round(generation.loaded_at, 3), "retired_leases": retired}
+
+    def _update_gauge(self) -> None:
+        REGISTRY.set_gauge("rag_index_retired_leases", sum(g.leases for g in self._retired))
+
+    def _release(self, generation: IndexGeneration) -> None:
+        for tool in generation.search_tools:
+            tool.clear_cache()
+        generation.search_tools, generation.vector_dbs = [], {}
+        logger.info(f"이전 인덱스 {generation.version or generation.path}를 해제했습니다.")
+
+
+class IndexWatcher:
+    """CURRENT 파일을 주기적으로 확인해 새 버전을 불러오고 교체하는 백그라운드 스레드"""
+
+    def __init__(self, manager: IndexManager, vector_db_dir: str = VECTOR_DB_DIR,
+                 interval: float = INDEX_WATCH_INTERVAL,
+                 loader: Callable[..., IndexGeneration] = load_generation):
+        self.manager = manager
+        self.vector_db_dir = vector_db_dir
+        self.interval = interval
+        self.loader = loader
+        self._failed: Optional[str] = None  # 불러오지 못한 버전 (CURRENT가 다시 바뀔 때까지 재시도하지 않음)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def check(self) -> bool:
+        """CURRENT가 바뀌었으면 새 버전으로 교체합니다. 반환: 교체했는지 여부"""
+        version = current_version(self.vector_db_dir)
+        if version is None or version == self.manager.current.version or version == self._failed:
+            return False
+        logger.info(f"새 검색 인덱스 버전 {version}을 불러옵니다.")
+        loaded = [name for name, db in self.manager.current.vector_dbs.items() if db is not None]
+        try:
+            generation = self.loader(self.vector_db_dir, version, require=loaded)
+            missing = [name for name in loaded if generation.vector_dbs.get(name) is None]
+            if missing or not generation.search_tools:
+                raise ValueError(f"벡터 DB를 불러오지 못했습니다: {', '.join(missing) or '전체'}")
+        except Exception as e:
+            logger.error(f"검색 인덱스 버전 {version}을 쓰지 않고 이전 버전으로 계속합니다: {str(e)}")
+            REGISTRY.inc("rag_index_reload_failures_total")
+            self._failed = version
+            return False
+        self._failed = None
+        self.manager.swap(generation)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"검색 인덱스 확인 중 오류 발생: {str(e)}")
+
+
+def list_versions(vector_db_dir: str = VECTOR_DB_DIR) -> List[str]:
+    """버전 이름 목록 (오래된 것부터, 폴더 수정 시각 기준)"""
+    root = os.path.join(vector_db_dir, INDEX_VERSIONS_DIR)
+    if not os.path.isdir(root):
+        return []
+    names = [name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))]
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(root, name)))
+
+
+def build_version(vector_db_dir: str = VECTOR_DB_DIR, version: Optional[str] = None, data_dir: str = DATA_DIR,
+                  publish: bool = True) -> str:
+    """data_dir의 원본으로 새 버전 폴더에 세 벡터 DB를 모두 만듭니다. 반환: 버전 이름"""
+    from rag.index import VECTOR_DB_NAMES, initialize_search_tools
+
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    path = version_dir(vector_db_dir, version)
+    if os.path.exists(path):
+        raise FileExistsError(f"이미 있는 버전입니다: {path}")
+    os.makedirs(path)
+    _, vector_dbs, _ = initialize_search_tools(data_dir=data_dir, vector_db_dir=path)
+    missing = [name for name in VECTOR_DB_NAMES if vector_dbs.get(name) is None]
+    if missing:
+        shutil.rmtree(path, ignore_errors=True)
+        raise RuntimeError(f"벡터 DB를 만들지 못했습니다: {', '.join(missing)}")
+    if publish:
+        publish_version(vector_db_dir, version)
+    return version
+
+
+def prune_versions(vector_db_dir: str = VECTOR_DB_DIR, keep: int = INDEX_KEEP_VERSIONS) -> List[str]:
+    """
+    최근 keep개 버전과 현재 버전을 남기고 지웁니다. 반환: 지운 버전
+    교체 직후 이전 버전으로 검색 중인 서버가 있을 수 있으므로 keep은 2 이상으로 둡니다.
+    """
+    current = current_version(vector_db_dir)
+    versions = list_versions(vector_db_dir)
+    removed = [v for v in versions[:max(len(versions) - keep, 0)] if v != current]
+    for version in removed:
+        shutil.rmtree(version_dir(vector_db_dir, version))
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터 DB 버전 관리")
+    parser.add_argument("command", choices=["status", "build", "publish", "prune"])
+    parser.add_argument("version", nargs="?", help="build: 새 버전 이름 (기본값: 현재 시각), publish: 서비스할 버전")
+    parser.add_argument("--vector-db-dir", default=VECTOR_DB_DIR)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--no-publish", action="store_true", help="build 후 CURRENT를 바꾸지 않음")
+    parser.add_argument("--keep", type=int, default=INDEX_KEEP_VERSIONS, help="prune 시 남길 버전 수")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "build":
+        version = build_version(args.vector_db_dir, args.version, args.data_dir, publish=not args.no_publish)
+        print(f"버전 {version}을 만들었습니다." + ("" if args.no_publish else " 서비스 버전으로 지정했습니다."))
+    elif args.command == "publish":
+        if not args.version:
+            parser.error("publish에는 버전 이름이 필요합니다.")
+        publish_version(args.vector_db_dir, args.version)
+        print(f"서비스 버전을 {args.version}(으)로 바꿨습니다.")
+    elif args.command == "prune":
+        removed = prune_versions(args.vector_db_dir, args.keep)
+        print(f"버전 {len(removed)}개를 지웠습니다: {', '.join(removed)}" if removed else "지울 버전이 없습니다.")
+    else:
+        current = current_version(args.vector_db_dir)
+        print(f"서비스 버전: {current or '(버전 구조 아님)'} (내용 해시 {index_version(args.vector_db_dir)})")
+        for version in list_versions(args.vector_db_dir):
+            print(f"{'*' if version == current else ' '} {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+크롤링한 카페 게시글 증분 색인 데몬
+
+크롤러(crawl/cafe-crawl-*)가 INGEST_WATCH_DIRS에 articles_<시작>_<끝>.json을 쓰면, 파일을 읽어
+merged_improved.py와 같은 방식으로 정리(source_file 추가, 댓글 제거)하고, classified_contents.json과 같이
+rag.classify로 정보/비정보(category, confidence)와 주제(topic)를 붙인 뒤 INGEST_BATCH_SIZE개씩 임베딩해
+분류_게시글 벡터 DB(faiss_classified, 주제별 파티션이면 해당 파티션)에 추가합니다. 전체 인덱스를 다시 만들지 않습니다.
+- 인덱스를 만들 때와 같이 "비정보"이거나 신뢰도가 MIN_CATEGORY_CONFIDENCE보다 낮은 글은 넣지 않습니다.
+  (크롤러의 게시판 이름은 분류 라벨과 섞이지 않도록 board에 저장)
+- 게시글은 "cafe:<게시글 id>"로 저장하므로 같은 게시글이 다시 크롤링되면 본문이 바뀐 경우에만 다시 분류해 교체합니다.
+- 변경 사항은 INGEST_PUBLISH_INTERVAL초마다 모아서, 현재 버전 폴더를 복사한 새 버전에 저장하고 publish합니다.
+  바뀌지 않는 벡터 DB(BM25, 월령별, 베이비러브 등) 파일은 하드 링크로 공유하므로 publish마다 디스크를 더 쓰지 않습니다.
+  추론 서버는 IndexWatcher가 새 버전을 불러와 무중단으로 교체합니다. (rag.index_versions)
+- 색인한 파일의 (수정 시각, 크기)를 버전 폴더의 INGEST_OFFSETS_FILE에 같이 저장하므로, 다시 시작하면
+  CURRENT가 가리키는 버전에 들어 있지 않은 파일만 읽습니다. 인덱스를 새로 만들거나(build) 되돌리면(publish)
+  그 버전의 기록을 기준으로 빠진 게시글을 다시 추가합니다.
+- 버전 폴더 기록에 바탕이 된 전체 빌드의 버전(base_index_version)도 남기므로, FAQ 답변 저장소는 게시글이
+  추가되어도 계속 쓰입니다. (인덱스를 새로 만들면 FAQ도 다시 만들어야 함)
+- 크롤러가 쓰는 중인 파일은 INGEST_SETTLE_SECONDS초 동안 바뀌지 않을 때까지 기다리고, JSON이 깨진 파일은
+  다시 바뀔 때까지 건너뜁니다.
+폴더 감시는 watchdog을 쓰고, 설치되어 있지 않으면 INGEST_POLL_INTERVAL초마다 폴더를 확인합니다.
+
+메트릭: rag_ingest_files_total{result="ok"|"error"}, rag_ingest_articles_total{result="added"|"updated"|
+        "unchanged"|"filtered"}, rag_ingest_publish_total, rag_ingest_publish_seconds,
+        rag_ingest_lag_seconds (파일 저장부터 publish까지)
+
+사용법:
+    python -m rag.ingest                       # 감시 시작 (Ctrl+C 또는 SIGTERM이면 남은 변경을 publish하고 종료)
+    python -m rag.ingest --once                # 지금 있는 파일만 색인하고 publish
+    python -m rag.ingest --watch-dir ./crawl/cafe-crawl-all-data/output --publish-interval 300
+    (분류 모델이 필요하므로 처음에는 CLASSIFIER_MODEL을 내려받습니다)
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import threading
+import time
+from fnmatch import fnmatch
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain.docstore.document import Document
+from langchain_community.vectorstores import FAISS
+
+from rag.config import (
+    EXCLUDED_CATEGORIES, INDEX_CURRENT_FILE, INDEX_KEEP_VERSIONS, INDEX_VERSIONS_DIR, INGEST_BATCH_SIZE,
+    INGEST_FILE_PATTERN, INGEST_OFFSETS_FILE, INGEST_POLL_INTERVAL, INGEST_PUBLISH_INTERVAL, INGEST_SETTLE_SECONDS,
+    INGEST_WATCH_DIRS, MIN_CATEGORY_CONFIDENCE, VECTOR_DB_DIR, VECTOR_INDEX_TYPE,
+)
+from rag.classify import ContentClassifier
+from rag.index import (
+    base_index_version, current_version, get_embedding, publish_version, resolve_vector_db_dir, vector_db_path,
+    version_dir,
+)
+from rag.index_versions import prune_versions
+from rag.partition import PartitionedVectorStore, keep_informative
+from rag.telemetry import REGISTRY, instrument_embedding, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+TARGET = "faiss_classified"  # 게시글을 추가할 벡터 DB (메타데이터가 분류 게시글과 같음)
+ARTICLE_ID_PREFIX = "cafe:"  # 원본 인덱스 문서 id와 겹치지 않도록 붙이는 접두어
+
+Stamp = List[int]  # [st_mtime_ns, st_size]
+
+
+def normalize_article(item: Dict[str, Any], source_file: str, is_info: bool = True) -> Dict[str, Any]:
+    """merged_improved.process_item과 같은 정리 (원본 복사, source_file 추가, is_info면 댓글 제거)"""
+    article = item.copy()
+    article["source_file"] = source_file
+    if is_info and "comments" in article:
+        del article["comments"]
+    return article
+
+
+def article_document(article: Dict[str, Any]) -> Optional[Document]:
+    """정리한 게시글 하나를 Document로 변환합니다. id나 본문이 없으면 None"""
+    body = str(article.get("contentText") or article.get("content") or "").strip()
+    if article.get("id") in (None, "") or not body:
+        return None
+    title = str(article.get("title") or "").strip()
+    text = body if not title or body.startswith(title) else f"{title}\n{body}"
+    meta = {"id": f"{ARTICLE_ID_PREFIX}{article['id']}", "source_file": article["source_file"]}
+    # 크롤러의 category(메뉴 매핑 크롤러는 menuName)는 게시판 이름이라 분류 라벨(category)과 따로 둠
+    board = article.get("menuName") or article.get("category")
+    if board:
+        meta["board"] = board
+    for key in ("title", "url", "date"):
+        if article.get(key):
+            meta[key] = article[key]
+    return Document(page_content=text, metadata=meta)
+
+
+def read_articles(path: str) -> List[Dict[str, Any]]:
+    """크롤러 출력 파일의 게시글 목록 ({"articles": [...]}, 게시글 리스트, 게시글 하나 모두 허용)"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data["articles"] if isinstance(data.get("articles"), list) else [data]
+    if not isinstance(data, list):
+        raise ValueError(f"게시글 목록이 아닙니다: {type(data).__name__}")
+    return [item for item in data if isinstance(item, dict)]
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """
+    shutil.copytree의 copy_function. 버전 폴더의 파일은 만든 뒤 바꾸지 않으므로(읽기 전용 mmap) 하드 링크로
+    공유하고, 다른 파일 시스템이라 링크할 수 없으면 복사합니다.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def read_offsets(path: str) -> Dict[str, Stamp]:
+    """버전 폴더 path에 들어 있는 파일 기록 (없으면 빈 기록)"""
+    try:
+        with open(os.path.join(path, INGEST_OFFSETS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except FileNotFoundError:
+        return {}
+
+
+def write_offsets(path: str, offsets: Dict[str, Stamp], base_version: str) -> None:
+    """base_version: 바탕이 된 전체 빌드의 버전 (rag.index.base_index_version)"""
+    with open(os.path.join(path, INGEST_OFFSETS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"files": offsets, "base_index_version": base_version, "updated_at": time.time()},
+                  f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_store(save_path: str, embedding) -> Any:
+    """flat FAISS 또는 파티션 벡터 DB (rag.index.init_vector_db가 저장한 형식)"""
+    if os.path.exists(os.path.join(save_path, "partitions.json")):
+        return PartitionedVectorStore.load_local(save_path, embedding)
+    return FAISS.load_local(save_path, embedding, allow_dangerous_deserialization=True)
+
+
+def document_count(db: Any) -> int:
+    return db.ntotal if isinstance(db, PartitionedVectorStore) else db.index.ntotal
+
+
+class Ingestor:
+    """크롤러 출력 파일을 분류_게시글 벡터 DB에 증분 추가하고 새 버전으로 publish"""
+
+    def __init__(self, watch_dirs: Sequence[str] = INGEST_WATCH_DIRS, vector_db_dir: str = VECTOR_DB_DIR,
+                 embedding=None, classifier: Optional[ContentClassifier] = None, pattern: str = INGEST_FILE_PATTERN,
+                 batch_size: int = INGEST_BATCH_SIZE, publish_interval: float = INGEST_PUBLISH_INTERVAL,
+                 settle: float = INGEST_SETTLE_SECONDS, poll_interval: float = INGEST_POLL_INTERVAL,
+                 keep: int = INDEX_KEEP_VERSIONS):
+        if VECTOR_INDEX_TYPE != "flat":
+            raise ValueError(f"증분 추가는 flat(파티션 포함) 인덱스만 지원합니다: {VECTOR_INDEX_TYPE}")
+        self.watch_dirs = list(watch_dirs)
+        self.vector_db_dir = vector_db_dir
+        self.target = TARGET
+        self.embedding = instrument_embedding(embedding or get_embedding(), TARGET)
+        self.classifier = classifier or ContentClassifier()
+        self.pattern = pattern
+        self.batch_size = batch_size
+        self.publish_interval = publish_interval
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self.keep_doc = keep_informative(EXCLUDED_CATEGORIES, MIN_CATEGORY_CONFIDENCE)
+        self.wake = threading.Event()  # 파일 이벤트가 오면 set
+        self.db: Any = None  # FAISS 또는 PartitionedVectorStore
+        self.offsets: Dict[str, Stamp] = {}  # 메모리의 db에 들어 있는 파일 (publish 전 포함)
+        self._base: Optional[str] = None  # 메모리의 db를 불러온 버전
+        self._bad: Dict[str, Stamp] = {}  # 읽지 못한 파일 (바뀔 때까지 건너뜀)
+        self._unpublished: List[float] = []  # publish 전에 색인한 파일의 수정 시각
+        self._settling = False
+        self._last_publish = 0.0
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._unpublished)
+
+    def load(self) -> None:
+        """CURRENT가 가리키는 버전의 벡터 DB와 파일 기록을 불러옵니다. 다른 곳에서 publish했으면 다시 불러옴"""
+        version = current_version(self.vector_db_dir)
+        if self.db is not None and version == self._base:
+            return
+        if self.dirty:
+            logger.warning(f"다른 버전({version})이 publish되어 아직 publish하지 않은 게시글을 그 버전에 다시 추가합니다.")
+        path = resolve_vector_db_dir(self.vector_db_dir)
+        save_path = vector_db_path(self.target, path, index_type="flat")
+        if not os.path.exists(save_path):
+            raise FileNotFoundError(f"{save_path}가 없습니다. 먼저 python -m rag.index_versions build로 인덱스를 만드세요.")
+        self.db = load_store(save_path, self.embedding)
+        self.offsets = read_offsets(path)
+        self._base, self._unpublished = version, []
+        logger.info(f"{save_path}를 불러왔습니다. (문서 {document_count(self.db)}개, 색인한 파일 {len(self.offsets)}개)")
+
+    def scan(self) -> List[Tuple[str, Stamp]]:
+        """읽을 차례인 파일 (기록과 다르고 settle초 동안 바뀌지 않은 파일)"""
+        now = time.time()
+        ready, self._settling = [], False
+        for directory in self.watch_dirs:
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if not fnmatch(name, self.pattern):
+                    continue
+                path = os.path.normpath(os.path.join(directory, name))
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                stamp = [st.st_mtime_ns, st.st_size]
+                if self.offsets.get(path) == stamp or self._bad.get(path) == stamp:
+                    continue
+                if now - st.st_mtime < self.settle:
+                    self._settling = True
+                    continue
+                ready.append((path, stamp))
+        return ready
+
+    def ingest_file(self, path: str, stamp: Stamp) -> Dict[str, int]:
+        """파일 하나의 게시글을 db에 추가합니다. 반환: 결과별 게시글 수"""
+        try:
+            articles = read_articles(path)
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.warning(f"{path}를 읽지 못해 파일이 바뀔 때까지 건너뜁니다: {str(e)}")
+            REGISTRY.inc("rag_ingest_files_total", result="error")
+            self._bad[path] = stamp
+            return {}
+        source_file = os.path.basename(path)
+        docs = [doc for doc in (article_document(normalize_article(item, source_file)) for item in articles) if doc]
+        counts = self.upsert(docs)
+        for result, n in counts.items():
+            REGISTRY.inc("rag_ingest_articles_total", n, result=result)
+        REGISTRY.inc("rag_ingest_files_total", result="ok")
+        self.offsets[path] = stamp
+        self._bad.pop(path, None)
+        self._unpublished.append(stamp[0] / 1e9)
+        logger.info(f"{source_file}: " + ", ".join(f"{result} {n}" for result, n in counts.items()))
+        return counts
+
+    def upsert(self, docs: List[Document]) -> Dict[str, int]:
+        """
+        게시글 id 기준으로 추가합니다. 이미 있는 게시글은 본문이 같으면 건너뛰고, 다르면 다시 분류해 교체합니다.
+        분류 결과 제외 대상이면 추가하지 않고, 이미 들어 있던 글이면 지웁니다.
+        분류와 임베딩을 먼저 한 뒤 지우고 추가하므로, 중간에 실패해도 기존 문서는 남습니다.
+        """
+        latest = {doc.metadata["id"]: doc for doc in docs}  # 같은 파일에 같은 게시글이 있으면 마지막 것
+        existing = {doc.id: doc for doc in self.db.get_by_ids(list(latest))}
+        changed = [doc for doc_id, doc in latest.items()
+                   if doc_id not in existing or existing[doc_id].page_content != doc.page_content]
+        counts = {"added": 0, "updated": 0, "unchanged": len(latest) - len(changed), "filtered": 0}
+        for start in range(0, len(changed), self.batch_size):
+            batch = changed[start:start + self.batch_size]
+            for doc, labels in zip(batch, self.classifier.classify([doc.page_content for doc in batch])):
+                doc.metadata.update(category=labels["category"], confidence=labels["confidence"],
+                                    topic=labels["topic"])
+            kept = [doc for doc in batch if self.keep_doc(doc)]
+            texts = [doc.page_content for doc in kept]
+            vectors = self.embedding.embed_documents(texts) if kept else []
+            removed = [doc.metadata["id"] for doc in batch if doc.metadata["id"] in existing]
+            if removed:
+                self.db.delete(removed)
+            if kept:
+                self.db.add_embeddings(list(zip(texts, vectors)), [doc.metadata for doc in kept],
+                                       ids=[doc.metadata["id"] for doc in kept])
+            updated = sum(doc.metadata["id"] in existing for doc in kept)
+            counts["updated"] += updated
+            counts["added"] += len(kept) - updated
+            counts["filtered"] += len(batch) - len(kept)
+        return counts
+
+    def publish(self) -> Optional[str]:
+        """
+        현재 버전 폴더를 새 버전으로 복사(바뀌지 않는 벡터 DB 파일은 하드 링크)하고, 대상 벡터 DB와 파일 기록만
+        새로 저장한 뒤 publish합니다.
+        반환: 새 버전 이름 (변경이 없거나, 그 사이 다른 버전이 publish되어 취소했으면 None)
+        """
+        if not self.dirty:
+            return None
+        start = time.perf_counter()
+        base = resolve_vector_db_dir(self.vector_db_dir)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        version, n = f"{stamp}-ingest", 1
+        while os.path.exists(version_dir(self.vector_db_dir, version)):
+            n += 1
+            version = f"{stamp}-ingest{n}"
+        path = version_dir(self.vector_db_dir, version)
+        target_folder = os.path.basename(vector_db_path(self.target, base, index_type="flat"))
+        base_version = base_index_version(self.vector_db_dir)
+
+        def ignore(directory: str, names: List[str]) -> List[str]:
+            if os.path.normpath(directory) != os.path.normpath(base):
+                return []
+            # 기존 구조 폴더 안의 버전들과 CURRENT, 새로 저장할 대상 벡터 DB는 복사하지 않음
+            skip = {INDEX_VERSIONS_DIR, INDEX_CURRENT_FILE, INGEST_OFFSETS_FILE, target_folder}
+            return [name for name in names if name in skip or name.startswith(f".{INDEX_CURRENT_FILE}.")]
+
+        try:
+            shutil.copytree(base, path, ignore=ignore, copy_function=link_or_copy)
+            self.db.save_local(vector_db_path(self.target, path, index_type="flat"))
+            write_offsets(path, self.offsets, base_version)
+            if current_version(self.vector_db_dir) != self._base:
+                raise RuntimeError("색인 중에 다른 버전이 publish되었습니다.")
+            publish_version(self.vector_db_dir, version)
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+        now = time.time()
+        for mtime in self._unpublished:
+            REGISTRY.observe("rag_ingest_lag_seconds", now - mtime)
+        REGISTRY.inc("rag_ingest_publish_total")
+        REGISTRY.observe("rag_ingest_publish_seconds", time.perf_counter() - start)
+        logger.info(f"새 게시글 파일 {len(self._unpublished)}개를 버전 {version}으로 publish했습니다. "
+                    f"(문서 {document_count(self.db)}개)")
+        self._base, self._unpublished = version, []
+        self._last_publish = time.monotonic()
+        removed = prune_versions(self.vector_db_dir, self.keep)
+        if removed:
+            logger.info(f"오래된 버전 {len(removed)}개를 지웠습니다: {', '.join(removed)}")
+        return version
+
+    def run_once(self) -> Optional[str]:
+        """지금 읽을 수 있는 파일을 모두 색인하고 publish 간격과 관계없이 바로 publish합니다."""
+        self.load()
+        for path, stamp in self.scan():
+            self.ingest_file(path, stamp)
+        return self.publish()
+
+    def run(self, stop: threading.Event) -> None:
+        """stop이 set될 때까지 파일 이벤트(또는 poll_interval)마다 색인하고, publish_interval마다 publish"""
+        while not stop.is_set():
+            try:
+                self.load()
+                for path, stamp in self.scan():
+                    if stop.is_set():
+                        break
+                    self.ingest_file(path, stamp)
+                if self.dirty and time.monotonic() - self._last_publish >= self.publish_interval:
+                    self.publish()
+            except Exception as e:
+                # 임베딩 실패 등: 기록하지 않은 파일은 다음 확인 때 다시 읽음
+                logger.error(f"게시글 색인 중 오류 발생: {str(e)}")
+            waits = [self.poll_interval]
+            if self._settling:
+                waits.append(self.settle)
+            if self.dirty:
+                waits.append(self.publish_interval - (time.monotonic() - self._last_publish))
+            self.wake.wait(max(min(waits), 0.1))
+            self.wake.clear()
+        if self.dirty:
+            self.publish()
+
+
+def start_observer(ingestor: Ingestor):
+    """감시 폴더에 파일 이벤트가 오면 ingestor.wake를 set하는 watchdog Observer (watchdog이 없으면 None)"""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        logger.warning(f"watchdog이 설치되어 있지 않아 {ingestor.poll_interval:g}초마다 폴더를 확인합니다.")
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            paths = (event.src_path, getattr(event, "dest_path", ""))
+            if not event.is_directory and any(fnmatch(os.path.basename(p), ingestor.pattern) for p in paths if p):
+                ingestor.wake.set()
+
+    observer = Observer()
+    for directory in ingestor.watch_dirs:
+        if os.path.isdir(directory):
+            observer.schedule(Handler(), directory, recursive=False)
+        else:
+            logger.warning(f"감시 폴더가 없어 건너뜁니다: {directory}")
+    observer.start()
+    return observer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="크롤링한 카페 게시글 증분 색인 데몬")
+    parser.add_argument("--watch-dir", action="append", help="감시할 크롤러 출력 폴더 (여러 번 지정 가능, "
+                                                             "기본값: INGEST_WATCH_DIRS)")
+    parser.add_argument("--vector-db-dir", default=VECTOR_DB_DIR)
+    parser.add_argument("--publish-interval", type=float, default=INGEST_PUBLISH_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="지금 있는 파일만 색인하고 종료")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Prometheus /metrics 포트 (0이면 사용 안 함)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ingestor = Ingestor(args.watch_dir or INGEST_WATCH_DIRS, args.vector_db_dir,
+                        publish_interval=args.publish_interval)
+    if args.once:
+        version = ingestor.run_once()
+        print(f"버전 {version}을 publish했습니다." if version else "새로 색인할 게시글이 없습니다.")
+        return
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    stop = threading.Event()
+
+    def request_stop(*_):
+        stop.set()
+        ingestor.wake.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, request_stop)
+    observer = start_observer(ingestor)
+    logger.info(f"게시글 색인 데몬을 시작합니다: {', '.join(ingestor.watch_dirs)}")
+    try:
+        ingestor.run(stop)
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+if __name__ == "__main__":
+    main()
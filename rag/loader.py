@@ -0,0 +1,164 @@
+"""
+JSON → Document 스트리밍 로더
+
+세 가지 입력 형식을 첫 번째 레코드만 보고 판별한 뒤, 파일 전체를 메모리에 올리지 않고
+Document를 하나씩 생성합니다.
+
+- classified_contents.json : {"post1": {"post": ..., "category": ..., "confidence": ..., "topic": ...}, ...}
+- expanded_info_contents.json : [{"post": ..., "comment": ...}, ...]
+- vector_db_final.json : [{"id": ..., "text": ..., "metadata": {...}}, ...]
+
+ijson이 설치되어 있으면 증분 파싱을 사용하고, 없으면 orjson(또는 json)으로 한 번에 읽습니다.
+"""
+import json
+from itertools import islice
+from typing import Any, Iterator, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+try:
+    import ijson  # 증분 JSON 파서 (선택)
+except ImportError:
+    ijson = None
+
+try:
+    import orjson  # 빠른 JSON 파서 (선택)
+except ImportError:
+    orjson = None
+
+# 입력 형식 이름
+FORMAT_CLASSIFIED = "classified"  # classified_contents.json
+FORMAT_EXPANDED = "expanded"  # expanded_info_contents.json
+FORMAT_VECTOR_DB = "vector_db"  # vector_db_final.json
+
+DEFAULT_BATCH_SIZE = 500  # 인덱스 빌드 시 한 번에 임베딩할 문서 수
+
+
+class UnknownFormatError(ValueError):
+    """JSON 구조를 세 가지 입력 형식 중 어느 것으로도 인식할 수 없을 때 발생"""
+
+
+def _peek_container(f) -> str:
+    """파일의 첫 번째 비공백 문자('{' 또는 '[')를 확인하고 파일 위치를 처음으로 되돌립니다."""
+    while True:
+        chunk = f.read(64)
+        if not chunk:
+            return ""
+        stripped = chunk.lstrip()
+        if stripped:
+            f.seek(0)
+            return chr(stripped[0])
+
+
+def _iter_records(path: str) -> Iterator[Tuple[str, Any, Any]]:
+    """(최상위 컨테이너 종류, 키 또는 인덱스, 레코드)를 순서대로 생성합니다."""
+    with open(path, "rb") as f:
+        container = _peek_container(f)
+
+        # 빈 리스트나 객체가 아닌 최상위 값은 기존 로더와 마찬가지로 인식 불가로 처리
+        # (빈 객체는 분류 게시글 형식으로 간주하여 문서 0개)
+        if container not in ("{", "["):
+            raise UnknownFormatError(f"`{path}`의 JSON 구조를 인식할 수 없습니다.")
+
+        if ijson is not None:
+            if container == "{":
+                for key, record in ijson.kvitems(f, "", use_float=True):
+                    yield container, key, record
+            else:
+                empty = True
+                for idx, record in enumerate(ijson.items(f, "item", use_float=True)):
+                    empty = False
+                    yield container, idx, record
+                if empty:
+                    raise UnknownFormatError(f"`{path}`의 JSON 구조를 인식할 수 없습니다.")
+            return
+
+        # ijson이 없으면 파일 전체를 한 번만 파싱
+        raw = f.read()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
+        if isinstance(data, dict):
+            for key, record in data.items():
+                yield "{", key, record
+        elif isinstance(data, list) and data:
+            for idx, record in enumerate(data):
+                yield "[", idx, record
+        else:
+            raise UnknownFormatError(f"`{path}`의 JSON 구조를 인식할 수 없습니다.")
+
+
+def detect_format(container: str, record: Any) -> Optional[str]:
+    """첫 번째 레코드로 입력 형식을 판별합니다. 알 수 없으면 None을 반환합니다."""
+    if not isinstance(record, dict):
+        return None
+    if container == "{" and "post" in record:
+        return FORMAT_CLASSIFIED
+    if container == "[" and "comment" in record:
+        return FORMAT_EXPANDED
+    if container == "[" and "text" in record:
+        return FORMAT_VECTOR_DB
+    return None
+
+
+def _to_document(fmt: str, key: Any, e: Any) -> Optional[Document]:
+    """레코드 하나를 Document로 변환합니다. 본문이 비어 있으면 None을 반환합니다."""
+    if not isinstance(e, dict):
+        return None
+
+    if fmt == FORMAT_CLASSIFIED:
+        text = e.get("post", "").strip()
+        if not text:
+            return None
+        meta = {"id": key}
+        if "category" in e:    meta["category"]   = e["category"]
+        if "confidence" in e:  meta["confidence"] = e["confidence"]
+        if "topic" in e:       meta["topic"]      = e["topic"]  # rag.classify의 주제 (파티션 기준)
+        return Document(page_content=text, metadata=meta)
+
+    if fmt == FORMAT_EXPANDED:
+        text = e.get("comment", "").strip()
+        if not text:
+            return None
+        meta = {"post": e.get("post", ""), "index": key}
+        return Document(page_content=text, metadata=meta)
+
+    # FORMAT_VECTOR_DB
+    text = e.get("text", "").strip()
+    if not text:
+        return None
+    meta = dict(e.get("metadata", {}))
+    if "id" in e:
+        meta.setdefault("id", e["id"])  # 평가 데이터의 정답 문서 ID와 맞추기 위해 보존
+    return Document(page_content=text, metadata=meta)
+
+
+def iter_documents_with_metadata(path: str) -> Iterator[Document]:
+    """
+    JSON 파일에서 Document를 하나씩 생성합니다.
+    첫 번째 레코드로 형식을 결정하며, 인식할 수 없으면 UnknownFormatError를 발생시킵니다.
+    """
+    fmt = None
+
+    for container, key, record in _iter_records(path):
+        if fmt is None:
+            fmt = detect_format(container, record)
+            if fmt is None:
+                raise UnknownFormatError(f"`{path}`의 JSON 구조를 인식할 수 없습니다.")
+
+        doc = _to_document(fmt, key, record)
+        if doc is not None:
+            yield doc
+
+
+def iter_document_batches(path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[list[Document]]:
+    """Document를 batch_size 단위 리스트로 묶어서 생성합니다. (인덱스 빌드용)"""
+    docs = iter_documents_with_metadata(path)
+    while True:
+        batch = list(islice(docs, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_documents_with_metadata(path: str) -> list[Document]:
+    """JSON 파일의 모든 Document를 리스트로 반환합니다."""
+    return list(iter_documents_with_metadata(path))
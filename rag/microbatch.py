@@ -0,0 +1,111 @@
+"""
+질의 임베딩 마이크로 배치
+
+OpenAIEmbeddings는 embed_query 한 번마다 HTTP 요청을 하나씩 보내므로, 여러 세션이 동시에 질문하면
+요청 수만큼 왕복 시간과 속도 제한(RPM)을 따로 씁니다. MicroBatchingEmbeddings는 모든 스레드의
+embed_query를 큐에 모았다가 첫 요청 후 window_ms가 지나거나 max_batch개가 차면 embed_documents 한 번으로
+보내고, 받은 벡터를 요청한 스레드에 나눠 줍니다.
+- 같은 배치 안의 같은 텍스트는 한 번만 임베딩합니다.
+- 배치 전송은 최대 concurrency개까지 동시에 하고, 그 이상은 다음 배치로 모입니다 (부하가 클수록 배치가 커짐).
+- 임베딩 호출이 실패하면 그 배치의 모든 요청에 같은 예외가 전달됩니다.
+- embed_documents는 이미 배치이므로 그대로 넘깁니다.
+embed_query와 embed_documents가 같은 벡터를 내는 임베딩(OpenAI)에만 씁니다.
+(질의용 지시문을 붙이는 임베딩은 배치로 바꾸면 결과가 달라짐)
+
+스레드는 첫 embed_query에서 시작하고, fork된 자식 프로세스(rag.prefork)에서는 새로 만듭니다.
+
+메트릭: rag_embedding_microbatch_size (배치당 텍스트 수), rag_embedding_microbatch_wait_seconds
+        (요청부터 전송 시작까지), rag_embedding_microbatch_requests_total, rag_embedding_microbatch_calls_total
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from rag.config import EMBED_MICROBATCH_CONCURRENCY, EMBED_MICROBATCH_MAX_SIZE, EMBED_MICROBATCH_WINDOW_MS
+from rag.telemetry import REGISTRY
+
+_start_lock = threading.Lock()
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """동시에 들어온 embed_query를 묶어 embed_documents 한 번으로 보내는 래퍼"""
+
+    def __init__(self, embedding: Embeddings, window_ms: float = EMBED_MICROBATCH_WINDOW_MS,
+                 max_batch: int = EMBED_MICROBATCH_MAX_SIZE, concurrency: int = EMBED_MICROBATCH_CONCURRENCY):
+        self.embedding = embedding
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self._pid = None
+
+    def __getattr__(self, name):
+        if name == "embedding":  # 역직렬화 중 무한 재귀 방지
+            raise AttributeError(name)
+        return getattr(self.embedding, name)
+
+    def _start(self) -> None:
+        # 잠금도 fork 시점 상태로 복사되므로 자식 프로세스에서는 모두 새로 만듦
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[str, Future, float]] = []
+        self._slots = threading.Semaphore(self.concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed-batch")
+        threading.Thread(target=self._collect, name="embed-microbatch", daemon=True).start()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.window <= 0 or self.max_batch <= 1:
+            return self.embedding.embed_query(text)
+        future: Future = Future()
+        if self._pid != os.getpid():
+            with _start_lock:
+                if self._pid != os.getpid():
+                    self._start()
+        with self._cond:
+            self._pending.append((text, future, time.perf_counter()))
+            self._cond.notify()
+        REGISTRY.inc("rag_embedding_microbatch_requests_total")
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding.embed_documents(texts)
+
+    def _collect(self) -> None:
+        while True:
+            # 전송 자리가 빌 때까지 기다리는 동안 들어온 요청은 다음 배치에 같이 실림
+            self._slots.acquire()
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0][2] + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch: List[Tuple[str, Future, float]]) -> None:
+        try:
+            start = time.perf_counter()
+            positions: Dict[str, int] = {}
+            for text, _, enqueued in batch:
+                positions.setdefault(text, len(positions))
+                REGISTRY.observe("rag_embedding_microbatch_wait_seconds", start - enqueued)
+            REGISTRY.observe("rag_embedding_microbatch_size", len(positions))
+            REGISTRY.inc("rag_embedding_microbatch_calls_total")
+            try:
+                vectors = self.embedding.embed_documents(list(positions))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                return
+            for text, future, _ in batch:
+                future.set_result(vectors[positions[text]])
+        finally:
+            self._slots.release()
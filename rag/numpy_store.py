@@ -0,0 +1,187 @@
+"""
+NumPy 전수 검색 벡터 스토어
+
+vector_db_final.json처럼 작은 코퍼스는 Chroma 클라이언트(SQLite 영속화, 서버 구성 요소) 없이
+정규화된 임베딩을 연속된 float32(또는 float16) 행렬 하나에 담아 검색하는 편이 훨씬 가볍습니다.
+
+- 단일 질의: 행렬-벡터 곱 1번 + argpartition
+- 배치 질의: 행렬-행렬 곱(GEMM) 1번
+- 저장: embeddings.npy + docs.jsonl + manifest.json (로드 시 mmap)
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+
+DTYPES = ("float32", "float16")
+SEARCH_CHUNK_ROWS = 8192  # float16 행렬을 float32로 변환해 계산할 때 한 번에 처리할 행 수
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """행 단위 L2 정규화"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def save_documents(path: str, documents: Iterable[Document]) -> None:
+    """Document 목록을 JSON Lines 파일로 저장합니다. (pickle 미사용)"""
+    with open(path, "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False))
+            f.write("\n")
+
+
+def load_documents(path: str) -> List[Document]:
+    """save_documents로 저장한 파일에서 Document 목록을 읽습니다."""
+    documents = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            documents.append(Document(page_content=record["page_content"], metadata=record["metadata"]))
+    return documents
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """마지막 축 기준 상위 k개의 (인덱스, 점수)를 점수 내림차순으로 반환합니다."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1)
+    return np.take_along_axis(part, order, axis=-1), np.take_along_axis(part_scores, order, axis=-1)
+
+
+class NumpyVectorStore:
+    """
+    정규화된 임베딩 행렬을 전수 검색하는 벡터 스토어
+    점수는 코사인 유사도(클수록 유사)입니다.
+    """
+
+    def __init__(self, embedding: Any, matrix: np.ndarray, documents: List[Document]):
+        self.embedding = embedding
+        self.matrix = matrix  # (N, D) float32 또는 float16, C 연속
+        self.documents = documents
+        self._filter_cache: Dict[Tuple, np.ndarray] = {}  # 메타데이터 필터 → 행 인덱스
+
+    @classmethod
+    def from_document_batches(cls, batches: Iterable[List[Document]], embedding: Any,
+                              dtype: str = "float32") -> "NumpyVectorStore":
+        """Document 배치를 차례로 임베딩하여 스토어를 생성합니다."""
+        if dtype not in DTYPES:
+            raise ValueError(f"지원하지 않는 dtype입니다: {dtype}")
+        documents: List[Document] = []
+        chunks = []
+        for docs in batches:
+            vectors = np.asarray(embedding.embed_documents([d.page_content for d in docs]), dtype=np.float32)
+            chunks.append(normalize(vectors).astype(dtype))
+            documents.extend(docs)
+        if not documents:
+            raise ValueError("색인할 문서가 없습니다.")
+        return cls(embedding, np.ascontiguousarray(np.concatenate(chunks)), documents)
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], embedding: Any, **kwargs) -> "NumpyVectorStore":
+        return cls.from_document_batches([documents], embedding, **kwargs)
+
+    def add_documents(self, documents: List[Document]) -> None:
+        """문서를 임베딩하여 행렬 끝에 추가합니다."""
+        if not documents:
+            return
+        vectors = np.asarray(self.embedding.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+        rows = normalize(vectors).astype(self.matrix.dtype)
+        self.matrix = np.ascontiguousarray(np.concatenate([np.asarray(self.matrix), rows]))
+        self.documents.extend(documents)
+        self._filter_cache.clear()
+
+    def _select_rows(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        메타데이터 필터에 맞는 행 인덱스를 반환합니다. (필터가 없으면 None = 전체)
+        지원 형식: {"key": value} 또는 {"key": {"$in": [v1, v2]}}
+        """
+        if not filter:
+            return None
+        conditions = []
+        for key, cond in filter.items():
+            values = cond["$in"] if isinstance(cond, dict) and "$in" in cond else [cond]
+            conditions.append((key, tuple(sorted(map(str, values)))))
+        cache_key = tuple(sorted(conditions))
+
+        if cache_key not in self._filter_cache:
+            rows = [
+                i for i, doc in enumerate(self.documents)
+                if all(str((doc.metadata or {}).get(key)) in values for key, values in conditions)
+            ]
+            self._filter_cache[cache_key] = np.asarray(rows, dtype=np.int64)
+        return self._filter_cache[cache_key]
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """(Q, D) 질의 행렬과 문서 행렬의 내적 (Q, N)"""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.dtype == np.float32:
+            return queries @ matrix.T
+        # float16은 BLAS가 없으므로 블록 단위로 float32 변환 후 계산
+        scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), SEARCH_CHUNK_ROWS):
+            block = np.asarray(matrix[start:start + SEARCH_CHUNK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    def search_vectors(self, queries: np.ndarray, k: int,
+                       filter: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        여러 질의 벡터를 한 번의 GEMM으로 검색합니다.
+        반환: (Q, k) 문서 인덱스, (Q, k) 코사인 유사도
+        """
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        rows = self._select_rows(filter)
+        ids, scores = top_k(self._scores(queries, rows), k)
+        if rows is not None:
+            ids = rows[ids]
+        return ids, scores
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        ids, scores = self.search_vectors(np.asarray(embedding, dtype=np.float32)[None, :], k, filter)
+        return [(self.documents[i], float(s)) for i, s in zip(ids[0], scores[0])]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                                filter: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Document, float]]]:
+        """여러 임베딩 벡터를 한 번의 GEMM으로 검색합니다. (질의별 결과 리스트)"""
+        ids, scores = self.search_vectors(np.asarray(embeddings, dtype=np.float32), k, filter)
+        return [[(self.documents[i], float(s)) for i, s in zip(row_ids, row_scores)]
+                for row_ids, row_scores in zip(ids, scores)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def save_local(self, folder: str) -> None:
+        os.makedirs(folder, exist_ok=True)
+        np.save(os.path.join(folder, "embeddings.npy"), np.asarray(self.matrix))
+        save_documents(os.path.join(folder, "docs.jsonl"), self.documents)
+        manifest = {
+            "count": len(self.documents),
+            "dim": int(self.matrix.shape[1]),
+            "dtype": str(self.matrix.dtype),
+        }
+        with open(os.path.join(folder, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load_local(cls, folder: str, embedding: Any, mmap: bool = True) -> "NumpyVectorStore":
+        """save_local로 저장한 폴더를 로드합니다. mmap=True면 행렬을 복사하지 않고 파일에 매핑합니다."""
+        matrix = np.load(os.path.join(folder, "embeddings.npy"), mmap_mode="r" if mmap else None)
+        documents = load_documents(os.path.join(folder, "docs.jsonl"))
+        return cls(embedding, matrix, documents)
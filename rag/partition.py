@@ -0,0 +1,219 @@
+"""
+카테고리별 파티션 벡터 인덱스
+
+분류기 라벨(category/confidence)이나 베이비러브 문서의 category_name을 기준으로 문서를
+카테고리별 FAISS 하위 인덱스에 나눠 저장합니다. 카테고리를 지정하면 해당 파티션만 검색하므로
+검색 비용이 파티션 크기에 비례해서 줄어듭니다.
+카테고리를 지정하지 않으면 모든 파티션을 검색해 합칩니다. (Flat 인덱스이므로 전체 인덱스 검색과 결과가 같고,
+벡터를 두 번 저장하지 않습니다.)
+
+저장 구조 (save_local):
+    partitions.json  {카테고리 이름: 하위 폴더 이름}
+    p000/, p001/ ... 카테고리별 FAISS 인덱스
+"""
+import heapq
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from rag.numpy_store import normalize
+
+UNCATEGORIZED = "기타"  # 카테고리 메타데이터가 없는 문서의 파티션 이름
+
+
+def keep_informative(excluded_categories: Sequence[str] = ("비정보",), min_confidence: float = 0.0,
+                     category_field: str = "category") -> Callable[[Document], bool]:
+    """
+    인덱스 생성 시 남길 문서를 판별하는 함수를 만듭니다.
+    - excluded_categories에 속한 문서(분류기가 '비정보'로 분류한 게시글 등)는 제외
+    - confidence 메타데이터가 min_confidence보다 낮은 문서는 제외
+    """
+    excluded = set(excluded_categories)
+
+    def keep(doc: Document) -> bool:
+        meta = doc.metadata or {}
+        if meta.get(category_field) in excluded:
+            return False
+        confidence = meta.get("confidence")
+        if confidence is not None and confidence < min_confidence:
+            return False
+        return True
+
+    return keep
+
+
+def filter_document_batches(batches: Iterable[List[Document]], keep: Optional[Callable[[Document], bool]]) -> Iterator[List[Document]]:
+    """Document 배치에서 keep 조건을 만족하는 문서만 남깁니다."""
+    for docs in batches:
+        if keep is not None:
+            docs = [doc for doc in docs if keep(doc)]
+        if docs:
+            yield docs
+
+
+def faiss_search_vectors(store: FAISS, vectors: Any, k: int) -> List[List[Tuple[Document, float]]]:
+    """
+    langchain FAISS 스토어에서 여러 질의 벡터를 index.search 한 번으로 검색합니다.
+    점수는 similarity_search_with_score_by_vector와 같은 원시 점수(L2 거리 또는 내적)입니다.
+    """
+    queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if store._normalize_L2:
+        queries = normalize(queries).astype(np.float32)
+    scores, ids = store.index.search(queries, k)
+
+    results = []
+    for row_scores, row_ids in zip(scores, ids):
+        hits = []
+        for score, i in zip(row_scores, row_ids):
+            if i == -1:  # 문서 수가 k보다 적은 경우
+                continue
+            doc = store.docstore.search(store.index_to_docstore_id[i])
+            if isinstance(doc, Document):
+                hits.append((doc, float(score)))
+        results.append(hits)
+    return results
+
+
+class PartitionedVectorStore:
+    """
+    카테고리별 FAISS 하위 인덱스 묶음
+    점수는 내적(정규화된 OpenAI 임베딩에서는 코사인 유사도, 클수록 유사)입니다.
+    """
+
+    def __init__(self, embedding: Any, partitions: Dict[str, FAISS], category_field: str):
+        self.embedding = embedding
+        self.partitions = partitions
+        self.category_field = category_field
+
+    @property
+    def partition_names(self) -> List[str]:
+        return list(self.partitions)
+
+    @classmethod
+    def from_document_batches(cls, batches: Iterable[List[Document]], embedding: Any,
+                              category_field: str) -> "PartitionedVectorStore":
+        """Document 배치를 임베딩하여 카테고리별 하위 인덱스에 추가합니다."""
+        partitions: Dict[str, FAISS] = {}
+
+        for docs in batches:
+            vectors = embedding.embed_documents([doc.page_content for doc in docs])
+
+            # 배치 안에서 카테고리별로 묶어서 추가
+            grouped: Dict[str, List[Tuple[Document, List[float]]]] = {}
+            for doc, vector in zip(docs, vectors):
+                name = str((doc.metadata or {}).get(category_field) or UNCATEGORIZED)
+                grouped.setdefault(name, []).append((doc, vector))
+
+            for name, items in grouped.items():
+                text_embeddings = [(doc.page_content, vector) for doc, vector in items]
+                metadatas = [doc.metadata for doc, _ in items]
+                if name not in partitions:
+                    partitions[name] = FAISS.from_embeddings(
+                        text_embeddings, embedding, metadatas=metadatas,
+                        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                    )
+                else:
+                    partitions[name].add_embeddings(text_embeddings, metadatas=metadatas)
+
+        if not partitions:
+            raise ValueError("색인할 문서가 없습니다.")
+        return cls(embedding, partitions, category_field)
+
+    @property
+    def ntotal(self) -> int:
+        return sum(store.index.ntotal for store in self.partitions.values())
+
+    def get_by_ids(self, ids: Sequence[str]) -> List[Document]:
+        """문서 id로 찾습니다. (모든 파티션, 없는 id는 건너뜀)"""
+        docs = []
+        for doc_id in ids:
+            for store in self.partitions.values():
+                doc = store.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    docs.append(doc)
+                    break
+        return docs
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """문서 id를 가진 파티션에서 지웁니다. (없는 id는 무시)"""
+        wanted = set(ids)
+        for store in self.partitions.values():
+            found = [doc_id for doc_id in store.index_to_docstore_id.values() if doc_id in wanted]
+            if found:
+                store.delete(found)
+
+    def add_embeddings(self, text_embeddings: Sequence[Tuple[str, List[float]]], metadatas: Sequence[Dict[str, Any]],
+                       ids: Optional[Sequence[str]] = None) -> None:
+        """이미 임베딩한 문서를 category_field 값의 파티션에 추가합니다. (없는 카테고리면 새 파티션)"""
+        grouped: Dict[str, List[int]] = {}
+        for i, meta in enumerate(metadatas):
+            grouped.setdefault(str((meta or {}).get(self.category_field) or UNCATEGORIZED), []).append(i)
+        for name, indices in grouped.items():
+            items = [text_embeddings[i] for i in indices]
+            metas = [metadatas[i] for i in indices]
+            part_ids = [ids[i] for i in indices] if ids is not None else None
+            if name not in self.partitions:
+                self.partitions[name] = FAISS.from_embeddings(
+                    items, self.embedding, metadatas=metas, ids=part_ids,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                )
+            else:
+                self.partitions[name].add_embeddings(items, metadatas=metas, ids=part_ids)
+
+    def _select(self, partitions: Optional[Iterable[str]]) -> List[FAISS]:
+        if not partitions:
+            return list(self.partitions.values())
+        return [self.partitions[name] for name in partitions if name in self.partitions]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               partitions: Optional[Iterable[str]] = None) -> List[Tuple[Document, float]]:
+        """지정한 파티션(없으면 전체)에서 검색한 뒤 점수 순으로 상위 k개를 합칩니다."""
+        results = []
+        for store in self._select(partitions):
+            results.extend(store.similarity_search_with_score_by_vector(embedding, k=k))
+        return heapq.nlargest(k, results, key=lambda item: item[1])
+
+    def similarity_search_with_score_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                                partitions: Optional[Iterable[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """여러 임베딩 벡터를 파티션마다 한 번씩 배치 검색한 뒤 질의별로 상위 k개를 합칩니다."""
+        merged: List[List[Tuple[Document, float]]] = [[] for _ in embeddings]
+        for store in self._select(partitions):
+            for results, hits in zip(merged, faiss_search_vectors(store, embeddings, k)):
+                results.extend(hits)
+        return [heapq.nlargest(k, results, key=lambda item: item[1]) for results in merged]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     partitions: Optional[Iterable[str]] = None) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, partitions)
+
+    def similarity_search(self, query: str, k: int = 4, partitions: Optional[Iterable[str]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, partitions)]
+
+    def save_local(self, folder: str) -> None:
+        os.makedirs(folder, exist_ok=True)
+        manifest = {}
+        for i, (name, store) in enumerate(self.partitions.items()):
+            subdir = f"p{i:03d}"
+            store.save_local(os.path.join(folder, subdir))
+            manifest[name] = subdir
+        with open(os.path.join(folder, "partitions.json"), "w", encoding="utf-8") as f:
+            json.dump({"category_field": self.category_field, "partitions": manifest}, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load_local(cls, folder: str, embedding: Any) -> "PartitionedVectorStore":
+        with open(os.path.join(folder, "partitions.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        partitions = {
+            name: FAISS.load_local(
+                os.path.join(folder, subdir), embedding,
+                allow_dangerous_deserialization=True,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
+            for name, subdir in manifest["partitions"].items()
+        }
+        return cls(embedding, partitions, manifest["category_field"])
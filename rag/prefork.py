@@ -0,0 +1,266 @@
+"""
+사전 fork 서빙 (모델은 한 번만 로드, 작업 프로세스 N개가 copy-on-write로 공유)
+
+CPU에서는 파이썬 프로세스 하나로 여러 생성을 동시에 돌려도 코어를 다 쓰지 못하지만, 프로세스를 늘리면
+프로세스마다 5.8B 모델을 다시 올려야 합니다. 이 모드에서는
+1. 마스터 프로세스가 검색 도구(인덱스)와 모델을 읽기 전용으로 모두 올리고 gc.freeze()로 힙을 고정한 뒤
+2. 리슨 소켓을 만들어 작업 프로세스 N개를 fork 합니다. 작업 프로세스는 같은 소켓에서 요청을 받고
+   (커널이 연결을 나눠 줌) 각자 rag.server 앱과 생성 작업 풀/입장 제어를 가집니다.
+3. 가중치와 인덱스 페이지는 쓰지 않는 한 모든 프로세스가 물리 메모리를 공유하므로,
+   프로세스 하나를 늘리는 비용은 가중치가 아니라 생성 중 활성 메모리(KV 캐시, 중간 텐서)입니다.
+   --processes auto는 모델 로드 후 남은 메모리를 activation_budget_mb로 나눠 프로세스 수를 정합니다.
+4. 마스터는 작업 프로세스의 하트비트(이벤트 루프에서 HEARTBEAT_INTERVAL마다 공유 메모리에 기록)를 보고
+   종료됐거나 WORKER_HEARTBEAT_TIMEOUT 동안 응답이 없는 프로세스를 다시 fork 합니다.
+
+입장 제어와 /metrics는 작업 프로세스마다 따로이며, /health의 pid로 어느 프로세스가 응답했는지 알 수 있습니다.
+fork를 쓰므로 Linux/macOS에서만 동작합니다. 마스터에서는 모델 추론을 하지 않습니다 (OpenMP 스레드 풀이
+만들어진 뒤 fork하면 자식에서 멈출 수 있음).
+
+실행:
+    python -m rag.server --processes 4
+    python -m rag.server --processes auto
+"""
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+from rag.config import (
+    ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT, MAX_NEW_TOKENS_LIMIT, WORKER_ACTIVATION_OVERHEAD_MB,
+    WORKER_HEARTBEAT_INTERVAL, WORKER_HEARTBEAT_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+LISTEN_BACKLOG = 2048
+
+
+def available_memory_mb() -> Optional[float]:
+    """MemAvailable (MB, Linux 외에서는 None)"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def activation_budget_mb(model, workers: int = 1) -> float:
+    """
+    작업 프로세스 하나가 생성 중에 더 쓰는 메모리 추정치 (MB, 가중치 제외)
+    생성 한 건당 KV 캐시(2 x 레이어 x hidden x 최대 문맥 길이 x dtype 크기) + 중간 텐서/파이썬 여유분
+    workers: 프로세스 안에서 동시에 생성하는 요청 수
+    """
+    config = model.config
+    tokens = getattr(config, "max_position_embeddings", MAX_NEW_TOKENS_LIMIT)
+    dtype_bytes = next(model.parameters()).element_size()
+    kv_cache = 2 * config.num_hidden_layers * config.hidden_size * tokens * dtype_bytes / MB
+    return workers * (kv_cache + WORKER_ACTIVATION_OVERHEAD_MB)
+
+
+def auto_processes(model, workers: int = 1) -> int:
+    """코어 수와 (남은 메모리 / 프로세스당 활성 메모리) 중 작은 값"""
+    cpus = os.cpu_count() or 1
+    available = available_memory_mb()
+    if available is None:
+        return cpus
+    budget = activation_budget_mb(model, workers)
+    by_memory = int(available // budget)
+    logger.info(f"남은 메모리 {available:.0f}MB / 프로세스당 활성 메모리 {budget:.0f}MB -> 최대 {by_memory}개, 코어 {cpus}개")
+    return max(1, min(cpus, by_memory))
+
+
+def _close_http_connections() -> None:
+    """
+    fork 전에 열려 있는 HTTP keep-alive 연결(OpenAI 임베딩 클라이언트 등, 캐시 워밍 중 생성)을 닫습니다.
+    닫지 않으면 작업 프로세스들이 같은 TLS 소켓을 나눠 써서 응답이 섞입니다.
+    클라이언트 자체는 그대로 쓸 수 있고 다음 요청에서 프로세스마다 새 연결을 엽니다.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return
+    closed = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, httpx.Client) and not obj.is_closed:
+            obj._transport.close()
+            closed += 1
+    if closed:
+        logger.info(f"fork 전 HTTP 클라이언트 연결 {closed}개 정리")
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkMaster:
+    def __init__(self, pipeline, sock: socket.socket, processes: int, workers: int,
+                 max_queue: int = ADMISSION_MAX_QUEUE, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                 torch_threads: Optional[int] = None):
+        self.pipeline = pipeline
+        self.sock = sock
+        self.processes = processes
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // processes)
+        # 슬롯별 마지막 하트비트 시각 (fork 전에 만든 공유 메모리라 자식의 기록이 마스터에 보임)
+        self.heartbeats = multiprocessing.Array("d", processes, lock=False)
+        self.children: Dict[int, int] = {}  # pid -> 슬롯
+        self.restarts = 0
+        self.running = True
+
+    def spawn(self, slot: int) -> None:
+        self.heartbeats[slot] = time.time()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(slot)
+            except BaseException:
+                logger.exception(f"작업 프로세스 {slot} 오류")
+                code = 1
+            finally:
+                # 자식은 절대 마스터 코드로 돌아가지 않음
+                os._exit(code)
+        self.children[pid] = slot
+        logger.info(f"작업 프로세스 {slot} 시작 (pid {pid})")
+
+    def _run_worker(self, slot: int) -> None:
+        import torch
+        import uvicorn
+
+        from rag.server import create_app
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        gc.enable()
+        torch.set_num_threads(self.torch_threads)
+
+        pipeline = self.pipeline
+        app = create_app(lambda: pipeline, workers=self.workers, max_queue=self.max_queue,
+                         queue_timeout=self.queue_timeout)
+        server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+
+        async def heartbeat() -> None:
+            # 이벤트 루프가 돌고 있다는 증거 (생성은 작업 풀 스레드에서 실행되므로 막히지 않아야 함)
+            while True:
+                self.heartbeats[slot] = time.time()
+                await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+        async def serve() -> None:
+            beat = asyncio.create_task(heartbeat())
+            try:
+                await server.serve(sockets=[self.sock])
+            finally:
+                beat.cancel()
+
+        asyncio.run(serve())
+
+    def _stop(self, signum, frame) -> None:
+        self.running = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for slot in range(self.processes):
+            self.spawn(slot)
+
+        while self.running:
+            self._reap(restart=True)
+            now = time.time()
+            for pid, slot in list(self.children.items()):
+                if now - self.heartbeats[slot] > WORKER_HEARTBEAT_TIMEOUT:
+                    logger.warning(f"작업 프로세스 {slot} (pid {pid}) 하트비트 없음, 강제 종료 후 다시 시작")
+                    self._kill(pid, signal.SIGKILL)
+            time.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+        logger.info("종료 신호를 받아 작업 프로세스를 종료합니다.")
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.time() + WORKER_HEARTBEAT_TIMEOUT
+        while self.children and time.time() < deadline:
+            self._reap(restart=False)
+            time.sleep(0.1)
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGKILL)
+        self._reap(restart=False)
+        self.sock.close()
+
+    def _kill(self, pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self, restart: bool) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            logger.warning(f"작업 프로세스 {slot} (pid {pid}) 종료: {_describe_status(status)}")
+            if restart and self.running:
+                self.restarts += 1
+                self.spawn(slot)
+
+
+def _describe_status(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"신호 {signal.Signals(os.WTERMSIG(status)).name}"
+    return f"종료 코드 {os.WEXITSTATUS(status)}"
+
+
+def serve_prefork(host: str, port: int, processes: Optional[int] = None, workers: int = 1,
+                  max_queue: int = ADMISSION_MAX_QUEUE, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                  loader=None, model_loader=None) -> None:
+    """
+    processes: 작업 프로세스 수 (None이면 auto_processes)
+    workers: 작업 프로세스마다의 생성 작업 풀 크기
+    loader/model_loader: rag.server.create_app과 같음 (모델은 fork 전에 마스터에서 바로 로드)
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("사전 fork 모드는 fork를 지원하는 OS에서만 사용할 수 있습니다.")
+    from rag.server import MODEL_READY, load_generator, load_pipeline
+
+    start = time.perf_counter()
+    pipeline = (loader or load_pipeline)()
+    if pipeline.model is None:
+        pipeline.model, pipeline.tokenizer, pipeline.device = (model_loader or load_generator)()
+        pipeline.model_load_seconds = time.perf_counter() - start
+    pipeline.model_state = MODEL_READY
+    pipeline.model.eval()
+    logger.info(f"마스터 로드 완료 ({time.perf_counter() - start:.1f}초)")
+
+    if processes is None:
+        processes = auto_processes(pipeline.model, workers)
+
+    _close_http_connections()
+    # 이후 생성되는 객체만 gc 대상이 되도록 지금까지의 힙을 고정
+    # (gc가 공유 객체의 헤더를 건드려 페이지가 복사되는 것을 막음)
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    logger.info(f"http://{host}:{port} 에서 작업 프로세스 {processes}개로 서비스합니다 "
+                f"(프로세스당 생성 작업자 {workers}개)")
+    PreforkMaster(pipeline, sock, processes, workers, max_queue, queue_timeout).run()
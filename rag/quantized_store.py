@@ -0,0 +1,261 @@
+"""
+차원 축소 + 양자화 벡터 인덱스
+
+OpenAI 임베딩(1536차원 float32)은 문서당 약 6KB를 차지합니다.
+이 모듈은 벡터를 PCA(또는 앞쪽 차원 절단, Matryoshka 방식)로 축소한 뒤 int8 또는 binary 코드로
+양자화해서 메모리에 올리고, 압축 코드로 후보를 찾은 다음 디스크에 저장된 원본 float32 벡터
+(np.load mmap)로 상위 후보만 정확하게 재순위화합니다.
+
+저장 구조 (save_local):
+    manifest.json  인덱스 설정
+    vectors.npy    정규화된 원본 float32 벡터 (mmap으로 로드)
+    codes.npy      양자화된 압축 코드
+    projection.npz 차원 축소/양자화 파라미터 (mean, components, scale)
+    docs.jsonl     문서 본문과 메타데이터
+"""
+import json
+import os
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+
+from rag.numpy_store import load_documents, normalize, save_documents
+
+REDUCTIONS = ("pca", "truncate")
+QUANTIZATIONS = ("int8", "binary")
+
+DEFAULT_DIM = 256  # 축소 후 차원 수
+DEFAULT_RESCORE_K = 200  # 원본 벡터로 재순위화할 후보 수
+PCA_SAMPLE_SIZE = 20000  # PCA 학습에 사용할 최대 벡터 수
+SEARCH_CHUNK_ROWS = 8192  # 압축 점수 계산 시 한 번에 처리할 행 수 (임시 메모리 제한)
+
+
+class QuantizedIndex:
+    """
+    문서 벡터를 압축 코드로 검색하고 원본 벡터로 재순위화하는 인덱스 (문서 정보 없음)
+    """
+
+    def __init__(self, vectors: np.ndarray, codes: np.ndarray, mean: Optional[np.ndarray],
+                 components: Optional[np.ndarray], scale: Optional[np.ndarray],
+                 dim: int, reduction: str, quantization: str):
+        self.vectors = vectors  # (N, D) float32, 보통 mmap
+        self.codes = codes  # int8: (N, dim) / binary: (N, dim / 8) uint8
+        self.mean = mean  # PCA 중심 벡터 (D,)
+        self.components = components  # PCA 주성분 (dim, D)
+        self.scale = scale  # int8 차원별 스케일 (dim,)
+        self.dim = dim
+        self.reduction = reduction
+        self.quantization = quantization
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, dim: int = DEFAULT_DIM, reduction: str = "pca",
+              quantization: str = "int8", seed: int = 0) -> "QuantizedIndex":
+        """float32 벡터 행렬로 인덱스를 생성합니다."""
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"지원하지 않는 차원 축소 방식입니다: {reduction}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"지원하지 않는 양자화 방식입니다: {quantization}")
+
+        vectors = normalize(np.ascontiguousarray(vectors, dtype=np.float32))
+        dim = min(dim, vectors.shape[1])
+        if quantization == "binary" and dim % 8:
+            raise ValueError("binary 양자화의 차원 수는 8의 배수여야 합니다.")
+
+        mean = components = scale = None
+        if reduction == "pca":
+            # 표본으로 주성분 학습
+            rng = np.random.default_rng(seed)
+            sample = vectors
+            if len(vectors) > PCA_SAMPLE_SIZE:
+                sample = vectors[rng.choice(len(vectors), PCA_SAMPLE_SIZE, replace=False)]
+            mean = sample.mean(axis=0)
+            _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+            components = np.ascontiguousarray(vt[:dim], dtype=np.float32)
+            dim = len(components)
+
+        index = cls(vectors, None, mean, components, None, dim, reduction, quantization)
+        reduced = index._reduce(vectors)
+
+        if quantization == "int8":
+            index.scale = (np.abs(reduced).max(axis=0) / 127.0).astype(np.float32)
+            index.scale[index.scale == 0] = 1.0
+            index.codes = np.clip(np.rint(reduced / index.scale), -127, 127).astype(np.int8)
+        else:
+            index.codes = np.packbits(reduced > 0, axis=1)
+        return index
+
+    def _reduce(self, vectors: np.ndarray) -> np.ndarray:
+        """원본 벡터를 축소 공간으로 변환합니다."""
+        if self.reduction == "pca":
+            return (vectors - self.mean) @ self.components.T
+        # Matryoshka 방식: 앞쪽 차원만 사용 후 재정규화
+        return normalize(vectors[..., :self.dim])
+
+    def _coarse_scores(self, queries: np.ndarray) -> np.ndarray:
+        """압축 코드로 (Q, D) 질의 행렬과 전체 문서의 근사 점수 (Q, N)를 계산합니다. (클수록 유사)"""
+        reduced = self._reduce(queries).astype(np.float32)
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        if self.quantization == "int8":
+            weighted = (reduced * self.scale).astype(np.float32)
+            for start in range(0, len(self.codes), SEARCH_CHUNK_ROWS):
+                chunk = self.codes[start:start + SEARCH_CHUNK_ROWS]
+                scores[:, start:start + len(chunk)] = weighted @ chunk.astype(np.float32).T
+            return scores
+
+        # binary: 비대칭 거리 (질의는 실수 벡터 그대로, 문서는 ±1 부호)
+        # q·sign(x) = 2 * q·bits(x) - sum(q)
+        for start in range(0, len(self.codes), SEARCH_CHUNK_ROWS):
+            bits = np.unpackbits(self.codes[start:start + SEARCH_CHUNK_ROWS], axis=1, count=self.dim)
+            scores[:, start:start + len(bits)] = reduced @ bits.astype(np.float32).T
+        return 2.0 * scores - reduced.sum(axis=1, keepdims=True)
+
+    def _rescore(self, query: np.ndarray, coarse: np.ndarray, k: int,
+                 rescore_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """질의 하나의 근사 점수에서 후보를 뽑고, rescore_k > 0이면 원본 벡터로 재순위화합니다."""
+        n = len(coarse)
+        num_candidates = min(max(rescore_k, k), n)
+        candidates = np.argpartition(-coarse, num_candidates - 1)[:num_candidates]
+
+        if rescore_k > 0:
+            # 후보 행만 디스크(mmap)에서 읽어 정확한 점수 계산
+            candidates.sort()
+            scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        else:
+            scores = coarse[candidates]
+
+        top = np.argsort(-scores)[:k]
+        return candidates[top], scores[top]
+
+    def search(self, query: np.ndarray, k: int, rescore_k: int = DEFAULT_RESCORE_K) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        query 벡터와 가장 유사한 문서 k개의 (인덱스, 코사인 유사도)를 반환합니다.
+        rescore_k가 0이면 재순위화 없이 압축 점수만 사용합니다.
+        """
+        n = len(self.codes)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize(np.asarray(query, dtype=np.float32))
+        return self._rescore(query, self._coarse_scores(query[None, :])[0], min(k, n), rescore_k)
+
+    def search_batch(self, queries: np.ndarray, k: int,
+                     rescore_k: int = DEFAULT_RESCORE_K) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        여러 질의를 검색합니다. 근사 점수는 행렬-행렬 곱 한 번으로 계산하고 재순위화만 질의별로 수행합니다.
+        반환: 질의별 (인덱스, 코사인 유사도) 리스트
+        """
+        n = len(self.codes)
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if n == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        coarse = self._coarse_scores(queries)
+        return [self._rescore(q, c, min(k, n), rescore_k) for q, c in zip(queries, coarse)]
+
+    @property
+    def resident_nbytes(self) -> int:
+        """메모리에 상주하는 바이트 수 (mmap된 원본 벡터 제외)"""
+        total = self.codes.nbytes
+        for arr in (self.mean, self.components, self.scale):
+            if arr is not None:
+                total += arr.nbytes
+        return total
+
+    def save(self, folder: str) -> None:
+        os.makedirs(folder, exist_ok=True)
+        np.save(os.path.join(folder, "vectors.npy"), np.asarray(self.vectors, dtype=np.float32))
+        np.save(os.path.join(folder, "codes.npy"), self.codes)
+        params = {}
+        for name in ("mean", "components", "scale"):
+            value = getattr(self, name)
+            if value is not None:
+                params[name] = value
+        np.savez(os.path.join(folder, "projection.npz"), **params)
+
+    @classmethod
+    def load(cls, folder: str, dim: int, reduction: str, quantization: str, mmap: bool = True) -> "QuantizedIndex":
+        vectors = np.load(os.path.join(folder, "vectors.npy"), mmap_mode="r" if mmap else None)
+        codes = np.load(os.path.join(folder, "codes.npy"))
+        with np.load(os.path.join(folder, "projection.npz")) as params:
+            mean = params["mean"] if "mean" in params else None
+            components = params["components"] if "components" in params else None
+            scale = params["scale"] if "scale" in params else None
+        return cls(vectors, codes, mean, components, scale, dim, reduction, quantization)
+
+
+class QuantizedVectorStore:
+    """
+    QuantizedIndex에 임베딩 함수와 문서를 결합한 벡터 스토어
+    (SearchTool에서 FAISS/Chroma와 같은 방식으로 similarity_search를 호출)
+    """
+
+    def __init__(self, embedding: Any, index: QuantizedIndex, documents: List[Document],
+                 rescore_k: int = DEFAULT_RESCORE_K):
+        self.embedding = embedding
+        self.index = index
+        self.documents = documents
+        self.rescore_k = rescore_k
+
+    @classmethod
+    def from_document_batches(cls, batches: Iterable[List[Document]], embedding: Any,
+                              dim: int = DEFAULT_DIM, reduction: str = "pca", quantization: str = "int8",
+                              rescore_k: int = DEFAULT_RESCORE_K) -> "QuantizedVectorStore":
+        """Document 배치를 차례로 임베딩하여 인덱스를 생성합니다."""
+        documents: List[Document] = []
+        chunks = []
+        for docs in batches:
+            chunks.append(np.asarray(embedding.embed_documents([d.page_content for d in docs]), dtype=np.float32))
+            documents.extend(docs)
+        if not documents:
+            raise ValueError("색인할 문서가 없습니다.")
+
+        index = QuantizedIndex.build(np.concatenate(chunks), dim, reduction, quantization)
+        return cls(embedding, index, documents, rescore_k)
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], embedding: Any, **kwargs) -> "QuantizedVectorStore":
+        return cls.from_document_batches([documents], embedding, **kwargs)
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        """임베딩 벡터로 검색합니다. 점수는 코사인 유사도(클수록 유사)입니다."""
+        ids, scores = self.index.search(np.asarray(embedding, dtype=np.float32), k, self.rescore_k)
+        return [(self.documents[i], float(s)) for i, s in zip(ids, scores)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score_by_vectors(self, embeddings: List[List[float]],
+                                                k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """여러 임베딩 벡터를 한 번에 검색합니다. (질의별 결과 리스트)"""
+        results = self.index.search_batch(np.asarray(embeddings, dtype=np.float32), k, self.rescore_k)
+        return [[(self.documents[i], float(s)) for i, s in zip(ids, scores)] for ids, scores in results]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def save_local(self, folder: str) -> None:
+        """인덱스와 문서를 폴더에 저장합니다."""
+        self.index.save(folder)
+        save_documents(os.path.join(folder, "docs.jsonl"), self.documents)
+        manifest = {
+            "count": len(self.documents),
+            "full_dim": int(self.index.vectors.shape[1]),
+            "dim": self.index.dim,
+            "reduction": self.index.reduction,
+            "quantization": self.index.quantization,
+            "rescore_k": self.rescore_k,
+        }
+        with open(os.path.join(folder, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load_local(cls, folder: str, embedding: Any, rescore_k: Optional[int] = None) -> "QuantizedVectorStore":
+        """save_local로 저장한 폴더를 로드합니다. 원본 벡터는 mmap으로 열립니다."""
+        with open(os.path.join(folder, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        index = QuantizedIndex.load(folder, manifest["dim"], manifest["reduction"], manifest["quantization"])
+        documents = load_documents(os.path.join(folder, "docs.jsonl"))
+
+        return cls(embedding, index, documents, manifest["rescore_k"] if rescore_k is None else rescore_k)
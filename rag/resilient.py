@@ -0,0 +1,186 @@
+"""
+원격 임베딩의 지연 꼬리 대응 (제한 시간, 헤지 요청, 회로 차단기)
+
+OpenAI 임베딩 서버가 느려지면 SearchTool.search가 그대로 기다려 답변 전체가 멈춥니다.
+ResilientEmbeddings는 embed_query를 작업 스레드에서 실행하고
+- 최근 응답 시간의 p95(EMBEDDING_HEDGE_PERCENTILE)가 지나도 응답이 없거나 첫 요청이 실패하면 같은 요청을 한 번 더
+  보내(헤지) 먼저 온 응답을 씁니다. 표본이 모이기 전에는 EMBEDDING_HEDGE_DELAY초 뒤에 보냅니다.
+  헤지 요청은 hedge_embedding(get_embedding에서는 원격 클라이언트)으로 바로 보내, 첫 요청이 막혀 있는
+  rag.microbatch 대기열을 다시 거치지 않습니다.
+- EMBEDDING_TIMEOUT초 안에 성공한 응답이 없으면 EmbeddingUnavailable을 발생시킵니다.
+- 연속 EMBEDDING_BREAKER_FAILURES번 실패하면 회로를 열고, EMBEDDING_BREAKER_RESET초 동안은 요청을 보내지 않고
+  바로 EmbeddingUnavailable을 발생시킵니다. 그 뒤 요청 하나로 원격을 시험해 성공하면 회로를 닫습니다.
+SearchTool은 EmbeddingUnavailable이 나면 로컬 임베딩(sentence-transformers)으로 만든 대체 인덱스에서 검색합니다.
+(rag.index.initialize_search_tools, FALLBACK_EMBEDDING_MODEL)
+
+embed_documents(인덱스 생성, 캐시 사전 적재)는 오래 걸리는 것이 정상이므로 그대로 넘깁니다.
+제한 시간이 지난 요청은 취소할 수 없으므로 작업 스레드에서 끝까지 돌고, 응답 시간 표본에만 반영됩니다.
+재시도는 헤지 요청이 대신하므로 원격 클라이언트는 max_retries=0으로 만듭니다. (버려진 요청이 재시도하며
+작업 스레드를 EMBEDDING_REQUEST_TIMEOUT의 몇 배씩 잡지 않도록)
+
+메트릭: rag_embedding_calls_total{result="ok"|"hedged"|"timeout"|"error"|"rejected"}, rag_embedding_hedges_total,
+        rag_embedding_attempt_seconds, rag_embedding_breaker_open (게이지), rag_embedding_breaker_trips_total
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag.config import (
+    EMBEDDING_BREAKER_FAILURES, EMBEDDING_BREAKER_RESET, EMBEDDING_HEDGE_DELAY, EMBEDDING_HEDGE_MIN_DELAY,
+    EMBEDDING_HEDGE_PERCENTILE, EMBEDDING_MAX_WORKERS, EMBEDDING_TIMEOUT,
+)
+from rag.telemetry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 200  # 헤지 지연 계산에 쓰는 최근 응답 시간 수
+MIN_LATENCY_SAMPLES = 20  # 이보다 적으면 EMBEDDING_HEDGE_DELAY 사용
+
+_start_lock = threading.Lock()
+
+
+class EmbeddingUnavailable(RuntimeError):
+    """제한 시간 안에 임베딩을 받지 못했거나 회로가 열려 있음"""
+
+
+class CircuitBreaker:
+    """
+    closed: 요청을 보냄. 연속 failures번 실패하면 open
+    open: reset초 동안 요청을 보내지 않음. 그 뒤 요청 하나만 시험으로 보냄 (half-open)
+    시험 요청이 성공하면 closed, 실패하면 다시 open
+    """
+
+    def __init__(self, failures: int = EMBEDDING_BREAKER_FAILURES, reset: float = EMBEDDING_BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._probing or time.monotonic() - self._opened_at >= self.reset else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                if self._opened_at is not None:
+                    logger.info("임베딩 서버가 다시 응답해 회로를 닫습니다.")
+                self._consecutive, self._opened_at, self._probing = 0, None, False
+            else:
+                self._consecutive += 1
+                if self._probing or (self._opened_at is None and self._consecutive >= self.failures):
+                    if not self._probing:
+                        logger.warning(f"임베딩 요청이 연속 {self._consecutive}번 실패해 {self.reset:g}초 동안 회로를 엽니다.")
+                        REGISTRY.inc("rag_embedding_breaker_trips_total")
+                    self._opened_at, self._probing = time.monotonic(), False
+            REGISTRY.set_gauge("rag_embedding_breaker_open", 0 if self._opened_at is None else 1)
+
+
+class ResilientEmbeddings(Embeddings):
+    """embed_query에 제한 시간, 헤지 요청, 회로 차단기를 적용하는 래퍼"""
+
+    def __init__(self, embedding: Embeddings, timeout: float = EMBEDDING_TIMEOUT,
+                 hedge_delay: float = EMBEDDING_HEDGE_DELAY, hedge_percentile: float = EMBEDDING_HEDGE_PERCENTILE,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = EMBEDDING_MAX_WORKERS,
+                 hedge_embedding: Optional[Embeddings] = None):
+        """hedge_embedding: 헤지 요청을 보낼 임베딩 (없으면 embedding)"""
+        self.embedding = embedding
+        self.hedge_embedding = hedge_embedding or embedding
+        self.timeout = timeout
+        self.initial_hedge_delay = hedge_delay  # 0 이하이면 헤지 요청을 보내지 않음
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._pid = None
+
+    def __getattr__(self, name):
+        if name == "embedding":  # 역직렬화 중 무한 재귀 방지
+            raise AttributeError(name)
+        return getattr(self.embedding, name)
+
+    def hedge_delay(self) -> float:
+        """두 번째 요청을 보내기까지 기다리는 시간(초)"""
+        samples = list(self._latencies)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return self.initial_hedge_delay
+        return max(EMBEDDING_HEDGE_MIN_DELAY, float(np.percentile(samples, self.hedge_percentile)))
+
+    def _submit(self, embedding: Embeddings, text: str) -> Future:
+        if self._pid != os.getpid():
+            # fork된 자식 프로세스(rag.prefork)에는 부모의 작업 스레드가 없으므로 새로 만듦
+            with _start_lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embed-call")
+                    self._pid = os.getpid()
+        return self._executor.submit(self._attempt, embedding, text)
+
+    def _attempt(self, embedding: Embeddings, text: str) -> List[float]:
+        start = time.perf_counter()
+        vector = embedding.embed_query(text)
+        elapsed = time.perf_counter() - start
+        self._latencies.append(elapsed)
+        REGISTRY.observe("rag_embedding_attempt_seconds", elapsed)
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        if not self.breaker.allow():
+            REGISTRY.inc("rag_embedding_calls_total", result="rejected")
+            raise EmbeddingUnavailable("임베딩 서버가 응답하지 않아 잠시 요청을 보내지 않습니다.")
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        hedge_at = start + self.hedge_delay() if self.initial_hedge_delay > 0 else None
+        pending = {self._submit(self.embedding, text)}
+        hedged = False
+        error: Optional[BaseException] = None
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake = deadline if hedged or hedge_at is None else min(deadline, hedge_at)
+            done, pending = wait(pending, timeout=max(wake - now, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.breaker.record(True)
+                    REGISTRY.inc("rag_embedding_calls_total", result="hedged" if hedged else "ok")
+                    return future.result()
+                error = future.exception()
+            # 첫 요청이 실패했거나 헤지 지연이 지났으면 한 번 더 보냄
+            if not hedged and hedge_at is not None and (error is not None or time.monotonic() >= hedge_at):
+                hedged = True
+                pending.add(self._submit(self.hedge_embedding, text))
+                REGISTRY.inc("rag_embedding_hedges_total")
+            elif not pending:
+                break
+
+        self.breaker.record(False)
+        if not pending and error is not None:
+            REGISTRY.inc("rag_embedding_calls_total", result="error")
+            raise EmbeddingUnavailable(f"임베딩 요청 실패: {error}") from error
+        REGISTRY.inc("rag_embedding_calls_total", result="timeout")
+        raise EmbeddingUnavailable(f"임베딩 요청이 {self.timeout:g}초 안에 끝나지 않았습니다.")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding.embed_documents(texts)
@@ -0,0 +1,400 @@
+"""
+검색 도구와 도구 선택 로직
+
+SearchTool은 FAISS/Chroma/양자화/파티션 벡터 DB를 감싸 검색 결과를 프롬프트 문맥 문자열로 만들고,
+select_and_use_tools는 질문 키워드로 도구와 카테고리를 골라 검색을 수행합니다.
+SearchTool.search_batch는 여러 질문을 배치로 임베딩하고 벡터 DB마다 한 번의 배치 검색으로 처리하여
+오프라인 평가와 검색 캐시 사전 적재에 사용합니다.
+"""
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain.docstore.document import Document
+from langchain_community.vectorstores import FAISS, Chroma
+
+from rag.partition import PartitionedVectorStore, faiss_search_vectors
+from rag.resilient import EmbeddingUnavailable
+from rag.telemetry import REGISTRY, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 3  # 각 벡터 DB에서 검색할 문서 수
+DEFAULT_EMBED_BATCH_SIZE = 256  # search_batch에서 한 번에 임베딩할 질문 수
+
+# 베이비러브(아이사랑) 문서의 월령 카테고리: (카테고리 이름, 시작 개월, 끝 개월)
+BABYLOVE_AGE_CATEGORIES = [
+    ("신생아", 0, 0),
+    ("1~3개월", 1, 3),
+    ("4~6개월", 4, 6),
+    ("7~9개월", 7, 9),
+    ("10~12개월", 10, 12),
+    ("13~24개월", 13, 24),
+    ("25~36개월", 25, 36),
+]
+BABYLOVE_CATEGORIES = [name for name, _, _ in BABYLOVE_AGE_CATEGORIES] + ["이른둥이"]
+
+# 월령 숫자 외에 카테고리를 가리키는 키워드
+CATEGORY_KEYWORDS = {
+    "신생아": ["신생아", "갓난아기", "갓난쟁이"],
+    "이른둥이": ["이른둥이", "미숙아", "조산아"],
+    "10~12개월": ["돌잔치", "돌 전"],
+    "13~24개월": ["돌 지난", "돌 이후", "두돌"],
+    "25~36개월": ["세돌"],
+}
+
+
+# 분류 게시글의 주제 (rag.classify가 제로샷 분류로 붙이는 topic 라벨, 분류_게시글 인덱스의 파티션)
+CLASSIFIED_TOPICS = ["수유", "이유식", "수면", "발달", "건강", "육아용품", "생활"]
+
+# 질문에서 주제를 가리키는 키워드
+TOPIC_KEYWORDS = {
+    "수유": ["수유", "모유", "분유", "젖병", "유축", "단유"],
+    "이유식": ["이유식", "유아식", "간식", "식단"],
+    "수면": ["수면", "잠투정", "낮잠", "밤잠", "통잠", "재우"],
+    "발달": ["발달", "뒤집기", "걸음마", "옹알이", "배밀이", "말문"],
+    "건강": ["열이", "감기", "예방접종", "기침", "설사", "발진", "병원", "아토피"],
+    "육아용품": ["유모차", "카시트", "기저귀", "아기띠", "젖꼭지"],
+}
+
+
+def route_categories(query: str) -> List[str]:
+    """
+    질문에서 월령("5개월", "신생아" 등)과 주제("분유", "낮잠" 등)를 찾아 검색할 카테고리 목록을 반환합니다.
+    월령은 베이비러브, 주제는 분류 게시글 도구에 적용됩니다. (SearchTool은 자기 카테고리만 사용)
+    찾지 못하면 빈 리스트(전체 검색)를 반환합니다.
+    """
+    categories = []
+
+    for match in re.finditer(r"(\d+)\s*개월", query):
+        months = int(match.group(1))
+        for name, start, end in BABYLOVE_AGE_CATEGORIES:
+            if start <= months <= end and name not in categories:
+                categories.append(name)
+
+    for name, words in list(CATEGORY_KEYWORDS.items()) + list(TOPIC_KEYWORDS.items()):
+        if name not in categories and any(word in query for word in words):
+            categories.append(name)
+
+    return categories
+
+
+@dataclass
+class SearchHit:
+    """
+    검색된 문서 하나
+    score: 벡터 DB가 반환한 원시 점수 (FAISS 기본 L2·Chroma는 거리라서 작을수록 유사,
+           양자화/파티션/NumPy 스토어는 코사인 유사도라서 클수록 유사). hits는 항상 유사한 순서입니다.
+    """
+    doc_id: Optional[str]
+    score: float
+    content: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class SearchResult:
+    """질문 하나에 대한 검색 결과 (구조화된 hits + 프롬프트용 text)"""
+    query: str
+    hits: List[SearchHit]
+    text: str
+
+
+def document_id(doc: Document) -> Optional[str]:
+    """원본 데이터의 문서 ID (id → index 메타데이터, 없으면 벡터 DB 내부 ID)"""
+    meta = doc.metadata or {}
+    for key in ("id", "index"):
+        if meta.get(key) is not None:
+            return str(meta[key])
+    doc_id = getattr(doc, "id", None)
+    return str(doc_id) if doc_id is not None else None
+
+
+def _chroma_search_vectors(db: Chroma, vectors: List[List[float]], k: int,
+                           where: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Document, float]]]:
+    """Chroma 컬렉션에 여러 질의 벡터를 한 번에 질의합니다. 점수는 거리(작을수록 유사)입니다."""
+    response = db._collection.query(
+        query_embeddings=[list(map(float, v)) for v in vectors],
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "distances"],
+    )
+    results = []
+    for ids, texts, metadatas, distances in zip(response["ids"], response["documents"],
+                                                response["metadatas"], response["distances"]):
+        results.append([
+            (Document(id=i, page_content=text, metadata=meta or {}), float(distance))
+            for i, text, meta, distance in zip(ids, texts, metadatas, distances)
+        ])
+    return results
+
+
+# 검색 도구 클래스 정의
+class SearchTool:
+    def __init__(self, name: str, description: str, vector_db: Any, db_type: str,
+                 k: int = DEFAULT_K, category_field: Optional[str] = None,
+                 categories: Optional[List[str]] = None, cache_size: int = 0, fallback_db: Any = None):
+        self.name = name
+        self.description = description
+        self.vector_db = vector_db
+        self.fallback_db = fallback_db  # 임베딩 서버가 응답하지 않을 때 검색할 로컬 임베딩 벡터 DB (같은 문서)
+        self.db_type = db_type
+        self.k = k
+        self.category_field = category_field  # 카테고리 필터에 사용할 메타데이터 키
+        self.categories = categories or []  # 이 도구가 가진 카테고리 목록
+        self.cache_size = cache_size  # 검색 결과 LRU 캐시 크기 (0이면 사용 안 함)
+        self._cache: "OrderedDict[Tuple[str, Tuple[str, ...]], SearchResult]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _wanted(self, categories: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        """이 도구가 가진 카테고리만 남깁니다."""
+        return tuple(c for c in (categories or []) if c in self.categories)
+
+    def _search_kwargs(self, wanted: Sequence[str], db: Any = None) -> Dict[str, Any]:
+        """카테고리가 지정되면 해당 파티션(또는 메타데이터 필터)으로 검색 범위를 좁힙니다."""
+        if isinstance(db or self.vector_db, PartitionedVectorStore):
+            return {"partitions": list(wanted) or None}
+        if wanted and self.category_field:
+            # Chroma 등 메타데이터 필터를 지원하는 DB는 검색 전에 후보를 제한
+            return {"filter": {self.category_field: {"$in": list(wanted)}}}
+        return {}
+
+    def _search_docs(self, query: str, wanted: Sequence[str], db: Any = None) -> List[Tuple[Document, float]]:
+        db = db or self.vector_db
+        return db.similarity_search_with_score(query, k=self.k, **self._search_kwargs(wanted, db))
+
+    def _search_vectors(self, vectors: List[List[float]], wanted: Sequence[str]) -> List[List[Tuple[Document, float]]]:
+        """여러 질의 벡터를 벡터 DB 한 번의 배치 검색으로 처리합니다."""
+        db = self.vector_db
+        kwargs = self._search_kwargs(wanted)
+
+        if hasattr(db, "similarity_search_with_score_by_vectors"):
+            # NumPy/양자화/파티션 스토어: 행렬 곱 한 번 (파티션은 파티션마다 한 번)
+            return db.similarity_search_with_score_by_vectors(vectors, k=self.k, **kwargs)
+        if isinstance(db, FAISS) and not kwargs:
+            return faiss_search_vectors(db, vectors, self.k)
+        if isinstance(db, Chroma):
+            return _chroma_search_vectors(db, vectors, self.k, kwargs.get("filter"))
+
+        # 배치 검색을 지원하지 않는 DB는 질의별로 검색
+        return [db.similarity_search_with_score_by_vector(v, k=self.k, **kwargs) for v in vectors]
+
+    def _embedding(self) -> Any:
+        embedding = getattr(self.vector_db, "embedding", None) or getattr(self.vector_db, "embeddings", None)
+        if embedding is None:
+            raise ValueError(f"{self.name} 벡터 DB의 임베딩을 찾을 수 없습니다.")
+        return embedding
+
+    def _format(self, docs: Iterable[Document]) -> str:
+        results = []
+        for i, doc in enumerate(docs):
+            source = f"[{self.db_type} 문서 {i+1}]"
+            meta = ""
+            if hasattr(doc, 'metadata') and doc.metadata:
+                if 'category' in doc.metadata:
+                    meta += f" 카테고리: {doc.metadata['category']}"
+                if 'topic' in doc.metadata:
+                    meta += f" 주제: {doc.metadata['topic']}"
+                if 'category_name' in doc.metadata:
+                    meta += f" 카테고리: {doc.metadata['category_name']}"
+                if 'page_title' in doc.metadata:
+                    meta += f" 페이지: {doc.metadata['page_title']}"
+                if 'post' in doc.metadata and isinstance(doc.metadata['post'], str) and len(doc.metadata['post']) > 0:
+                    meta += f" 관련 게시글: {doc.metadata['post'][:100]}..."
+
+            results.append(f"{source}{meta}:\n{doc.page_content}")
+
+        return "\n\n".join(results) if results else f"{self.name}에서 관련 정보를 찾을 수 없습니다."
+
+    def _make_result(self, query: str, docs_and_scores: List[Tuple[Document, float]]) -> SearchResult:
+        hits = [
+            SearchHit(doc_id=document_id(doc), score=score, content=doc.page_content, metadata=dict(doc.metadata or {}))
+            for doc, score in docs_and_scores
+        ]
+        return SearchResult(query=query, hits=hits, text=self._format(doc for doc, _ in docs_and_scores))
+
+    def _cache_get(self, key: Tuple[str, Tuple[str, ...]]) -> Optional[SearchResult]:
+        if self.cache_size <= 0:
+            return None
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+    def _cache_put(self, key: Tuple[str, Tuple[str, ...]], result: SearchResult) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    def search(self, query: str, categories: Optional[Iterable[str]] = None) -> str:
+        try:
+            if self.vector_db is None:
+                return f"{self.name} 데이터베이스를 사용할 수 없습니다."
+
+            # 벡터 DB에서 검색 수행
+            if hasattr(self.vector_db, 'similarity_search'):
+                wanted = self._wanted(categories)
+                cached = self._cache_get((query, wanted))
+                if cached is not None:
+                    REGISTRY.inc("rag_search_cache_hits_total", tool=self.name)
+                    return cached.text
+
+                fallback = False
+                with span("rag.search", "rag_search_seconds", {"tool": self.name}) as s:
+                    try:
+                        docs_and_scores = self._search_docs(query, wanted)
+                    except EmbeddingUnavailable as e:
+                        if self.fallback_db is None:
+                            raise
+                        logger.warning(f"{self.name}: {e} 대체 인덱스에서 검색합니다.")
+                        REGISTRY.inc("rag_search_fallback_total", tool=self.name)
+                        s.set_attribute("rag.fallback", True)
+                        fallback = True
+                        docs_and_scores = self._search_docs(query, wanted, self.fallback_db)
+                    result = self._make_result(query, docs_and_scores)
+                    s.set_attribute("rag.hits", len(result.hits))
+                if not fallback:
+                    # 대체 인덱스 결과는 원격이 돌아오면 다시 검색하도록 캐시하지 않음
+                    self._cache_put((query, wanted), result)
+                return result.text
+            else:
+                return f"{self.name}은 지원되지 않는 벡터 DB 타입입니다."
+
+        except Exception as e:
+            logger.error(f"{self.name} 검색 중 오류 발생: {str(e)}")
+            return f"검색 오류: {str(e)}"
+
+    def search_batch(self, queries: Sequence[str],
+                     categories: Optional[Sequence[Optional[Iterable[str]]]] = None,
+                     batch_size: int = DEFAULT_EMBED_BATCH_SIZE, use_cache: bool = True) -> List[SearchResult]:
+        """
+        여러 질문을 한 번에 검색합니다. (오프라인 평가, 캐시 사전 적재용)
+        - 질문을 batch_size개씩 embed_documents로 임베딩
+        - 같은 카테고리를 가진 질문끼리 묶어 벡터 DB마다 배치 검색 한 번 수행
+        categories: 질문별 카테고리 목록 (queries와 같은 길이, 없으면 전체 검색)
+        반환: queries와 같은 순서의 SearchResult 리스트 (결과는 캐시에도 저장)
+        오류는 search()와 달리 문자열로 바꾸지 않고 그대로 발생시킵니다.
+        """
+        if self.vector_db is None:
+            raise ValueError(f"{self.name} 데이터베이스를 사용할 수 없습니다.")
+        if categories is not None and len(categories) != len(queries):
+            raise ValueError("categories는 queries와 길이가 같아야 합니다.")
+
+        results: List[Optional[SearchResult]] = [None] * len(queries)
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, query in enumerate(queries):
+            wanted = self._wanted(categories[i] if categories is not None else None)
+            cached = self._cache_get((query, wanted)) if use_cache else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                groups.setdefault(wanted, []).append(i)
+
+        embedding = self._embedding() if groups else None
+        for wanted, indices in groups.items():
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                vectors = embedding.embed_documents([queries[i] for i in chunk])
+                for i, docs_and_scores in zip(chunk, self._search_vectors(vectors, wanted)):
+                    results[i] = self._make_result(queries[i], docs_and_scores)
+                    self._cache_put((queries[i], wanted), results[i])
+
+        return results
+
+
+def read_questions(path: str) -> List[str]:
+    """JSON Lines 파일에서 question 필드를 읽습니다. (한 줄에 {"question": ...} 하나)"""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line)["question"])
+    return questions
+
+
+def warm_search_cache(search_tools: List[SearchTool], queries: Sequence[str],
+                      batch_size: int = DEFAULT_EMBED_BATCH_SIZE) -> int:
+    """
+    자주 묻는 질문을 미리 배치 검색해 각 도구의 검색 캐시를 채웁니다.
+    select_and_use_tools와 같은 키로 캐시되도록 질문에서 찾은 월령 카테고리를 사용합니다.
+    반환: 캐시에 적재한 (도구, 질문) 결과 수
+    """
+    categories = [route_categories(query) for query in queries]
+    warmed = 0
+    for tool in search_tools:
+        if tool.vector_db is None or tool.cache_size <= 0:
+            continue
+        try:
+            warmed += len(tool.search_batch(queries, categories, batch_size))
+        except Exception as e:
+            logger.error(f"{tool.name} 캐시 사전 적재 중 오류 발생: {str(e)}")
+    logger.info(f"검색 캐시 사전 적재 완료: {warmed}건")
+    return warmed
+
+# 적합한 도구 선택 및 검색 수행
+def select_and_use_tools(query: str, search_tools: List[SearchTool], categories: Optional[List[str]] = None) -> str:
+    """
+    categories: 사용자가 직접 선택한 카테고리 (없으면 질문에서 월령을 찾아 자동으로 지정)
+    """
+    try:
+        # 키워드 기반 도구 선택 로직
+        keywords = {
+            "분류_게시글_검색": ["발달", "단계", "일반", "기본", "수유", "이유식"],
+            "확장_정보_검색": ["상세", "자세히", "사례", "예시", "경험"],
+            "베이비러브_정보_검색": ["전문", "조언", "의학", "건강", "질병", "전문가"],
+        }
+
+        query_lower = query.lower()
+        selected_tools = []
+
+        # 키워드 일치도 기반 도구 선택
+        for tool in search_tools:
+            if tool.name in keywords:
+                for word in keywords[tool.name]:
+                    if word in query_lower:
+                        selected_tools.append(tool)
+                        break
+
+        # 선택된 도구가 없으면 모든 도구 사용
+        if not selected_tools:
+            logger.info(f"키워드 매칭 실패, 모든 검색 도구 사용")
+            selected_tools = search_tools
+
+        # 카테고리 결정 (사용자 필터 우선)
+        if not categories:
+            categories = route_categories(query)
+        if categories:
+            logger.info(f"검색 카테고리: {categories}")
+
+        # 선택된 도구로 검색 수행
+        results = []
+        with span("rag.retrieval", "rag_retrieval_seconds") as s:
+            s.set_attribute("rag.tools", len(selected_tools))
+            for tool in selected_tools:
+                logger.info(f"'{query}'에 대해 '{tool.name}' 도구 사용 중...")
+                result = tool.search(query, categories)
+                if not result.endswith("에서 관련 정보를 찾을 수 없습니다."):
+                    results.append(f"[{tool.name} 결과]\n{result}")
+
+        combined_result = "\n\n".join(results)
+        logger.info(f"검색 완료: {len(selected_tools)}개 도구 사용")
+
+        return combined_result if results else "어떤 데이터베이스에서도 관련 정보를 찾을 수 없습니다."
+
+    except Exception as e:
+        logger.error(f"도구 선택 및 사용 중 오류 발생: {str(e)}")
+        return f"검색 오류: {str(e)}"
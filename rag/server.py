@@ -0,0 +1,673 @@
+"""
+추론 서버 (FastAPI)
+
+모델과 검색 도구를 이 프로세스 하나에만 올려두고 HTTP로 제공합니다.
+streamlit 페이지와 CLI는 rag.client로 이 서버를 호출하므로 UI 프로세스는 모델을 올리지 않고,
+UI를 여러 개 띄워도 5.8B 모델은 한 번만 메모리에 올라갑니다.
+
+- GET  /health: 준비 상태, 벡터 DB 로드 여부, 검색 카테고리
+- POST /search: 검색만 수행 (문맥 문자열)
+- POST /generate: 검색 없이(또는 주어진 문맥으로) 생성
+- POST /chat: 검색 + 생성 (RAG)
+- DELETE /sessions/{session_id}: 멀티턴 세션 초기화
+- GET  /metrics: Prometheus 메트릭 (rag.telemetry)
+
+/generate, /chat에 session_id를 주면 같은 세션의 이전 대화에 이어서 답하고, 지난 턴의 KV 캐시를 재사용해
+새 질문 부분만 prefill 합니다 (rag.sessions).
+/generate, /chat은 stream=true면 SSE(server-sent events)로 결과를 보냅니다.
+- event: context  data: {"context", "found"}  (/chat만, 검색 직후)
+- event: queue    data: {"position": 대기 순번}  (생성 대기열에서 기다리는 동안 순번이 바뀔 때마다)
+- event: token    data: {"text": 새로 추가된 텍스트}
+- event: done     data: {"text": 정지 태그를 정리한 최종 텍스트, "stats": 생성 측정값}
+- event: error    data: {"detail": 오류 메시지, "reason": 입장 거절 사유(대기 시간 초과면 "timeout")}
+stream=false면 같은 내용을 JSON 하나로 반환합니다.
+
+생성은 GENERATION_WORKERS개 스레드로 된 작업 풀에서만 실행되고(모델 소유), 그 앞에서 rag.admission이
+동시 실행 수와 대기열 길이를 제한합니다. 대기열이 가득 차면 바로 503(Retry-After), 대기 시간을 넘기면
+503(stream=false) 또는 error 이벤트(stream=true)로 응답합니다.
+클라이언트 연결이 끊기면 대기열에서 빠지고, 이미 생성 중이면 StopSignal로 생성을 중단합니다.
+
+세션 없는 /chat은 같은 질문(공백/문장 부호를 정규화한 질문, 카테고리, 생성 매개변수가 같음)이 이미 처리 중이면
+새로 검색/생성하지 않고 그 결과 스트림에 합류합니다 (rag.singleflight). 늦게 합류한 요청은 이미 생성된
+부분을 token 이벤트 하나로 먼저 받고 이후 토큰을 실시간으로 받으며, done에 "coalesced": true가 붙습니다.
+
+검색 인덱스는 VECTOR_DB_DIR/CURRENT가 다른 버전을 가리키면 재시작 없이 백그라운드에서 불러와 요청 사이에
+교체합니다 (rag.index_versions, /health의 index). 진행 중인 검색은 끝날 때까지 이전 버전을 씁니다.
+
+/chat은 미리 만든 FAQ 답변 저장소(rag.faq)에 충분히 비슷한 질문이 있으면 검색과 생성 없이 저장된 답변을
+바로 돌려줍니다 (done/JSON에 "faq": {"question", "score"}, 세션이나 카테고리를 지정한 요청은 제외).
+
+시작할 때는 검색 도구(인덱스)만 올리고 바로 요청을 받으며, 모델은 백그라운드 스레드에서 불러옵니다.
+모델 상태(/health의 model.state)는 loading -> ready(또는 failed)로 바뀌고, ready가 되기 전까지
+/chat은 검색된 상위 문서로만 답하고(done/JSON에 "retrieval_only": true) /generate는 503을 돌려줍니다.
+
+--uds로 유닉스 도메인 소켓에서 서비스할 수 있고, --idle-timeout을 주면 그 시간 동안 요청이 없고
+생성 중/대기 중인 요청도 없을 때 스스로 종료합니다 (cli_chat.py가 띄우는 로컬 데몬, rag.daemon).
+
+실행:
+    python -m rag.server --port 8000
+    python -m rag.server --processes 4   # 사전 fork 모드 (rag.prefork)
+    python -m rag.server --uds /tmp/rag.sock --idle-timeout 1800
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from sse_starlette.sse import EventSourceResponse
+from starlette.concurrency import run_in_threadpool
+
+from rag.admission import AdmissionController, AdmissionRejected, Ticket
+from rag.config import (
+    ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER, DAEMON_IDLE_TIMEOUT, DEFAULT_MAX_NEW_TOKENS, DEFAULT_TEMPERATURE, GENERATION_WORKERS, INDEX_WATCH_INTERVAL, MAX_NEW_TOKENS_LIMIT,
+    MODEL_LOADING_RETRY_AFTER, MODEL_PATH, SERVER_HOST, SERVER_PROCESSES, SERVER_PORT, TELEMETRY_EXPORTER, TELEMETRY_TRACE_PATH, TOKENIZER_PATH,
+    VECTOR_DB_DIR,
+)
+from rag.generation import (
+    NO_RESULTS_ANSWER, SYSTEM_PROMPT, StopSignal, build_prompt, generate_stream, load_model, retrieve_context,
+    retrieval_only_answer,
+)
+from rag.faq import normalize_question
+from rag.sessions import SessionStore, session_generate
+from rag.singleflight import Flight, SingleFlight
+from rag.snapshot import find_snapshot
+from rag.telemetry import REGISTRY, setup_tracing
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOADING, MODEL_READY, MODEL_FAILED = "loading", "ready", "failed"
+DISCONNECT_POLL_SECONDS = 0.5  # stream=false 요청이 생성 중 연결 끊김을 확인하는 간격(초)
+
+
+@dataclass
+class Pipeline:
+    """서버가 소유하는 검색 도구와 모델"""
+    search_tools: List[Any]
+    vector_dbs: Dict[str, Any] = field(default_factory=dict)
+    model: Any = None
+    tokenizer: Any = None
+    device: Any = None
+    categories: List[str] = field(default_factory=list)  # 베이비러브 월령 카테고리
+    topics: List[str] = field(default_factory=list)  # 분류 게시글 주제 (파티션)
+    model_state: str = MODEL_LOADING
+    model_error: Optional[str] = None
+    model_load_seconds: Optional[float] = None
+    faq: Any = None  # rag.faq.AnswerStore (없으면 None)
+    indexes: Any = None  # rag.index_versions.IndexManager (없으면 search_tools를 그대로 씀)
+
+    @property
+    def model_ready(self) -> bool:
+        return self.model_state == MODEL_READY
+
+    @contextmanager
+    def lease_search_tools(self) -> Iterator[List[Any]]:
+        """요청 하나 동안 쓸 검색 도구 (인덱스가 교체돼도 한 요청 안에서는 같은 버전)"""
+        if self.indexes is None:
+            yield self.search_tools
+            return
+        with self.indexes.lease() as generation:
+            yield generation.search_tools
+
+
+def topics_of(search_tools: List[Any]) -> List[str]:
+    """분류 게시글 도구가 가진 주제 (인덱스가 주제별 파티션이 아니면 빈 리스트)"""
+    return next((list(tool.categories) for tool in search_tools if tool.db_type == "분류_게시글"), [])
+
+
+def load_pipeline() -> Pipeline:
+    """
+    서비스 구성: rag.index의 검색 도구 (모델은 load_generator로 따로 불러옴)
+    자주 묻는 질문으로 검색 캐시를 미리 채우고, 인덱스 버전이 바뀌면 교체할 수 있도록 IndexManager로 관리합니다.
+    """
+    from rag.faq import load_answer_store
+    from rag.index import base_index_version
+    from rag.index_versions import IndexManager, load_generation
+    from rag.search import BABYLOVE_CATEGORIES
+
+    generation = load_generation(VECTOR_DB_DIR)
+    pipeline = Pipeline(generation.search_tools, generation.vector_dbs, categories=list(BABYLOVE_CATEGORIES),
+                        topics=topics_of(generation.search_tools),
+                        faq=load_answer_store(index_version=base_index_version(generation.path)))
+
+    def use_generation(generation) -> None:
+        pipeline.search_tools, pipeline.vector_dbs = generation.search_tools, generation.vector_dbs
+        pipeline.topics = topics_of(generation.search_tools)
+        # FAQ 답변은 만든 인덱스 빌드가 다르면 쓰지 않음 (새 버전으로 다시 만들어야 함, 증분 색인만 된 버전은 그대로 씀)
+        had_faq = pipeline.faq is not None
+        pipeline.faq = load_answer_store(index_version=base_index_version(generation.path))
+        if had_faq and pipeline.faq is None:
+            logger.warning("인덱스가 새 빌드로 교체되어 FAQ 답변을 쓰지 않습니다. python -m rag.faq로 다시 만드세요.")
+            REGISTRY.inc("rag_faq_disabled_total")
+
+    pipeline.indexes = IndexManager(generation, on_swap=use_generation)
+    return pipeline
+
+
+def load_generator():
+    """파인튜닝 모델. 반환: (model, tokenizer, device)"""
+    return load_model(MODEL_PATH, TOKENIZER_PATH)
+
+
+def _load_model_in_background(pipeline: Pipeline, model_loader: Callable[[], Any]) -> threading.Thread:
+    """모델을 백그라운드 스레드에서 불러오고, 끝나면 pipeline.model_state를 바꿉니다."""
+
+    def run() -> None:
+        start = time.perf_counter()
+        try:
+            model, tokenizer, device = model_loader()
+        except Exception as e:
+            logger.error(f"모델 로드 실패: {str(e)}")
+            pipeline.model_error = str(e)
+            pipeline.model_state = MODEL_FAILED
+            return
+        pipeline.model, pipeline.tokenizer, pipeline.device = model, tokenizer, device
+        pipeline.model_load_seconds = time.perf_counter() - start
+        # 모델/토크나이저를 채운 뒤에 상태를 바꿔야 요청 스레드가 반쯤 채워진 Pipeline을 보지 않음
+        pipeline.model_state = MODEL_READY
+        logger.info(f"모델 로드 완료 ({pipeline.model_load_seconds:.1f}초), 생성 답변으로 전환합니다.")
+
+    thread = threading.Thread(target=run, name="model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+class GenerationParams(BaseModel):
+    max_new_tokens: int = Field(DEFAULT_MAX_NEW_TOKENS, ge=1, le=MAX_NEW_TOKENS_LIMIT)
+    temperature: float = Field(DEFAULT_TEMPERATURE, gt=0.0, le=2.0)
+    top_p: float = Field(0.95, gt=0.0, le=1.0)
+    stream: bool = True
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    categories: Optional[List[str]] = None
+
+
+class GenerateRequest(GenerationParams):
+    question: str = Field(..., min_length=1)
+    context: str = ""
+    system_prompt: str = SYSTEM_PROMPT  # 빈 문자열이면 시스템 부분 없이 질문/답변 형식만 사용
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128)  # 멀티턴 세션
+
+
+class ChatRequest(GenerationParams):
+    question: str = Field(..., min_length=1)
+    categories: Optional[List[str]] = None
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128)
+
+
+@dataclass
+class GenerationJob:
+    """생성 한 건의 입력 (session_id가 있으면 세션 대화에 이어서 생성)"""
+    question: str
+    context: str = ""
+    system_prompt: str = SYSTEM_PROMPT
+    session_id: Optional[str] = None
+
+    @property
+    def prompt_text(self) -> str:
+        return build_prompt(self.question, self.context, self.system_prompt)
+
+
+def _event(name: str, data: Dict[str, Any]) -> Dict[str, str]:
+    return {"event": name, "data": json.dumps(data, ensure_ascii=False)}
+
+
+def _run_generation(app: FastAPI, job: GenerationJob, params: GenerationParams, request_start: float,
+                    stop_signal: StopSignal, on_text: Optional[Callable[[str], None]] = None):
+    """작업 풀 스레드에서 실행됩니다."""
+    pipeline: Pipeline = app.state.pipeline
+    if stop_signal.stopped:
+        # 작업을 넘긴 직후 클라이언트가 떠남
+        return "", None
+    if job.session_id:
+        return session_generate(
+            app.state.sessions, job.session_id, job.question, pipeline.model, pipeline.tokenizer, pipeline.device,
+            max_new_tokens=params.max_new_tokens,
+            temperature=params.temperature,
+            top_p=params.top_p,
+            context=job.context,
+            system_prompt=job.system_prompt,
+            on_text=on_text,
+            request_start=request_start,
+            stop_signal=stop_signal,
+        )
+    return generate_stream(
+        job.prompt_text, pipeline.model, pipeline.tokenizer, pipeline.device,
+        max_new_tokens=params.max_new_tokens,
+        temperature=params.temperature,
+        top_p=params.top_p,
+        on_text=on_text,
+        request_start=request_start,
+        stop_signal=stop_signal,
+    )
+
+
+def _submit(app: FastAPI, ticket: Ticket, fn: Callable, *args) -> asyncio.Future:
+    """
+    입장한 요청의 작업을 작업 풀에 넘깁니다.
+    자리는 작업 스레드가 실제로 끝날 때 반납하므로, 연결이 끊겨도 생성이 멈출 때까지 다음 요청이 들어오지 않습니다.
+    """
+    loop = asyncio.get_running_loop()
+    admission: AdmissionController = app.state.admission
+
+    def run():
+        try:
+            return fn(*args)
+        finally:
+            loop.call_soon_threadsafe(admission.finish, ticket)
+
+    admission.start(ticket)
+    return loop.run_in_executor(app.state.executor, run)
+
+
+def _rejected(e: AdmissionRejected) -> Dict[str, str]:
+    return {"detail": str(e), "reason": e.reason}
+
+
+async def _stream_events(app: FastAPI, ticket: Ticket, job: GenerationJob, params: GenerationParams,
+                         request_start: float, endpoint: str,
+                         first_events: List[Dict[str, str]]) -> AsyncIterator[Dict[str, str]]:
+    """입장 대기 순번과 작업 풀의 생성 결과를 SSE 이벤트로 바꿉니다."""
+    admission: AdmissionController = app.state.admission
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop_signal = StopSignal()
+
+    def on_text(text: str) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, ("text", text))
+
+    def work() -> None:
+        try:
+            text, stats = _run_generation(app, job, params, request_start, stop_signal, on_text)
+            loop.call_soon_threadsafe(queue.put_nowait, ("done", (text, stats)))
+        except Exception as e:
+            logger.error(f"생성 중 오류 발생: {str(e)}")
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", str(e)))
+
+    try:
+        for event in first_events:
+            yield event
+        try:
+            async for position in admission.wait_positions(ticket):
+                yield _event("queue", {"position": position})
+        except AdmissionRejected as e:
+            yield _event("error", _rejected(e))
+            return
+
+        _submit(app, ticket, work)
+        sent = ""
+        while True:
+            kind, payload = await queue.get()
+            if kind == "text":
+                # on_text는 누적 텍스트를 주므로 새로 늘어난 부분만 전송
+                # (정지 태그 앞부분이 잘려 짧아진 경우는 done의 최종 텍스트로 바로잡음)
+                if payload.startswith(sent) and len(payload) > len(sent):
+                    yield _event("token", {"text": payload[len(sent):]})
+                    sent = payload
+            elif kind == "done":
+                text, stats = payload
+                REGISTRY.observe("rag_request_seconds", time.perf_counter() - request_start, endpoint=endpoint)
+                yield _event("done", {"text": text.strip(), "stats": stats.as_dict() if stats else None})
+                return
+            else:
+                yield _event("error", {"detail": payload})
+                return
+    finally:
+        # 클라이언트 연결이 끊기면 제너레이터가 취소되므로 여기서 대기열에서 빼거나 생성을 중단
+        admission.abandon(ticket)
+        stop_signal.set()
+
+
+async def _respond(request: Request, ticket: Ticket, job: GenerationJob, params: GenerationParams,
+                   request_start: float, endpoint: str, extra: Optional[Dict[str, Any]] = None):
+    app = request.app
+    admission: AdmissionController = app.state.admission
+    extra = extra or {}
+    if params.stream:
+        first_events = [_event("context", extra)] if extra else []
+        return EventSourceResponse(
+            _stream_events(app, ticket, job, params, request_start, endpoint, first_events))
+
+    stop_signal = StopSignal()
+    try:
+        await admission.wait(ticket)  # 대기 시간 초과는 AdmissionRejected -> 503
+        future = _submit(app, ticket, _run_generation, app, job, params, request_start, stop_signal)
+    finally:
+        admission.abandon(ticket)
+    # stream=false는 응답을 보낼 때까지 연결 끊김을 알 수 없으므로 생성하는 동안 직접 확인해 중단
+    while not future.done():
+        await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+        if not future.done() and await request.is_disconnected():
+            stop_signal.set()
+            break
+    text, stats = await future
+    REGISTRY.observe("rag_request_seconds", time.perf_counter() - request_start, endpoint=endpoint)
+    return {"text": text.strip(), "stats": stats.as_dict() if stats else None, **extra}
+
+
+async def _chat_flight(app: FastAPI, flight: Flight, ticket: Ticket, body: "ChatRequest",
+                       request_start: float) -> None:
+    """합쳐진 /chat 요청들의 검색과 생성 (요청과 별개의 작업, 결과는 flight로 보냄)"""
+    pipeline: Pipeline = app.state.pipeline
+    admission: AdmissionController = app.state.admission
+    loop = asyncio.get_running_loop()
+    stop_signal = StopSignal()
+    sent = ""
+
+    def publish_text(text: str) -> None:
+        # on_text는 누적 텍스트를 주므로 새로 늘어난 부분만 전송 (_stream_events와 같음)
+        nonlocal sent
+        if text.startswith(sent) and len(text) > len(sent):
+            flight.publish("token", {"text": text[len(sent):]})
+            sent = text
+
+    try:
+        with pipeline.lease_search_tools() as search_tools:
+            context, found = await run_in_threadpool(
+                retrieve_context, body.question, search_tools, body.categories, pipeline.tokenizer)
+        flight.publish("context", {"context": context, "found": found})
+        if not found:
+            # 관련 정보가 없으면 모델을 거치지 않고 바로 응답
+            admission.abandon(ticket)
+            flight.publish("token", {"text": NO_RESULTS_ANSWER})
+            flight.publish("done", {"text": NO_RESULTS_ANSWER, "stats": None})
+            return
+        try:
+            async for position in admission.wait_positions(ticket):
+                flight.publish("queue", {"position": position})
+        except AdmissionRejected as e:
+            flight.publish("error", _rejected(e))
+            return
+        job = GenerationJob(body.question, context)
+        text, stats = await _submit(app, ticket, _run_generation, app, job, body, request_start, stop_signal,
+                                    lambda text: loop.call_soon_threadsafe(publish_text, text))
+        flight.publish("done", {"text": text.strip(), "stats": stats.as_dict() if stats else None})
+    finally:
+        # 모든 구독자가 떠나 취소되면 대기열에서 빼거나 생성을 중단
+        admission.abandon(ticket)
+        stop_signal.set()
+
+
+async def _flight_events(flight: Flight, leader: bool, request_start: float) -> AsyncIterator[Dict[str, str]]:
+    # 연결이 끊겨 이 제너레이터가 닫히면 구독도 바로 닫아서 구독 수를 줄임
+    async with aclosing(flight.subscribe()) as events:
+        async for name, data in events:
+            if name == "done":
+                REGISTRY.observe("rag_request_seconds", time.perf_counter() - request_start, endpoint="chat")
+                if not leader:
+                    data = {**data, "coalesced": True}
+            yield _event(name, data)
+
+
+async def _flight_response(flight: Flight, leader: bool, stream: bool, request_start: float):
+    if stream:
+        return EventSourceResponse(_flight_events(flight, leader, request_start))
+    response: Dict[str, Any] = {}
+    async with aclosing(_flight_events(flight, leader, request_start)) as events:
+        async for event in events:
+            name, data = event["event"], json.loads(event["data"])
+            if name == "context":
+                response.update(data)
+            elif name == "done":
+                return {**data, **response}
+            elif name == "error":
+                if data.get("reason"):
+                    raise AdmissionRejected(data["reason"], data["detail"])  # 503
+                raise HTTPException(500, data["detail"])
+    raise HTTPException(500, "응답이 완료되지 않았습니다.")
+
+
+async def _shutdown_when_idle(app: FastAPI, idle_timeout: float) -> None:
+    """요청이 idle_timeout초 동안 없으면 SIGTERM으로 uvicorn을 정상 종료시킵니다."""
+    admission: AdmissionController = app.state.admission
+    while True:
+        await asyncio.sleep(min(idle_timeout, 5.0))
+        busy = admission.active or admission.depth
+        if busy:
+            app.state.last_request = time.monotonic()
+        elif time.monotonic() - app.state.last_request >= idle_timeout:
+            logger.info(f"{idle_timeout:g}초 동안 요청이 없어 서버를 종료합니다.")
+            os.kill(os.getpid(), signal.SIGTERM)
+            return
+
+
+def create_app(loader: Callable[[], Pipeline] = load_pipeline, workers: int = GENERATION_WORKERS,
+               max_queue: int = ADMISSION_MAX_QUEUE, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+               model_loader: Callable[[], Any] = load_generator,
+               idle_timeout: Optional[float] = None) -> FastAPI:
+    """
+    loader: 시작할 때 한 번 호출해 Pipeline을 만드는 함수 (벤치마크에서는 가짜 구성 요소를 넘김)
+    model_loader: (model, tokenizer, device)를 반환하는 함수, 백그라운드에서 호출
+                  (loader가 이미 모델을 채워 넘기면 호출하지 않음)
+    workers: 생성 작업 풀 크기 (= 동시에 생성하는 요청 수)
+    max_queue, queue_timeout: 생성 대기열 최대 길이와 최대 대기 시간(초)
+    idle_timeout: 마지막 요청 후 이 시간(초)이 지나고 생성 중/대기 중인 요청이 없으면 프로세스 종료 (None이면 계속 실행)
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        setup_tracing(TELEMETRY_EXPORTER, TELEMETRY_TRACE_PATH)
+        start = time.perf_counter()
+        pipeline: Pipeline = await run_in_threadpool(loader)
+        if pipeline.model is not None:
+            pipeline.model_state = MODEL_READY
+        else:
+            _load_model_in_background(pipeline, model_loader)
+        app.state.pipeline = pipeline
+        logger.info(f"검색 도구 준비 완료 ({time.perf_counter() - start:.1f}초), 모델 상태: {pipeline.model_state}")
+        app.state.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generate")
+        app.state.admission = AdmissionController(workers, max_queue, queue_timeout)
+        app.state.sessions = SessionStore()
+        app.state.flights = SingleFlight()
+        logger.info(f"추론 서버 준비 완료 (생성 작업자 {workers}개, 대기열 {max_queue}개)")
+        app.state.last_request = time.monotonic()
+        watcher = asyncio.create_task(_shutdown_when_idle(app, idle_timeout)) if idle_timeout else None
+        index_watcher = None
+        if pipeline.indexes is not None and INDEX_WATCH_INTERVAL > 0:
+            from rag.index_versions import IndexWatcher
+            index_watcher = IndexWatcher(pipeline.indexes, VECTOR_DB_DIR, INDEX_WATCH_INTERVAL)
+            index_watcher.start()
+        yield
+        if watcher is not None:
+            watcher.cancel()
+        if index_watcher is not None:
+            index_watcher.stop()
+        app.state.executor.shutdown(wait=False, cancel_futures=True)
+
+    app = FastAPI(title="마파덜 추론 서버", lifespan=lifespan)
+
+    @app.middleware("http")
+    async def track_activity(request: Request, call_next):
+        request.app.state.last_request = time.monotonic()
+        return await call_next(request)
+
+    @app.exception_handler(AdmissionRejected)
+    async def admission_rejected(request: Request, e: AdmissionRejected):
+        return JSONResponse(_rejected(e), status_code=503, headers={"Retry-After": str(ADMISSION_RETRY_AFTER)})
+
+    @app.get("/health")
+    async def health(request: Request):
+        pipeline: Pipeline = request.app.state.pipeline
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "model_path": MODEL_PATH,
+            "tokenizer_path": TOKENIZER_PATH,
+            "snapshot": find_snapshot(MODEL_PATH, TOKENIZER_PATH),  # 로컬 스냅숏에서 로드했으면 그 경로
+            "model": {
+                "state": pipeline.model_state,
+                "error": pipeline.model_error,
+                "load_seconds": pipeline.model_load_seconds,
+            },
+            "workers": workers,
+            "admission": request.app.state.admission.stats(),
+            "faq": pipeline.faq.stats() if pipeline.faq is not None else None,
+            "sessions": request.app.state.sessions.stats(),
+            "tools": [tool.name for tool in pipeline.search_tools],
+            "index": pipeline.indexes.stats() if pipeline.indexes is not None else None,
+            "vector_dbs": {name: db is not None for name, db in pipeline.vector_dbs.items()},
+            "categories": pipeline.categories,
+            "topics": pipeline.topics,
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return REGISTRY.render()
+
+    @app.post("/search")
+    async def search(body: SearchRequest, request: Request):
+        pipeline: Pipeline = request.app.state.pipeline
+        with pipeline.lease_search_tools() as search_tools:
+            context, found = await run_in_threadpool(
+                retrieve_context, body.query, search_tools, body.categories, pipeline.tokenizer)
+        return {"context": context, "found": found}
+
+    def require_model(pipeline: Pipeline) -> None:
+        if pipeline.model_state == MODEL_LOADING:
+            raise HTTPException(503, "모델을 불러오는 중입니다.", headers={"Retry-After": str(MODEL_LOADING_RETRY_AFTER)})
+        if pipeline.model_state == MODEL_FAILED:
+            raise HTTPException(500, f"모델 로드에 실패했습니다: {pipeline.model_error}")
+
+    @app.post("/generate")
+    async def generate(body: GenerateRequest, request: Request):
+        request_start = time.perf_counter()
+        require_model(request.app.state.pipeline)
+        job = GenerationJob(body.question, body.context, body.system_prompt, body.session_id)
+        ticket = request.app.state.admission.enqueue()  # 혼잡하면 바로 503
+        return await _respond(request, ticket, job, body, request_start, "generate")
+
+    @app.post("/chat")
+    async def chat(body: ChatRequest, request: Request):
+        request_start = time.perf_counter()
+        pipeline: Pipeline = request.app.state.pipeline
+        # 세션 대화는 이전 턴에 이어서 답해야 하고, 카테고리를 고른 요청은 검색 범위가 다르므로 FAQ를 쓰지 않음
+        if pipeline.faq is not None and not body.session_id and not body.categories:
+            hit = await run_in_threadpool(pipeline.faq.match, body.question)
+            if hit is not None:
+                return faq_answer(body, hit, request_start)
+        if not pipeline.model_ready:
+            return await retrieval_only(body, pipeline, request_start)
+
+        admission: AdmissionController = request.app.state.admission
+        if not body.session_id:
+            # 같은 질문이 처리 중이면 합류 (대기열 자리도 차지하지 않음)
+            flights: SingleFlight = request.app.state.flights
+            key = (normalize_question(body.question), tuple(sorted(body.categories or [])),
+                   body.max_new_tokens, body.temperature, body.top_p)
+            ticket = None if key in flights else admission.enqueue()
+            flight, leader = flights.join(
+                key, lambda flight: _chat_flight(request.app, flight, ticket, body, request_start))
+            return await _flight_response(flight, leader, body.stream, request_start)
+
+        # 검색 전에 대기열에 넣어 혼잡하면 검색 비용 없이 바로 503, 검색하는 동안에도 순번은 앞으로 당겨짐
+        ticket = admission.enqueue()
+        try:
+            with pipeline.lease_search_tools() as search_tools:
+                context, found = await run_in_threadpool(
+                    retrieve_context, body.question, search_tools, body.categories, pipeline.tokenizer)
+        except BaseException:
+            admission.abandon(ticket)
+            raise
+        retrieved = {"context": context, "found": found}
+
+        if not found:
+            admission.abandon(ticket)
+            # 관련 정보가 없으면 모델을 거치지 않고 바로 응답
+            if not body.stream:
+                return {"text": NO_RESULTS_ANSWER, "stats": None, **retrieved}
+
+            async def no_results():
+                yield _event("context", retrieved)
+                yield _event("token", {"text": NO_RESULTS_ANSWER})
+                yield _event("done", {"text": NO_RESULTS_ANSWER, "stats": None})
+            return EventSourceResponse(no_results())
+
+        job = GenerationJob(body.question, context, session_id=body.session_id)
+        return await _respond(request, ticket, job, body, request_start, "chat", retrieved)
+
+    @app.delete("/sessions/{session_id}")
+    async def reset_session(session_id: str, request: Request):
+        return {"removed": request.app.state.sessions.reset(session_id)}
+
+    def faq_answer(body: ChatRequest, hit, request_start: float):
+        """미리 만든 FAQ 답변을 그대로 돌려줌"""
+        retrieved = {"context": hit.context, "found": True}
+        faq = {"question": hit.question, "score": round(hit.score, 4)}
+        REGISTRY.observe("rag_request_seconds", time.perf_counter() - request_start, endpoint="chat_faq")
+        if not body.stream:
+            return {"text": hit.answer, "stats": None, "faq": faq, **retrieved}
+
+        async def events():
+            yield _event("context", retrieved)
+            yield _event("token", {"text": hit.answer})
+            yield _event("done", {"text": hit.answer, "stats": None, "faq": faq})
+        return EventSourceResponse(events())
+
+    async def retrieval_only(body: ChatRequest, pipeline: Pipeline, request_start: float):
+        """모델이 준비되기 전: 검색된 상위 문서를 그대로 답변으로 보여줌"""
+        with pipeline.lease_search_tools() as search_tools:
+            context, found = await run_in_threadpool(
+                retrieve_context, body.question, search_tools, body.categories)
+        retrieved = {"context": context, "found": found}
+        text = retrieval_only_answer(context) if found else NO_RESULTS_ANSWER
+        REGISTRY.observe("rag_request_seconds", time.perf_counter() - request_start, endpoint="chat_retrieval")
+        if not body.stream:
+            return {"text": text, "stats": None, "retrieval_only": True, **retrieved}
+
+        async def events():
+            yield _event("context", retrieved)
+            yield _event("token", {"text": text})
+            yield _event("done", {"text": text, "stats": None, "retrieval_only": True})
+        return EventSourceResponse(events())
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="마파덜 추론 서버")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=GENERATION_WORKERS, help="생성 작업 풀 크기")
+    parser.add_argument("--max-queue", type=int, default=ADMISSION_MAX_QUEUE, help="생성 대기열 최대 길이")
+    parser.add_argument("--queue-timeout", type=float, default=ADMISSION_QUEUE_TIMEOUT, help="최대 대기 시간(초)")
+    parser.add_argument("--processes", default=SERVER_PROCESSES,
+                        help="작업 프로세스 수 (2 이상 또는 auto면 모델을 한 번 올리고 fork하는 사전 fork 모드)")
+    parser.add_argument("--uds", default=None, help="TCP 대신 이 경로의 유닉스 도메인 소켓에서 서비스")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help=f"요청이 없으면 종료할 시간(초, 로컬 데몬 기본값 {DAEMON_IDLE_TIMEOUT:g})")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.processes != "1":
+        if args.uds or args.idle_timeout:
+            parser.error("--uds와 --idle-timeout은 사전 fork 모드에서 사용할 수 없습니다.")
+        from rag.prefork import serve_prefork
+        serve_prefork(args.host, args.port, None if args.processes == "auto" else int(args.processes),
+                      args.workers, args.max_queue, args.queue_timeout)
+        return
+    # uvicorn의 --workers는 프로세스마다 모델을 다시 올리므로 사용하지 않음 (여러 프로세스는 사전 fork 모드로)
+    app = create_app(workers=args.workers, max_queue=args.max_queue, queue_timeout=args.queue_timeout,
+                     idle_timeout=args.idle_timeout)
+    if args.uds is None:
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        # 종료 후 남은 소켓 파일은 접속이 거부되므로 클라이언트가 데몬을 다시 띄우고, 바인드할 때 지워짐
+        uvicorn.run(app, uds=args.uds)
+
+
+if __name__ == "__main__":
+    main()
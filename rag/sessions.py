@@ -0,0 +1,258 @@
+"""
+멀티턴 대화 세션과 KV 캐시 재사용
+
+세션마다 지난 턴의 질문/답변과, 그 대화를 prefill한 past_key_values(KV 캐시)와 토큰 id를 보관합니다.
+다음 턴의 프롬프트는 이전 대화의 토큰 id(생성된 답변 토큰 그대로, 정지 태그 제외) + 새 질문 토큰이므로
+캐시와 겹치는 앞부분은 다시 계산하지 않고 새 질문 부분만 prefill 합니다.
+(답변 텍스트를 다시 토큰화하면 생성된 토큰과 달라질 수 있어 토큰 id로 이어 붙임)
+- 검색 문맥은 현재 질문 앞에만 넣으므로, 세션에는 문맥을 뺀 형태(이전 대화 + 질문 + 답변)의 토큰 id를 저장하고
+  KV 캐시는 그와 겹치는 부분(이번 턴 문맥 앞까지, 문맥이 없었으면 답변까지)만 남깁니다.
+
+- 프롬프트가 토큰 예산(SESSION_MAX_PROMPT_TOKENS, 모델 최대 길이 - 생성 토큰 수를 넘지 않음)을 넘으면
+  오래된 턴부터 버립니다. 이때는 앞부분이 바뀌므로 그 턴만 처음부터 prefill 합니다.
+  턴을 모두 버려도 넘치면 문맥 뒤쪽을 잘라냅니다.
+- 세션은 마지막 사용 순서(LRU)로 SESSION_MAX_COUNT개, KV 캐시 합계 SESSION_CACHE_MAX_MB까지만 유지합니다.
+
+메트릭: rag_session_cached_tokens (재사용한 토큰 수), rag_session_evictions_total,
+        rag_session_count, rag_session_cache_bytes (게이지)
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from transformers import DynamicCache
+
+from rag.config import SESSION_CACHE_MAX_MB, SESSION_MAX_COUNT, SESSION_MAX_PROMPT_TOKENS
+from rag.generation import GenerationStats, StopSignal, build_prompt, clean_response, generate_stream
+from rag.telemetry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass
+class ChatSession:
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (질문, 답변)
+    ids: List[int] = field(default_factory=list)  # 문맥을 뺀 대화의 토큰 id (cache는 이 앞부분을 담고 있음)
+    cache: Any = None
+    nbytes: int = 0
+    last_used: float = field(default_factory=time.time)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def drop_cache(self) -> None:
+        self.ids, self.cache, self.nbytes = [], None, 0
+
+
+def cache_nbytes(cache) -> int:
+    """DynamicCache의 key/value 텐서 크기 합 (transformers 버전에 따라 구조가 다름)"""
+    if cache is None:
+        return 0
+    if hasattr(cache, "layers"):
+        tensors = [t for layer in cache.layers for t in (getattr(layer, "keys", None), getattr(layer, "values", None))]
+    else:
+        tensors = list(cache.key_cache) + list(cache.value_cache)
+    return sum(t.numel() * t.element_size() for t in tensors if t is not None and hasattr(t, "numel"))
+
+
+def common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+def answer_token_count(tokenizer, generated_ids: Sequence[int], answer: str) -> int:
+    """생성 토큰 중 정지 태그를 뺀 답변 부분의 토큰 수 (디코딩 길이로 이분 탐색)"""
+    target = len(answer.strip())
+    lo, hi = 0, len(generated_ids)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        text = clean_response(tokenizer.decode(generated_ids[:mid], skip_special_tokens=True)).strip()
+        if len(text) >= target:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def build_chat_prompt(turns: Sequence[Tuple[str, str]], question: str, context: str = "",
+                      system_prompt: str = "") -> str:
+    """
+    KoAlpaca 형식 멀티턴 프롬프트. 이전 턴은 질문/답변만 남기고 문맥은 현재 질문 앞에만 넣어서
+    다음 턴에서도 앞부분(시스템 + 이전 대화)이 그대로 유지되도록 합니다.
+    """
+    prompt = f"### 시스템: {system_prompt}\n\n" if system_prompt else ""
+    for past_question, answer in turns:
+        prompt += f"### 질문: {past_question}\n\n### 답변: {answer}\n\n"
+    return prompt + build_prompt(question, context, system_prompt="")
+
+
+def question_ids(tokenizer, question: str, context: str = "") -> List[int]:
+    """이전 대화 토큰 뒤에 이어 붙일 새 질문 부분의 토큰 id (시스템 프롬프트는 첫 턴에 이미 들어 있음)"""
+    return tokenizer("\n\n" + build_prompt(question, context, system_prompt=""), add_special_tokens=False)["input_ids"]
+
+
+def trim_turns(tokenizer, turns: List[Tuple[str, str]], question: str, context: str, system_prompt: str,
+               budget: int) -> Tuple[List[Tuple[str, str]], str, List[int]]:
+    """
+    프롬프트가 budget 토큰 이하가 될 때까지 오래된 턴을 버리고, 턴이 없는데도 넘치면 문맥 뒤쪽을 잘라냅니다.
+    반환: (남은 턴, 프롬프트, 프롬프트 토큰 id)
+    """
+    turns = list(turns)
+    while True:
+        prompt = build_chat_prompt(turns, question, context, system_prompt)
+        ids = tokenizer(prompt)["input_ids"]
+        if len(ids) <= budget:
+            return turns, prompt, ids
+        if turns:
+            turns.pop(0)
+        elif context:
+            context_ids = tokenizer(context, add_special_tokens=False)["input_ids"]
+            keep = min(len(context_ids) - (len(ids) - budget), len(context_ids) - 1)
+            context = tokenizer.decode(context_ids[:keep], skip_special_tokens=True) if keep > 0 else ""
+        else:
+            return turns, prompt, ids  # 질문만으로도 넘침
+
+
+class SessionStore:
+    """세션 id -> ChatSession (LRU, 개수/KV 캐시 메모리 상한)"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, max_cache_mb: float = SESSION_CACHE_MAX_MB):
+        self.max_sessions = max_sessions
+        self.max_bytes = int(max_cache_mb * MB)
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ChatSession:
+        """세션을 가져옵니다 (없으면 새로 만듦). 가장 최근 사용으로 표시합니다."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = ChatSession()
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.time()
+            self._evict(keep=session_id)
+            return session
+
+    def update(self, session_id: str, session: ChatSession) -> None:
+        """턴이 끝난 뒤 캐시 크기를 반영하고 상한을 넘으면 오래된 세션부터 내보냅니다."""
+        with self._lock:
+            session.nbytes = cache_nbytes(session.cache)
+            if session.nbytes > self.max_bytes:
+                # 세션 하나가 상한보다 크면 대화 기록만 남기고 캐시는 버림 (다음 턴에 다시 prefill)
+                session.drop_cache()
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self._evict(keep=session_id)
+
+    def reset(self, session_id: str) -> bool:
+        with self._lock:
+            removed = self._sessions.pop(session_id, None) is not None
+            self._update_gauges()
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "cache_mb": round(sum(s.nbytes for s in self._sessions.values()) / MB, 1),
+                "max_sessions": self.max_sessions,
+                "max_cache_mb": round(self.max_bytes / MB, 1),
+            }
+
+    def _evict(self, keep: str) -> None:
+        total = sum(s.nbytes for s in self._sessions.values())
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions and total <= self.max_bytes:
+                break
+            if session_id == keep:
+                continue
+            total -= self._sessions.pop(session_id).nbytes
+            REGISTRY.inc("rag_session_evictions_total")
+        self._update_gauges(total)
+
+    def _update_gauges(self, total: Optional[int] = None) -> None:
+        if total is None:
+            total = sum(s.nbytes for s in self._sessions.values())
+        REGISTRY.set_gauge("rag_session_count", len(self._sessions))
+        REGISTRY.set_gauge("rag_session_cache_bytes", total)
+
+
+def session_generate(store: SessionStore, session_id: str, question: str, model, tokenizer, device,
+                     max_new_tokens: int, temperature: float, top_p: float = 0.95, context: str = "",
+                     system_prompt: str = "", on_text: Optional[Callable[[str], None]] = None,
+                     request_start: Optional[float] = None,
+                     stop_signal: Optional[StopSignal] = None) -> Tuple[str, GenerationStats]:
+    """
+    세션의 이전 대화에 이어서 답변을 생성하고, 턴과 KV 캐시를 세션에 저장합니다.
+    같은 세션의 요청이 동시에 오면 순서대로 처리합니다.
+    """
+    session = store.get(session_id)
+    with session.lock:
+        max_positions = getattr(model.config, "max_position_embeddings", SESSION_MAX_PROMPT_TOKENS + max_new_tokens)
+        budget = min(SESSION_MAX_PROMPT_TOKENS, max_positions - max_new_tokens)
+
+        ids = None
+        turns = session.turns
+        if session.ids and turns:
+            # 이전 대화 토큰 뒤에 새 질문만 이어 붙임
+            ids = session.ids + question_ids(tokenizer, question, context)
+            history = session.ids + question_ids(tokenizer, question)
+        if ids is None or len(ids) > budget:
+            # 첫 턴, 캐시가 없는 세션, 예산 초과: 텍스트로 다시 만들고 필요하면 오래된 턴을 버림
+            turns, _, ids = trim_turns(tokenizer, turns, question, context, system_prompt, budget)
+            history = tokenizer(build_chat_prompt(turns, question, "", system_prompt))["input_ids"]
+
+        cache = session.cache if session.cache is not None else DynamicCache()
+        # 마지막 토큰 하나는 항상 새로 넣어야 다음 토큰 분포를 얻으므로 최대 len(ids) - 1까지 재사용
+        reuse = min(common_prefix_length(session.ids, ids), len(ids) - 1, cache.get_seq_length())
+        if reuse == 0:
+            cache = DynamicCache()
+        elif cache.get_seq_length() > reuse:
+            cache.crop(reuse)
+        REGISTRY.observe("rag_session_cached_tokens", reuse)
+
+        # 생성 중에는 캐시를 세션에서 떼어 둠 (잘라내고 이어 쓰는 캐시가 실패 시 session.ids와 어긋나지 않도록)
+        session.cache = None
+        sequences = []
+        try:
+            answer, stats = generate_stream(
+                "", model, tokenizer, device,
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                on_text=on_text,
+                request_start=request_start,
+                stop_signal=stop_signal,
+                past_key_values=cache,
+                prompt_ids=ids,
+                on_sequences=sequences.append,
+            )
+        except BaseException:
+            # 대화 기록은 그대로 두고 캐시만 버림 (다음 턴에 처음부터 prefill)
+            session.drop_cache()
+            raise
+
+        session.turns = turns + [(question, answer.strip())]
+        if sequences:
+            generated = sequences[0][0, len(ids):].tolist()
+            # 다음 턴에는 이번 문맥이 빠지므로 문맥 없는 형태로 저장
+            session.ids = history + generated[:answer_token_count(tokenizer, generated, answer)]
+            # 캐시는 문맥을 넣은 프롬프트로 계산했으므로 저장한 토큰과 겹치는 앞부분만 남김
+            # (문맥이 있었으면 문맥 앞까지, 없었으면 답변 뒤 정지 태그만 잘라냄)
+            shared = common_prefix_length(session.ids, ids + generated)
+            if shared == 0:
+                session.cache = None
+            else:
+                if cache.get_seq_length() > shared:
+                    cache.crop(shared)
+                session.cache = cache
+        else:
+            session.drop_cache()
+    store.update(session_id, session)
+    return answer, stats
@@ -0,0 +1,127 @@
+"""
+같은 질문 요청 합치기 (single-flight)
+
+유행하는 질문(예: 열감기 철)은 몇 초 사이에 여러 사용자가 똑같이 보내는데, 요청마다 검색과 256토큰 생성을
+따로 하면 생성 대기열만 길어집니다. SingleFlight는 같은 키(정규화한 질문 + 생성 매개변수)의 작업이
+진행 중이면 새 작업을 시작하지 않고 그 작업의 결과 스트림을 같이 구독하게 합니다.
+- 작업(Flight)은 요청과 별개의 asyncio 작업으로 돌고, 결과를 publish로 Flight에 쌓습니다.
+- 구독자는 지금까지 쌓인 문맥, 대기 순번, 생성된 텍스트를 먼저 한꺼번에 받고 이후 새 토큰을 실시간으로 받습니다.
+- 구독자가 모두 떠나면 작업을 취소하고, 작업이 끝나면 키를 지웁니다 (결과를 캐시하지는 않음).
+
+모든 메서드는 서버의 이벤트 루프 스레드에서만 호출합니다 (작업 풀 스레드에서는 loop.call_soon_threadsafe).
+
+메트릭: rag_singleflight_requests_total{role="leader"|"joined"}, rag_singleflight_inflight (게이지)
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from rag.telemetry import REGISTRY
+
+
+class Flight:
+    """진행 중인 작업 하나의 결과 스트림"""
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.context: Optional[Dict[str, Any]] = None  # context 이벤트 데이터
+        self.position: Optional[int] = None  # 마지막 대기 순번
+        self.text = ""  # 지금까지 생성된 텍스트 (token 이벤트를 이어 붙인 것)
+        self.result: Optional[Tuple[str, Dict[str, Any]]] = None  # ("done" 또는 "error", 데이터)
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.result is not None
+
+    def publish(self, name: str, data: Dict[str, Any]) -> None:
+        """작업 쪽에서 이벤트(context, queue, token, done, error)를 추가합니다."""
+        if self.finished:
+            return
+        if name == "context":
+            self.context = data
+        elif name == "queue":
+            self.position = data["position"]
+        elif name == "token":
+            self.text += data["text"]
+        else:
+            self.result = (name, data)
+        self._changed.set()
+
+    async def subscribe(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        (이벤트 이름, 데이터)를 내보냅니다. 늦게 들어온 구독자는 이미 생성된 텍스트를 token 하나로 먼저 받습니다.
+        done/error를 내보내면 끝납니다. 구독 수는 처음 읽을 때 늘리고 끝날 때 줄이므로, join만 하고
+        읽지 않은 응답(스트리밍 전에 연결이 끊김 등)은 작업을 붙잡지 않습니다.
+        """
+        self.subscribers += 1
+        context_sent = False
+        position_sent: Optional[int] = None
+        text_sent = 0
+        try:
+            while True:
+                self._changed.clear()
+                if self.context is not None and not context_sent:
+                    context_sent = True
+                    yield "context", self.context
+                if self.position is not None and self.position != position_sent and not self.text:
+                    position_sent = self.position
+                    yield "queue", {"position": self.position}
+                if len(self.text) > text_sent:
+                    chunk, text_sent = self.text[text_sent:], len(self.text)
+                    yield "token", {"text": chunk}
+                if self.result is not None:
+                    yield self.result
+                    return
+                await self._changed.wait()
+        finally:
+            self._leave()
+
+    def _leave(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers <= 0 and not self.finished and self.task is not None:
+            # 기다리는 사람이 없으면 작업(대기열, 생성)을 취소
+            self.task.cancel()
+
+
+class SingleFlight:
+    """키 -> 진행 중인 Flight"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def join(self, key: Hashable, start: Callable[[Flight], Awaitable[None]]) -> Tuple[Flight, bool]:
+        """
+        key의 작업이 진행 중이면 그 Flight에 합류하고, 없으면 start(flight)로 새 작업을 시작합니다.
+        start는 결과를 flight.publish로 보내고, 끝날 때 done 또는 error를 publish 해야 합니다.
+        반환: (Flight, 새로 시작했는지 여부)
+        """
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._flights[key] = Flight(key)
+            flight.task = asyncio.get_running_loop().create_task(self._run(flight, start))
+        REGISTRY.inc("rag_singleflight_requests_total", role="leader" if leader else "joined")
+        return flight, leader
+
+    async def _run(self, flight: Flight, start: Callable[[Flight], Awaitable[None]]) -> None:
+        REGISTRY.set_gauge("rag_singleflight_inflight", len(self._flights))
+        try:
+            await start(flight)
+        except asyncio.CancelledError:
+            flight.publish("error", {"detail": "요청이 취소되었습니다."})
+        except Exception as e:
+            flight.publish("error", {"detail": str(e)})
+        finally:
+            if not flight.finished:
+                flight.publish("error", {"detail": "응답이 완료되지 않았습니다."})
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            REGISTRY.set_gauge("rag_singleflight_inflight", len(self._flights))
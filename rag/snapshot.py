@@ -0,0 +1,126 @@
+"""
+서빙용 로컬 모델 스냅숏
+
+허깅페이스 레포지토리(MODEL_PATH, TOKENIZER_PATH)를 한 번 받아서 서빙 dtype으로 변환한 safetensors 샤드와
+fast 토크나이저(tokenizer.json)를 MODEL_SNAPSHOT_DIR에 저장합니다.
+rag.generation.load_model은 같은 레포지토리로 만든 스냅숏이 있으면 허브에 묻지 않고(local_files_only)
+스냅숏을 엽니다.
+- safetensors는 파일을 메모리 매핑해서 읽으므로 체크포인트 전체를 한 번 더 메모리에 올리지 않고,
+  이미 서빙 dtype이라 로드 중 dtype 변환용 사본도 생기지 않습니다.
+- tokenizer.json은 바로 fast 토크나이저로 열리므로 sentencepiece/slow 토크나이저 변환을 건너뜁니다.
+
+스냅숏 디렉터리에는 snapshot.json(원본 레포지토리, dtype, 만든 시각)이 함께 저장되며,
+원본 레포지토리나 dtype이 config와 다르면 스냅숏을 쓰지 않고 허브에서 로드합니다.
+
+사용법:
+    python -m rag.snapshot                       # config의 MODEL_PATH/TOKENIZER_PATH -> MODEL_SNAPSHOT_DIR
+    python -m rag.snapshot --output ./models/x --dtype bfloat16 --max-shard-size 1GB
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional
+
+from rag.config import MODEL_DTYPE, MODEL_PATH, MODEL_SNAPSHOT_DIR, SNAPSHOT_MAX_SHARD_SIZE, TOKENIZER_PATH
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MANIFEST = "snapshot.json"
+
+
+def read_manifest(snapshot_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_snapshot(model_path: str, tokenizer_path: str, snapshot_dir: Optional[str] = MODEL_SNAPSHOT_DIR,
+                  dtype: str = MODEL_DTYPE) -> Optional[str]:
+    """model_path/tokenizer_path/dtype로 만든 스냅숏이 있으면 그 경로, 없으면 None"""
+    if not snapshot_dir:
+        return None
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return None
+    if (manifest.get("model_path"), manifest.get("tokenizer_path"), manifest.get("dtype")) != (
+            model_path, tokenizer_path, dtype):
+        logger.info(f"스냅숏 {snapshot_dir}은(는) 다른 모델/dtype으로 만들어져 사용하지 않습니다: {manifest}")
+        return None
+    return snapshot_dir
+
+
+def prepare_snapshot(model_path: str = MODEL_PATH, tokenizer_path: str = TOKENIZER_PATH,
+                     output_dir: str = MODEL_SNAPSHOT_DIR, dtype: str = MODEL_DTYPE,
+                     max_shard_size: str = SNAPSHOT_MAX_SHARD_SIZE) -> Dict[str, Any]:
+    """
+    모델과 토크나이저를 받아 스냅숏을 만듭니다. 임시 디렉터리에 모두 쓴 뒤 바꿔치기하므로
+    중간에 실패해도 기존 스냅숏은 그대로 남습니다.
+    반환: snapshot.json 내용
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    if not tokenizer.is_fast:
+        raise ValueError(f"{tokenizer_path}에서 fast 토크나이저를 만들 수 없습니다.")
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    logger.info(f"모델을 {dtype}로 불러옵니다: {model_path}")
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=getattr(torch, dtype),
+                                                 low_cpu_mem_usage=True)
+
+    tmp_dir = output_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    model.save_pretrained(tmp_dir, safe_serialization=True, max_shard_size=max_shard_size)
+    tokenizer.save_pretrained(tmp_dir)
+    if not os.path.exists(os.path.join(tmp_dir, "tokenizer.json")):
+        raise RuntimeError("tokenizer.json이 저장되지 않았습니다.")
+
+    manifest = {
+        "model_path": model_path,
+        "tokenizer_path": tokenizer_path,
+        "dtype": dtype,
+        "max_shard_size": max_shard_size,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "prepare_seconds": round(time.perf_counter() - start, 1),
+        "size_mb": round(sum(
+            os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir)) / (1024 * 1024), 1),
+    }
+    # 매니페스트는 마지막에 써서, 매니페스트가 있으면 스냅숏이 완성된 것으로 봄
+    with open(os.path.join(tmp_dir, SNAPSHOT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    old_dir = output_dir.rstrip("/") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"스냅숏 저장 완료: {output_dir} ({manifest['size_mb']}MB)")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="서빙용 로컬 모델 스냅숏 만들기")
+    parser.add_argument("--model", default=MODEL_PATH, help="모델 레포지토리 또는 경로")
+    parser.add_argument("--tokenizer", default=TOKENIZER_PATH, help="토크나이저 레포지토리 또는 경로")
+    parser.add_argument("--output", default=MODEL_SNAPSHOT_DIR, help="스냅숏 디렉터리")
+    parser.add_argument("--dtype", default=MODEL_DTYPE, help="서빙 dtype (float16, bfloat16, float32)")
+    parser.add_argument("--max-shard-size", default=SNAPSHOT_MAX_SHARD_SIZE, help="safetensors 샤드 최대 크기")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    manifest = prepare_snapshot(args.model, args.tokenizer, args.output, args.dtype, args.max_shard_size)
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
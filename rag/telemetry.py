@@ -0,0 +1,360 @@
+"""
+요청 경로 계측 (트레이스 + 지연 시간 히스토그램)
+
+- 트레이스: OpenTelemetry 스팬을 콘솔 또는 로컬 파일(JSON Lines)로 내보냅니다.
+  opentelemetry-sdk가 설치되지 않았으면 스팬은 아무 일도 하지 않습니다.
+- 메트릭: 프로세스 안에서 최근 MAX_SAMPLES개 관측값으로 p50/p95/p99를 계산하고,
+  start_metrics_server로 Prometheus 텍스트 형식(/metrics)으로 노출합니다.
+- 임베딩: InstrumentedEmbeddings로 감싸면 벡터 DB별 임베딩 시간과 API 토큰 수를 기록합니다.
+- 생성: GenerationTimer를 logits_processor로 넘기면 prefill 종료 시점과 디코딩 속도를 잽니다.
+
+주요 메트릭 이름:
+    rag_request_seconds, rag_search_seconds{tool}, rag_embedding_seconds{store,kind},
+    rag_embedding_tokens_total{store}, rag_context_tokens, rag_prompt_tokens,
+    rag_prefill_seconds, rag_ttft_seconds, rag_decode_tokens_per_second, rag_generated_tokens,
+    rag_admission_queue_depth, rag_admission_active, rag_admission_wait_seconds, rag_admission_rejected_total{reason}
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from rag.config import TELEMETRY_TRACE_PATH
+
+try:
+    from opentelemetry import trace
+except ImportError:  # opentelemetry 미설치 시 트레이스 없이 메트릭만 수집
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+MAX_SAMPLES = 2048  # 분위수 계산에 사용할 최근 관측값 수 (메트릭/라벨 조합별)
+EMBEDDING_ENCODING = "cl100k_base"  # OpenAI 임베딩 모델(text-embedding-ada-002, -3-*)의 토크나이저
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Summary:
+    def __init__(self):
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self) -> List[Tuple[float, float]]:
+        values = sorted(self.samples)
+        if not values:
+            return [(q, math.nan) for q in QUANTILES]
+        # nearest-rank 방식
+        return [(q, values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]) for q in QUANTILES]
+
+
+class MetricsRegistry:
+    """요약(분위수) 메트릭, 카운터, 게이지를 모아 Prometheus 텍스트 형식으로 만듭니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._summaries: Dict[str, Dict[LabelKey, _Summary]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            series.setdefault(self._key(labels), _Summary()).observe(float(value))
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._key(labels)] = float(value)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        {메트릭: {라벨 문자열: {"count", "p50", "p95", "p99"}}} (벤치마크/로그용)
+        카운터와 게이지는 {메트릭: {라벨 문자열: {"value"}}}
+        """
+        with self._lock:
+            result = {}
+            for name, series in self._summaries.items():
+                result[name] = {}
+                for key, summary in series.items():
+                    stats = {"count": summary.count}
+                    stats.update({f"p{int(q * 100)}": v for q, v in summary.quantiles()})
+                    result[name][_format_labels(key)] = stats
+            for name, series in list(self._counters.items()) + list(self._gauges.items()):
+                result[name] = {_format_labels(key): {"value": value} for key, value in series.items()}
+            return result
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(self._summaries):
+                lines.append(f"# TYPE {name} summary")
+                for key, summary in self._summaries[name].items():
+                    for q, value in summary.quantiles():
+                        lines.append(f"{name}{_format_labels(key + (('quantile', str(q)),))} {value}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {summary.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {summary.count}")
+            for name in sorted(self._counters):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in self._counters[name].items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted(self._gauges):
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in self._gauges[name].items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for k, v in key
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# ---------------------------------------------------------------------------
+# 트레이스
+# ---------------------------------------------------------------------------
+_tracing_lock = threading.Lock()
+_tracing_ready = False
+
+
+def setup_tracing(exporter: str = "none", path: str = TELEMETRY_TRACE_PATH, service_name: str = "rag-chatbot") -> bool:
+    """
+    OpenTelemetry 트레이서를 설정합니다. 프로세스당 한 번만 적용됩니다.
+    exporter: "console"(표준 출력), "file"(path에 스팬을 한 줄씩 JSON으로 추가), "none"
+    반환: 트레이스 사용 여부
+    """
+    global _tracing_ready
+    if trace is None or exporter == "none":
+        return False
+
+    with _tracing_lock:
+        if _tracing_ready:
+            return True
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-sdk가 없어 트레이스를 내보내지 않습니다.")
+            return False
+
+        if exporter == "file":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            out = open(path, "a", encoding="utf-8")
+            span_exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+        else:
+            span_exporter = ConsoleSpanExporter()
+
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        trace.set_tracer_provider(provider)
+        _tracing_ready = True
+        logger.info(f"트레이스 내보내기 설정: {exporter}" + (f" ({path})" if exporter == "file" else ""))
+        return True
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+@contextmanager
+def span(name: str, metric: Optional[str] = None, labels: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """
+    스팬을 열고, metric이 주어지면 구간 시간(초)을 히스토그램에 기록합니다.
+    labels는 메트릭 라벨과 스팬 속성("rag.<키>")에 모두 사용됩니다. 라벨이 아닌 속성은 set_attribute로 붙입니다.
+        with span("rag.search", "rag_search_seconds", {"tool": name}) as s:
+            s.set_attribute("rag.hits", 3)
+    """
+    labels = labels or {}
+    attrs = {f"rag.{k}": v for k, v in labels.items()}
+    start = time.perf_counter()
+    try:
+        if trace is None:
+            yield _NoopSpan()
+        else:
+            with trace.get_tracer("rag").start_as_current_span(name, attributes=attrs) as s:
+                yield s
+    finally:
+        if metric:
+            REGISTRY.observe(metric, time.perf_counter() - start, **labels)
+
+
+# ---------------------------------------------------------------------------
+# Prometheus 엔드포인트
+# ---------------------------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # 요청마다 표준 오류로 찍지 않음
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """/metrics를 제공하는 HTTP 서버를 데몬 스레드로 시작합니다. (port가 0이면 시작하지 않음)"""
+    global _server
+    if port <= 0:
+        return None
+    if _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"메트릭 서버를 시작할 수 없습니다 ({host}:{port}): {str(e)}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"메트릭 엔드포인트: http://{host}:{port}/metrics")
+    return _server
+
+
+# ---------------------------------------------------------------------------
+# 임베딩 / 생성 계측
+# ---------------------------------------------------------------------------
+_encoding = None
+
+
+def count_embedding_tokens(texts: List[str]) -> int:
+    """OpenAI 임베딩 API가 과금하는 토큰 수 (tiktoken이 없으면 글자 수로 대략 추정)"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(EMBEDDING_ENCODING)
+        except Exception:
+            _encoding = False
+    if _encoding is False:
+        return sum(len(text) for text in texts)
+    return sum(len(tokens) for tokens in _encoding.encode_batch(texts))
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """임베딩 호출마다 스팬과 시간/토큰 메트릭을 남기는 래퍼 (store 라벨로 벡터 DB 구분)"""
+
+    def __init__(self, embedding: Embeddings, store: str):
+        self.embedding = embedding
+        self.store = store
+
+    def __getattr__(self, name):
+        if name == "embedding":  # 역직렬화 중 무한 재귀 방지
+            raise AttributeError(name)
+        return getattr(self.embedding, name)
+
+    def _record_tokens(self, texts: List[str], s: Any) -> None:
+        tokens = count_embedding_tokens(texts)
+        REGISTRY.inc("rag_embedding_tokens_total", tokens, store=self.store)
+        s.set_attribute("rag.embedding_tokens", tokens)
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("rag.embed", "rag_embedding_seconds", {"store": self.store, "kind": "query"}) as s:
+            self._record_tokens([text], s)
+            return self.embedding.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("rag.embed", "rag_embedding_seconds", {"store": self.store, "kind": "documents"}) as s:
+            s.set_attribute("rag.texts", len(texts))
+            self._record_tokens(texts, s)
+            return self.embedding.embed_documents(texts)
+
+
+def instrument_embedding(embedding: Embeddings, store: str) -> Embeddings:
+    if isinstance(embedding, InstrumentedEmbeddings):
+        return embedding
+    return InstrumentedEmbeddings(embedding, store)
+
+
+class GenerationTimer:
+    """
+    model.generate(logits_processor=LogitsProcessorList([timer]))에 넘기는 시간 측정기
+    logits 처리기는 forward 한 번마다 호출되므로 첫 호출 = prefill 종료, 호출 수 = 생성 토큰 수입니다.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.prefill_end: Optional[float] = None
+        self.last_token: Optional[float] = None
+        self.tokens = 0
+
+    def __call__(self, input_ids, scores):
+        now = time.perf_counter()
+        if self.prefill_end is None:
+            self.prefill_end = now
+        self.last_token = now
+        self.tokens += 1
+        return scores
+
+    @property
+    def prefill_seconds(self) -> Optional[float]:
+        return None if self.prefill_end is None else self.prefill_end - self.start
+
+    @property
+    def decode_tokens_per_second(self) -> Optional[float]:
+        """첫 토큰 이후 토큰들의 생성 속도"""
+        if self.tokens < 2 or self.last_token <= self.prefill_end:
+            return None
+        return (self.tokens - 1) / (self.last_token - self.prefill_end)
+
+    def record(self, s: Any = None) -> None:
+        """측정값을 메트릭과 (주어지면) 스팬 속성으로 기록합니다."""
+        s = s or _NoopSpan()
+        if self.prefill_seconds is not None:
+            REGISTRY.observe("rag_prefill_seconds", self.prefill_seconds)
+            s.set_attribute("rag.prefill_seconds", self.prefill_seconds)
+        if self.decode_tokens_per_second is not None:
+            REGISTRY.observe("rag_decode_tokens_per_second", self.decode_tokens_per_second)
+            s.set_attribute("rag.decode_tokens_per_second", self.decode_tokens_per_second)
+        REGISTRY.observe("rag_generated_tokens", self.tokens)
+        s.set_attribute("rag.generated_tokens", self.tokens)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# python -m pytest 없이 pytest로 실행해도 저장소의 패키지(rag 등)를 불러올 수 있도록 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,96 @@
+"""rag.admission 입장 제어와 추론 서버의 혼잡 응답(503)"""
+import asyncio
+
+import pytest
+
+from rag.admission import ADMITTED, DONE, AdmissionController, AdmissionRejected
+
+
+def test_waiting_requests_are_admitted_in_fifo_order():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=3, queue_timeout=5)
+        first = controller.enqueue()
+        waiting = [controller.enqueue() for _ in range(3)]
+        assert first.state == ADMITTED
+        assert [controller.position(t) for t in waiting] == [1, 2, 3]
+
+        order = []
+
+        async def wait(name, ticket):
+            await controller.wait(ticket)
+            order.append(name)
+            controller.start(ticket)
+            await asyncio.sleep(0)
+            controller.finish(ticket)
+
+        tasks = [asyncio.create_task(wait(i, t)) for i, t in enumerate(waiting)]
+        await asyncio.sleep(0)
+        controller.finish(first)
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2]
+        assert controller.stats()["active"] == 0 and controller.depth == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_rejects_as_busy():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        controller.enqueue()
+        controller.enqueue()
+        with pytest.raises(AdmissionRejected) as e:
+            controller.enqueue()
+        assert e.value.reason == "busy"
+
+    asyncio.run(run())
+
+
+def test_queue_timeout_rejects_and_leaves_queue():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=0.05)
+        controller.enqueue()
+        ticket = controller.enqueue()
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.wait(ticket)
+        assert e.value.reason == "timeout"
+        assert controller.depth == 0
+
+    asyncio.run(run())
+
+
+def test_abandon_releases_queue_position_and_slot():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=3, queue_timeout=5)
+        running = controller.enqueue()
+        gone, next_up = controller.enqueue(), controller.enqueue()
+
+        controller.abandon(gone)  # 대기 중에 포기하면 대기열에서 빠짐
+        assert gone.state == DONE and gone.future.cancelled()
+        assert controller.position(next_up) == 1
+
+        controller.abandon(running)  # 입장 후 시작 전에 포기하면 자리를 반납하고 다음 요청이 입장
+        assert next_up.state == ADMITTED
+        assert controller.stats()["active"] == 1
+
+        controller.start(next_up)
+        controller.abandon(next_up)  # 시작한 뒤에는 finish에서만 반납
+        assert controller.stats()["active"] == 1
+        controller.finish(next_up)
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(run())
+
+
+def test_server_returns_503_with_retry_after_when_queue_is_full():
+    from fastapi.testclient import TestClient
+
+    from rag.config import ADMISSION_RETRY_AFTER
+    from rag.server import Pipeline, create_app
+
+    app = create_app(loader=lambda: Pipeline(search_tools=[], model=object()), workers=1, max_queue=0)
+    with TestClient(app) as client:
+        app.state.admission.active = 1  # 생성 중인 요청이 자리를 차지한 상태
+        response = client.post("/generate", json={"question": "아기가 밤에 자주 깨요", "stream": False})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(ADMISSION_RETRY_AFTER)
+    assert response.json()["reason"] == "busy"
@@ -0,0 +1,32 @@
+"""rag.batch.plan_batches 배치 나누기"""
+import random
+
+import pytest
+
+from rag.batch import plan_batches
+
+
+@pytest.mark.parametrize("batch_size,max_batch_tokens", [(4, 10_000), (8, 600), (3, 300)])
+def test_batches_respect_size_and_token_bound(batch_size, max_batch_tokens):
+    rng = random.Random(0)
+    lengths = [rng.randint(10, 200) for _ in range(50)]
+    max_new_tokens = 64
+
+    batches = plan_batches(lengths, max_new_tokens, batch_size, max_batch_tokens)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    order = [lengths[i] for batch in batches for i in batch]
+    assert order == sorted(order)  # 짧은 프롬프트부터
+    for batch in batches:
+        assert len(batch) <= batch_size
+        # 배치는 가장 긴 프롬프트 길이로 패딩됨
+        padded = len(batch) * (max(lengths[i] for i in batch) + max_new_tokens)
+        assert len(batch) == 1 or padded <= max_batch_tokens
+
+
+def test_overlong_prompt_gets_its_own_batch():
+    assert plan_batches([10, 500, 20], max_new_tokens=50, batch_size=8, max_batch_tokens=200) == [[0, 2], [1]]
+
+
+def test_empty_input():
+    assert plan_batches([], max_new_tokens=50) == []
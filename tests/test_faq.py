@@ -0,0 +1,59 @@
+"""rag.faq AnswerStore.match 정확히 같은 질문과 유사도 threshold"""
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from rag.faq import AnswerStore, normalize_question
+from rag.numpy_store import normalize
+
+QUESTIONS = ["신생아 수유 간격은 얼마나 되나요?", "이유식은 언제 시작하나요?"]
+
+
+class TableEmbeddings(Embeddings):
+    """질문별로 정해 둔 벡터를 돌려주는 임베딩"""
+
+    def __init__(self, table):
+        self.table = table
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [self.table[text] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self.table[text]
+
+
+@pytest.fixture
+def store():
+    table = {
+        QUESTIONS[0]: [1.0, 0.0, 0.0],
+        QUESTIONS[1]: [0.0, 1.0, 0.0],
+        "신생아는 몇 시간마다 먹이나요": [0.95, 0.05, 0.0],  # 첫 질문과 비슷함
+        "아기 예방접종 일정": [0.3, 0.3, 0.9],
+    }
+    embedding = TableEmbeddings(table)
+    vectors = normalize(np.asarray(embedding.embed_documents(QUESTIONS), dtype=np.float32))
+    entries = [{"question": q, "answer": f"답변 {i}", "context": f"문맥 {i}"} for i, q in enumerate(QUESTIONS)]
+    return AnswerStore(entries, vectors, {"created": "2024-01-01"}, embedding, threshold=0.9)
+
+
+def test_normalize_question_ignores_spacing_and_trailing_punctuation():
+    assert normalize_question("  이유식은   언제\n시작하나요?!  ") == normalize_question("이유식은 언제 시작하나요")
+
+
+def test_exact_match_skips_embedding(store):
+    hit = store.match("이유식은  언제 시작하나요")
+    assert (hit.question, hit.answer, hit.context, hit.score) == (QUESTIONS[1], "답변 1", "문맥 1", 1.0)
+    assert store.embedding.queries == []
+
+
+def test_similar_question_above_threshold(store):
+    hit = store.match("신생아는 몇 시간마다 먹이나요")
+    assert hit.answer == "답변 0"
+    assert 0.9 <= hit.score < 1.0
+
+
+def test_question_below_threshold_is_a_miss(store):
+    assert store.match("아기 예방접종 일정") is None
+    assert store.embedding.queries == ["아기 예방접종 일정"]
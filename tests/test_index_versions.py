@@ -0,0 +1,42 @@
+"""rag.index_versions IndexManager의 세대 대여와 교체"""
+from rag.index_versions import IndexGeneration, IndexManager
+
+
+class FakeTool:
+    def __init__(self):
+        self.cleared = False
+
+    def clear_cache(self):
+        self.cleared = True
+
+
+def generation(version):
+    return IndexGeneration(version, f"/vector_db/versions/{version}", [FakeTool()], {"faiss_classified": object()})
+
+
+def test_retired_generation_is_released_after_last_lease():
+    old, new = generation("v1"), generation("v2")
+    swapped = []
+    manager = IndexManager(old, on_swap=swapped.append)
+    tool = old.search_tools[0]
+
+    with manager.lease() as first:
+        with manager.lease() as second:
+            manager.swap(new)
+            assert first is old and second is old
+            assert manager.current is new and swapped == [new]
+            with manager.lease() as fresh:
+                assert fresh is new  # 교체 뒤 요청은 새 세대를 씀
+            assert manager.stats()["retired_leases"] == 2
+        assert old.search_tools and not tool.cleared  # 아직 검색 중인 요청이 있음
+    assert old.search_tools == [] and old.vector_dbs == {} and tool.cleared
+    assert manager.stats()["retired_leases"] == 0
+    assert new.search_tools and not new.search_tools[0].cleared
+
+
+def test_swap_without_leases_releases_immediately():
+    old, new = generation("v1"), generation("v2")
+    manager = IndexManager(old)
+    manager.swap(new)
+    assert old.retired and old.search_tools == []
+    assert manager.stats()["version"] == "v2"
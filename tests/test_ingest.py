@@ -0,0 +1,123 @@
+"""rag.ingest 증분 색인 (가짜 분류기와 rag.fakes.HashEmbeddings 사용)"""
+import json
+import os
+import time
+
+import pytest
+from langchain.docstore.document import Document
+
+from rag.classify import ContentClassifier
+from rag.fakes import HashEmbeddings
+from rag.index import base_index_version, current_version, publish_version, vector_db_path, version_dir
+from rag.ingest import Ingestor, article_document, read_offsets
+from rag.partition import PartitionedVectorStore
+
+
+class FakeZeroShot:
+    """"광고"가 들어간 글은 비정보, "잠"이 들어간 글은 수면, 나머지는 수유로 분류하는 제로샷 파이프라인"""
+
+    def __call__(self, texts, candidate_labels, hypothesis_template=None):
+        results = []
+        for text in texts:
+            if "정보" in candidate_labels:
+                labels = ["비정보", "정보"] if "광고" in text else ["정보", "비정보"]
+            else:
+                top = "수면" if "잠" in text else "수유"
+                labels = [top] + [label for label in candidate_labels if label != top]
+            results.append({"labels": labels, "scores": [0.9] + [0.1 / len(labels)] * (len(labels) - 1)})
+        return results
+
+
+def article(article_id, text, board="자유게시판"):
+    return {"id": str(article_id), "title": f"제목 {article_id}", "contentText": text, "menuName": board}
+
+
+def write_articles(directory, name, articles, age=60):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"articles": articles}, f, ensure_ascii=False)
+    past = time.time() - age
+    os.utime(path, (past, past))
+    return path
+
+
+@pytest.fixture
+def vector_db(tmp_path):
+    """분류 게시글 DB(주제별 파티션)와 바뀌지 않는 다른 DB 파일이 들어 있는 첫 버전"""
+    root = str(tmp_path / "vector_db")
+    path = version_dir(root, "v1")
+    os.makedirs(os.path.join(path, "bm25_babylove"))
+    with open(os.path.join(path, "bm25_babylove", "index.pkl"), "wb") as f:
+        f.write(b"unchanged")
+    docs = [Document(page_content=f"기존 글 {i}", metadata={"id": f"post{i}", "topic": "수유", "category": "정보"})
+            for i in range(3)]
+    PartitionedVectorStore.from_document_batches([docs], HashEmbeddings(), "topic").save_local(
+        vector_db_path("faiss_classified", path, index_type="flat"))
+    publish_version(root, "v1")
+    return root
+
+
+@pytest.fixture
+def ingestor_factory(vector_db, tmp_path):
+    watch = tmp_path / "output"
+    watch.mkdir()
+    classifier = ContentClassifier()
+    classifier._pipeline = FakeZeroShot()
+
+    def make():
+        return Ingestor([str(watch)], vector_db, embedding=HashEmbeddings(), classifier=classifier, settle=1)
+
+    return make, str(watch)
+
+
+def test_board_name_is_not_stored_as_category():
+    doc = article_document({"id": "1", "title": "t", "contentText": "본문", "menuName": "자유게시판",
+                            "source_file": "articles_1_1.json"})
+    assert doc.metadata["board"] == "자유게시판" and "category" not in doc.metadata
+
+
+def test_upsert_counts_and_classification(ingestor_factory):
+    make, _ = ingestor_factory
+    ingestor = make()
+    ingestor.load()
+
+    docs = [article_document({**article(i, text), "source_file": "a.json"})
+            for i, text in enumerate(["분유 양", "낮잠 시간", "광고 글"])]
+    assert ingestor.upsert(docs) == {"added": 2, "updated": 0, "unchanged": 0, "filtered": 1}
+    stored = ingestor.db.get_by_ids(["cafe:1"])[0].metadata
+    assert (stored["category"], stored["topic"], stored["board"]) == ("정보", "수면", "자유게시판")
+    assert ingestor.db.ntotal == 5
+
+    changed = [article_document({**article(i, text), "source_file": "a.json"})
+               for i, text in enumerate(["분유 양", "밤잠 시간", "광고 글"])]
+    changed.append(article_document({**article(3, "이유식"), "source_file": "a.json"}))
+    # 넣지 않은 비정보 글은 다시 분류해 다시 제외
+    assert ingestor.upsert(changed) == {"added": 1, "updated": 1, "unchanged": 1, "filtered": 1}
+
+    became_ad = [article_document({**article(0, "광고로 바뀐 글"), "source_file": "a.json"})]
+    assert ingestor.upsert(became_ad) == {"added": 0, "updated": 0, "unchanged": 0, "filtered": 1}
+    assert ingestor.db.get_by_ids(["cafe:0"]) == []
+
+
+def test_offsets_persist_across_restarts(ingestor_factory, vector_db):
+    make, watch = ingestor_factory
+    base = base_index_version(vector_db)
+    path = write_articles(watch, "articles_1_3.json", [article(1, "분유 양"), article(2, "낮잠"), article(3, "광고")])
+
+    version = make().run_once()
+    assert version is not None and current_version(vector_db) == version
+    published = version_dir(vector_db, version)
+    stamp = [os.stat(path).st_mtime_ns, os.stat(path).st_size]
+    assert read_offsets(published) == {os.path.normpath(path): stamp}
+    assert base_index_version(vector_db) == base  # 게시글만 추가한 버전은 FAQ 기준 버전이 그대로
+    # 바뀌지 않는 DB 파일은 복사하지 않고 하드 링크로 공유
+    unchanged = [os.stat(os.path.join(p, "bm25_babylove", "index.pkl")) for p in (version_dir(vector_db, "v1"), published)]
+    assert unchanged[0].st_ino == unchanged[1].st_ino
+
+    restarted = make()
+    assert restarted.run_once() is None  # 이미 색인한 파일은 다시 읽지 않음
+    assert restarted.db.ntotal == 5
+
+    write_articles(watch, "articles_4_4.json", [article(4, "밤잠")])
+    assert make().run_once() is not None
+    assert len(read_offsets(version_dir(vector_db, current_version(vector_db)))) == 2
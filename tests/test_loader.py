@@ -0,0 +1,56 @@
+"""rag.loader 입력 형식 판별과 스트리밍 배치"""
+import json
+
+import pytest
+
+from rag.loader import (
+    FORMAT_CLASSIFIED, FORMAT_EXPANDED, FORMAT_VECTOR_DB, UnknownFormatError, detect_format, iter_document_batches,
+)
+
+
+def write_json(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("container,record,expected", [
+    ("{", {"post": "본문", "category": "정보"}, FORMAT_CLASSIFIED),
+    ("[", {"post": "원글", "comment": "댓글"}, FORMAT_EXPANDED),
+    ("[", {"id": "d1", "text": "본문", "metadata": {}}, FORMAT_VECTOR_DB),
+    ("{", {"text": "본문"}, None),
+    ("[", {"post": "본문"}, None),
+    ("[", "문자열", None),
+])
+def test_detect_format(container, record, expected):
+    assert detect_format(container, record) == expected
+
+
+def test_classified_batches_keep_order_and_skip_empty_posts(tmp_path):
+    posts = {f"post{i}": {"post": f"본문 {i}" if i != 3 else "  ", "category": "정보", "confidence": 0.9}
+             for i in range(7)}
+    path = write_json(tmp_path, "classified_contents.json", posts)
+
+    batches = list(iter_document_batches(path, batch_size=4))
+    assert [len(batch) for batch in batches] == [4, 2]
+    docs = [doc for batch in batches for doc in batch]
+    assert [doc.metadata["id"] for doc in docs] == [f"post{i}" for i in range(7) if i != 3]
+    assert docs[0].metadata == {"id": "post0", "category": "정보", "confidence": 0.9}
+
+
+def test_expanded_and_vector_db_metadata(tmp_path):
+    expanded = write_json(tmp_path, "expanded.json", [{"post": "원글", "comment": "댓글 내용"}])
+    [[doc]] = list(iter_document_batches(expanded))
+    assert doc.page_content == "댓글 내용" and doc.metadata == {"post": "원글", "index": 0}
+
+    vector_db = write_json(tmp_path, "vector_db_final.json",
+                           [{"id": "d1", "text": "본문", "metadata": {"category": "4~6개월"}}])
+    [[doc]] = list(iter_document_batches(vector_db))
+    assert doc.page_content == "본문" and doc.metadata["category"] == "4~6개월"
+
+
+@pytest.mark.parametrize("data", [[], [{"unknown": 1}], "문자열"])
+def test_unknown_structure_raises(tmp_path, data):
+    path = write_json(tmp_path, "unknown.json", data)
+    with pytest.raises(UnknownFormatError):
+        list(iter_document_batches(path))
@@ -0,0 +1,58 @@
+"""rag.microbatch 질의 임베딩 마이크로 배치"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rag.fakes import HashEmbeddings
+from rag.microbatch import MicroBatchingEmbeddings
+
+
+class RecordingEmbeddings(HashEmbeddings):
+    def __init__(self, error=None):
+        super().__init__()
+        self.calls = []
+        self.error = error
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return super().embed_documents(texts)
+
+
+def embed_concurrently(embedding, texts):
+    barrier = threading.Barrier(len(texts))
+
+    def embed(text):
+        barrier.wait()
+        return embedding.embed_query(text)
+
+    with ThreadPoolExecutor(len(texts)) as pool:
+        return [pool.submit(embed, text) for text in texts]
+
+
+def test_concurrent_queries_are_batched_and_deduplicated():
+    remote = RecordingEmbeddings()
+    embedding = MicroBatchingEmbeddings(remote, window_ms=200, max_batch=8, concurrency=1)
+    texts = ["수유 간격", "밤잠", "수유 간격", "밤잠", "이유식"]
+
+    vectors = [future.result() for future in embed_concurrently(embedding, texts)]
+
+    assert len(remote.calls) == 1
+    assert sorted(remote.calls[0]) == ["밤잠", "수유 간격", "이유식"]
+    assert vectors == [remote.embed_query(text) for text in texts]
+
+
+def test_batch_error_is_raised_in_every_waiting_caller():
+    remote = RecordingEmbeddings(error=RuntimeError("embedding server down"))
+    embedding = MicroBatchingEmbeddings(remote, window_ms=200, max_batch=8, concurrency=1)
+
+    futures = embed_concurrently(embedding, ["a", "b", "c"])
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="embedding server down"):
+            future.result()
+    assert len(remote.calls) == 1
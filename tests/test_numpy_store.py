@@ -0,0 +1,77 @@
+"""rag.numpy_store 전수 검색 벡터 스토어 (직접 계산한 코사인 유사도 기준)"""
+import zlib
+
+import numpy as np
+import pytest
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.numpy_store import NumpyVectorStore
+
+CATEGORIES = ["0~3개월", "4~6개월", "7~12개월"]
+
+
+class CrcEmbeddings(Embeddings):
+    """텍스트의 crc32를 시드로 만든 무작위 단위 벡터 (결정적, 네트워크 없음)"""
+
+    def __init__(self, size=64):
+        self.size = size
+
+    def embed_array(self, texts):
+        vectors = np.stack([np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.size)
+                            for text in texts]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+@pytest.fixture(scope="module")
+def documents():
+    return [Document(page_content=f"게시글 {i}", metadata={"id": i, "category": CATEGORIES[i % 3]})
+            for i in range(500)]
+
+
+def brute_force(embedding, documents, query, k, rows=None):
+    rows = list(range(len(documents))) if rows is None else rows
+    matrix = embedding.embed_array([documents[i].page_content for i in rows])
+    scores = matrix @ embedding.embed_array([query])[0]
+    return [rows[i] for i in np.argsort(-scores)[:k]]
+
+
+@pytest.mark.parametrize("dtype,minimum", [("float32", 1.0), ("float16", 0.9)])
+def test_recall_against_brute_force(documents, dtype, minimum):
+    embedding = CrcEmbeddings()
+    store = NumpyVectorStore.from_documents(documents, embedding, dtype=dtype)
+    queries = [f"질문 {i}" for i in range(30)]
+
+    found = [store.similarity_search_with_score_by_vector(embedding.embed_query(query), k=10) for query in queries]
+    recall = np.mean([
+        len({doc.metadata["id"] for doc, _ in hits} & set(brute_force(embedding, documents, query, 10))) / 10
+        for query, hits in zip(queries, found)
+    ])
+    assert recall >= minimum
+
+
+def test_filter_searches_only_matching_rows(documents):
+    embedding = CrcEmbeddings()
+    store = NumpyVectorStore.from_documents(documents, embedding)
+    rows = [i for i, doc in enumerate(documents) if doc.metadata["category"] in CATEGORIES[:2]]
+
+    hits = store.similarity_search("이유식", k=10, filter={"category": {"$in": CATEGORIES[:2]}})
+    assert [doc.metadata["id"] for doc in hits] == brute_force(embedding, documents, "이유식", 10, rows)
+
+
+def test_mmap_round_trip_and_add_documents(tmp_path, documents):
+    embedding = CrcEmbeddings()
+    store = NumpyVectorStore.from_documents(documents[:100], embedding)
+    store.save_local(str(tmp_path))
+    loaded = NumpyVectorStore.load_local(str(tmp_path), embedding)
+    assert [d.metadata["id"] for d in loaded.similarity_search("게시글 5", k=3)] == \
+        [d.metadata["id"] for d in store.similarity_search("게시글 5", k=3)]
+
+    loaded.add_documents(documents[100:110])
+    assert loaded.similarity_search("게시글 105", k=1)[0].metadata["id"] == 105
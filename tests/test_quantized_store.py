@@ -0,0 +1,95 @@
+"""rag.quantized_store 양자화 인덱스의 recall (전수 검색 기준)"""
+import zlib
+
+import numpy as np
+import pytest
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.quantized_store import QuantizedIndex, QuantizedVectorStore
+
+
+class CrcEmbeddings(Embeddings):
+    """텍스트의 crc32를 시드로 만든 무작위 단위 벡터 (결정적, 네트워크 없음)"""
+
+    def __init__(self, size=64):
+        self.size = size
+
+    def embed_array(self, texts):
+        vectors = np.stack([np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.size)
+                            for text in texts]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+def low_rank_vectors(n, dim=256, rank=48, noise=0.05, seed=0):
+    """임베딩처럼 일부 방향에 몰린 벡터 (정규화)"""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim)).astype(np.float32)
+    vectors = rng.standard_normal((n, rank)).astype(np.float32) @ basis
+    vectors += noise * np.linalg.norm(vectors, axis=1, keepdims=True) / np.sqrt(dim) \
+        * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall_at_k(index, docs, queries, k):
+    truth = np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+    found = [ids for ids, _ in index.search_batch(queries, k)]
+    return np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)])
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    vectors = low_rank_vectors(2200)
+    return vectors[:2000], vectors[2000:]
+
+
+@pytest.mark.parametrize("reduction,quantization,dim,minimum", [
+    ("pca", "int8", 64, 0.95),
+    ("pca", "binary", 128, 0.85),
+    ("truncate", "int8", 128, 0.9),
+])
+def test_rescored_recall_close_to_exact_search(corpus, reduction, quantization, dim, minimum):
+    docs, queries = corpus
+    index = QuantizedIndex.build(docs, dim, reduction, quantization)
+    assert recall_at_k(index, docs, queries, k=10) >= minimum
+
+
+def test_rescoring_improves_binary_recall(corpus):
+    docs, queries = corpus
+    index = QuantizedIndex.build(docs, 64, "pca", "binary")
+    truth = np.argsort(-(queries @ docs.T), axis=1)[:, :10]
+
+    def recall(rescore_k):
+        found = [ids for ids, _ in index.search_batch(queries, 10, rescore_k=rescore_k)]
+        return np.mean([len(set(t) & set(f)) / 10 for t, f in zip(truth, found)])
+
+    assert recall(200) > recall(0)
+
+
+def test_search_matches_search_batch_and_returns_cosine_scores(corpus):
+    docs, queries = corpus
+    index = QuantizedIndex.build(docs, 64, "pca", "int8")
+    ids, scores = index.search(queries[0], 5)
+    batch_ids, batch_scores = index.search_batch(queries[:1], 5)[0]
+    assert list(ids) == list(batch_ids)
+    np.testing.assert_allclose(scores, docs[ids] @ queries[0], rtol=1e-5)
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_store_round_trip(tmp_path):
+    embedding = CrcEmbeddings()
+    documents = [Document(page_content=f"문서 {i}", metadata={"id": i}) for i in range(300)]
+    store = QuantizedVectorStore.from_documents(documents, embedding, dim=32)
+    store.save_local(str(tmp_path))
+    loaded = QuantizedVectorStore.load_local(str(tmp_path), embedding)
+
+    expected = store.similarity_search_with_score("문서 7", k=3)
+    actual = loaded.similarity_search_with_score("문서 7", k=3)
+    assert [doc.metadata["id"] for doc, _ in actual] == [doc.metadata["id"] for doc, _ in expected]
+    assert actual[0][0].page_content == "문서 7"
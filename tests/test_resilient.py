@@ -0,0 +1,122 @@
+"""rag.resilient 제한 시간, 헤지 요청, 회로 차단기 (benchmarks.fake_embedding_server 사용)"""
+import socket
+import threading
+import time
+
+import pytest
+
+from benchmarks.bench_embedding import remote_embedding, start_server
+from benchmarks.fake_embedding_server import create_app
+from rag.fakes import HashEmbeddings
+from rag.microbatch import MicroBatchingEmbeddings
+from rag.resilient import CircuitBreaker, EmbeddingUnavailable, ResilientEmbeddings
+
+
+@pytest.fixture(scope="module")
+def fake_server():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    app = create_app(latency_ms=5, jitter_ms=0)
+    server = start_server(app, port)
+    yield app, f"http://127.0.0.1:{port}/v1"
+    server.should_exit = True
+
+
+@pytest.fixture
+def server(fake_server):
+    app, base_url = fake_server
+    defaults = dict(app.state.settings)
+    yield app, base_url
+    app.state.settings.update(defaults)
+
+
+class StuckEmbeddings(HashEmbeddings):
+    """release가 설정될 때까지 응답하지 않는 임베딩"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.release.wait(5)
+        return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.release.wait(5)
+        return super().embed_documents(texts)
+
+
+def test_slow_server_times_out(server):
+    app, base_url = server
+    app.state.settings.update(tail_rate=1.0, tail_ms=2000)
+    embedding = ResilientEmbeddings(remote_embedding(base_url), timeout=0.3, hedge_delay=0)
+
+    start = time.monotonic()
+    with pytest.raises(EmbeddingUnavailable, match="초 안에 끝나지 않았습니다"):
+        embedding.embed_query("열이 나요")
+    assert time.monotonic() - start < 1.0
+
+
+def test_hedge_answers_when_first_attempt_stalls():
+    stuck = StuckEmbeddings()
+    fast = HashEmbeddings()
+    embedding = ResilientEmbeddings(stuck, timeout=2, hedge_delay=0.05, hedge_embedding=fast)
+    try:
+        start = time.monotonic()
+        assert embedding.embed_query("밤잠") == fast.embed_query("밤잠")
+        assert time.monotonic() - start < 1.0
+        assert stuck.calls == 1
+    finally:
+        stuck.release.set()
+
+
+def test_hedge_bypasses_stalled_microbatch_queue():
+    stuck = StuckEmbeddings()
+    batched = MicroBatchingEmbeddings(stuck, window_ms=1, max_batch=8, concurrency=1)
+    embedding = ResilientEmbeddings(batched, timeout=2, hedge_delay=0.05, hedge_embedding=HashEmbeddings())
+    try:
+        # 배치 전송 자리(concurrency=1)를 막힌 요청이 차지해도 헤지 요청은 바로 응답
+        assert embedding.embed_query("이유식") == HashEmbeddings().embed_query("이유식")
+    finally:
+        stuck.release.set()
+
+
+def test_breaker_opens_then_half_opens_and_closes(server):
+    app, base_url = server
+    breaker = CircuitBreaker(failures=2, reset=0.2)
+    embedding = ResilientEmbeddings(remote_embedding(base_url), timeout=1, hedge_delay=0, breaker=breaker)
+
+    app.state.settings["error_rate"] = 1.0
+    for _ in range(2):
+        with pytest.raises(EmbeddingUnavailable, match="임베딩 요청 실패"):
+            embedding.embed_query("기저귀")
+    assert breaker.state == "open"
+
+    requests = app.state.requests
+    with pytest.raises(EmbeddingUnavailable, match="잠시 요청을 보내지 않습니다"):
+        embedding.embed_query("기저귀")
+    assert app.state.requests == requests  # 회로가 열려 있으면 서버에 보내지 않음
+
+    time.sleep(0.25)
+    assert breaker.state == "half_open"
+    app.state.settings["error_rate"] = 0.0
+    assert len(embedding.embed_query("기저귀")) == 256
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_breaker(server):
+    app, base_url = server
+    breaker = CircuitBreaker(failures=1, reset=0.1)
+    embedding = ResilientEmbeddings(remote_embedding(base_url), timeout=1, hedge_delay=0, breaker=breaker)
+
+    app.state.settings["error_rate"] = 1.0
+    with pytest.raises(EmbeddingUnavailable):
+        embedding.embed_query("예방접종")
+    time.sleep(0.15)
+    with pytest.raises(EmbeddingUnavailable, match="임베딩 요청 실패"):
+        embedding.embed_query("예방접종")  # 시험 요청도 실패
+    assert breaker.state == "open"
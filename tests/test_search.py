@@ -0,0 +1,81 @@
+"""rag.search SearchTool.search_batch (rag.numpy_store 사용)"""
+import zlib
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.numpy_store import NumpyVectorStore
+from rag.search import SearchTool
+
+CATEGORIES = ["0~3개월", "4~6개월"]
+TEXTS = ["신생아 수유 간격", "신생아 황달", "이유식 시작 시기", "이유식 알레르기", "밤중 수유 끊기", "뒤집기 시기"]
+
+
+class CountingEmbeddings(Embeddings):
+    """텍스트의 crc32를 시드로 만든 무작위 단위 벡터, embed_documents 호출을 기록"""
+
+    def __init__(self, size=64):
+        self.size = size
+        self.batches = []
+
+    def _embed(self, text):
+        vector = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class CountingStore(NumpyVectorStore):
+    searches = None
+
+    def similarity_search_with_score_by_vectors(self, embeddings, k=4, filter=None):
+        self.searches.append((len(embeddings), filter))
+        return super().similarity_search_with_score_by_vectors(embeddings, k, filter)
+
+
+def make_tool(cache_size=0):
+    embedding = CountingEmbeddings()
+    docs = [Document(page_content=text, metadata={"id": f"d{i}", "category": CATEGORIES[i // 3]})
+            for i, text in enumerate(TEXTS)]
+    store = CountingStore.from_documents(docs, embedding)
+    embedding.batches.clear()
+    store.searches = []
+    tool = SearchTool("베이비러브", "월령별 정보", store, "베이비러브", k=2, category_field="category",
+                      categories=CATEGORIES, cache_size=cache_size)
+    return tool, embedding, store
+
+
+def test_search_batch_groups_queries_by_category():
+    tool, embedding, store = make_tool()
+    queries = ["수유 간격", "이유식", "황달", "뒤집기"]
+    categories = [["0~3개월"], ["4~6개월"], ["0~3개월", "없는 카테고리"], None]
+
+    results = tool.search_batch(queries, categories, batch_size=8)
+
+    assert [r.query for r in results] == queries
+    # 카테고리 조합마다 임베딩 한 번, 배치 검색 한 번
+    assert sorted(map(sorted, embedding.batches)) == [["뒤집기"], ["수유 간격", "황달"], ["이유식"]]
+    assert sorted(store.searches, key=str) == sorted([
+        (2, {"category": {"$in": ["0~3개월"]}}), (1, {"category": {"$in": ["4~6개월"]}}), (1, None),
+    ], key=str)
+    assert all(hit.metadata["category"] == "0~3개월" for hit in results[0].hits + results[2].hits)
+    assert all(hit.metadata["category"] == "4~6개월" for hit in results[1].hits)
+
+
+def test_search_batch_matches_single_search_and_uses_cache():
+    tool, embedding, _ = make_tool(cache_size=16)
+    queries = ["이유식 시작", "수유"]
+    results = tool.search_batch(queries, batch_size=1)
+    assert len(embedding.batches) == 2  # batch_size개씩 임베딩
+
+    for query, result in zip(queries, results):
+        assert tool.search(query) == result.text
+    embedding.batches.clear()
+    assert tool.search_batch(queries) == results
+    assert embedding.batches == []  # 모두 캐시에서
@@ -0,0 +1,44 @@
+"""rag.server 생성 요청 처리 (가짜 생성 함수 사용)"""
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import rag.server as server
+from rag.server import GenerateRequest, GenerationJob, Pipeline, create_app
+
+
+def test_non_streaming_generation_stops_when_client_disconnects(monkeypatch):
+    started, stopped = threading.Event(), threading.Event()
+
+    def generate_stream(prompt, model, tokenizer, device, stop_signal=None, **kwargs):
+        started.set()
+        for _ in range(200):
+            if stop_signal.stopped:
+                stopped.set()
+                return "", None
+            time.sleep(0.01)
+        return "끝까지 생성", None
+
+    monkeypatch.setattr(server, "generate_stream", generate_stream)
+    monkeypatch.setattr(server, "DISCONNECT_POLL_SECONDS", 0.05)
+    app = create_app(loader=lambda: Pipeline(search_tools=[], model=object()), workers=1)
+
+    class DisconnectedRequest:
+        """생성이 시작된 뒤 연결이 끊긴 요청"""
+        def __init__(self):
+            self.app = app
+
+        async def is_disconnected(self):
+            return started.is_set()
+
+    async def respond():
+        ticket = app.state.admission.enqueue()
+        return await server._respond(DisconnectedRequest(), ticket, GenerationJob("밤잠은?", ""),
+                                     GenerateRequest(question="밤잠은?", stream=False), time.perf_counter(),
+                                     "generate")
+
+    with TestClient(app) as client:
+        response = client.portal.call(respond)
+        assert stopped.is_set() and response["text"] == ""
+        assert app.state.admission.stats()["active"] == 0
@@ -0,0 +1,91 @@
+"""rag.sessions 멀티턴 프롬프트와 KV 캐시 재사용 (rag.fakes의 작은 모델 사용)"""
+import pytest
+
+import rag.sessions as sessions
+from rag.fakes import build_tiny_model
+from rag.sessions import SessionStore, build_chat_prompt, session_generate, trim_turns
+
+TEXTS = [
+    "### 시스템: 육아 상담\n\n### 문맥: 생후 4개월 아기는 하루 4~6회 수유합니다.\n\n### 질문: 수유 간격은?\n\n### 답변: 3~4시간",
+    "### 질문: 밤잠은 몇 시간 자나요?\n\n### 답변: 10시간 정도 잡니다.",
+    "이유식은 6개월 무렵 시작하고 분유는 양을 조금씩 줄입니다.",
+]
+SYSTEM = "육아 상담"
+
+
+@pytest.fixture(scope="module")
+def tiny():
+    return build_tiny_model(TEXTS, vocab_size=300)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """session_generate가 넘긴 프롬프트 토큰과 재사용한 캐시 길이를 기록"""
+    recorded = []
+    generate_stream = sessions.generate_stream
+
+    def record(*args, **kwargs):
+        recorded.append({"ids": list(kwargs["prompt_ids"]), "reused": kwargs["past_key_values"].get_seq_length()})
+        return generate_stream(*args, **kwargs)
+
+    monkeypatch.setattr(sessions, "generate_stream", record)
+    return recorded
+
+
+def chat(store, tiny, question, context=""):
+    model, tokenizer, device = tiny
+    return session_generate(store, "s", question, model, tokenizer, device, max_new_tokens=4, temperature=1.0,
+                            context=context, system_prompt=SYSTEM)
+
+
+def test_stored_history_has_no_context(tiny, calls):
+    _, tokenizer, _ = tiny
+    store = SessionStore()
+    chat(store, tiny, "수유 간격은?", context="생후 4개월 아기는 하루 4~6회 수유합니다.")
+
+    session = store.get("s")
+    history = tokenizer(build_chat_prompt([], "수유 간격은?", "", SYSTEM))["input_ids"]
+    assert session.ids[:len(history)] == history
+    assert "### 문맥" not in tokenizer.decode(session.ids)
+    # 캐시는 문맥 앞까지만 남음
+    assert session.cache.get_seq_length() == sessions.common_prefix_length(session.ids, calls[0]["ids"])
+
+
+def test_next_turn_has_only_current_context_and_reuses_cache(tiny, calls):
+    _, tokenizer, _ = tiny
+    store = SessionStore()
+    chat(store, tiny, "수유 간격은?", context="첫 번째 문맥")
+    first = store.get("s")
+    cached, history = first.cache.get_seq_length(), list(first.ids)
+    chat(store, tiny, "밤잠은 몇 시간 자나요?", context="두 번째 문맥")
+
+    prompt = tokenizer.decode(calls[1]["ids"])
+    assert "첫 번째 문맥" not in prompt
+    assert prompt.count("### 문맥") == 1 and "두 번째 문맥" in prompt
+    assert calls[1]["ids"][:len(history)] == history  # 이전 대화 토큰 그대로 이어 붙임
+    assert calls[1]["reused"] == cached > 0
+
+
+def test_turn_without_context_keeps_answer_in_cache(tiny, calls):
+    store = SessionStore()
+    chat(store, tiny, "수유 간격은?")
+    session = store.get("s")
+    history = len(session.ids)
+    assert session.cache.get_seq_length() == history
+
+    chat(store, tiny, "밤잠은 몇 시간 자나요?")
+    assert calls[1]["reused"] == history
+
+
+def test_trim_turns_drops_old_turns_then_truncates_context(tiny):
+    _, tokenizer, _ = tiny
+    turns = [("수유 간격은?", "3~4시간"), ("밤잠은?", "10시간")]
+    full = len(tokenizer(build_chat_prompt(turns, "이유식은?", "", SYSTEM))["input_ids"])
+    kept, _, ids = trim_turns(tokenizer, turns, "이유식은?", "", SYSTEM, budget=full - 1)
+    assert kept == turns[1:] and len(ids) <= full - 1
+
+    context = "이유식은 6개월 무렵 시작하고 분유는 양을 조금씩 줄입니다. " * 20
+    budget = len(tokenizer(build_chat_prompt([], "이유식은?", "", SYSTEM))["input_ids"]) + 20
+    kept, prompt, ids = trim_turns(tokenizer, turns, "이유식은?", context, SYSTEM, budget)
+    assert kept == [] and len(ids) <= budget
+    assert "### 문맥: 이유식은" in prompt
@@ -0,0 +1,96 @@
+"""rag.singleflight 같은 질문 요청 합치기"""
+import asyncio
+
+from rag.singleflight import SingleFlight
+
+
+async def collect(flight):
+    return [event async for event in flight.subscribe()]
+
+
+def test_joined_subscriber_receives_text_so_far_and_result():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def start(flight):
+            flight.publish("token", {"text": "안녕"})
+            await release.wait()
+            flight.publish("token", {"text": "하세요"})
+            flight.publish("done", {"answer": "안녕하세요"})
+
+        leader, started = flights.join("q", start)
+        first = asyncio.create_task(collect(leader))
+        await asyncio.sleep(0.01)
+        joined, started_again = flights.join("q", start)
+        second = asyncio.create_task(collect(joined))
+        await asyncio.sleep(0.01)
+        release.set()
+
+        assert started and not started_again and joined is leader
+        assert "".join(d["text"] for name, d in await first if name == "token") == "안녕하세요"
+        events = await second
+        assert events[0] == ("token", {"text": "안녕"})
+        assert events[-1] == ("done", {"answer": "안녕하세요"})
+        await asyncio.sleep(0)
+        assert "q" not in flights
+
+    asyncio.run(run())
+
+
+def test_task_is_cancelled_when_last_subscriber_leaves():
+    async def run():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def start(flight):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        flight, _ = flights.join("q", start)
+        flights.join("q", start)
+        first = asyncio.create_task(collect(flight))
+        second = asyncio.create_task(collect(flight))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()  # 남은 구독자가 있으면 계속 진행
+
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert flight.result[0] == "error"
+        assert len(flights) == 0
+
+    asyncio.run(run())
+
+
+def test_joined_response_that_is_never_read_does_not_keep_task_alive():
+    async def run():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def start(flight):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        flight, _ = flights.join("q", start)
+        flights.join("q", start)  # 스트리밍을 시작하기 전에 연결이 끊긴 요청
+        reader = asyncio.create_task(collect(flight))
+        await asyncio.sleep(0.01)
+        assert flight.subscribers == 1
+
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    asyncio.run(run())